@@ -53,9 +53,39 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Conexões persistentes: cada thread reaproveita a sua por até 10 min,
+        # em vez de reabrir o arquivo (e reaplicar os PRAGMAs) a cada requisição.
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        # Segundos que uma escrita espera outra terminar antes de falhar.
+        'OPTIONS': {'timeout': 20},
     }
 }
 
+# PRAGMAs aplicados a cada conexão SQLite nova (localidades/banco.py). O WAL
+# deixa leituras e a escrita de uma importação rodarem ao mesmo tempo; com
+# ele, synchronous=NORMAL continua seguro contra corrupção.
+LOCALIDADES_SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,  # em KiB (valor negativo): 64 MiB por conexão
+    'temp_store': 'MEMORY',
+}
+
+# Réplica de leitura em memória (localidades/replica.py): o banco é copiado
+# para um SQLite em memória na primeira requisição e recopiado quando a
+# versão dos dados muda; as leituras das localidades vão para a cópia. Ocupa
+# a memória de uma cópia do banco por processo.
+LOCALIDADES_REPLICA_MEMORIA = False
+if LOCALIDADES_REPLICA_MEMORIA:
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': 'file:localidades_replica?mode=memory&cache=shared',
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_ROUTERS = ['localidades.replica.RoteadorReplica']
+
 # --- Password validation ---
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -100,4 +130,96 @@ CSRF_TRUSTED_ORIGINS = [
 
 # --- Configuração de Sessão ---
 # Garante que a sessão do usuário expire quando o navegador for fechado.
-SESSION_EXPIRE_AT_BROWSER_CLOSE = True
\ No newline at end of file
+SESSION_EXPIRE_AT_BROWSER_CLOSE = True
+
+# --- Configurações de desempenho das localidades ---
+# Zoom a partir do qual o endpoint de clusters devolve as localidades individuais.
+LOCALIDADES_CLUSTER_ZOOM_PONTOS = 13
+# Tamanho (em pixels de tela) da célula usada para agrupar localidades próximas.
+LOCALIDADES_CLUSTER_RAIO_PX = 60
+# Pasta do cache em disco dos tiles vetoriais (organizada por versão dos dados).
+LOCALIDADES_TILES_DIR = BASE_DIR / 'cache' / 'tiles'
+# Tempo (em segundos) que o navegador pode reutilizar um tile sem pedir de novo.
+LOCALIDADES_TILES_MAX_AGE = 300
+# Tamanho (em pixels de tela) das células do mapa de calor; a resolução
+# geográfica acompanha o zoom (256 / CELULA_PX células por tile).
+LOCALIDADES_HEATMAP_CELULA_PX = 16
+# Máximo de tiles cobertos por uma requisição do mapa de calor e de grades
+# de tile guardadas em memória.
+LOCALIDADES_HEATMAP_MAX_TILES = 64
+LOCALIDADES_HEATMAP_CACHE_TILES = 1024
+# Quantidade de linhas lidas do banco por vez no modo streaming (?stream=true).
+LOCALIDADES_STREAM_CHUNK = 2000
+
+# --- Cache ---
+# `localidades` guarda as respostas renderizadas da listagem. O LocMemCache do
+# Django descarta as entradas menos usadas (LRU) ao atingir MAX_ENTRIES, e
+# cache_respostas.py descarta as menos usadas quando o total passa de
+# LOCALIDADES_CACHE_MAX_BYTES. Para compartilhar o cache entre processos,
+# troque por FileBasedCache.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'localidades': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'localidades-respostas',
+        'TIMEOUT': None,
+        'OPTIONS': {'MAX_ENTRIES': 128, 'CULL_FREQUENCY': 4},
+    },
+}
+# Total de bytes de respostas guardadas no cache, por processo.
+LOCALIDADES_CACHE_MAX_BYTES = 64 * 1024 * 1024
+# Respostas maiores que isto (em bytes) não são guardadas no cache.
+LOCALIDADES_CACHE_MAX_BYTES_RESPOSTA = 8 * 1024 * 1024
+
+# --- Matriz de distâncias ---
+# Máximo de células calculadas por bloco (limita a memória usada pelo NumPy).
+LOCALIDADES_DISTANCIA_CELULAS_POR_BLOCO = 2_000_000
+# Máximo de células (origens x destinos) aceitas na resposta densa.
+LOCALIDADES_DISTANCIA_MAX_DENSA = 1_000_000
+
+# --- Vizinhos mais próximos ---
+# Maior valor aceito para o parâmetro `k` de /api/localidades/nearest/, e
+# máximo de resultados de uma busca por `radius_km` sem `k`.
+LOCALIDADES_VIZINHOS_MAX_K = 1000
+
+# --- Planejador de visitas ---
+# Máximo de localidades aceitas em /api/rotas/tour/ (a matriz de distâncias
+# float32 de 3000 paradas ocupa ~36 MB).
+LOCALIDADES_ROTA_MAX_PARADAS = 3000
+# Tempo padrão (s) para as melhorias 2-opt/Or-opt.
+LOCALIDADES_ROTA_TEMPO_LIMITE = 0.8
+
+# --- Rede fluvial ---
+# Linhas dos rios (GeoJSON; shapefile também é aceito com o pacote `pyshp`).
+# O comando `preparar_rede_fluvial` gera o arquivo pré-processado usado pelas
+# consultas de /api/rotas/fluvial/.
+LOCALIDADES_REDE_FLUVIAL_ARQUIVO = BASE_DIR / 'data' / 'rede_fluvial.geojson'
+LOCALIDADES_REDE_FLUVIAL_PREPARADA = BASE_DIR / 'cache' / 'rede_fluvial.npz'
+# Vértices com as mesmas coordenadas arredondadas (5 casas ≈ 1 m) viram o mesmo nó.
+LOCALIDADES_REDE_FLUVIAL_CASAS_DECIMAIS = 5
+# Localidades mais longe que isto do rio mais próximo ficam fora da rede.
+LOCALIDADES_REDE_FLUVIAL_MAX_ENCAIXE_KM = 30
+# Velocidade média (km/h) padrão das embarcações na estimativa de tempo.
+LOCALIDADES_REDE_FLUVIAL_VELOCIDADE = 20
+
+# --- Limites das calhas ---
+# Polígonos das calhas (GeoJSON, uma feature por calha). Se o arquivo
+# existir, a importação atribui a calha pela posição de cada localidade e
+# só recorre ao nome do município para as que ficarem fora dos polígonos.
+LOCALIDADES_CALHAS_LIMITES_ARQUIVO = BASE_DIR / 'data' / 'calhas.geojson'
+# Propriedade das features com o nome da calha (o mesmo de CalhaRio.nome).
+LOCALIDADES_CALHAS_LIMITES_PROPRIEDADE = 'nome'
+
+# --- Autocompletar ---
+# Maior valor aceito para o parâmetro `limit` de /api/localidades/autocomplete/.
+LOCALIDADES_AUTOCOMPLETE_MAX_LIMITE = 50
+
+# --- Importação ---
+# Linhas montadas e inseridas por vez (bulk_create) na importação da planilha.
+LOCALIDADES_IMPORTACAO_LOTE = 2000
+# Cache em disco das abas já lidas e limpas, pelo hash do arquivo. As
+# entradas usadas há mais tempo são apagadas quando o total passa do limite.
+LOCALIDADES_IMPORTACAO_CACHE_DIR = BASE_DIR / 'cache' / 'planilhas'
+LOCALIDADES_IMPORTACAO_CACHE_MAX_BYTES = 256 * 1024 * 1024
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_wsgi_application()
+
+# Constrói o índice do autocompletar em segundo plano na subida do servidor.
+from localidades.autocomplete import aquecer  # noqa: E402
+
+aquecer()
@@ -1,7 +1,7 @@
 # backend/localidades/admin.py
 
 from django.contrib import admin
-from .models import Localidade, CalhaRio
+from .models import Localidade, CalhaRio, ResumoLocalidades
 
 # Registra o modelo CalhaRio no painel de administração.
 @admin.register(CalhaRio)
@@ -27,4 +27,20 @@ class LocalidadeAdmin(admin.ModelAdmin):
     search_fields = ('nome_comunidade', 'municipio')
     
     # Melhora a performance para campos com muitos valores únicos.
-    raw_id_fields = ('calha_rio',)
\ No newline at end of file
+    raw_id_fields = ('calha_rio',)
+
+# Tabela de resumo mantida automaticamente: só leitura no admin.
+@admin.register(ResumoLocalidades)
+class ResumoLocalidadesAdmin(admin.ModelAdmin):
+    list_display = ('calha_rio', 'municipio', 'fonte_dados', 'tipo_comunidade', 'quantidade', 'domicilios', 'total_ligacoes')
+    list_filter = ('fonte_dados', 'calha_rio')
+    search_fields = ('municipio',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -1,6 +1,20 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class LocalidadesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'localidades'
+
+    def ready(self):
+        # Registra os receptores de sinais que controlam a versão dos dados,
+        # os PRAGMAs das conexões SQLite e a réplica de leitura.
+        from . import banco, cache_respostas, replica, signals  # noqa: F401
+        from .indice_espacial import garantir_indice_espacial
+        from .indice_textual import garantir_indice_textual
+
+        # Os índices espacial (R*Tree) e textual (FTS5) do SQLite ficam fora
+        # das migrações porque precisam ser recriados sempre que o SQLite
+        # reconstrói a tabela.
+        post_migrate.connect(garantir_indice_espacial, sender=self)
+        post_migrate.connect(garantir_indice_textual, sender=self)
@@ -0,0 +1,184 @@
+# backend/localidades/autocomplete.py
+#
+# Índice em memória para o autocompletar dos seletores de ponto A/B. Os
+# nomes normalizados (sem acentos, minúsculos) ficam em um único texto com
+# offsets, ordenados; a busca por prefixo é uma busca binária, sem varrer a
+# tabela. Cada comunidade entra com o nome inteiro e com cada sufixo que
+# começa em uma palavra ("sao gabriel do papuri", "gabriel do papuri", ...),
+# e os municípios têm um índice próprio (são poucos valores distintos).
+#
+# Ordem dos resultados: prefixo do nome, prefixo de uma palavra do nome,
+# prefixo do município; dentro de cada nível, mais domicílios primeiro.
+
+import bisect
+import threading
+
+import numpy as np
+from django.db import DatabaseError, connection, transaction
+from django.dispatch import receiver
+
+from .models import Localidade
+from .texto import normalizar_texto
+from .versao import CachePorVersao, versao_alterada
+
+NIVEL_NOME = 0
+NIVEL_PALAVRA = 1
+NIVEL_MUNICIPIO = 2
+
+# Consultas curtas casam com boa parte da base; as respostas delas são
+# memorizadas no próprio índice (que é descartado quando a versão muda).
+MAX_TAMANHO_MEMORIZADO = 2
+
+_FIM = chr(0x10FFFF)
+
+_indices = CachePorVersao(max_itens=8)
+
+# Só os processos do servidor (que chamam `aquecer()` na subida) reconstroem
+# o índice em segundo plano a cada mudança de versão; comandos de
+# importação não precisam dele.
+_aquecimento = {'ativo': False}
+
+
+def _sufixos(normalizado):
+    palavras = normalizado.split(' ')
+    return [' '.join(palavras[i:]) for i in range(len(palavras))] if normalizado else []
+
+
+class _ChavesOrdenadas:
+    """Chaves de texto ordenadas, guardadas em um único str com offsets."""
+
+    def __init__(self, chaves):
+        ordem = sorted(range(len(chaves)), key=chaves.__getitem__)
+        self.texto = ''.join([chaves[i] for i in ordem])
+        self.offsets = np.zeros(len(chaves) + 1, dtype=np.int64)
+        np.cumsum([len(chaves[i]) for i in ordem], out=self.offsets[1:])
+        self.ordem = np.array(ordem, dtype=np.int64)
+
+    def _chave(self, posicao):
+        return self.texto[self.offsets[posicao]:self.offsets[posicao + 1]]
+
+    def intervalo(self, prefixo):
+        """Posições [inicio, fim) das chaves que começam com `prefixo`."""
+        posicoes = range(len(self.ordem))
+        inicio = bisect.bisect_left(posicoes, prefixo, key=self._chave)
+        fim = bisect.bisect_left(posicoes, prefixo + _FIM, lo=inicio, key=self._chave)
+        return inicio, fim
+
+
+class IndiceAutocomplete:
+    def __init__(self, linhas):
+        """`linhas`: tuplas (id, nome_comunidade, municipio, domicilios)."""
+        self.ids = np.array([linha[0] for linha in linhas], dtype=np.int64)
+        self.domicilios = np.array([linha[3] or 0 for linha in linhas], dtype=np.int64)
+        chaves, linhas_chave, niveis = [], [], []
+        for posicao, linha in enumerate(linhas):
+            for i, sufixo in enumerate(_sufixos(normalizar_texto(linha[1]))):
+                chaves.append(sufixo)
+                linhas_chave.append(posicao)
+                niveis.append(NIVEL_NOME if i == 0 else NIVEL_PALAVRA)
+        self.chaves_nome = _ChavesOrdenadas(chaves)
+        self.linha_nome = np.array(linhas_chave, dtype=np.int32)[self.chaves_nome.ordem]
+        self.nivel_nome = np.array(niveis, dtype=np.int8)[self.chaves_nome.ordem]
+
+        # Municípios: para cada chave, as linhas do município já ordenadas
+        # por domicílios (decrescente).
+        por_municipio = {}
+        for posicao, linha in enumerate(linhas):
+            por_municipio.setdefault(linha[2], []).append(posicao)
+        agrupado = {}
+        for municipio, posicoes in por_municipio.items():
+            agrupado.setdefault(normalizar_texto(municipio), []).extend(posicoes)
+        self.municipios = []
+        chaves_municipio = []
+        for nome, posicoes in agrupado.items():
+            posicoes = np.array(posicoes, dtype=np.int64)
+            posicoes = posicoes[np.argsort(-self.domicilios[posicoes], kind='stable')]
+            for sufixo in _sufixos(nome):
+                chaves_municipio.append(sufixo)
+                self.municipios.append(posicoes)
+        self.chaves_municipio = _ChavesOrdenadas(chaves_municipio)
+
+        self._memo = {}
+
+    def _melhores_do_nome(self, consulta, limite):
+        inicio, fim = self.chaves_nome.intervalo(consulta)
+        if inicio == fim:
+            return np.empty(0, dtype=np.int64)
+        linhas = self.linha_nome[inicio:fim]
+        # Nível primeiro, depois mais domicílios: uma única chave inteira.
+        pontuacao = self.nivel_nome[inicio:fim].astype(np.int64) * (int(self.domicilios.max()) + 1) - self.domicilios[linhas]
+        quantidade = limite * 2
+        while True:
+            if quantidade < len(linhas):
+                escolhidas = np.argpartition(pontuacao, quantidade)[:quantidade]
+            else:
+                escolhidas = np.arange(len(linhas))
+            escolhidas = escolhidas[np.lexsort((linhas[escolhidas], pontuacao[escolhidas]))]
+            # Uma linha pode casar por mais de um sufixo; fica a melhor posição.
+            _, primeiras = np.unique(linhas[escolhidas], return_index=True)
+            unicas = linhas[escolhidas[np.sort(primeiras)]]
+            if len(unicas) >= limite or len(escolhidas) == len(linhas):
+                return unicas[:limite]
+            quantidade *= 4
+
+    def buscar(self, texto, limite):
+        """Ids das até `limite` localidades que casam com `texto`, na ordem de relevância."""
+        consulta = normalizar_texto(texto)
+        if not consulta or limite <= 0:
+            return []
+        memorizar = len(consulta) <= MAX_TAMANHO_MEMORIZADO
+        if memorizar and (consulta, limite) in self._memo:
+            return self._memo[(consulta, limite)]
+
+        resultado = self._melhores_do_nome(consulta, limite).tolist()
+        if len(resultado) < limite:
+            vistos = set(resultado)
+            inicio, fim = self.chaves_municipio.intervalo(consulta)
+            grupos = [self.municipios[i] for i in self.chaves_municipio.ordem[inicio:fim].tolist()]
+            if grupos:
+                candidatas = np.concatenate(grupos)
+                candidatas = candidatas[np.argsort(-self.domicilios[candidatas], kind='stable')]
+                for posicao in candidatas.tolist():
+                    if posicao not in vistos:
+                        vistos.add(posicao)
+                        resultado.append(posicao)
+                        if len(resultado) == limite:
+                            break
+
+        ids = self.ids[resultado].tolist() if resultado else []
+        if memorizar:
+            self._memo[(consulta, limite)] = ids
+        return ids
+
+
+def obter_indice(chave_filtros, queryset):
+    def construir():
+        return IndiceAutocomplete(list(queryset.values_list('id', 'nome_comunidade', 'municipio', 'domicilios')))
+
+    return _indices.obter(chave_filtros, construir)
+
+
+def aquecer():
+    """
+    Constrói em segundo plano o índice sem filtros, para que a primeira
+    consulta (na subida do servidor ou depois de uma importação) não pague
+    a construção.
+    """
+    _aquecimento['ativo'] = True
+
+    def construir():
+        try:
+            obter_indice(('', ''), Localidade.objects.all())
+        except DatabaseError:
+            # Banco ainda sem as tabelas (antes do migrate): fica para a primeira consulta.
+            pass
+        finally:
+            connection.close()
+
+    threading.Thread(target=construir, name='aquecer-autocomplete', daemon=True).start()
+
+
+@receiver(versao_alterada)
+def reconstruir(sender, **kwargs):
+    if _aquecimento['ativo']:
+        transaction.on_commit(aquecer)
@@ -0,0 +1,27 @@
+# backend/localidades/banco.py
+#
+# Ajustes de desempenho das conexões SQLite, aplicados a cada conexão nova
+# (com CONN_MAX_AGE, uma vez por thread, não por requisição).
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+# Só fazem sentido para um arquivo em disco: um banco em memória não tem
+# WAL nem mapeamento de arquivo.
+_PRAGMAS_DE_ARQUIVO = {'journal_mode', 'mmap_size', 'synchronous'}
+
+
+@receiver(connection_created)
+def configurar_sqlite(sender, connection, **kwargs):
+    """
+    Aplica `LOCALIDADES_SQLITE_PRAGMAS` à conexão. Com o WAL, leitores não
+    esperam a escrita de uma importação terminar (e vice-versa).
+    """
+    if connection.vendor != 'sqlite':
+        return
+    em_memoria = connection.is_in_memory_db()
+    with connection.cursor() as cursor:
+        for nome, valor in settings.LOCALIDADES_SQLITE_PRAGMAS.items():
+            if not (em_memoria and nome in _PRAGMAS_DE_ARQUIVO):
+                cursor.execute(f'PRAGMA {nome} = {valor}')
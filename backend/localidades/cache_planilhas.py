@@ -0,0 +1,132 @@
+# backend/localidades/cache_planilhas.py
+#
+# Cache em disco das abas de planilha já lidas e limpas. Ler o .xlsx é a
+# etapa mais lenta da importação, e é comum rodar a importação de novo com o
+# mesmo arquivo (por exemplo, depois de ajustar o mapeamento das calhas, que
+# é aplicado depois da limpeza). A chave é o hash do conteúdo do arquivo
+# mais a especificação da aba; cada entrada é um .npz com uma coluna por
+# array (sem pickle). As entradas menos usadas recentemente são apagadas
+# quando o total passa de LOCALIDADES_IMPORTACAO_CACHE_MAX_BYTES.
+
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+# Mude quando a limpeza (importacao.limpar) mudar de comportamento, para que
+# entradas antigas não sejam reaproveitadas.
+VERSAO_FORMATO = 2
+
+COLUNAS_REJEITADOS = ('fonte_dados', 'linha', 'nome_comunidade', 'motivo')
+
+
+def chave(hash_arquivo, especificacao):
+    conteudo = json.dumps([VERSAO_FORMATO, hash_arquivo, especificacao], sort_keys=True, default=str)
+    return hashlib.sha256(conteudo.encode()).hexdigest()
+
+
+def _caminho(chave_entrada):
+    return os.path.join(settings.LOCALIDADES_IMPORTACAO_CACHE_DIR, f'{chave_entrada}.npz')
+
+
+def _para_arrays(df, prefixo):
+    """Colunas do DataFrame como arrays NumPy (texto em unicode, nulos numa máscara)."""
+    arrays = {}
+    tipos = {}
+    for coluna in df.columns:
+        serie = df[coluna]
+        nulos = serie.isna().to_numpy()
+        if pd.api.types.is_float_dtype(serie):
+            tipos[coluna] = 'float'
+            arrays[f'{prefixo}valores_{coluna}'] = serie.to_numpy(np.float64)
+        elif pd.api.types.is_integer_dtype(serie):
+            tipos[coluna] = 'int'
+            arrays[f'{prefixo}valores_{coluna}'] = serie.fillna(0).to_numpy(np.int64)
+            arrays[f'{prefixo}nulos_{coluna}'] = nulos
+        else:
+            tipos[coluna] = 'texto'
+            arrays[f'{prefixo}valores_{coluna}'] = np.array(serie.astype(object).where(~nulos, '').tolist(), dtype=str)
+            arrays[f'{prefixo}nulos_{coluna}'] = nulos
+    return arrays, tipos
+
+
+def _de_arrays(arquivo, prefixo, tipos):
+    df = pd.DataFrame()
+    for coluna, tipo in tipos.items():
+        valores = arquivo[f'{prefixo}valores_{coluna}']
+        if tipo == 'float':
+            df[coluna] = valores
+        elif tipo == 'int':
+            serie = pd.Series(valores).astype('Int64')
+            serie[arquivo[f'{prefixo}nulos_{coluna}']] = pd.NA
+            df[coluna] = serie
+        else:
+            serie = pd.Series(valores, dtype='string')
+            serie[arquivo[f'{prefixo}nulos_{coluna}']] = pd.NA
+            df[coluna] = serie
+    return df
+
+
+def existe(chave_entrada):
+    return os.path.exists(_caminho(chave_entrada))
+
+
+def carregar(chave_entrada):
+    """(validos, rejeitados) guardados para a chave, ou None se não houver."""
+    caminho = _caminho(chave_entrada)
+    try:
+        with np.load(caminho, allow_pickle=False) as arquivo:
+            meta = json.loads(str(arquivo['meta']))
+            validos = _de_arrays(arquivo, 'v_', meta['validos'])
+            rejeitados = _de_arrays(arquivo, 'r_', meta['rejeitados'])
+    except (FileNotFoundError, ValueError, KeyError, OSError):
+        return None
+    # Marca a entrada como usada agora (a remoção apaga as mais antigas).
+    os.utime(caminho)
+    rejeitados = rejeitados.astype(object).where(rejeitados.notna(), None)
+    rejeitados['linha'] = rejeitados['linha'].astype(int)
+    return validos, rejeitados.to_dict('records')
+
+
+def salvar(chave_entrada, validos, rejeitados):
+    """Grava a entrada de forma atômica e aplica o limite de tamanho do cache."""
+    arrays_validos, tipos_validos = _para_arrays(validos, 'v_')
+    tabela_rejeitados = pd.DataFrame(rejeitados, columns=list(COLUNAS_REJEITADOS)).astype({'linha': np.int64})
+    arrays_rejeitados, tipos_rejeitados = _para_arrays(tabela_rejeitados, 'r_')
+    meta = json.dumps({'validos': tipos_validos, 'rejeitados': tipos_rejeitados})
+
+    caminho = _caminho(chave_entrada)
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    temporario = f'{caminho}.{os.getpid()}.tmp'
+    with open(temporario, 'wb') as arquivo:
+        np.savez_compressed(arquivo, meta=np.array(meta), **arrays_validos, **arrays_rejeitados)
+    os.replace(temporario, caminho)
+    limitar_tamanho(settings.LOCALIDADES_IMPORTACAO_CACHE_MAX_BYTES)
+
+
+def limitar_tamanho(max_bytes):
+    """Apaga as entradas usadas há mais tempo até o cache caber em `max_bytes`."""
+    pasta = settings.LOCALIDADES_IMPORTACAO_CACHE_DIR
+    try:
+        nomes = [nome for nome in os.listdir(pasta) if nome.endswith('.npz')]
+    except FileNotFoundError:
+        return
+    entradas = []
+    for nome in nomes:
+        try:
+            estado = os.stat(os.path.join(pasta, nome))
+        except FileNotFoundError:
+            continue
+        entradas.append((estado.st_mtime, estado.st_size, nome))
+    total = sum(tamanho for _, tamanho, _ in entradas)
+    for _, tamanho, nome in sorted(entradas):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(os.path.join(pasta, nome))
+        except FileNotFoundError:
+            pass
+        total -= tamanho
@@ -0,0 +1,173 @@
+# backend/localidades/cache_respostas.py
+#
+# Cache das respostas já renderizadas da listagem de localidades. Quase todo
+# o tráfego repete as mesmas combinações de fonte de dados x calha, então
+# guardamos os bytes finais, indexados pelos filtros normalizados e pela
+# versão dos dados. O backend é o cache `localidades` de config/settings.py
+# (LocMemCache com descarte LRU por número de entradas); o total de bytes
+# guardados por processo é limitado aqui, por LOCALIDADES_CACHE_MAX_BYTES.
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.dispatch import receiver
+from django.http import HttpResponse
+from django.template.response import SimpleTemplateResponse
+
+from .filters import ler_bbox
+from .versao import versao_alterada, versao_atual
+
+ALIAS = 'localidades'
+
+# Formatos de resposta que podem ser guardados. A API navegável (HTML)
+# contém dados do usuário e token CSRF, então nunca entra no cache.
+FORMATOS_CACHEAVEIS = ('json', 'colunar')
+
+_contadores = {'acertos': 0, 'falhas': 0}
+_lock = threading.Lock()
+# Tamanho em bytes de cada entrada guardada por este processo, da menos para
+# a mais usada recentemente. O LocMemCache só conta entradas; o orçamento em
+# bytes é aplicado aqui, descartando as menos usadas.
+_tamanhos = OrderedDict()
+_total_bytes = 0
+
+
+def _contar(nome):
+    with _lock:
+        _contadores[nome] += 1
+
+
+def cache():
+    return caches[ALIAS]
+
+
+def _ler(chave):
+    guardado = cache().get(chave)
+    with _lock:
+        if guardado is None:
+            # Descartada pelo próprio cache (MAX_ENTRIES) ou ainda não guardada.
+            _esquecer(chave)
+        elif chave in _tamanhos:
+            _tamanhos.move_to_end(chave)
+    return guardado
+
+
+def _esquecer(chave):
+    global _total_bytes
+    _total_bytes -= _tamanhos.pop(chave, 0)
+
+
+def _guardar(chave, content_type, conteudo):
+    """Guarda a resposta e descarta as menos usadas até caber em LOCALIDADES_CACHE_MAX_BYTES."""
+    global _total_bytes
+    if len(conteudo) > settings.LOCALIDADES_CACHE_MAX_BYTES:
+        return
+    with _lock:
+        _esquecer(chave)
+        _tamanhos[chave] = len(conteudo)
+        _total_bytes += len(conteudo)
+        descartadas = []
+        while _total_bytes > settings.LOCALIDADES_CACHE_MAX_BYTES:
+            antiga, tamanho = _tamanhos.popitem(last=False)
+            _total_bytes -= tamanho
+            descartadas.append(antiga)
+        cache().delete_many(descartadas)
+        cache().set(chave, (content_type, conteudo))
+
+
+def chave_da_requisicao(request):
+    """
+    Chave canônica: versão dos dados, formato negociado e os parâmetros de
+    filtro/busca/bbox/paginação normalizados (ordem e caixa não importam).
+    """
+    params = request.query_params
+    bbox = ler_bbox(params.get('in_bbox'))
+    canonico = {
+        'fonte_dados': params.get('fonte_dados', '').strip().lower(),
+        'calha_rio': params.get('calha_rio', '').strip(),
+        'search': ' '.join(params.get('search', '').split()),
+        'in_bbox': list(bbox) if bbox else None,
+        'limit': params.get('limit', ''),
+        'cursor': params.get('cursor', ''),
+    }
+    # Parâmetros desconhecidos também entram, para nunca misturar respostas.
+    outros = sorted(
+        (chave, sorted(params.getlist(chave)))
+        for chave in params if chave not in canonico and chave != 'format'
+    )
+    # O host entra porque os links de paginação ("next") são absolutos.
+    texto = json.dumps([request.get_host(), canonico, outros], sort_keys=True, ensure_ascii=False)
+    resumo = hashlib.sha1(texto.encode('utf-8')).hexdigest()
+    return f'lista:{versao_atual()}:{request.accepted_renderer.format}:{resumo}'
+
+
+def cache_de_resposta(view):
+    """Decorator para `list`: serve os bytes do cache ou guarda a resposta gerada."""
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.accepted_renderer.format not in FORMATOS_CACHEAVEIS:
+            return view(request, *args, **kwargs)
+
+        chave = chave_da_requisicao(request)
+        guardado = _ler(chave)
+        if guardado is not None:
+            _contar('acertos')
+            content_type, conteudo = guardado
+            resposta = HttpResponse(conteudo, content_type=content_type)
+            resposta['X-Cache'] = 'HIT'
+            return resposta
+
+        _contar('falhas')
+        resposta = view(request, *args, **kwargs)
+        if resposta.streaming or resposta.status_code != 200:
+            return resposta
+
+        def guardar(resposta_renderizada):
+            if len(resposta_renderizada.content) <= settings.LOCALIDADES_CACHE_MAX_BYTES_RESPOSTA:
+                _guardar(chave, resposta_renderizada['Content-Type'], resposta_renderizada.content)
+
+        # Respostas do DRF só têm conteúdo depois de renderizadas pelo Django.
+        if isinstance(resposta, SimpleTemplateResponse) and not resposta.is_rendered:
+            resposta.add_post_render_callback(guardar)
+        else:
+            guardar(resposta)
+        resposta['X-Cache'] = 'MISS'
+        return resposta
+
+    return wrapper
+
+
+def estatisticas():
+    with _lock:
+        acertos, falhas = _contadores['acertos'], _contadores['falhas']
+        entradas, total_bytes = len(_tamanhos), _total_bytes
+    total = acertos + falhas
+    return {
+        'acertos': acertos,
+        'falhas': falhas,
+        'taxa_acerto': round(acertos / total, 4) if total else None,
+        'backend': settings.CACHES[ALIAS]['BACKEND'],
+        'max_entradas': settings.CACHES[ALIAS].get('OPTIONS', {}).get('MAX_ENTRIES'),
+        'entradas': entradas,
+        'bytes': total_bytes,
+        'max_bytes': settings.LOCALIDADES_CACHE_MAX_BYTES,
+    }
+
+
+@receiver(versao_alterada)
+def invalidar(sender, **kwargs):
+    # As chaves já incluem a versão, então entradas antigas nunca são servidas;
+    # limpar aqui só libera a memória mais cedo. Num processo diferente do
+    # servidor (comandos de importação) a limpeza não alcança o LocMemCache,
+    # mas a troca de versão garante a invalidação do mesmo jeito.
+    global _total_bytes
+    with _lock:
+        _tamanhos.clear()
+        _total_bytes = 0
+        cache().clear()
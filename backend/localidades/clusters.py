@@ -0,0 +1,110 @@
+# backend/localidades/clusters.py
+
+import numpy as np
+from django.conf import settings
+
+from .versao import CachePorVersao
+
+# Tamanho (em pixels) de um tile na projeção Web Mercator usada pelo Leaflet.
+TAMANHO_TILE = 256
+
+# Pirâmides já construídas, uma por combinação de filtros.
+_piramides = CachePorVersao()
+
+
+def projetar_mercator(latitude, longitude):
+    """Converte arrays de lat/lon em coordenadas Web Mercator normalizadas (0 a 1)."""
+    lat = np.radians(np.clip(latitude, -85.05112878, 85.05112878))
+    x = (np.asarray(longitude, dtype=np.float64) + 180.0) / 360.0
+    y = (1.0 - np.log(np.tan(lat) + 1.0 / np.cos(lat)) / np.pi) / 2.0
+    return x, y
+
+
+class PiramideClusters:
+    """
+    Agrupamento pré-calculado das localidades para cada nível de zoom.
+
+    Em cada zoom o mapa é dividido em uma grade de células de
+    `LOCALIDADES_CLUSTER_RAIO_PX` pixels. As localidades que caem na mesma
+    célula viram um único cluster com centroide, quantidade e somas de
+    domicílios e ligações. A pirâmide é construída uma vez por versão dos
+    dados e reutilizada por todas as requisições.
+    """
+
+    def __init__(self, ids, latitudes, longitudes, domicilios, total_ligacoes, zoom_maximo, raio_px):
+        self.zoom_maximo = zoom_maximo
+        self.niveis = {}
+
+        x, y = projetar_mercator(latitudes, longitudes)
+        for zoom in range(zoom_maximo):
+            celulas_por_eixo = TAMANHO_TILE * 2 ** zoom / raio_px
+            cx = np.floor(x * celulas_por_eixo).astype(np.int64)
+            cy = np.floor(y * celulas_por_eixo).astype(np.int64)
+            chaves = cx * (int(celulas_por_eixo) + 1) + cy
+            _, grupo = np.unique(chaves, return_inverse=True)
+
+            quantidade = np.bincount(grupo)
+            # Para clusters com uma única localidade guardamos o id dela,
+            # permitindo que o frontend abra o popup diretamente.
+            id_unico = np.full(len(quantidade), -1, dtype=np.int64)
+            id_unico[grupo] = ids
+            id_unico[quantidade > 1] = -1
+
+            self.niveis[zoom] = {
+                'latitude': np.bincount(grupo, weights=latitudes) / quantidade,
+                'longitude': np.bincount(grupo, weights=longitudes) / quantidade,
+                'quantidade': quantidade,
+                'domicilios': np.bincount(grupo, weights=domicilios).astype(np.int64),
+                'total_ligacoes': np.bincount(grupo, weights=total_ligacoes).astype(np.int64),
+                'id': id_unico,
+            }
+
+    @classmethod
+    def a_partir_do_queryset(cls, queryset):
+        linhas = list(queryset.values_list('id', 'latitude', 'longitude', 'domicilios', 'total_ligacoes'))
+        colunas = np.array(linhas, dtype=np.float64).reshape(-1, 5)
+        # Domicílios/ligações nulos entram como zero nas somas.
+        colunas = np.nan_to_num(colunas, nan=0.0)
+        return cls(
+            ids=colunas[:, 0].astype(np.int64),
+            latitudes=colunas[:, 1],
+            longitudes=colunas[:, 2],
+            domicilios=colunas[:, 3],
+            total_ligacoes=colunas[:, 4],
+            zoom_maximo=settings.LOCALIDADES_CLUSTER_ZOOM_PONTOS,
+            raio_px=settings.LOCALIDADES_CLUSTER_RAIO_PX,
+        )
+
+    def clusters(self, zoom, bbox=None):
+        """Retorna a lista de clusters do nível `zoom`, opcionalmente recortada pelo bbox."""
+        nivel = self.niveis[zoom]
+        mascara = np.ones(len(nivel['quantidade']), dtype=bool)
+        if bbox is not None:
+            west, south, east, north = bbox
+            mascara = (
+                (nivel['longitude'] >= west) & (nivel['longitude'] <= east)
+                & (nivel['latitude'] >= south) & (nivel['latitude'] <= north)
+            )
+        return [
+            {
+                'latitude': float(lat),
+                'longitude': float(lon),
+                'quantidade': int(qtd),
+                'domicilios': int(dom),
+                'total_ligacoes': int(lig),
+                'id': int(id_) if id_ >= 0 else None,
+            }
+            for lat, lon, qtd, dom, lig, id_ in zip(
+                nivel['latitude'][mascara],
+                nivel['longitude'][mascara],
+                nivel['quantidade'][mascara],
+                nivel['domicilios'][mascara],
+                nivel['total_ligacoes'][mascara],
+                nivel['id'][mascara],
+            )
+        ]
+
+
+def obter_piramide(chave_filtros, queryset):
+    """Retorna a pirâmide para a combinação de filtros, construindo-a se necessário."""
+    return _piramides.obter(chave_filtros, lambda: PiramideClusters.a_partir_do_queryset(queryset))
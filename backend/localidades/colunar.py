@@ -0,0 +1,108 @@
+# backend/localidades/colunar.py
+#
+# Formato binário colunar para o mapa. Em vez de uma lista de objetos JSON
+# (que repete o nome de cada campo em toda linha), as localidades são
+# enviadas como colunas paralelas:
+#
+#   bytes 0-3   assinatura b'GLC1'
+#   bytes 4-7   tamanho H do cabeçalho (uint32 little-endian)
+#   H bytes     cabeçalho JSON (UTF-8) descrevendo as colunas
+#   padding     até múltiplo de 8
+#   buffers     dados de cada coluna, cada um alinhado em 8 bytes
+#
+# Os offsets do cabeçalho são relativos ao início da área de buffers.
+# Tipos de coluna:
+#   - numéricas ("int32", "int64", "float32"), little-endian; inteiros nulos
+#     viram o valor de `nulo` indicado na coluna;
+#   - "dicionario": índices ("uint8"/"uint16"/"uint32") para a lista
+#     `valores` do cabeçalho (que pode conter null);
+#   - "texto": `offsets` (int32, linhas + 1 posições) sobre um bloco UTF-8.
+
+import json
+import struct
+
+import numpy as np
+
+from .serializacao_rapida import CAMPOS
+
+ASSINATURA = b'GLC1'
+ALINHAMENTO = 8
+NULO_INTEIRO = -1
+
+# Como cada campo da lista é codificado.
+TIPOS = {
+    'id': 'inteiro',
+    'ibge': 'dicionario',
+    'uf': 'dicionario',
+    'municipio': 'dicionario',
+    'nome_comunidade': 'texto',
+    'tipo_comunidade': 'dicionario',
+    'domicilios': 'inteiro',
+    'total_ligacoes': 'inteiro',
+    'latitude': 'float32',
+    'longitude': 'float32',
+    'calha_rio': 'dicionario',
+    'fonte_dados': 'dicionario',
+}
+
+
+def _inteiros(valores):
+    maior = max((abs(v) for v in valores if v is not None), default=0)
+    dtype = np.int32 if maior < 2 ** 31 else np.int64
+    array = np.array([NULO_INTEIRO if v is None else v for v in valores], dtype=dtype)
+    return {'tipo': np.dtype(dtype).name, 'nulo': NULO_INTEIRO}, array
+
+
+def _dicionario(valores):
+    indices = {}
+    codigos = [indices.setdefault(v, len(indices)) for v in valores]
+    if len(indices) <= 2 ** 8:
+        dtype = np.uint8
+    elif len(indices) <= 2 ** 16:
+        dtype = np.uint16
+    else:
+        dtype = np.uint32
+    return {'tipo': 'dicionario', 'indices': np.dtype(dtype).name, 'valores': list(indices)}, np.array(codigos, dtype=dtype)
+
+
+def _texto(valores):
+    partes = [(v or '').encode('utf-8') for v in valores]
+    offsets = np.zeros(len(partes) + 1, dtype=np.int32)
+    np.cumsum([len(p) for p in partes], out=offsets[1:])
+    return {'tipo': 'texto'}, offsets.astype('<i4').tobytes() + b''.join(partes)
+
+
+def codificar(tuplas, extras=None):
+    """
+    Codifica tuplas na ordem de `serializacao_rapida.CAMPOS` no formato colunar.
+    `extras` é incluído no cabeçalho (ex.: links de paginação).
+    """
+    colunas = list(zip(*tuplas)) if tuplas else [()] * len(CAMPOS)
+    descricoes, buffers, offset = [], [], 0
+
+    for campo, valores in zip(CAMPOS, colunas):
+        tipo = TIPOS[campo]
+        if tipo == 'inteiro':
+            descricao, dados = _inteiros(valores)
+        elif tipo == 'dicionario':
+            descricao, dados = _dicionario(valores)
+        elif tipo == 'texto':
+            descricao, dados = _texto(valores)
+        else:
+            descricao, dados = {'tipo': 'float32'}, np.array(valores, dtype=np.float32)
+
+        if isinstance(dados, np.ndarray):
+            dados = dados.astype(dados.dtype.newbyteorder('<')).tobytes()
+        descricao.update({'nome': campo, 'offset': offset, 'bytes': len(dados)})
+        descricoes.append(descricao)
+
+        padding = -len(dados) % ALINHAMENTO
+        buffers.append(dados + b'\0' * padding)
+        offset += len(dados) + padding
+
+    cabecalho = {'linhas': len(tuplas), 'colunas': descricoes}
+    if extras:
+        cabecalho.update(extras)
+    cabecalho = json.dumps(cabecalho, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    cabecalho += b' ' * (-(len(ASSINATURA) + 4 + len(cabecalho)) % ALINHAMENTO)
+    return ASSINATURA + struct.pack('<I', len(cabecalho)) + cabecalho + b''.join(buffers)
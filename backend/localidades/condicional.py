@@ -0,0 +1,42 @@
+# backend/localidades/condicional.py
+
+import hashlib
+import json
+from functools import wraps
+
+from django.views.decorators.http import condition
+
+from .versao import versao_atual
+
+
+def etag_por_versao(request, *args, **kwargs):
+    """
+    ETag forte derivado da versão dos dados e da requisição normalizada
+    (caminho, parâmetros de query ordenados e o cabeçalho Accept, que decide
+    o formato da resposta). Só lê a tabela de versão, nunca as localidades.
+    """
+    parametros = sorted((chave, sorted(request.GET.getlist(chave))) for chave in request.GET)
+    requisicao = json.dumps(
+        [request.path, parametros, request.META.get('HTTP_ACCEPT', '')],
+        ensure_ascii=False, separators=(',', ':'),
+    )
+    resumo = hashlib.sha1(requisicao.encode('utf-8')).hexdigest()[:16]
+    return f'{versao_atual()}-{resumo}'
+
+
+def condicional_por_versao(view):
+    """
+    Aplica GET condicional (If-None-Match -> 304) com `etag_por_versao`.
+    Respostas sem Cache-Control recebem `private, no-cache`, para que o
+    navegador guarde a resposta mas sempre revalide com o ETag.
+    """
+    condicional = condition(etag_func=etag_por_versao)(view)
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        resposta = condicional(request, *args, **kwargs)
+        if request.method in ('GET', 'HEAD') and not resposta.has_header('Cache-Control'):
+            resposta['Cache-Control'] = 'private, no-cache'
+        return resposta
+
+    return wrapper
@@ -0,0 +1,115 @@
+# backend/localidades/exportacao.py
+#
+# Exportação completa das localidades em GeoJSON, CSV ou KML. Cada formato
+# é um gerador de bytes que lê o queryset com `iterator()` em lotes, como o
+# modo streaming da listagem: só um lote fica em memória, e o primeiro
+# pedaço sai antes de o banco terminar de devolver as linhas.
+
+import csv
+import io
+import json
+import zlib
+from itertools import islice
+from xml.sax.saxutils import escape, quoteattr
+
+from . import serializacao_rapida
+
+CAMPOS = serializacao_rapida.CAMPOS
+_POS_ID = CAMPOS.index('id')
+_POS_LAT = CAMPOS.index('latitude')
+_POS_LON = CAMPOS.index('longitude')
+_POS_NOME = CAMPOS.index('nome_comunidade')
+# Campos que vão como propriedades (as coordenadas já estão na geometria).
+_PROPRIEDADES = [(posicao, campo) for posicao, campo in enumerate(CAMPOS) if posicao not in (_POS_LAT, _POS_LON)]
+
+TIPOS_CONTEUDO = {
+    'geojson': 'application/geo+json',
+    'csv': 'text/csv; charset=utf-8',
+    'kml': 'application/vnd.google-earth.kml+xml',
+}
+
+
+def _lotes(queryset, chunk_size):
+    tuplas = serializacao_rapida.linhas(queryset).iterator(chunk_size=chunk_size)
+    while lote := list(islice(tuplas, chunk_size)):
+        yield lote
+
+
+def gerar_geojson(queryset, chunk_size):
+    """FeatureCollection com um Point por localidade; os demais campos vão em `properties`."""
+    yield b'{"type":"FeatureCollection","features":['
+    primeiro = True
+    for lote in _lotes(queryset, chunk_size):
+        features = [
+            {
+                'type': 'Feature',
+                'id': tupla[_POS_ID],
+                'geometry': {'type': 'Point', 'coordinates': [tupla[_POS_LON], tupla[_POS_LAT]]},
+                'properties': {campo: tupla[posicao] for posicao, campo in _PROPRIEDADES},
+            }
+            for tupla in lote
+        ]
+        conteudo = json.dumps(features, ensure_ascii=False, allow_nan=False, separators=(',', ':'))
+        # Remove os colchetes do array parcial para emendar os lotes.
+        if not primeiro:
+            yield b','
+        yield conteudo[1:-1].encode('utf-8')
+        primeiro = False
+    yield b']}'
+
+
+def gerar_csv(queryset, chunk_size):
+    """CSV com cabeçalho, nas colunas e na ordem da API."""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow(CAMPOS)
+    for lote in _lotes(queryset, chunk_size):
+        escritor.writerows(lote)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    # Sem localidades, sai só o cabeçalho.
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def _placemark(tupla):
+    dados = ''.join(
+        f'<Data name="{campo}"><value>{escape(str(tupla[posicao]))}</value></Data>'
+        for posicao, campo in _PROPRIEDADES if tupla[posicao] is not None
+    )
+    return (
+        f'<Placemark id={quoteattr(f"localidade-{tupla[_POS_ID]}")}>'
+        f'<name>{escape(tupla[_POS_NOME] or "")}</name>'
+        f'<ExtendedData>{dados}</ExtendedData>'
+        f'<Point><coordinates>{tupla[_POS_LON]!r},{tupla[_POS_LAT]!r}</coordinates></Point>'
+        '</Placemark>\n'
+    )
+
+
+def gerar_kml(queryset, chunk_size):
+    """KML com um Placemark por localidade e os campos em ExtendedData."""
+    yield (
+        b'<?xml version="1.0" encoding="UTF-8"?>\n'
+        b'<kml xmlns="http://www.opengis.net/kml/2.2"><Document><name>Localidades</name>\n'
+    )
+    for lote in _lotes(queryset, chunk_size):
+        yield ''.join(_placemark(tupla) for tupla in lote).encode('utf-8')
+    yield b'</Document></kml>\n'
+
+
+GERADORES = {'geojson': gerar_geojson, 'csv': gerar_csv, 'kml': gerar_kml}
+
+
+def comprimir(pedacos, nivel=6):
+    """
+    Comprime em gzip os pedaços à medida que chegam. Cada pedaço é liberado
+    com um flush de sincronização, para o cliente receber os dados do lote
+    sem esperar o fim do arquivo.
+    """
+    compressor = zlib.compressobj(nivel, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for pedaco in pedacos:
+        dados = compressor.compress(pedaco) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if dados:
+            yield dados
+    yield compressor.flush()
@@ -2,6 +2,9 @@
 
 from rest_framework import filters
 from django_filters import rest_framework as django_filters
+from django_filters.utils import translate_validation
+from .indice_espacial import filtrar_bbox
+from .indice_textual import buscar, suportado as busca_indexada
 from .models import Localidade
 
 class LocalidadeFilter(django_filters.FilterSet):
@@ -17,19 +20,61 @@ class LocalidadeFilter(django_filters.FilterSet):
         # A lista de campos pelos quais queremos permitir a filtragem.
         fields = ['fonte_dados', 'calha_rio']
 
-# O BoundingBoxFilter que usamos no mapa não precisa de alterações.
+def filtrar_fonte_e_calha(request, queryset):
+    """
+    Aplica apenas os filtros de fonte de dados e calha, que definem as
+    estruturas pré-calculadas (pirâmide de clusters, tiles etc.). Retorna a
+    chave normalizada dos filtros junto com o queryset filtrado.
+    """
+    dados = {
+        'fonte_dados': request.query_params.get('fonte_dados', ''),
+        'calha_rio': request.query_params.get('calha_rio', ''),
+    }
+    filterset = LocalidadeFilter(data=dados, queryset=queryset, request=request)
+    if not filterset.is_valid():
+        raise translate_validation(filterset.errors)
+    chave = (dados['fonte_dados'].lower(), dados['calha_rio'])
+    return chave, filterset.qs
+
+def filtrar_selecao(request, selecao, queryset=None):
+    """
+    Resolve uma seleção validada por `SelecaoLocalidadesSerializer` (lista
+    de ids ou filtros `fonte_dados`/`calha_rio`) em um queryset.
+    """
+    if queryset is None:
+        queryset = Localidade.objects.all()
+    if 'ids' in selecao:
+        return queryset.filter(id__in=selecao['ids'])
+    dados = {chave: selecao[chave] for chave in ('fonte_dados', 'calha_rio') if chave in selecao}
+    filterset = LocalidadeFilter(data=dados, queryset=queryset, request=request)
+    if not filterset.is_valid():
+        raise translate_validation(filterset.errors)
+    return filterset.qs
+
+def ler_bbox(bbox_string):
+    """Converte "oeste,sul,leste,norte" em uma tupla de floats, ou None se inválido."""
+    if not bbox_string:
+        return None
+    try:
+        west, south, east, north = [float(val) for val in bbox_string.split(',')]
+    except (ValueError, IndexError):
+        return None
+    return west, south, east, north
+
+# O BoundingBoxFilter consulta o índice espacial (R*Tree) em vez de
+# varrer a tabela inteira a cada movimento do mapa.
 class BoundingBoxFilter(filters.BaseFilterBackend):
     def filter_queryset(self, request, queryset, view):
-        bbox_string = request.query_params.get('in_bbox')
-        if not bbox_string:
+        bbox = ler_bbox(request.query_params.get('in_bbox'))
+        if bbox is None:
             return queryset
-        try:
-            west, south, east, north = [float(val) for val in bbox_string.split(',')]
-            return queryset.filter(
-                longitude__gte=west,
-                longitude__lte=east,
-                latitude__gte=south,
-                latitude__lte=north
-            )
-        except (ValueError, IndexError):
-            return queryset
\ No newline at end of file
+        return filtrar_bbox(queryset, *bbox)
+
+# Substitui o SearchFilter do DRF: no SQLite a busca usa o índice FTS5
+# (sem acentos, por prefixo e ordenada por relevância) em vez de varrer a
+# tabela com LIKE. Em outros bancos mantém o comportamento do SearchFilter.
+class BuscaTextualFilter(filters.SearchFilter):
+    def filter_queryset(self, request, queryset, view):
+        if not busca_indexada(queryset.db):
+            return super().filter_queryset(request, queryset, view)
+        return buscar(queryset, request.query_params.get(self.search_param, ''))
@@ -0,0 +1,160 @@
+# backend/localidades/fixture.py
+#
+# Escrita e leitura de fixtures de localidades em streaming. O formato
+# "jsonl" (um objeto por linha, o mesmo que o `loaddata` do Django aceita
+# em arquivos .jsonl) pode ser escrito e lido lote a lote, então a memória
+# usada depende do tamanho do lote e não do número de localidades. O
+# formato "json" (array com indent=4) também é escrito em streaming e sai
+# byte a byte igual ao `json.dump` da lista inteira.
+#
+# `carregar` insere uma fixture .jsonl com um executemany por lote (INSERT
+# ... ON CONFLICT (id) DO UPDATE, direto no banco, sem montar objetos do
+# modelo), em vez de salvar objeto por objeto como o loaddata.
+
+import json
+from itertools import islice
+
+from django.core.management.color import no_style
+from django.db import connection
+
+from .models import Localidade
+
+FORMATOS = ('json', 'jsonl')
+
+MODELO = 'localidades.localidade'
+
+# Nomes diferentes de propósito: com localidades_fixture.json e
+# localidades_fixture.jsonl na mesma pasta, `loaddata localidades_fixture`
+# falharia por achar duas fixtures com o mesmo nome.
+NOME_ARQUIVO = {'json': 'localidades_fixture.json', 'jsonl': 'localidades_fixture_linhas.jsonl'}
+
+
+class FixtureInvalida(Exception):
+    pass
+
+
+class EscritorFixture:
+    """
+    Escreve objetos de fixture (`{"model", "pk", "fields"}`) à medida que
+    os lotes chegam. As chaves primárias são sequenciais a partir de
+    `primeira_pk`.
+    """
+
+    def __init__(self, caminho, formato='jsonl', modelo=MODELO, primeira_pk=1):
+        if formato not in FORMATOS:
+            raise ValueError(f'formato desconhecido: {formato}')
+        self.caminho = caminho
+        self.formato = formato
+        self.modelo = modelo
+        self.proxima_pk = primeira_pk
+        self.total = 0
+        self._arquivo = None
+
+    def __enter__(self):
+        self._arquivo = open(self.caminho, 'w', encoding='utf-8')
+        if self.formato == 'json':
+            self._arquivo.write('[')
+        return self
+
+    def __exit__(self, *excecao):
+        if self.formato == 'json':
+            self._arquivo.write('\n]' if self.total else ']')
+        self._arquivo.close()
+        self._arquivo = None
+
+    def escrever(self, registros, pks=None):
+        """
+        Escreve os `fields` de cada registro. Sem `pks` (uma chave por
+        registro), usa as próximas chaves da sequência.
+        """
+        if pks is None:
+            pks = range(self.proxima_pk, self.proxima_pk + len(registros))
+            self.proxima_pk += len(registros)
+        for pk, registro in zip(pks, registros):
+            objeto = {'model': self.modelo, 'pk': pk, 'fields': registro}
+            if self.formato == 'jsonl':
+                self._arquivo.write(json.dumps(objeto, ensure_ascii=False))
+                self._arquivo.write('\n')
+            else:
+                # Mesmo recuo que json.dump(lista, indent=4) daria ao item.
+                texto = json.dumps(objeto, indent=4, ensure_ascii=False).replace('\n', '\n    ')
+                self._arquivo.write(f"{',' if self.total else ''}\n    {texto}")
+            self.total += 1
+
+
+def ler_lotes(caminho, tamanho_lote):
+    """Gera listas de até `tamanho_lote` objetos de uma fixture .jsonl."""
+    with open(caminho, encoding='utf-8') as arquivo:
+        linhas = (
+            (numero, linha) for numero, linha in enumerate(arquivo, start=1) if linha.strip()
+        )
+        while True:
+            lote = []
+            for numero, linha in islice(linhas, tamanho_lote):
+                try:
+                    objeto = json.loads(linha)
+                except json.JSONDecodeError as e:
+                    raise FixtureInvalida(f'linha {numero}: JSON inválido ({e})')
+                if not isinstance(objeto, dict) or 'model' not in objeto or 'fields' not in objeto:
+                    raise FixtureInvalida(f'linha {numero}: objeto sem "model" ou "fields"')
+                lote.append(objeto)
+            if not lote:
+                return
+            yield lote
+
+
+def _campos():
+    """Campos do modelo (menos a pk), com a chave estrangeira pelo nome usado na fixture (calha_rio)."""
+    return [campo for campo in Localidade._meta.concrete_fields if not campo.primary_key]
+
+
+def _sql_insercao(campos):
+    """
+    INSERT com todas as colunas e, para pk repetida, UPDATE dos campos (o
+    mesmo que o loaddata faz). ON CONFLICT ... DO UPDATE funciona no SQLite
+    e no PostgreSQL.
+    """
+    nome = connection.ops.quote_name
+    colunas = [Localidade._meta.pk.column] + [campo.column for campo in campos]
+    return (
+        f'INSERT INTO {nome(Localidade._meta.db_table)} ({", ".join(map(nome, colunas))}) '
+        f'VALUES ({", ".join(["%s"] * len(colunas))}) '
+        f'ON CONFLICT ({nome(colunas[0])}) DO UPDATE SET '
+        + ', '.join(f'{nome(coluna)} = excluded.{nome(coluna)}' for coluna in colunas[1:])
+    )
+
+
+def carregar(caminho, tamanho_lote):
+    """
+    Insere as localidades da fixture, lote a lote, com um executemany por
+    lote: montar um objeto do modelo por linha (como o loaddata e o
+    bulk_create fazem) custava mais que o próprio INSERT. Campos ausentes
+    ficam com o valor padrão do modelo. Uma pk que já existe no banco tem
+    os campos sobrescritos. Retorna o total de localidades.
+    """
+    campos = _campos()
+    nomes = {campo.name for campo in campos}
+    padroes = [(campo.name, campo.get_default()) for campo in campos]
+    sql = _sql_insercao(campos)
+    total = 0
+    with connection.cursor() as cursor:
+        for lote in ler_lotes(caminho, tamanho_lote):
+            linhas = []
+            for objeto in lote:
+                if objeto['model'].lower() != MODELO:
+                    raise FixtureInvalida(f"modelo '{objeto['model']}' não suportado (só {MODELO})")
+                if objeto.get('pk') is None:
+                    raise FixtureInvalida(f"localidade sem pk: {objeto['fields']}")
+                valores = objeto['fields']
+                desconhecidos = valores.keys() - nomes
+                if desconhecidos:
+                    raise FixtureInvalida(f"campos desconhecidos em pk={objeto['pk']}: {', '.join(sorted(desconhecidos))}")
+                linhas.append([objeto['pk']] + [valores.get(nome, padrao) for nome, padrao in padroes])
+            cursor.executemany(sql, linhas)
+            total += len(linhas)
+
+        # Com pks explícitas, bancos com sequência (PostgreSQL) precisam que
+        # ela seja ajustada, como o loaddata faz; no SQLite a lista sai vazia.
+        for comando in connection.ops.sequence_reset_sql(no_style(), [Localidade]):
+            cursor.execute(comando)
+    return total
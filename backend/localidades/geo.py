@@ -0,0 +1,78 @@
+# backend/localidades/geo.py
+#
+# Cálculos geográficos vetorizados com NumPy. Usam a mesma fórmula de
+# haversine e o mesmo raio da Terra do cálculo de distância do frontend
+# (FilterPanelSimple.js), para que os números coincidam com os da tela.
+
+import math
+
+import numpy as np
+
+RAIO_TERRA_KM = 6371.0
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """
+    Distância de haversine em km. Aceita escalares ou arrays; com arrays de
+    formas (n, 1) e (1, m) o NumPy gera a matriz n x m por broadcasting.
+    """
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lon1, lat2, lon2))
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return RAIO_TERRA_KM * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def blocos_matriz(origens, destinos, max_celulas):
+    """
+    Percorre a matriz de distâncias origens x destinos em blocos de linhas,
+    com no máximo `max_celulas` elementos por bloco, limitando a memória.
+
+    `origens`/`destinos` são pares (latitudes, longitudes). Gera tuplas
+    (inicio, fim, bloco) com a submatriz das origens[inicio:fim].
+    """
+    lat_o, lon_o = (np.asarray(v, dtype=np.float64) for v in origens)
+    lat_d, lon_d = (np.asarray(v, dtype=np.float64)[np.newaxis, :] for v in destinos)
+    linhas_por_bloco = max(1, max_celulas // max(1, lat_d.shape[1]))
+    for inicio in range(0, len(lat_o), linhas_por_bloco):
+        fim = min(inicio + linhas_por_bloco, len(lat_o))
+        bloco = haversine_km(lat_o[inicio:fim, np.newaxis], lon_o[inicio:fim, np.newaxis], lat_d, lon_d)
+        yield inicio, fim, bloco
+
+
+def matriz_distancias(origens, destinos, max_celulas):
+    """Matriz densa de distâncias (km), calculada em blocos."""
+    matriz = np.empty((len(origens[0]), len(destinos[0])), dtype=np.float64)
+    for inicio, fim, bloco in blocos_matriz(origens, destinos, max_celulas):
+        matriz[inicio:fim] = bloco
+    return matriz
+
+
+def mais_proximos(origens, destinos, k, max_celulas, ids_origens=None, ids_destinos=None):
+    """
+    Para cada origem, índices e distâncias dos `k` destinos mais próximos,
+    em ordem crescente. Quando os ids são informados, a própria origem é
+    ignorada entre os destinos.
+    """
+    k = min(k, len(destinos[0]))
+    indices = np.empty((len(origens[0]), k), dtype=np.int64)
+    distancias = np.empty((len(origens[0]), k), dtype=np.float64)
+    if k == 0:
+        return indices, distancias
+    for inicio, fim, bloco in blocos_matriz(origens, destinos, max_celulas):
+        if ids_origens is not None and ids_destinos is not None:
+            mesma = np.asarray(ids_origens[inicio:fim])[:, np.newaxis] == np.asarray(ids_destinos)[np.newaxis, :]
+            bloco[mesma] = np.inf
+        parcial = np.argpartition(bloco, k - 1, axis=1)[:, :k] if k < bloco.shape[1] else np.tile(np.arange(bloco.shape[1]), (fim - inicio, 1))
+        valores = np.take_along_axis(bloco, parcial, axis=1)
+        ordem = np.argsort(valores, axis=1)
+        indices[inicio:fim] = np.take_along_axis(parcial, ordem, axis=1)
+        distancias[inicio:fim] = np.take_along_axis(valores, ordem, axis=1)
+    return indices, distancias
+
+
+def formatar_tempo(horas):
+    """Mesmo formato do frontend: "<h>h <min>min" (com o arredondamento do Math.round)."""
+    inteiras = math.floor(horas)
+    minutos = math.floor((horas - inteiras) * 60 + 0.5)
+    return f'{inteiras}h {minutos}min'
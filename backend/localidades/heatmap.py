@@ -0,0 +1,126 @@
+# backend/localidades/heatmap.py
+
+import numpy as np
+from django.conf import settings
+
+from .clusters import TAMANHO_TILE, projetar_mercator
+from .versao import CachePorVersao
+
+# Pesos aceitos: `quantidade` conta as localidades; os outros somam o campo.
+PESOS = ('quantidade', 'domicilios', 'total_ligacoes')
+
+# Pontos projetados, um conjunto por combinação de filtros.
+_pontos = CachePorVersao()
+# Grades já calculadas, por (filtros, peso, zoom, tile).
+_grades = CachePorVersao(max_itens=settings.LOCALIDADES_HEATMAP_CACHE_TILES)
+
+
+class PontosHeatmap:
+    """
+    Localidades em coordenadas Web Mercator (0 a 1), ordenadas por x para
+    que as de uma coluna de tiles saiam com uma busca binária. Cada tile é
+    dividido em células de `LOCALIDADES_HEATMAP_CELULA_PX` pixels; o valor
+    de uma célula é a soma do peso das localidades que caem nela.
+    """
+
+    def __init__(self, latitudes, longitudes, domicilios, total_ligacoes):
+        x, y = projetar_mercator(latitudes, longitudes)
+        ordem = np.argsort(x, kind='stable')
+        self.x, self.y = x[ordem], y[ordem]
+        self.pesos = {
+            'quantidade': None,
+            'domicilios': np.asarray(domicilios, dtype=np.float64)[ordem],
+            'total_ligacoes': np.asarray(total_ligacoes, dtype=np.float64)[ordem],
+        }
+
+    @classmethod
+    def a_partir_do_queryset(cls, queryset):
+        linhas = list(queryset.values_list('latitude', 'longitude', 'domicilios', 'total_ligacoes'))
+        colunas = np.array(linhas, dtype=np.float64).reshape(-1, 4)
+        # Domicílios/ligações nulos entram como zero nas somas.
+        colunas = np.nan_to_num(colunas, nan=0.0)
+        return cls(colunas[:, 0], colunas[:, 1], colunas[:, 2], colunas[:, 3])
+
+    def tiles(self, zoom, bbox=None):
+        """
+        Intervalos (x0, x1, y0, y1), inclusivos, dos tiles do `zoom` que
+        cobrem o bbox (oeste, sul, leste, norte) ou, sem bbox, as localidades.
+        None se não há localidades ou o bbox está invertido.
+        """
+        n = 2 ** zoom
+        if bbox is not None:
+            oeste, sul, leste, norte = bbox
+            # Comparado nos graus: os dois cantos de um bbox invertido podem
+            # cair no mesmo tile.
+            if oeste > leste or sul > norte:
+                return None
+            (x0, x1), (y1, y0) = projetar_mercator(np.array([sul, norte]), np.array([oeste, leste]))
+        elif len(self.x):
+            x0, x1, y0, y1 = self.x[0], self.x[-1], self.y.min(), self.y.max()
+        else:
+            return None
+        tile = lambda valor: int(np.clip(np.floor(valor * n), 0, n - 1))
+        return tile(x0), tile(x1), tile(y0), tile(y1)
+
+    def grade(self, zoom, tx, ty, peso):
+        """
+        Células não vazias do tile (tx, ty): arrays com a coluna e a linha
+        de cada célula (na grade global do zoom) e o valor somado.
+        """
+        n = 2 ** zoom
+        celulas = TAMANHO_TILE // settings.LOCALIDADES_HEATMAP_CELULA_PX
+        inicio, fim = np.searchsorted(self.x, [tx / n, (tx + 1) / n])
+        x, y = self.x[inicio:fim], self.y[inicio:fim]
+        no_tile = (y >= ty / n) & (y < (ty + 1) / n)
+        pesos = self.pesos[peso]
+        pesos = pesos[inicio:fim][no_tile] if pesos is not None else None
+
+        # Cada localidade vai para a célula (coluna, linha) dentro do tile, e a
+        # soma por célula sai de um bincount, como um histogram2d com pesos.
+        coluna = np.minimum(((x[no_tile] * n - tx) * celulas).astype(np.int64), celulas - 1)
+        linha = np.minimum(((y[no_tile] * n - ty) * celulas).astype(np.int64), celulas - 1)
+        soma = np.bincount(linha * celulas + coluna, weights=pesos, minlength=celulas * celulas)
+        ocupadas = np.flatnonzero(soma)
+        return tx * celulas + ocupadas % celulas, ty * celulas + ocupadas // celulas, soma[ocupadas]
+
+
+def obter_pontos(chave_filtros, queryset):
+    return _pontos.obter(chave_filtros, lambda: PontosHeatmap.a_partir_do_queryset(queryset))
+
+
+def heatmap(chave_filtros, queryset, zoom, peso, bbox=None):
+    """
+    Grade de calor do `zoom` sobre o bbox: lista de [latitude, longitude,
+    valor] do centro de cada célula não vazia (o formato do Leaflet.heat),
+    junto com o maior valor para normalizar as cores. Retorna None se o
+    bbox cobre mais de `LOCALIDADES_HEATMAP_MAX_TILES` tiles.
+    """
+    pontos = obter_pontos(chave_filtros, queryset)
+    celula_px = settings.LOCALIDADES_HEATMAP_CELULA_PX
+    resposta = {'zoom': zoom, 'peso': peso, 'celula_px': celula_px, 'maximo': 0, 'celulas': []}
+    intervalo = pontos.tiles(zoom, bbox)
+    if intervalo is None:
+        return resposta
+    x0, x1, y0, y1 = intervalo
+    if (x1 - x0 + 1) * (y1 - y0 + 1) > settings.LOCALIDADES_HEATMAP_MAX_TILES:
+        return None
+
+    partes = [
+        _grades.obter((chave_filtros, peso, zoom, tx, ty), lambda tx=tx, ty=ty: pontos.grade(zoom, tx, ty, peso))
+        for tx in range(x0, x1 + 1)
+        for ty in range(y0, y1 + 1)
+    ]
+    colunas, linhas, valores = (np.concatenate(arrays) for arrays in zip(*partes))
+    if not len(valores):
+        return resposta
+
+    # Centro de cada célula, de volta de Web Mercator para lat/lon.
+    por_eixo = 2 ** zoom * (TAMANHO_TILE // celula_px)
+    longitudes = (colunas + 0.5) / por_eixo * 360.0 - 180.0
+    latitudes = np.degrees(np.arctan(np.sinh(np.pi * (1.0 - 2.0 * (linhas + 0.5) / por_eixo))))
+    resposta['maximo'] = int(round(valores.max()))
+    resposta['celulas'] = [
+        [round(lat, 5), round(lon, 5), int(round(valor))]
+        for lat, lon, valor in zip(latitudes.tolist(), longitudes.tolist(), valores.tolist())
+    ]
+    return resposta
@@ -0,0 +1,472 @@
+# backend/localidades/importacao.py
+#
+# Pipeline de importação de localidades a partir de planilhas. A limpeza é
+# feita de uma vez sobre o DataFrame inteiro (operações vetorizadas do
+# pandas) e a gravação usa bulk_create em lotes, dentro de uma transação.
+# Linhas descartadas são devolvidas com o número da linha na planilha e o
+# motivo, para o relatório do comando.
+
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+import django
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import transaction
+
+from . import cache_planilhas, limites_calhas, planilha, resumo
+from .models import Localidade
+from .versao import adiar_incremento, incrementar_versao
+
+# Colunas de cada tipo no modelo Localidade.
+CAMPOS_TEXTO = ('ibge', 'uf', 'municipio', 'nome_comunidade', 'tipo_comunidade')
+CAMPOS_INTEIROS = ('domicilios', 'total_ligacoes')
+CAMPOS_DECIMAIS = ('latitude', 'longitude')
+CAMPOS = CAMPOS_TEXTO + CAMPOS_INTEIROS + CAMPOS_DECIMAIS
+
+# Chave de unicidade do modelo (unique_together).
+CHAVE_UNICA = ('nome_comunidade', 'municipio', 'fonte_dados')
+
+# Como ler cada aba da planilha. `colunas` liga os campos do modelo à coluna
+# da planilha (posição a partir de 0 ou nome no cabeçalho), `cabecalho` é o
+# número da linha com os nomes das colunas (None se não houver) e
+# `primeira_linha` é o número da primeira linha de dados.
+ABA_TRANCHE = {
+    'aba': '3ª Tranche',
+    'fonte_dados': Localidade.FonteDados.TRANCHE,
+    'cabecalho': None,
+    'colunas': {
+        'ibge': 0, 'uf': 1, 'municipio': 2, 'nome_comunidade': 3, 'tipo_comunidade': 4,
+        'domicilios': 5, 'total_ligacoes': 22, 'latitude': 26, 'longitude': 27,
+    },
+    'primeira_linha': 8,
+}
+ABA_CONVENCIONAL = {
+    'aba': 'Convencional',
+    'fonte_dados': Localidade.FonteDados.CONVENCIONAL,
+    'cabecalho': 4,
+    'colunas': {
+        'ibge': 'Código do Municipio (IBGE)', 'uf': 'UF', 'municipio': 'Nome do Município',
+        'nome_comunidade': 'Nome da Comunidade', 'tipo_comunidade': 'Tipo de Comunidade',
+        'domicilios': 'Domicílios', 'total_ligacoes': 'Total de Ligações',
+        'latitude': 'Latitude', 'longitude': 'Longitude',
+    },
+    'primeira_linha': 5,
+}
+ABAS = (ABA_TRANCHE, ABA_CONVENCIONAL)
+
+# Municípios (em maiúsculas, sem acentos) -> calha de rio.
+CALHA_POR_MUNICIPIO = {
+    'TAPAUA': 'Calha do Purus', 'LABREA': 'Calha do Purus', 'SANTA ISABEL DO RIO NEGRO': 'Calha do Alto Rio Negro',
+    'SAO GABRIEL DA CACHOEIRA': 'Calha do Alto Rio Negro', 'BARCELOS': 'Calha do Alto Rio Negro', 'GUAJARA': 'Calha do Juruá',
+    'IPIXUNA': 'Calha do Juruá', 'ENVIRA': 'Calha do Juruá', 'ITAMARATI': 'Calha do Juruá', 'EIRUNEPE': 'Calha do Juruá',
+    'CARAUARI': 'Calha do Juruá', 'PAUINI': 'Calha do Purus', 'BERURI': 'Calha do Purus', 'CANUTAMA': 'Calha do Purus',
+    'BOCA DO ACRE': 'Calha do Purus', 'ATALAIA DO NORTE': 'Calha do Alto Solimões', 'BENJAMIN CONSTANT': 'Calha do Alto Solimões',
+    'TABATINGA': 'Calha do Alto Solimões', 'SAO PAULO DE OLIVENCA': 'Calha do Alto Solimões', 'AMATURA': 'Calha do Alto Solimões',
+    'SANTO ANTONIO DO ICA': 'Calha do Alto Solimões', 'TONANTINS': 'Calha do Alto Solimões', 'HUMAITA': 'Calha do Madeira',
+    'MANICORE': 'Calha do Madeira', 'NOVO ARIPUANA': 'Calha do Madeira', 'APUI': 'Calha do Madeira', 'BORBA': 'Calha do Madeira',
+    'NOVA OLINDA DO NORTE': 'Calha do Madeira', 'MANAUS': 'Calha dos rios Negro e Solimões', 'IRANDUBA': 'Calha dos rios Negro e Solimões',
+    'NOVO AIRAO': 'Calha dos rios Negro e Solimões', 'CODAJAS': 'Calha dos rios Negro e Solimões', 'ANORI': 'Calha dos rios Negro e Solimões',
+    'ANAMA': 'Calha dos rios Negro e Solimões', 'CAAPIRANGA': 'Calha dos rios Negro e Solimões', 'MANACAPURU': 'Calha dos rios Negro e Solimões',
+    'MANAQUIRI': 'Calha dos rios Negro e Solimões', 'CAREIRO': 'Calha dos rios Negro e Solimões',
+    'CAREIRO DA VARZEA': 'Calha dos rios Negro e Solimões', 'BARREIRINHA': 'Calha do Baixo Amazonas',
+    'BOA VISTA DO RAMOS': 'Calha do Baixo Amazonas', 'NHAMUNDA': 'Calha do Baixo Amazonas', 'URUCARA': 'Calha do Baixo Amazonas',
+    'SAO SEBASTIAO DO UATUMA': 'Calha do Baixo Amazonas', 'PARINTINS': 'Calha do Baixo Amazonas', 'MAUES': 'Calha do Baixo Amazonas',
+    'ITACOATIARA': 'Calha do Médio Amazonas', 'PRESIDENTE FIGUEIREDO': 'Calha do Médio Amazonas', 'RIO PRETO DA EVA': 'Calha do Médio Amazonas',
+    'AUTAZES': 'Calha do Médio Amazonas', 'URUCURITUBA': 'Calha do Médio Amazonas', 'ITAPIRANGA': 'Calha do Médio Amazonas',
+    'JAPURA': 'Calha do Triângulo', 'MARAA': 'Calha do Triângulo', 'FONTE BOA': 'Calha do Triângulo',
+    'JUTAI': 'Calha do Triângulo', 'UARINI': 'Calha do Triângulo', 'ALVARAES': 'Calha do Triângulo',
+    'JURUA': 'Calha do Triângulo', 'TEFE': 'Calha do Triângulo',
+}
+CALHAS = tuple(dict.fromkeys(CALHA_POR_MUNICIPIO.values()))
+
+
+def ler_aba(caminho, especificacao):
+    """
+    Lê uma aba inteira da planilha num único DataFrame com as colunas do
+    modelo (ainda sem limpeza), mais `fonte_dados` e `linha` (número da
+    linha na planilha). Para arquivos grandes, prefira `planilha.ler_lotes`.
+    """
+    with planilha.abrir(caminho) as arquivo:
+        for df in planilha.ler_lotes(arquivo, especificacao, tamanho_lote=None):
+            return df
+    return pd.DataFrame(columns=[*especificacao['colunas'], 'fonte_dados', 'linha'])
+
+
+def limpar_texto(serie):
+    """Converte para texto sem espaços nas pontas; vazios viram nulos.
+    Números inteiros lidos como float (1300102.0) perdem o ".0", também
+    numa coluna que mistura números e texto."""
+    numeros = None
+    if pd.api.types.is_float_dtype(serie):
+        numeros = serie
+    elif serie.dtype == object:
+        numeros = serie.where(serie.map(lambda valor: isinstance(valor, float))).astype(np.float64)
+    if numeros is not None:
+        inteiros = numeros.notna() & (numeros == np.floor(numeros))
+        texto = serie.astype(object)
+        texto[inteiros] = numeros[inteiros].astype(np.int64).astype(str)
+        serie = texto
+    texto = serie.astype('string').str.strip()
+    return texto.mask(texto == '')
+
+
+def limpar_decimal(serie):
+    """Números com vírgula ou ponto decimal; o que não for número vira nulo."""
+    if pd.api.types.is_numeric_dtype(serie):
+        return serie.astype(np.float64)
+    texto = serie.astype('string').str.strip().str.replace(',', '.', regex=False)
+    return pd.to_numeric(texto, errors='coerce')
+
+
+def limpar_inteiro(serie):
+    """Como `limpar_decimal`, descartando a parte fracionária."""
+    return np.trunc(limpar_decimal(serie)).astype('Int64')
+
+
+def limpar(df, vistas=None):
+    """
+    Limpa um DataFrame vindo de `ler_aba`/`planilha.ler_lotes` (ou com as
+    mesmas colunas).
+
+    Retorna (validos, rejeitados). `validos` tem as colunas do modelo já
+    convertidas; `rejeitados` é uma lista de dicionários com `fonte_dados`,
+    `linha`, `nome_comunidade` e `motivo`. Repetições da chave única ficam
+    só com a primeira ocorrência; ao limpar uma aba em lotes, passe o mesmo
+    dicionário `vistas` ({chave: linha}) em todas as chamadas para que as
+    repetições entre lotes também sejam encontradas. Linhas sem nome nem
+    coordenadas (comuns no fim das abas, às vezes só com fórmulas) são
+    ignoradas sem entrar no relatório.
+    """
+    df = df.copy()
+    for campo in CAMPOS_TEXTO:
+        df[campo] = limpar_texto(df[campo])
+    for campo in CAMPOS_INTEIROS:
+        df[campo] = limpar_inteiro(df[campo])
+    for campo in CAMPOS_DECIMAIS:
+        df[campo] = limpar_decimal(df[campo])
+    df = df[df[['municipio', 'nome_comunidade', 'latitude', 'longitude']].notna().any(axis=1)]
+    df['uf'] = df['uf'].fillna('AM')
+
+    motivos = pd.Series(pd.NA, index=df.index, dtype='string')
+    sem_nome = df['municipio'].isna() | df['nome_comunidade'].isna()
+    motivos[sem_nome] = 'município ou comunidade ausente'
+    sem_coordenadas = motivos.isna() & (df['latitude'].isna() | df['longitude'].isna())
+    motivos[sem_coordenadas] = 'coordenadas ausentes'
+
+    candidatos = motivos.isna()
+    repetidas = candidatos & df[candidatos].duplicated(list(CHAVE_UNICA), keep='first').reindex(df.index, fill_value=False)
+    if repetidas.any():
+        primeira = df[candidatos].drop_duplicates(list(CHAVE_UNICA)).set_index(list(CHAVE_UNICA))['linha']
+        originais = primeira.reindex(pd.MultiIndex.from_frame(df.loc[repetidas, list(CHAVE_UNICA)])).to_numpy()
+        motivos[repetidas] = [f'repetida (mesma comunidade da linha {linha})' for linha in originais]
+    if vistas is not None:
+        candidatos = motivos.isna()
+        chaves = list(df.loc[candidatos, list(CHAVE_UNICA)].itertuples(index=False, name=None))
+        anteriores = [vistas.get(chave) for chave in chaves]
+        motivos[candidatos] = pd.array([
+            f'repetida (mesma comunidade da linha {linha})' if linha is not None else pd.NA for linha in anteriores
+        ], dtype='string')
+        for chave, linha, anterior in zip(chaves, df.loc[candidatos, 'linha'], anteriores):
+            if anterior is None:
+                vistas[chave] = linha
+
+    rejeitadas = motivos.notna()
+    rejeitados = (
+        df.loc[rejeitadas, ['fonte_dados', 'linha', 'nome_comunidade']]
+        .assign(motivo=motivos[rejeitadas])
+        .astype(object)
+        .where(lambda tabela: tabela.notna(), None)
+        .to_dict('records')
+    )
+    return df[~rejeitadas].reset_index(drop=True), rejeitados
+
+
+def _juntar(partes):
+    # Só as colunas da limpeza: quem consome os lotes pode ter acrescentado
+    # outras (como calha_rio_id).
+    colunas = [*CAMPOS, 'fonte_dados', 'linha']
+    return pd.DataFrame({
+        coluna: pd.concat([parte[coluna] for parte in partes], ignore_index=True) if partes else []
+        for coluna in colunas
+    })
+
+
+def limpar_aba(caminho, especificacao, tamanho_lote):
+    """
+    Lê e limpa uma aba inteira, em lotes, devolvendo (validos, rejeitados).
+    Roda nos processos de `leitura_paralela`; o resultado é o mesmo da
+    leitura em lotes feita por `lotes_limpos` no processo principal.
+    """
+    vistas = {}
+    partes, todos_rejeitados = [], []
+    with planilha.abrir(caminho) as arquivo:
+        for lote in planilha.ler_lotes(arquivo, especificacao, tamanho_lote):
+            validos, rejeitados = limpar(lote, vistas)
+            if len(validos):
+                partes.append(validos)
+            todos_rejeitados += rejeitados
+    return _juntar(partes), todos_rejeitados
+
+
+@contextmanager
+def leitura_paralela(arquivo, especificacoes, workers, tamanho_lote=None, usar_cache=True):
+    """
+    Começa a ler e limpar as abas em `workers` processos, uma aba por
+    processo. Entrega um dicionário {nome da aba: Future} para passar a
+    `lotes_limpos`; abas que já estão no cache não são enviadas ao pool.
+    Com um só processo útil (workers, CPUs ou abas pendentes) o dicionário
+    fica vazio e tudo roda em série.
+
+    Os trechos de uma mesma aba não são divididos entre processos: no modo
+    somente leitura o openpyxl precisa percorrer todas as linhas anteriores
+    para chegar a um trecho, então cada processo leria quase a aba inteira.
+    """
+    tamanho_lote = tamanho_lote or settings.LOCALIDADES_IMPORTACAO_LOTE
+    pendentes = [
+        especificacao for especificacao in especificacoes
+        if not (usar_cache and cache_planilhas.existe(cache_planilhas.chave(arquivo.hash, especificacao)))
+    ]
+    # Mais processos que CPUs só acrescentaria o custo de cada processo abrir
+    # a planilha de novo.
+    workers = min(workers, len(pendentes), os.cpu_count() or 1)
+    if workers <= 1:
+        yield {}
+        return
+    # Os processos só leem a planilha; django.setup() é necessário para
+    # importar este módulo quando o processo é iniciado com "spawn".
+    with ProcessPoolExecutor(workers, initializer=django.setup) as executor:
+        yield {
+            especificacao['aba']: executor.submit(limpar_aba, arquivo.caminho, especificacao, tamanho_lote)
+            for especificacao in pendentes
+        }
+
+
+def lotes_limpos(arquivo, especificacao, tamanho_lote=None, usar_cache=True, futuro=None):
+    """
+    Gera pares (validos, rejeitados) de uma aba, em lotes, a partir de um
+    `planilha.Planilha`. Com `usar_cache`, uma aba já limpa antes (mesmo
+    conteúdo de arquivo e mesma especificação) vem do cache em disco sem
+    abrir o .xlsx. Se `futuro` (de `leitura_paralela`) for informado, a aba
+    vem do processo que a leu; senão é lida aqui mesmo, em streaming. Nos
+    dois casos o resultado é guardado no cache.
+    """
+    tamanho_lote = tamanho_lote or settings.LOCALIDADES_IMPORTACAO_LOTE
+    chave = cache_planilhas.chave(arquivo.hash, especificacao) if usar_cache else None
+    guardado = cache_planilhas.carregar(chave) if chave else None
+    if guardado is None and futuro is not None:
+        guardado = futuro.result()
+        if chave:
+            cache_planilhas.salvar(chave, *guardado)
+    if guardado is not None:
+        validos, rejeitados = guardado
+        for inicio in range(0, max(len(validos), 1), tamanho_lote):
+            yield validos.iloc[inicio:inicio + tamanho_lote].reset_index(drop=True), rejeitados if inicio == 0 else []
+        return
+
+    vistas = {}
+    partes, todos_rejeitados = [], []
+    for lote in planilha.ler_lotes(arquivo, especificacao, tamanho_lote):
+        validos, rejeitados = limpar(lote, vistas)
+        if chave:
+            if len(validos):
+                partes.append(validos)
+            todos_rejeitados += rejeitados
+        yield validos, rejeitados
+    if chave:
+        cache_planilhas.salvar(chave, _juntar(partes), todos_rejeitados)
+
+
+def normalizar_municipio(municipios):
+    """Maiúsculas e sem acentos (Á -> A, Ç -> C...), como as chaves de CALHA_POR_MUNICIPIO."""
+    return (
+        municipios.astype('string').str.strip().str.upper()
+        .str.normalize('NFKD').str.encode('ascii', errors='ignore').str.decode('ascii')
+    )
+
+
+def mapear_calhas(municipios, calhas, calha_por_municipio=None):
+    """
+    Id da calha de cada município (ou nulo), a partir de {nome da calha: id}
+    e do mapeamento município -> nome da calha (CALHA_POR_MUNICIPIO, se não
+    for informado). Os nomes dos municípios são comparados já normalizados.
+    """
+    calha_por_municipio = CALHA_POR_MUNICIPIO if calha_por_municipio is None else calha_por_municipio
+    chaves = normalizar_municipio(pd.Series(list(calha_por_municipio), dtype='string'))
+    ids_por_municipio = {
+        chave: calhas[nome] for chave, nome in zip(chaves, calha_por_municipio.values()) if nome in calhas
+    }
+    # Os mesmos poucos municípios se repetem em todas as linhas: normaliza só os distintos.
+    codigos, unicos = pd.factorize(municipios)
+    ids_unicos = normalizar_municipio(pd.Series(unicos, dtype='string')).map(ids_por_municipio).astype('Int64')
+    ids = ids_unicos.take(np.maximum(codigos, 0)).where(codigos >= 0, pd.NA).astype('Int64')
+    return pd.Series(ids.to_numpy(), index=municipios.index, dtype='Int64')
+
+
+def carregar_limites():
+    """
+    Limites das calhas (`limites_calhas.LimitesCalhas`) do arquivo em
+    LOCALIDADES_CALHAS_LIMITES_ARQUIVO, ou None se ele não existir.
+    """
+    caminho = settings.LOCALIDADES_CALHAS_LIMITES_ARQUIVO
+    if not os.path.exists(caminho):
+        return None
+    return limites_calhas.LimitesCalhas.de_arquivo(caminho, settings.LOCALIDADES_CALHAS_LIMITES_PROPRIEDADE)
+
+
+def atribuir_calhas(df, calhas, limites=None, calha_por_municipio=None):
+    """
+    Id da calha de cada localidade, a partir de {nome da calha: id}: pelo
+    polígono em que a coordenada cai, se houver `limites`, e pelo município
+    (veja `mapear_calhas`) para as que ficarem fora dos polígonos. Retorna
+    (ids, resumo), com a contagem por origem em `resumo`: 'limites',
+    'municipio' e 'sem_calha'.
+    """
+    ids = pd.Series(pd.NA, index=df.index, dtype='Int64')
+    if limites is not None and len(df):
+        indices = limites.localizar(df['latitude'].to_numpy(np.float64), df['longitude'].to_numpy(np.float64))
+        # Polígonos cujo nome não é de uma calha do banco ficam como -1 também.
+        ids_por_indice = np.array([calhas.get(nome, -1) for nome in limites.nomes] + [-1], dtype=np.int64)
+        encontrados = ids_por_indice[indices]
+        ids[encontrados >= 0] = encontrados[encontrados >= 0]
+    pelos_limites = int(ids.notna().sum())
+    fora = ids.isna()
+    if fora.any():
+        ids[fora] = mapear_calhas(df.loc[fora, 'municipio'], calhas, calha_por_municipio)
+    sem_calha = int(ids.isna().sum())
+    return ids, {'limites': pelos_limites, 'municipio': len(ids) - pelos_limites - sem_calha, 'sem_calha': sem_calha}
+
+
+def calcular_hashes(df):
+    """
+    Hash (hex, 32 caracteres) do conteúdo de cada linha limpa: os campos do
+    modelo, a fonte e a calha. Linhas iguais sempre geram o mesmo hash.
+    """
+    colunas = [*CAMPOS, 'fonte_dados'] + (['calha_rio_id'] if 'calha_rio_id' in df.columns else [])
+    texto = df[colunas[0]].astype('string').fillna('\x00')
+    for coluna in colunas[1:]:
+        texto = texto.str.cat(df[coluna].astype('string').fillna('\x00'), sep='\x1f')
+    return pd.Series(
+        [hashlib.blake2b(linha.encode(), digest_size=16).hexdigest() for linha in texto],
+        index=df.index, dtype=object,
+    )
+
+
+def _registros(df):
+    """Linhas do DataFrame como dicionários prontos para o modelo (nulos como None)."""
+    colunas = [*CAMPOS, 'fonte_dados', 'hash_conteudo'] + (['calha_rio_id'] if 'calha_rio_id' in df.columns else [])
+    return df[colunas].astype(object).where(df[colunas].notna(), None)
+
+
+def _grupos(df):
+    """Grupos do resumo (calha, município, fonte, tipo) presentes nas linhas, para `resumo.marcar`."""
+    colunas = df.reindex(columns=['calha_rio_id', 'municipio', 'fonte_dados', 'tipo_comunidade'])
+    colunas['calha_rio_id'] = colunas['calha_rio_id'].astype('Int64')
+    return set(colunas.astype(object).where(colunas.notna(), None).itertuples(index=False, name=None))
+
+
+def _inserir(df, tamanho_lote):
+    registros = _registros(df)
+    for inicio in range(0, len(registros), tamanho_lote):
+        lote = registros.iloc[inicio:inicio + tamanho_lote].to_dict('records')
+        Localidade.objects.bulk_create([Localidade(**registro) for registro in lote])
+
+
+def gravar(df, tamanho_lote=None):
+    """
+    Insere as linhas limpas com bulk_create em lotes, numa única transação.
+    Usa a coluna `calha_rio_id`, se houver. Retorna o número de linhas.
+    """
+    tamanho_lote = tamanho_lote or settings.LOCALIDADES_IMPORTACAO_LOTE
+    df = df.assign(hash_conteudo=calcular_hashes(df))
+    with adiar_incremento(), transaction.atomic():
+        _inserir(df, tamanho_lote)
+        # bulk_create não envia post_save; a versão é incrementada aqui.
+        if len(df):
+            resumo.marcar(_grupos(df))
+            incrementar_versao()
+    return len(df)
+
+
+class Sincronizacao:
+    """
+    Importação incremental das linhas de uma fonte, lote a lote. Cada lote
+    limpo passado a `aplicar` é comparado (pela chave única) com o que está
+    no banco: linhas novas são inseridas e as que mudaram de hash são
+    atualizadas, mantendo o id. `finalizar` remove as localidades da fonte
+    que não apareceram em nenhum lote e devolve o resumo das diferenças:
+    listas de chaves (nome_comunidade, municipio) `inseridas`, `atualizadas`
+    e `removidas`, e o total de `inalteradas`.
+    """
+
+    CHAVE = ['nome_comunidade', 'municipio']
+
+    def __init__(self, fonte_dados, tamanho_lote=None):
+        self.fonte_dados = fonte_dados
+        self.tamanho_lote = tamanho_lote or settings.LOCALIDADES_IMPORTACAO_LOTE
+        self.existentes = pd.DataFrame(
+            Localidade.objects.filter(fonte_dados=fonte_dados).values_list(
+                'id', *self.CHAVE, 'hash_conteudo', 'calha_rio_id', 'tipo_comunidade',
+            ),
+            columns=['id', *self.CHAVE, 'hash_anterior', 'calha_anterior', 'tipo_anterior'],
+        ).set_index(self.CHAVE)
+        self.encontrados = np.zeros(len(self.existentes), dtype=bool)
+        self.resumo = {'inseridas': [], 'atualizadas': [], 'removidas': [], 'inalteradas': 0}
+
+    def _chaves(self, tabela):
+        return list(tabela[self.CHAVE].itertuples(index=False, name=None))
+
+    def aplicar(self, df):
+        df = df.assign(hash_conteudo=calcular_hashes(df)).reset_index(drop=True)
+        posicoes = self.existentes.index.get_indexer(pd.MultiIndex.from_frame(df[self.CHAVE].astype(object)))
+        existe = posicoes >= 0
+        self.encontrados[posicoes[existe]] = True
+        anteriores = self.existentes.iloc[posicoes[existe]]
+        em_ambos = df[existe].assign(
+            id=anteriores['id'].to_numpy(np.int64), hash_anterior=anteriores['hash_anterior'].to_numpy(),
+            calha_anterior=anteriores['calha_anterior'].to_numpy(), tipo_anterior=anteriores['tipo_anterior'].to_numpy(),
+        )
+        alteradas = em_ambos[em_ambos['hash_conteudo'] != em_ambos['hash_anterior']]
+        novas = df[~existe]
+
+        campos_atualizados = [campo for campo in (*CAMPOS, 'hash_conteudo') if campo not in self.CHAVE]
+        if 'calha_rio_id' in df.columns:
+            campos_atualizados.append('calha_rio')
+        with adiar_incremento(), transaction.atomic():
+            registros = _registros(alteradas).assign(id=alteradas['id'].to_numpy())
+            for inicio in range(0, len(registros), self.tamanho_lote):
+                lote = registros.iloc[inicio:inicio + self.tamanho_lote].to_dict('records')
+                Localidade.objects.bulk_update([Localidade(**registro) for registro in lote], campos_atualizados)
+            _inserir(novas, self.tamanho_lote)
+            if len(novas) or len(alteradas):
+                # Uma linha alterada pode ter saído do grupo antigo (outra calha ou tipo).
+                antigos = alteradas[['calha_anterior', 'municipio', 'fonte_dados', 'tipo_anterior']].set_axis(
+                    ['calha_rio_id', 'municipio', 'fonte_dados', 'tipo_comunidade'], axis=1,
+                )
+                resumo.marcar(_grupos(novas) | _grupos(alteradas) | _grupos(antigos))
+                incrementar_versao()
+
+        self.resumo['inseridas'] += self._chaves(novas)
+        self.resumo['atualizadas'] += self._chaves(alteradas)
+        self.resumo['inalteradas'] += len(em_ambos) - len(alteradas)
+
+    def finalizar(self):
+        removidas = self.existentes[~self.encontrados].reset_index()
+        ids_removidos = removidas['id'].tolist()
+        # As remoções disparam post_delete por linha; adiar_incremento junta
+        # tudo em um único incremento de versão.
+        with adiar_incremento(), transaction.atomic():
+            for inicio in range(0, len(ids_removidos), self.tamanho_lote):
+                Localidade.objects.filter(id__in=ids_removidos[inicio:inicio + self.tamanho_lote]).delete()
+        self.resumo['removidas'] += self._chaves(removidas)
+        return self.resumo
+
+
+def sincronizar(df, fonte_dados, tamanho_lote=None):
+    """Importação incremental de uma fonte a partir de um único DataFrame limpo (veja `Sincronizacao`)."""
+    sincronizacao = Sincronizacao(fonte_dados, tamanho_lote)
+    sincronizacao.aplicar(df)
+    return sincronizacao.finalizar()
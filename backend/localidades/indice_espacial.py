@@ -0,0 +1,103 @@
+# backend/localidades/indice_espacial.py
+
+from django.db import connections
+from django.db.models.expressions import RawSQL
+
+from .models import Localidade
+
+# Tabela virtual R*Tree do SQLite com o retângulo (degenerado) de cada localidade.
+TABELA_RTREE = 'localidades_localidade_rtree'
+
+# Gatilhos que mantêm o R*Tree sincronizado com a tabela de localidades.
+# Como ficam no próprio banco, cobrem save(), delete(), bulk_create(),
+# loaddata e até SQL manual, sem depender de sinais do Django.
+GATILHOS = {
+    f'{TABELA_RTREE}_ai': '''
+        CREATE TRIGGER IF NOT EXISTS {nome} AFTER INSERT ON {tabela} BEGIN
+            INSERT OR REPLACE INTO {rtree} (id, min_lat, max_lat, min_lon, max_lon)
+            VALUES (new.id, new.latitude, new.latitude, new.longitude, new.longitude);
+        END
+    ''',
+    f'{TABELA_RTREE}_au': '''
+        CREATE TRIGGER IF NOT EXISTS {nome} AFTER UPDATE OF id, latitude, longitude ON {tabela} BEGIN
+            DELETE FROM {rtree} WHERE id = old.id;
+            INSERT OR REPLACE INTO {rtree} (id, min_lat, max_lat, min_lon, max_lon)
+            VALUES (new.id, new.latitude, new.latitude, new.longitude, new.longitude);
+        END
+    ''',
+    f'{TABELA_RTREE}_ad': '''
+        CREATE TRIGGER IF NOT EXISTS {nome} AFTER DELETE ON {tabela} BEGIN
+            DELETE FROM {rtree} WHERE id = old.id;
+        END
+    ''',
+}
+
+
+def suportado(using='default'):
+    return connections[using].vendor == 'sqlite'
+
+
+def garantir_indice_espacial(using='default', **kwargs):
+    """
+    Cria o R*Tree e os gatilhos caso ainda não existam.
+
+    Roda após cada `migrate`: o SQLite recria a tabela de localidades em
+    algumas alterações de esquema, o que descarta os gatilhos. Quando algum
+    gatilho precisa ser recriado o índice é reconstruído do zero.
+    """
+    if not suportado(using):
+        return
+    tabela = Localidade._meta.db_table
+    if tabela not in connections[using].introspection.table_names():
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = %s", [tabela]
+        )
+        existentes = {linha[0] for linha in cursor.fetchall()}
+        cursor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {TABELA_RTREE} '
+            f'USING rtree(id, min_lat, max_lat, min_lon, max_lon)'
+        )
+        if set(GATILHOS) <= existentes:
+            return
+        for nome, sql in GATILHOS.items():
+            cursor.execute(sql.format(nome=nome, tabela=tabela, rtree=TABELA_RTREE))
+    reconstruir_indice_espacial(using)
+
+
+def reconstruir_indice_espacial(using='default'):
+    """Recarrega o R*Tree inteiro a partir da tabela de localidades."""
+    if not suportado(using):
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABELA_RTREE}')
+        cursor.execute(
+            f'INSERT INTO {TABELA_RTREE} (id, min_lat, max_lat, min_lon, max_lon) '
+            f'SELECT id, latitude, latitude, longitude, longitude FROM {Localidade._meta.db_table}'
+        )
+
+
+def filtrar_bbox(queryset, west, south, east, north):
+    """
+    Restringe o queryset ao retângulo informado.
+
+    No SQLite os candidatos vêm do R*Tree e são unidos pela chave primária;
+    como o R*Tree guarda coordenadas em precisão simples, os predicados
+    exatos são reaplicados sobre os candidatos. Em outros bancos cai nos
+    predicados de intervalo simples.
+    """
+    exato = queryset.filter(
+        longitude__gte=west,
+        longitude__lte=east,
+        latitude__gte=south,
+        latitude__lte=north,
+    )
+    if not suportado(queryset.db):
+        return exato
+    candidatos = RawSQL(
+        f'SELECT id FROM {TABELA_RTREE} '
+        f'WHERE max_lon >= %s AND min_lon <= %s AND max_lat >= %s AND min_lat <= %s',
+        (west, east, south, north),
+    )
+    return exato.filter(id__in=candidatos)
@@ -0,0 +1,114 @@
+# backend/localidades/indice_textual.py
+
+import re
+
+from django.db import connections
+
+from .models import Localidade
+
+# Tabela virtual FTS5 do SQLite sobre os campos de busca das localidades.
+# É uma tabela de conteúdo externo: guarda só o índice e lê o texto da
+# própria tabela de localidades. O tokenizador unicode61 com
+# remove_diacritics ignora acentos ("Sao Gabriel" encontra "São Gabriel").
+TABELA_FTS = 'localidades_localidade_fts'
+CAMPOS = ('nome_comunidade', 'municipio', 'uf')
+
+# Peso de cada campo no ranking (bm25): o nome da comunidade conta mais.
+PESOS = (10.0, 3.0, 1.0)
+
+_COLUNAS = ', '.join(CAMPOS)
+_NOVOS = ', '.join(f'new.{campo}' for campo in CAMPOS)
+_ANTIGOS = ', '.join(f'old.{campo}' for campo in CAMPOS)
+
+# Gatilhos que mantêm o índice sincronizado (save(), bulk_create(), loaddata
+# e SQL manual), como os do índice espacial.
+GATILHOS = {
+    f'{TABELA_FTS}_ai': f'''
+        CREATE TRIGGER IF NOT EXISTS {{nome}} AFTER INSERT ON {{tabela}} BEGIN
+            INSERT INTO {{fts}} (rowid, {_COLUNAS}) VALUES (new.id, {_NOVOS});
+        END
+    ''',
+    f'{TABELA_FTS}_au': f'''
+        CREATE TRIGGER IF NOT EXISTS {{nome}} AFTER UPDATE OF id, {_COLUNAS} ON {{tabela}} BEGIN
+            INSERT INTO {{fts}} ({{fts}}, rowid, {_COLUNAS}) VALUES ('delete', old.id, {_ANTIGOS});
+            INSERT INTO {{fts}} (rowid, {_COLUNAS}) VALUES (new.id, {_NOVOS});
+        END
+    ''',
+    f'{TABELA_FTS}_ad': f'''
+        CREATE TRIGGER IF NOT EXISTS {{nome}} AFTER DELETE ON {{tabela}} BEGIN
+            INSERT INTO {{fts}} ({{fts}}, rowid, {_COLUNAS}) VALUES ('delete', old.id, {_ANTIGOS});
+        END
+    ''',
+}
+
+
+def suportado(using='default'):
+    return connections[using].vendor == 'sqlite'
+
+
+def garantir_indice_textual(using='default', **kwargs):
+    """
+    Cria a tabela FTS5 e os gatilhos caso ainda não existam, reconstruindo o
+    índice quando algum gatilho precisou ser (re)criado. Roda após cada
+    `migrate`, pelo mesmo motivo do índice espacial.
+    """
+    if not suportado(using):
+        return
+    tabela = Localidade._meta.db_table
+    if tabela not in connections[using].introspection.table_names():
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = %s", [tabela]
+        )
+        existentes = {linha[0] for linha in cursor.fetchall()}
+        cursor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {TABELA_FTS} USING fts5('
+            f"{_COLUNAS}, content='{tabela}', content_rowid='id', "
+            f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+        if set(GATILHOS) <= existentes:
+            return
+        for nome, sql in GATILHOS.items():
+            cursor.execute(sql.format(nome=nome, tabela=tabela, fts=TABELA_FTS))
+    reconstruir_indice_textual(using)
+
+
+def reconstruir_indice_textual(using='default'):
+    """Refaz o índice inteiro a partir da tabela de localidades."""
+    if not suportado(using):
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute(f"INSERT INTO {TABELA_FTS} ({TABELA_FTS}) VALUES ('rebuild')")
+
+
+def consulta_fts(texto):
+    """
+    Converte o texto digitado em uma expressão MATCH do FTS5: cada palavra
+    vira um prefixo entre aspas e todas precisam aparecer (em qualquer um
+    dos campos). Retorna None se não houver palavras.
+    """
+    termos = re.findall(r'\w+', texto or '')
+    if not termos:
+        return None
+    return ' '.join('"{}"*'.format(termo.replace('"', '""')) for termo in termos)
+
+
+def buscar(queryset, texto):
+    """
+    Filtra o queryset pelas localidades que casam com `texto`, ordenadas por
+    relevância (bm25, mais relevantes primeiro), com a relevância anotada em
+    `relevancia_busca`.
+    """
+    expressao = consulta_fts(texto)
+    if expressao is None:
+        return queryset
+    tabela = Localidade._meta.db_table
+    pesos = ', '.join(str(peso) for peso in PESOS)
+    return queryset.extra(
+        tables=[TABELA_FTS],
+        where=[f'{TABELA_FTS}.rowid = {tabela}.id', f'{TABELA_FTS} MATCH %s'],
+        params=[expressao],
+        select={'relevancia_busca': f'bm25({TABELA_FTS}, {pesos})'},
+        order_by=['relevancia_busca', 'id'],
+    )
@@ -0,0 +1,154 @@
+# backend/localidades/kdtree.py
+#
+# KD-tree em memória para consultas de vizinhos mais próximos sobre a
+# superfície da Terra. As coordenadas são convertidas em vetores unitários
+# 3D; a distância euclidiana entre eles (corda) cresce junto com a distância
+# de grande círculo, então a árvore euclidiana dá a ordem correta e a
+# distância final é convertida de volta para km.
+
+import heapq
+
+import numpy as np
+
+from .geo import RAIO_TERRA_KM
+from .versao import CachePorVersao
+
+TAMANHO_FOLHA = 32
+
+# Árvores já construídas, uma por combinação de filtros. São refeitas
+# preguiçosamente na primeira consulta depois de uma mudança de versão.
+_arvores = CachePorVersao()
+
+
+def para_vetores(latitudes, longitudes):
+    lat = np.radians(np.asarray(latitudes, dtype=np.float64))
+    lon = np.radians(np.asarray(longitudes, dtype=np.float64))
+    return np.column_stack((np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)))
+
+
+def corda_para_km(corda):
+    return 2 * RAIO_TERRA_KM * np.arcsin(np.clip(corda / 2, 0, 1))
+
+
+def km_para_corda(km):
+    return 2 * np.sin(np.clip(km / (2 * RAIO_TERRA_KM), 0, np.pi / 2))
+
+
+class ArvoreKD:
+    """
+    KD-tree construída uma vez sobre um conjunto de pontos (ids + lat/lon).
+
+    Os nós ficam em listas paralelas; cada nó cobre um intervalo de
+    `self.ordem` e guarda a caixa envolvente dos seus pontos, usada para
+    descartar ramos inteiros durante as consultas.
+    """
+
+    def __init__(self, ids, latitudes, longitudes):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.pontos = para_vetores(latitudes, longitudes)
+        self.ordem = np.arange(len(self.ids))
+        self.intervalos = []
+        self.filhos = []
+        self.minimos = []
+        self.maximos = []
+        if len(self.ids):
+            self._construir()
+
+    def _novo_no(self, inicio, fim):
+        pontos = self.pontos[self.ordem[inicio:fim]]
+        self.intervalos.append((inicio, fim))
+        self.filhos.append(None)
+        self.minimos.append(pontos.min(axis=0))
+        self.maximos.append(pontos.max(axis=0))
+        return len(self.intervalos) - 1
+
+    def _construir(self):
+        pilha = [self._novo_no(0, len(self.ids))]
+        while pilha:
+            no = pilha.pop()
+            inicio, fim = self.intervalos[no]
+            if fim - inicio <= TAMANHO_FOLHA:
+                continue
+            # Divide pela dimensão de maior extensão, na mediana.
+            eixo = int(np.argmax(self.maximos[no] - self.minimos[no]))
+            meio = (fim - inicio) // 2
+            trecho = self.ordem[inicio:fim]
+            self.ordem[inicio:fim] = trecho[np.argpartition(self.pontos[trecho, eixo], meio)]
+            esquerda = self._novo_no(inicio, inicio + meio)
+            direita = self._novo_no(inicio + meio, fim)
+            self.filhos[no] = (esquerda, direita)
+            pilha += [esquerda, direita]
+
+    def _distancia_caixa(self, no, alvo):
+        excesso = np.maximum(self.minimos[no] - alvo, 0) + np.maximum(alvo - self.maximos[no], 0)
+        return float(np.sqrt(np.dot(excesso, excesso)))
+
+    def _folha(self, no, alvo):
+        inicio, fim = self.intervalos[no]
+        indices = self.ordem[inicio:fim]
+        return indices, np.linalg.norm(self.pontos[indices] - alvo, axis=1)
+
+    def vizinhos(self, latitude, longitude, k, raio_km=None):
+        """
+        Os `k` pontos mais próximos (opcionalmente só dentro de `raio_km`).
+        Retorna (ids, distancias_km) em ordem crescente de distância.
+        """
+        if not len(self.ids) or k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        alvo = para_vetores([latitude], [longitude])[0]
+        limite = km_para_corda(raio_km) if raio_km is not None else np.inf
+
+        melhores_indices = np.empty(0, dtype=np.int64)
+        melhores_cordas = np.empty(0)
+        fila = [(self._distancia_caixa(0, alvo), 0)]
+        while fila:
+            distancia, no = heapq.heappop(fila)
+            pior = melhores_cordas[-1] if len(melhores_cordas) == k else limite
+            if distancia > min(pior, limite):
+                break
+            if self.filhos[no] is not None:
+                for filho in self.filhos[no]:
+                    heapq.heappush(fila, (self._distancia_caixa(filho, alvo), filho))
+                continue
+            indices, cordas = self._folha(no, alvo)
+            dentro = cordas <= limite
+            melhores_indices = np.concatenate((melhores_indices, indices[dentro]))
+            melhores_cordas = np.concatenate((melhores_cordas, cordas[dentro]))
+            ordem = np.argsort(melhores_cordas, kind='stable')[:k]
+            melhores_indices, melhores_cordas = melhores_indices[ordem], melhores_cordas[ordem]
+
+        return self.ids[melhores_indices], corda_para_km(melhores_cordas)
+
+    def no_raio(self, latitude, longitude, raio_km):
+        """Todos os pontos a até `raio_km`, em ordem crescente de distância."""
+        if not len(self.ids):
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        alvo = para_vetores([latitude], [longitude])[0]
+        limite = km_para_corda(raio_km)
+        indices, cordas = [], []
+        pilha = [0]
+        while pilha:
+            no = pilha.pop()
+            if self._distancia_caixa(no, alvo) > limite:
+                continue
+            if self.filhos[no] is not None:
+                pilha += list(self.filhos[no])
+                continue
+            folha_indices, folha_cordas = self._folha(no, alvo)
+            dentro = folha_cordas <= limite
+            indices.append(folha_indices[dentro])
+            cordas.append(folha_cordas[dentro])
+        if not indices:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        indices, cordas = np.concatenate(indices), np.concatenate(cordas)
+        ordem = np.argsort(cordas, kind='stable')
+        return self.ids[indices[ordem]], corda_para_km(cordas[ordem])
+
+
+def obter_arvore(chave_filtros, queryset):
+    def construir():
+        linhas = list(queryset.values_list('id', 'latitude', 'longitude'))
+        ids, latitudes, longitudes = zip(*linhas) if linhas else ((), (), ())
+        return ArvoreKD(ids, latitudes, longitudes)
+
+    return _arvores.obter(chave_filtros, construir)
@@ -0,0 +1,240 @@
+# backend/localidades/limites_calhas.py
+#
+# Atribuição de calha pela posição: em que polígono de calha cada
+# localidade cai. Os limites vêm de um GeoJSON local (Polygon/MultiPolygon,
+# uma feature por calha, com o nome da calha numa propriedade).
+#
+# O teste é o da paridade de cruzamentos (ímpar = dentro), feito para todos
+# os pontos de uma vez com NumPy. Para não comparar cada ponto com todas as
+# arestas, as arestas são distribuídas numa grade regular e, para o centro
+# de cada célula, guarda-se de antemão em quais calhas ele está (teste do
+# raio para leste). Um ponto só olha as arestas da própria célula: as que
+# cortam o caminho entre o centro e o ponto trocam o dentro/fora. Os limites
+# das calhas se sobrepõem muito nas caixas envolventes (uma calha contorna a
+# outra, e os limites seguem rios sinuosos), então a grade sobre as arestas
+# filtra bem mais que uma árvore sobre as caixas de cada polígono.
+
+import json
+
+import numpy as np
+
+# Pares (ponto, aresta candidata) avaliados por vez; limita a memória.
+MAX_PARES = 4_000_000
+# Limite de células da grade (a tabela dentro/fora dos centros tem
+# células x calhas posições).
+MAX_CELULAS = 1 << 20
+
+
+class LimitesIndisponiveis(Exception):
+    """O arquivo de limites das calhas não existe ou não pôde ser lido."""
+
+
+def _poligonos_geojson(geometria):
+    """Anéis (listas de [lon, lat]) de cada polígono da geometria."""
+    tipo = geometria.get('type') if geometria else None
+    if tipo == 'Polygon':
+        yield geometria['coordinates']
+    elif tipo == 'MultiPolygon':
+        yield from geometria['coordinates']
+    elif tipo == 'GeometryCollection':
+        for parte in geometria['geometries']:
+            yield from _poligonos_geojson(parte)
+
+
+def ler_limites(caminho, propriedade):
+    """
+    Lê o GeoJSON dos limites. Retorna uma lista de (nome da calha, anéis),
+    cada anel um array (k, 2) com [longitude, latitude]. Features sem a
+    propriedade com o nome ou sem polígono são ignoradas.
+    """
+    try:
+        with open(caminho, encoding='utf-8') as arquivo:
+            dados = json.load(arquivo)
+    except FileNotFoundError:
+        raise LimitesIndisponiveis(f'arquivo de limites das calhas não encontrado: {caminho}')
+    except json.JSONDecodeError as e:
+        raise LimitesIndisponiveis(f'arquivo de limites das calhas inválido: {e}')
+
+    if dados.get('type') == 'FeatureCollection':
+        features = dados['features']
+    elif dados.get('type') == 'Feature':
+        features = [dados]
+    else:
+        raise LimitesIndisponiveis('o arquivo de limites das calhas precisa ter features com o nome da calha')
+
+    limites = []
+    for feature in features:
+        nome = (feature.get('properties') or {}).get(propriedade)
+        aneis = [
+            np.asarray(anel, dtype=np.float64)[:, :2]
+            for poligono in _poligonos_geojson(feature.get('geometry'))
+            for anel in poligono if len(anel) >= 3
+        ]
+        if nome and aneis:
+            limites.append((str(nome).strip(), aneis))
+    return limites
+
+
+class LimitesCalhas:
+    """Polígonos das calhas preparados para `localizar` muitos pontos de uma vez."""
+
+    def __init__(self, limites):
+        self.nomes = [nome for nome, _ in limites]
+
+        # Arestas de todos os anéis, com a região (índice em self.nomes) de
+        # cada uma. Buracos e partes de MultiPolygon entram na mesma contagem
+        # de cruzamentos da região, então a regra par/ímpar já os trata.
+        inicio, fim, regiao = [], [], []
+        for indice, (_, aneis) in enumerate(limites):
+            for anel in aneis:
+                inicio.append(anel)
+                fim.append(np.roll(anel, -1, axis=0))
+                regiao.append(np.full(len(anel), indice, dtype=np.int64))
+        if inicio:
+            inicio, fim, regiao = np.concatenate(inicio), np.concatenate(fim), np.concatenate(regiao)
+        else:
+            inicio = fim = np.empty((0, 2))
+            regiao = np.empty(0, dtype=np.int64)
+        # Arestas de comprimento zero (como o fechamento repetido do anel) não contam.
+        validas = (inicio != fim).any(axis=1)
+        self.x1, self.y1 = inicio[validas, 0], inicio[validas, 1]
+        self.x2, self.y2 = fim[validas, 0], fim[validas, 1]
+        self.regiao = regiao[validas]
+        quantidade = len(self.regiao)
+        if not quantidade:
+            return
+
+        # Grade com umas duas células por aresta, na proporção da caixa dos limites.
+        self.oeste, self.sul = float(min(self.x1.min(), self.x2.min())), float(min(self.y1.min(), self.y2.min()))
+        largura = float(max(self.x1.max(), self.x2.max())) - self.oeste or 1.0
+        altura = float(max(self.y1.max(), self.y2.max())) - self.sul or 1.0
+        celulas = min(2 * quantidade, MAX_CELULAS)
+        self.colunas = int(np.clip(round(np.sqrt(celulas * largura / altura)), 1, celulas))
+        self.linhas = int(np.clip(celulas // self.colunas, 1, celulas))
+        self.largura_celula = largura / self.colunas
+        self.altura_celula = altura / self.linhas
+
+        # Cada aresta é registrada em todas as células da sua caixa (CSR por célula).
+        c0, c1 = self._coluna(np.minimum(self.x1, self.x2)), self._coluna(np.maximum(self.x1, self.x2))
+        l0, l1 = self._linha(np.minimum(self.y1, self.y2)), self._linha(np.maximum(self.y1, self.y2))
+        largura_caixa = c1 - c0 + 1
+        ocupadas = largura_caixa * (l1 - l0 + 1)
+        arestas = np.repeat(np.arange(quantidade), ocupadas)
+        k = _sequencias(ocupadas)
+        celula = (np.repeat(l0, ocupadas) + k // largura_caixa[arestas]) * self.colunas + np.repeat(c0, ocupadas) + k % largura_caixa[arestas]
+        ordem = np.argsort(celula, kind='stable')
+        self.arestas_por_celula = arestas[ordem]
+        self.offsets = np.zeros(self.colunas * self.linhas + 1, dtype=np.int64)
+        np.cumsum(np.bincount(celula, minlength=self.colunas * self.linhas), out=self.offsets[1:])
+
+        self.centro_dentro = self._centros_dentro()
+
+    @classmethod
+    def de_arquivo(cls, caminho, propriedade):
+        return cls(ler_limites(caminho, propriedade))
+
+    def _coluna(self, x):
+        return np.clip(((x - self.oeste) / self.largura_celula).astype(np.int64), 0, self.colunas - 1)
+
+    def _linha(self, y):
+        return np.clip(((y - self.sul) / self.altura_celula).astype(np.int64), 0, self.linhas - 1)
+
+    def _centros_dentro(self):
+        """
+        (células, regiões): se o centro de cada célula está dentro de cada
+        região, pelo teste do raio. Os centros de uma linha da grade estão
+        todos na mesma latitude, então basta achar uma vez, por linha, onde
+        as arestas cruzam aquela latitude e contar quantos cruzamentos de
+        cada região ficam a leste de cada centro.
+        """
+        regioes = len(self.nomes)
+        centros_x = self.oeste + (np.arange(self.colunas) + 0.5) * self.largura_celula
+        dentro = np.zeros((self.linhas, self.colunas, regioes), dtype=bool)
+        for linha in range(self.linhas):
+            y = self.sul + (linha + 0.5) * self.altura_celula
+            # As arestas que cruzam a latitude do centro estão nas células da linha.
+            candidatas = np.unique(self.arestas_por_celula[
+                self.offsets[linha * self.colunas]:self.offsets[(linha + 1) * self.colunas]
+            ])
+            cruza = candidatas[(self.y1[candidatas] > y) != (self.y2[candidatas] > y)]
+            if not len(cruza):
+                continue
+            x = self.x1[cruza] + (y - self.y1[cruza]) * (self.x2[cruza] - self.x1[cruza]) / (self.y2[cruza] - self.y1[cruza])
+            for indice in np.unique(self.regiao[cruza]):
+                xs = np.sort(x[self.regiao[cruza] == indice])
+                a_leste = len(xs) - np.searchsorted(xs, centros_x, side='right')
+                dentro[linha, :, indice] = (a_leste & 1).astype(bool)
+        return dentro.reshape(self.linhas * self.colunas, regioes)
+
+    def localizar(self, latitudes, longitudes):
+        """
+        Índice em `self.nomes` da calha de cada ponto, ou -1 se o ponto não
+        cai em nenhuma. Se as calhas se sobrepõem, vale a primeira do arquivo.
+        """
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        resultado = np.full(len(latitudes), -1, dtype=np.int64)
+        if not len(self.regiao) or not len(latitudes):
+            return resultado
+
+        # Pontos fora da caixa dos limites (ou sem coordenadas) ficam sem calha.
+        na_grade = np.flatnonzero(
+            (longitudes >= self.oeste) & (longitudes <= self.oeste + self.largura_celula * self.colunas)
+            & (latitudes >= self.sul) & (latitudes <= self.sul + self.altura_celula * self.linhas)
+        )
+        latitudes, longitudes = latitudes[na_grade], longitudes[na_grade]
+        colunas, linhas = self._coluna(longitudes), self._linha(latitudes)
+        celula = linhas * self.colunas + colunas
+        candidatas = self.offsets[celula + 1] - self.offsets[celula]
+
+        # Blocos de pontos com no máximo MAX_PARES pares (ponto, aresta).
+        acumulado = np.cumsum(candidatas)
+        inicio = 0
+        while inicio < len(na_grade):
+            base = acumulado[inicio - 1] if inicio else 0
+            fim = max(int(np.searchsorted(acumulado, base + MAX_PARES, side='right')), inicio + 1)
+            bloco = slice(inicio, fim)
+            resultado[na_grade[bloco]] = self._localizar_bloco(
+                latitudes[bloco], longitudes[bloco], colunas[bloco], linhas[bloco], celula[bloco], candidatas[bloco],
+            )
+            inicio = fim
+        return resultado
+
+    def _localizar_bloco(self, latitudes, longitudes, colunas, linhas, celula, candidatas):
+        """
+        Parte do estado do centro da célula e conta as arestas da célula
+        cruzadas no caminho do centro até o ponto (na horizontal até a
+        longitude do ponto e depois na vertical): cada cruzamento troca o
+        dentro/fora daquela região.
+        """
+        pontos = np.repeat(np.arange(len(latitudes)), candidatas)
+        arestas = self.arestas_por_celula[np.repeat(self.offsets[celula], candidatas) + _sequencias(candidatas)]
+        x1, y1, x2, y2 = self.x1[arestas], self.y1[arestas], self.x2[arestas], self.y2[arestas]
+        px, py = longitudes[pontos], latitudes[pontos]
+        cx = self.oeste + (colunas[pontos] + 0.5) * self.largura_celula
+        cy = self.sul + (linhas[pontos] + 0.5) * self.altura_celula
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # Trecho horizontal, na latitude do centro, do centro até a longitude do ponto.
+            horizontal = (y1 > cy) != (y2 > cy)
+            x = x1 + (cy - y1) * (x2 - x1) / (y2 - y1)
+            horizontal &= (x > np.minimum(cx, px)) & (x <= np.maximum(cx, px))
+            # Trecho vertical, na longitude do ponto, até a latitude do ponto.
+            vertical = (x1 > px) != (x2 > px)
+            y = y1 + (px - x1) * (y2 - y1) / (x2 - x1)
+            vertical &= (y > np.minimum(cy, py)) & (y <= np.maximum(cy, py))
+        cruza = horizontal ^ vertical
+
+        regioes = len(self.nomes)
+        trocas = np.bincount(
+            pontos[cruza] * regioes + self.regiao[arestas[cruza]], minlength=len(latitudes) * regioes,
+        ).reshape(len(latitudes), regioes)
+        dentro = self.centro_dentro[celula] ^ (trocas & 1).astype(bool)
+        return np.where(dentro.any(axis=1), dentro.argmax(axis=1), -1)
+
+
+def _sequencias(tamanhos):
+    """[0..t0-1, 0..t1-1, ...] para cada t em `tamanhos`, concatenados."""
+    total = int(tamanhos.sum())
+    inicios = np.repeat(np.cumsum(tamanhos) - tamanhos, tamanhos)
+    return np.arange(total, dtype=np.int64) - inicios
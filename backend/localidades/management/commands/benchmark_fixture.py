@@ -0,0 +1,81 @@
+# backend/localidades/management/commands/benchmark_fixture.py
+
+import os
+import tempfile
+import time
+
+import numpy as np
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+
+from localidades import fixture
+from localidades.models import Localidade
+
+
+def gerar_fixture(caminho, linhas, primeira_pk, tamanho_lote=10_000):
+    """Fixture .jsonl sintética, escrita lote a lote com o EscritorFixture."""
+    gerador = np.random.default_rng(0)
+    with fixture.EscritorFixture(caminho, 'jsonl', primeira_pk=primeira_pk) as escritor:
+        for inicio in range(0, linhas, tamanho_lote):
+            quantidade = min(tamanho_lote, linhas - inicio)
+            latitudes = gerador.uniform(-9, 2, quantidade)
+            longitudes = gerador.uniform(-73, -56, quantidade)
+            domicilios = gerador.integers(1, 200, quantidade)
+            escritor.escrever([
+                {
+                    'nome_comunidade': f'BENCHMARK {inicio + i}', 'municipio': 'BENCHMARK',
+                    'latitude': float(latitudes[i]), 'longitude': float(longitudes[i]),
+                    'ibge': '1300000', 'uf': 'AM', 'tipo_comunidade': 'Rural Convencional',
+                    'domicilios': int(domicilios[i]), 'total_ligacoes': int(domicilios[i]),
+                    'fonte_dados': Localidade.FonteDados.CONVENCIONAL, 'calha_rio': None,
+                }
+                for i in range(quantidade)
+            ])
+
+
+class Command(BaseCommand):
+    help = 'Compara o loaddata com o load_localidades_fast numa fixture .jsonl sintética (nada fica gravado no banco).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--linhas', type=int, default=100_000, help='Localidades na fixture sintética.')
+        parser.add_argument('--lote', type=int, default=10_000, help='Lote do load_localidades_fast.')
+
+    def handle(self, *args, **options):
+        linhas = options['linhas']
+        # As pks ficam depois das que já existem, para as duas variantes só
+        # inserirem linhas novas.
+        primeira_pk = (Localidade.objects.aggregate(maximo=Max('id'))['maximo'] or 0) + 1
+        temporario = tempfile.NamedTemporaryFile(suffix='.jsonl', delete=False)
+        temporario.close()
+        try:
+            inicio = time.perf_counter()
+            gerar_fixture(temporario.name, linhas, primeira_pk)
+            self.stdout.write(
+                f'Fixture com {linhas:,} localidades ({os.path.getsize(temporario.name) / 1e6:.1f} MB) '
+                f'escrita em {time.perf_counter() - inicio:.1f} s.'
+            )
+
+            variantes = (
+                ('loaddata', lambda: call_command('loaddata', temporario.name, verbosity=0)),
+                ('load_localidades_fast', lambda: fixture.carregar(temporario.name, options['lote'])),
+            )
+            tempos = {}
+            for nome, funcao in variantes:
+                # Cada variante roda numa transação desfeita no fim.
+                with transaction.atomic():
+                    inicio = time.perf_counter()
+                    funcao()
+                    tempos[nome] = time.perf_counter() - inicio
+                    carregadas = Localidade.objects.filter(id__gte=primeira_pk).count()
+                    transaction.set_rollback(True)
+                self.stdout.write(
+                    f'{nome:>22}: {carregadas:>9,} localidades em {tempos[nome]:6.1f} s '
+                    f'({carregadas / tempos[nome]:>9,.0f} linhas/s)'
+                )
+        finally:
+            os.unlink(temporario.name)
+
+        ganho = tempos['loaddata'] / tempos['load_localidades_fast']
+        self.stdout.write(self.style.SUCCESS(f'Ganho: {ganho:.1f}x.'))
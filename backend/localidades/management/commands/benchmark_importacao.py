@@ -0,0 +1,124 @@
+# backend/localidades/management/commands/benchmark_importacao.py
+
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import openpyxl
+import pandas as pd
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from localidades import importacao, planilha
+
+VARIANTES = ('pandas', 'streaming')
+
+
+def rss_atual_kb():
+    """RSS atual do processo em KB (Linux), ou 0 se não for possível ler."""
+    try:
+        with open('/proc/self/status') as arquivo:
+            for linha in arquivo:
+                if linha.startswith('VmRSS:'):
+                    return int(linha.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def gerar_planilha(caminho, linhas):
+    """Planilha sintética no formato da aba "Convencional" (cabeçalho na linha 4)."""
+    especificacao = importacao.ABA_CONVENCIONAL
+    colunas = list(especificacao['colunas'].values())
+    gerador = np.random.default_rng(0)
+    pasta = openpyxl.Workbook(write_only=True)
+    aba = pasta.create_sheet(especificacao['aba'])
+    for _ in range(especificacao['cabecalho'] - 1):
+        aba.append([])
+    aba.append(colunas)
+    latitudes = gerador.uniform(-9, 2, linhas)
+    longitudes = gerador.uniform(-73, -56, linhas)
+    domicilios = gerador.integers(1, 200, linhas)
+    for i in range(linhas):
+        aba.append([
+            1300000 + i % 62, 'AMAZONAS', f'MUNICIPIO {i % 62}', f'COMUNIDADE {i}', 'Rural Convencional',
+            int(domicilios[i]), int(domicilios[i]), float(latitudes[i]), float(longitudes[i]),
+        ])
+    pasta.save(caminho)
+
+
+class Command(BaseCommand):
+    help = 'Compara tempo e pico de memória (RSS) da leitura da planilha: pd.read_excel x leitura em streaming.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--linhas', type=int, default=100_000, help='Linhas da planilha sintética.')
+        parser.add_argument('--arquivo', help='Usa esta planilha (aba "Convencional") em vez de gerar uma.')
+        parser.add_argument('--medir', choices=VARIANTES, help='Uso interno: mede só esta variante no processo atual.')
+        parser.add_argument('--lote', type=int, default=settings.LOCALIDADES_IMPORTACAO_LOTE, help='Linhas por lote na leitura em streaming.')
+
+    def handle(self, *args, **options):
+        if options['medir']:
+            return self.medir(options['medir'], options['arquivo'], options['lote'])
+
+        temporario = None
+        caminho = options['arquivo']
+        if not caminho:
+            temporario = tempfile.NamedTemporaryFile(suffix='.xlsx', delete=False)
+            temporario.close()
+            caminho = temporario.name
+            self.stdout.write(f"Gerando planilha sintética com {options['linhas']:,} linhas...")
+            gerar_planilha(caminho, options['linhas'])
+        elif not os.path.exists(caminho):
+            raise CommandError(f'Arquivo não encontrado: {caminho}')
+
+        try:
+            self.stdout.write(f'Planilha: {os.path.getsize(caminho) / 1e6:.1f} MB.')
+            for variante in VARIANTES:
+                # Cada variante roda num processo novo, para que o pico de
+                # memória de uma não conte na outra.
+                saida = subprocess.run(
+                    [sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'), 'benchmark_importacao', '--medir', variante,
+                     '--arquivo', caminho, '--lote', str(options['lote'])],
+                    capture_output=True, text=True, check=True,
+                ).stdout
+                resultado = json.loads(saida.strip().splitlines()[-1])
+                self.stdout.write(
+                    f"{variante:>10}: {resultado['linhas']:>9,} linhas válidas em {resultado['segundos']:6.1f} s, "
+                    f"pico de RSS {resultado['pico_mb']:7.1f} MB (+{resultado['pico_mb'] - resultado['base_mb']:.1f} MB "
+                    f"sobre o processo ocioso)"
+                )
+        except subprocess.CalledProcessError as e:
+            raise CommandError(f'Falha ao medir a variante: {e.stderr}')
+        finally:
+            if temporario:
+                os.unlink(caminho)
+
+    def medir(self, variante, caminho, tamanho_lote):
+        especificacao = importacao.ABA_CONVENCIONAL
+        base = rss_atual_kb()
+        inicio = time.perf_counter()
+        linhas = 0
+        if variante == 'pandas':
+            bruto = pd.read_excel(caminho, sheet_name=especificacao['aba'], header=especificacao['cabecalho'] - 1)
+            bruto.columns = [str(coluna).strip() for coluna in bruto.columns]
+            df = bruto.rename(columns={coluna: campo for campo, coluna in especificacao['colunas'].items()})
+            df['fonte_dados'] = especificacao['fonte_dados']
+            df['linha'] = np.arange(len(df)) + especificacao['primeira_linha']
+            linhas = len(importacao.limpar(df)[0])
+        else:
+            vistas = {}
+            with planilha.abrir(caminho) as arquivo:
+                for lote in planilha.ler_lotes(arquivo, especificacao, tamanho_lote):
+                    linhas += len(importacao.limpar(lote, vistas)[0])
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        self.stdout.write(json.dumps({
+            'linhas': linhas,
+            'segundos': time.perf_counter() - inicio,
+            'base_mb': base / 1024,
+            'pico_mb': pico / 1024,
+        }))
@@ -0,0 +1,47 @@
+# backend/localidades/management/commands/benchmark_serializacao.py
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from localidades import serializacao_rapida
+from localidades.models import Localidade
+from localidades.serializers import LocalidadeSerializer
+
+
+class Command(BaseCommand):
+    help = 'Compara a serialização da lista de localidades (LocalidadeSerializer x caminho rápido) em linhas/segundo.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticoes', type=int, default=10, help='Quantas vezes cada variante é executada.')
+
+    def handle(self, *args, **options):
+        queryset = Localidade.objects.select_related('calha_rio').all()
+        total = queryset.count()
+        if not total:
+            raise CommandError('Nenhuma localidade no banco. Carregue os dados antes de rodar o benchmark.')
+        repeticoes = options['repeticoes']
+
+        def antes():
+            return JSONRenderer().render(LocalidadeSerializer(queryset.all(), many=True).data)
+
+        def depois():
+            return serializacao_rapida.renderizar(list(serializacao_rapida.linhas(queryset.all())))
+
+        if antes() != depois():
+            raise CommandError('As duas variantes produziram saídas diferentes!')
+
+        self.stdout.write(f'{total} localidades, {repeticoes} repetições por variante.')
+        resultados = {}
+        for nome, funcao in (('LocalidadeSerializer', antes), ('caminho rápido', depois)):
+            inicio = time.perf_counter()
+            for _ in range(repeticoes):
+                funcao()
+            duracao = time.perf_counter() - inicio
+            resultados[nome] = total * repeticoes / duracao
+            self.stdout.write(f'{nome:>22}: {resultados[nome]:>12,.0f} linhas/s')
+
+        ganho = resultados['caminho rápido'] / resultados['LocalidadeSerializer']
+        motor = 'orjson' if serializacao_rapida.orjson is not None else 'json'
+        self.stdout.write(self.style.SUCCESS(f'Saídas idênticas. Ganho: {ganho:.1f}x (codificador: {motor}).'))
@@ -1,35 +1,37 @@
 # backend/localidades/management/commands/carregar_localidades.py (VERSÃO FINAL E DEFINITIVA)
 
-import pandas as pd
 from django.core.management.base import BaseCommand, CommandError
 from django.conf import settings
-import json
 import os
-from localidades.models import Localidade, CalhaRio
-
-def clean_value(value, target_type, default=None):
-    if value is None or pd.isna(value):
-        return default
-    try:
-        if target_type == str:
-            return str(value).strip()
-        if target_type == int:
-            return int(float(str(value).replace(',', '.')))
-        if target_type == float:
-            return float(str(value).replace(',', '.'))
-    except (ValueError, TypeError):
-        return default
-    return value
+from localidades import fixture, importacao, limites_calhas, planilha
+from localidades.models import CalhaRio
+
+# Esta fixture usa colunas um pouco diferentes das do import_data na aba
+# "3ª Tranche" (domicílios e ligações vêm das colunas W e AD).
+ABA_TRANCHE = {
+    **importacao.ABA_TRANCHE,
+    'colunas': {**importacao.ABA_TRANCHE['colunas'], 'domicilios': 22, 'total_ligacoes': 29},
+}
+ABA_CONVENCIONAL = {
+    **importacao.ABA_CONVENCIONAL,
+    'colunas': {**importacao.ABA_CONVENCIONAL['colunas'], 'ibge': 'Código do Município (IBGE)'},
+}
 
 class Command(BaseCommand):
     help = 'Lê as abas da planilha, associa calhas, remove duplicatas e gera um arquivo de fixture.'
 
     def add_arguments(self, parser):
         parser.add_argument('file_path', type=str, help='O caminho do arquivo Excel')
+        parser.add_argument(
+            '--formato', choices=fixture.FORMATOS, default='json',
+            help='"json" (array, para o loaddata) ou "jsonl" (uma localidade por linha, para o load_localidades_fast).',
+        )
+        parser.add_argument('--workers', type=int, default=1, help='Processos para ler as abas em paralelo (1 = em série).')
 
     def handle(self, *args, **options):
         file_path = options['file_path']
-        output_path = os.path.join(settings.BASE_DIR, 'localidades', 'fixtures', 'localidades_fixture.json')
+        formato = options['formato']
+        output_path = os.path.join(settings.BASE_DIR, 'localidades', 'fixtures', fixture.NOME_ARQUIVO[formato])
 
         self.stdout.write(self.style.SUCCESS(f'--- Iniciando processamento da planilha: {file_path} ---'))
 
@@ -39,7 +41,8 @@ class Command(BaseCommand):
         if not calhas_map:
             raise CommandError('Nenhuma calha de rio encontrada no banco. Rode "python manage.py seed_calhas" primeiro.')
 
-        # 2. Mapeamento de Município para Nome da Calha (baseado na lista oficial)
+        # 2. Mapeamento de Município para Nome da Calha (baseado na lista oficial).
+        # Com o arquivo de limites das calhas, só vale para localidades fora dos polígonos.
         municipio_para_calha = {
             'SANTA ISABEL DO RIO NEGRO': 'Calha do Alto Rio Negro', 'SÃO GABRIEL DA CACHOEIRA': 'Calha do Alto Rio Negro', 'BARCELOS': 'Calha do Alto Rio Negro',
             'MANAUS': 'Calha do Baixo Rio Negro', 'IRANDUBA': 'Calha do Baixo Rio Negro', 'NOVO AIRÃO': 'Calha do Baixo Rio Negro', 'CODAJÁS': 'Calha do Baixo Rio Negro',
@@ -60,125 +63,55 @@ class Command(BaseCommand):
             'AUTAZES': 'Calha do Baixo Solimões',
         }
 
-        dados_tranche = self.processar_aba_tranche(file_path, calhas_map, municipio_para_calha)
-        dados_convencional = self.processar_aba_convencional(file_path, calhas_map, municipio_para_calha)
-        
-        todos_os_dados = dados_tranche + dados_convencional
-        self.stdout.write(self.style.SUCCESS(f'\nTotal de {len(todos_os_dados)} localidades válidas e únicas encontradas na planilha.'))
-
-        django_fixture = self.converter_para_fixture(todos_os_dados)
-        
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(django_fixture, f, indent=4, ensure_ascii=False)
+        ids_calhas = {nome: calha.id for nome, calha in calhas_map.items()}
+        try:
+            limites = importacao.carregar_limites()
+        except limites_calhas.LimitesIndisponiveis as e:
+            raise CommandError(f'Não foi possível ler os limites das calhas: {e}.')
+        if limites is not None:
+            self.stdout.write(f'Calhas atribuídas pelos limites de {settings.LOCALIDADES_CALHAS_LIMITES_ARQUIVO} '
+                              f'(o município é usado só fora dos polígonos).')
+
+        # A planilha é aberta uma vez só e cada aba é lida em lotes; com
+        # --workers as abas são lidas em paralelo e juntadas na mesma ordem.
+        # Cada lote vai direto para o arquivo, então só um lote de
+        # localidades fica em memória por vez.
+        abas = (ABA_TRANCHE, ABA_CONVENCIONAL)
+        with planilha.abrir(file_path) as arquivo, \
+                importacao.leitura_paralela(arquivo, abas, options['workers']) as futuros, \
+                fixture.EscritorFixture(output_path, formato) as escritor:
+            for especificacao in abas:
+                self.processar_aba(
+                    arquivo, especificacao, ids_calhas, limites, municipio_para_calha, escritor, futuros.get(especificacao['aba']),
+                )
+
+        self.stdout.write(self.style.SUCCESS(f'\nTotal de {escritor.total} localidades válidas e únicas encontradas na planilha.'))
 
         self.stdout.write(self.style.SUCCESS(f'--- PROCESSO CONCLUÍDO ---'))
         self.stdout.write(self.style.SUCCESS(f'Arquivo de fixture gerado com sucesso em: {output_path}'))
-        self.stdout.write(self.style.SUCCESS('Para carregar os dados no banco, rode agora: python manage.py loaddata localidades_fixture'))
+        if formato == 'jsonl':
+            self.stdout.write(self.style.SUCCESS(f'Para carregar os dados no banco, rode agora: python manage.py load_localidades_fast {output_path}'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Para carregar os dados no banco, rode agora: python manage.py loaddata localidades_fixture'))
 
-    def processar_aba_convencional(self, file_path, calhas_map, municipio_para_calha):
-        # ... (código da função sem alterações, apenas o que é passado para ela)
-        sheet_name = 'Convencional'
-        header_row_index = 3
+    def processar_aba(self, arquivo, especificacao, ids_calhas, limites, municipio_para_calha, escritor, futuro=None):
+        sheet_name = especificacao['aba']
         self.stdout.write(f"\n--- Lendo aba: '{sheet_name}' ---")
+        campos = ['nome_comunidade', 'municipio', 'latitude', 'longitude', 'ibge', 'uf', 'tipo_comunidade',
+                  'domicilios', 'total_ligacoes', 'fonte_dados', 'calha_rio']
         try:
-            df = pd.read_excel(file_path, sheet_name=sheet_name, header=header_row_index)
-            df.columns = [str(col).strip() for col in df.columns]
-            df = df.where(pd.notnull(df), None)
-            
-            dados_limpos = []
-            chaves_unicas = set()
-
-            for _, row in df.iterrows():
-                comunidade = clean_value(row.get('Nome da Comunidade'), str)
-                municipio = clean_value(row.get('Nome do Município'), str)
-                lat = clean_value(row.get('Latitude'), float)
-                lon = clean_value(row.get('Longitude'), float)
-
-                if not all([comunidade, municipio, lat, lon]):
-                    continue
-
-                fonte_dados = Localidade.FonteDados.CONVENCIONAL
-                chave_unica = (comunidade, municipio, fonte_dados)
-                if chave_unica in chaves_unicas:
-                    continue
-                chaves_unicas.add(chave_unica)
-                
+            total = 0
+            sem_calha = 0
+            for validos, _ in importacao.lotes_limpos(arquivo, especificacao, futuro=futuro):
                 # --- LÓGICA DE ASSOCIAÇÃO DE CALHAS ---
-                calha_nome = municipio_para_calha.get(municipio.upper())
-                calha_obj_id = calhas_map[calha_nome].id if calha_nome and calha_nome in calhas_map else None
-
-                item = {
-                    'nome_comunidade': comunidade, 'municipio': municipio, 'latitude': lat, 'longitude': lon,
-                    'ibge': clean_value(row.get('Código do Município (IBGE)'), str),
-                    'uf': clean_value(row.get('UF'), str, default='AM'),
-                    'tipo_comunidade': clean_value(row.get('Tipo de Comunidade'), str),
-                    'domicilios': clean_value(row.get('Domicílios'), int),
-                    'total_ligacoes': clean_value(row.get('Total de Ligações'), int),
-                    'fonte_dados': fonte_dados,
-                    'calha_rio': calha_obj_id, # Adiciona o ID da calha
-                }
-                dados_limpos.append(item)
-            
-            self.stdout.write(f"Encontradas {len(dados_limpos)} localidades VÁLIDAS e ÚNICAS na aba '{sheet_name}'.")
-            return dados_limpos
+                validos['calha_rio'], resumo = importacao.atribuir_calhas(validos, ids_calhas, limites, municipio_para_calha)
+                sem_calha += resumo['sem_calha']
+                validos = validos[campos].astype(object)
+                escritor.escrever(validos.where(validos.notna(), None).to_dict('records'))
+                total += len(validos)
+
+            self.stdout.write(f"Encontradas {total} localidades VÁLIDAS e ÚNICAS na aba '{sheet_name}'.")
+            if sem_calha:
+                self.stdout.write(self.style.WARNING(f"{sem_calha} localidades da aba '{sheet_name}' ficaram sem calha."))
         except Exception as e:
             raise CommandError(f"ERRO ao processar a aba '{sheet_name}': {e}")
-
-    def processar_aba_tranche(self, file_path, calhas_map, municipio_para_calha):
-        # ... (código da função sem alterações, apenas o que é passado para ela)
-        sheet_name = '3ª Tranche'
-        skip_rows = 7
-        self.stdout.write(f"\n--- Lendo aba: '{sheet_name}' ---")
-        try:
-            df = pd.read_excel(file_path, sheet_name=sheet_name, header=None, skiprows=skip_rows)
-            df = df.where(pd.notnull(df), None)
-
-            dados_limpos = []
-            chaves_unicas = set()
-
-            for _, row in df.iterrows():
-                comunidade = clean_value(row.iloc[3], str)
-                municipio = clean_value(row.iloc[2], str)
-                lat = clean_value(row.iloc[26], float)
-                lon = clean_value(row.iloc[27], float)
-
-                if not all([comunidade, municipio, lat, lon]):
-                    continue
-
-                fonte_dados = Localidade.FonteDados.TRANCHE
-                chave_unica = (comunidade, municipio, fonte_dados)
-                if chave_unica in chaves_unicas:
-                    continue
-                chaves_unicas.add(chave_unica)
-                
-                # --- LÓGICA DE ASSOCIAÇÃO DE CALHAS ---
-                calha_nome = municipio_para_calha.get(municipio.upper())
-                calha_obj_id = calhas_map[calha_nome].id if calha_nome and calha_nome in calhas_map else None
-
-                item = {
-                    'nome_comunidade': comunidade, 'municipio': municipio, 'latitude': lat, 'longitude': lon,
-                    'ibge': clean_value(row.iloc[0], str),
-                    'uf': clean_value(row.iloc[1], str, default='AM'),
-                    'tipo_comunidade': clean_value(row.iloc[4], str),
-                    'domicilios': clean_value(row.iloc[22], int),
-                    'total_ligacoes': clean_value(row.iloc[29], int),
-                    'fonte_dados': fonte_dados,
-                    'calha_rio': calha_obj_id, # Adiciona o ID da calha
-                }
-                dados_limpos.append(item)
-            
-            self.stdout.write(f"Encontradas {len(dados_limpos)} localidades VÁLIDAS e ÚNICAS na aba '{sheet_name}'.")
-            return dados_limpos
-        except Exception as e:
-            raise CommandError(f"ERRO ao processar a aba '{sheet_name}': {e}")
-
-    def converter_para_fixture(self, dados):
-        django_fixture = []
-        for pk_atual, item in enumerate(dados, start=1):
-            fixture_item = {
-                'model': 'localidades.localidade',
-                'pk': pk_atual,
-                'fields': item
-            }
-            django_fixture.append(fixture_item)
-        return django_fixture
\ No newline at end of file
@@ -1,199 +1,180 @@
 # backend/localidades/management/commands/import_data.py
 
 import os
+import time
+from collections import Counter
+
 import pandas as pd
-from django.core.management.base import BaseCommand
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
 from django.conf import settings
+from django.db import transaction
+from localidades import importacao, limites_calhas, planilha
 from localidades.models import CalhaRio, Localidade
-from django.db import IntegrityError
-
-# Funções auxiliares para limpeza de dados
-def clean_value(value, target_type, default=None):
-    """
-    Função genérica para limpar e converter dados de planilhas.
-    - value: o valor da célula.
-    - target_type: o tipo de dado desejado (int, float, str).
-    - default: valor a ser retornado se a conversão falhar.
-    """
-    if value is None or pd.isna(value):
-        return default
-    
-    try:
-        if target_type == str:
-            return str(value).strip()
-        if target_type == int:
-            return int(float(value))
-        if target_type == float:
-            # Substitui vírgula por ponto para o padrão decimal correto
-            return float(str(value).replace(',', '.'))
-    except (ValueError, TypeError):
-        return default
-    return value
+from localidades.versao import adiar_incremento
 
 
 class Command(BaseCommand):
     help = 'Importa dados de localidades e calhas de rios a partir de um arquivo Excel.'
 
-    def handle(self, *args, **kwargs):
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--arquivo',
+            default=os.path.join(settings.BASE_DIR, 'data', '3ª Tranche Remotos e Convencional v2.xlsx'),
+            help='Planilha com as abas "3ª Tranche" e "Convencional".',
+        )
+        parser.add_argument(
+            '--rejeitados',
+            help='Grava as linhas descartadas (aba, linha, comunidade, motivo) neste arquivo CSV.',
+        )
+        parser.add_argument(
+            '--sem-cache',
+            action='store_true',
+            help='Lê a planilha mesmo que as abas já estejam no cache de planilhas limpas.',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Processos usados para ler e limpar as abas em paralelo (1 = em série).',
+        )
+        parser.add_argument(
+            '--incremental',
+            action='store_true',
+            help='Em vez de apagar tudo, aplica só as inserções, alterações e remoções em relação ao banco.',
+        )
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        if not os.path.exists(options['arquivo']):
+            raise CommandError(f"Arquivo não encontrado: {options['arquivo']}")
+
+        # Todas as gravações da importação geram um único incremento na versão
+        # dos dados e acontecem numa só transação: se algo falhar, os dados
+        # antigos continuam lá.
+        with adiar_incremento(), transaction.atomic():
+            self.importar(
+                options['arquivo'], options['rejeitados'], options['incremental'], not options['sem_cache'],
+                options['workers'],
+            )
+
+        # Encaixa as localidades importadas na rede fluvial, se houver uma configurada.
+        if os.path.exists(settings.LOCALIDADES_REDE_FLUVIAL_ARQUIVO):
+            call_command('preparar_rede_fluvial', stdout=self.stdout, stderr=self.stderr)
+
+    def importar(self, excel_file_path, caminho_rejeitados, incremental, usar_cache, workers):
+        inicio = time.perf_counter()
         self.stdout.write(self.style.SUCCESS('--- Iniciando o processo de importação ---'))
 
         # --- Etapa 1: Limpar dados antigos ---
-        self.stdout.write('Limpando dados antigos das tabelas...')
-        Localidade.objects.all().delete()
-        CalhaRio.objects.all().delete()
-        self.stdout.write(self.style.SUCCESS('Dados antigos removidos.'))
+        # No modo incremental nada é apagado: as localidades e calhas que
+        # continuam na planilha mantêm os ids.
+        if not incremental:
+            self.stdout.write('Limpando dados antigos das tabelas...')
+            Localidade.objects.all().delete()
+            CalhaRio.objects.all().delete()
+            self.stdout.write(self.style.SUCCESS('Dados antigos removidos.'))
 
         # --- Etapa 2: Criar as Calhas de Rio ---
-        calhas_nomes = [
-            "Calha do Alto Rio Negro", "Calha do Juruá", "Calha do Purus",
-            "Calha do Alto Solimões", "Calha do Madeira", 
-            "Calha dos rios Negro e Solimões", "Calha do Baixo Amazonas",
-            "Calha do Médio Amazonas", "Calha do Triângulo"
-        ]
-        for nome_calha in calhas_nomes:
-            CalhaRio.objects.create(nome=nome_calha)
-        self.stdout.write(self.style.SUCCESS(f'{len(calhas_nomes)} calhas de rios foram criadas.'))
-
-        # --- Etapa 3: Mapear Municípios para Calhas ---
-        calha_por_municipio = {
-            'TAPAUA': 'Calha do Purus', 'LABREA': 'Calha do Purus', 'SANTA ISABEL DO RIO NEGRO': 'Calha do Alto Rio Negro',
-            'SAO GABRIEL DA CACHOEIRA': 'Calha do Alto Rio Negro', 'BARCELOS': 'Calha do Alto Rio Negro', 'GUAJARA': 'Calha do Juruá',
-            'IPIXUNA': 'Calha do Juruá', 'ENVIRA': 'Calha do Juruá', 'ITAMARATI': 'Calha do Juruá', 'EIRUNEPE': 'Calha do Juruá',
-            'CARAUARI': 'Calha do Juruá', 'PAUINI': 'Calha do Purus', 'BERURI': 'Calha do Purus', 'CANUTAMA': 'Calha do Purus',
-            'BOCA DO ACRE': 'Calha do Purus', 'ATALAIA DO NORTE': 'Calha do Alto Solimões', 'BENJAMIN CONSTANT': 'Calha do Alto Solimões',
-            'TABATINGA': 'Calha do Alto Solimões', 'SAO PAULO DE OLIVENCA': 'Calha do Alto Solimões', 'AMATURA': 'Calha do Alto Solimões',
-            'SANTO ANTONIO DO ICA': 'Calha do Alto Solimões', 'TONANTINS': 'Calha do Alto Solimões', 'HUMAITA': 'Calha do Madeira',
-            'MANICORE': 'Calha do Madeira', 'NOVO ARIPUANA': 'Calha do Madeira', 'APUI': 'Calha do Madeira', 'BORBA': 'Calha do Madeira',
-            'NOVA OLINDA DO NORTE': 'Calha do Madeira', 'MANAUS': 'Calha dos rios Negro e Solimões', 'IRANDUBA': 'Calha dos rios Negro e Solimões',
-            'NOVO AIRAO': 'Calha dos rios Negro e Solimões', 'CODAJAS': 'Calha dos rios Negro e Solimões', 'ANORI': 'Calha dos rios Negro e Solimões',
-            'ANAMA': 'Calha dos rios Negro e Solimões', 'CAAPIRANGA': 'Calha dos rios Negro e Solimões', 'MANACAPURU': 'Calha dos rios Negro e Solimões',
-            'MANAQUIRI': 'Calha dos rios Negro e Solimões', 'CAREIRO': 'Calha dos rios Negro e Solimões',
-            'CAREIRO DA VARZEA': 'Calha dos rios Negro e Solimões', 'BARREIRINHA': 'Calha do Baixo Amazonas',
-            'BOA VISTA DO RAMOS': 'Calha do Baixo Amazonas', 'NHAMUNDA': 'Calha do Baixo Amazonas', 'URUCARA': 'Calha do Baixo Amazonas',
-            'SAO SEBASTIAO DO UATUMA': 'Calha do Baixo Amazonas', 'PARINTINS': 'Calha do Baixo Amazonas', 'MAUES': 'Calha do Baixo Amazonas',
-            'ITACOATIARA': 'Calha do Médio Amazonas', 'PRESIDENTE FIGUEIREDO': 'Calha do Médio Amazonas', 'RIO PRETO DA EVA': 'Calha do Médio Amazonas',
-            'AUTAZES': 'Calha do Médio Amazonas', 'URUCURITUBA': 'Calha do Médio Amazonas', 'ITAPIRANGA': 'Calha do Médio Amazonas',
-            'JAPURA': 'Calha do Triângulo', 'MARAA': 'Calha do Triângulo', 'FONTE BOA': 'Calha do Triângulo',
-            'JUTAI': 'Calha do Triângulo', 'UARINI': 'Calha do Triângulo', 'ALVARAES': 'Calha do Triângulo',
-            'JURUA': 'Calha do Triângulo', 'TEFE': 'Calha do Triângulo'
-        }
-        calhas = {calha.nome: calha for calha in CalhaRio.objects.all()}
-        
-        excel_file_path = os.path.join(settings.BASE_DIR, 'data', '3ª Tranche Remotos e Convencional v2.xlsx')
-        
-        if not os.path.exists(excel_file_path):
-            self.stdout.write(self.style.ERROR(f'Arquivo não encontrado: {excel_file_path}'))
-            return
-
-        # --- Leitura da Aba "3ª Tranche" por POSIÇÃO de coluna ---
-        self.stdout.write("Processando a aba '3ª Tranche'...")
-        try:
-            df_tranche = pd.read_excel(excel_file_path, sheet_name='3ª Tranche', header=None, skiprows=7)
-            
-            success_count = 0
-            fail_count = 0
-
-            for index, row in df_tranche.iterrows():
+        existentes = set(CalhaRio.objects.values_list('nome', flat=True))
+        novas = CalhaRio.objects.bulk_create(
+            [CalhaRio(nome=nome) for nome in importacao.CALHAS if nome not in existentes]
+        )
+        calhas = dict(CalhaRio.objects.values_list('nome', 'id'))
+        self.stdout.write(self.style.SUCCESS(f'{len(novas)} calhas de rios foram criadas.'))
+        limites = self.carregar_limites(calhas)
+
+        # --- Etapa 3: Ler, limpar e gravar cada aba ---
+        # A planilha é aberta uma vez (e só se alguma aba não estiver no
+        # cache) e cada aba é lida em lotes (streaming), então a memória não
+        # cresce com o tamanho do arquivo. Com --workers as abas são lidas em
+        # paralelo e gravadas aqui na mesma ordem da leitura em série, então
+        # o resultado no banco é o mesmo.
+        todos_rejeitados = []
+        with planilha.abrir(excel_file_path) as arquivo, \
+                importacao.leitura_paralela(arquivo, importacao.ABAS, workers, usar_cache=usar_cache) as futuros:
+            for especificacao in importacao.ABAS:
+                aba = especificacao['aba']
+                self.stdout.write(f"Processando a aba '{aba}'...")
                 try:
-                    # Usando índices numéricos para as colunas: 0=A, 1=B, 2=C, etc.
-                    municipio_str = clean_value(row.iloc[2], str)
-                    comunidade_str = clean_value(row.iloc[3], str)
-
-                    if not municipio_str or not comunidade_str:
-                        fail_count += 1
-                        continue
-
-                    lat = clean_value(row.iloc[26], float)
-                    lng = clean_value(row.iloc[27], float)
-                    
-                    if lat is None or lng is None:
-                        self.stdout.write(self.style.WARNING(f"[Tranche] Linha {index + 8}: Coordenadas ausentes para '{comunidade_str}'. Pulando."))
-                        fail_count += 1
-                        continue
-                    
-                    municipio_normalizado = municipio_str.upper().replace('Á', 'A').replace('Ã', 'A').replace('É', 'E').replace('Ô', 'O')
-                    calha_nome = calha_por_municipio.get(municipio_normalizado)
-                    calha_obj = calhas.get(calha_nome) if calha_nome else None
-
-                    Localidade.objects.create(
-                        fonte_dados=Localidade.FonteDados.TRANCHE,
-                        ibge=clean_value(row.iloc[0], str),
-                        uf=clean_value(row.iloc[1], str, default='AM'),
-                        municipio=municipio_str,
-                        nome_comunidade=comunidade_str,
-                        tipo_comunidade=clean_value(row.iloc[4], str),
-                        latitude=lat,
-                        longitude=lng,
-                        domicilios=clean_value(row.iloc[5], int),
-                        total_ligacoes=clean_value(row.iloc[22], int),
-                        calha_rio=calha_obj,
+                    todos_rejeitados += self.importar_aba(
+                        arquivo, especificacao, calhas, limites, incremental, usar_cache, futuros.get(aba),
                     )
-                    success_count += 1
-                except (IntegrityError, IndexError) as e:
-                    self.stdout.write(self.style.WARNING(f"[Tranche] Linha {index + 8}: Falha ao processar '{comunidade_str}'. Erro: {e}. Pulando."))
-                    fail_count += 1
-            
-            self.stdout.write(self.style.SUCCESS(f"Aba '3ª Tranche': {success_count} importadas, {fail_count} puladas."))
-        
-        except Exception as e:
-            self.stdout.write(self.style.ERROR(f"Não foi possível processar a aba '3ª Tranche': {e}"))
-
-
-        # --- Leitura da Aba "Convencional" por NOME de coluna ---
-        self.stdout.write("Processando a aba 'Convencional'...")
-        try:
-            df_convencional = pd.read_excel(excel_file_path, sheet_name='Convencional', header=3)
-            df_convencional.columns = [str(col).strip() for col in df_convencional.columns]
-            
-            success_count = 0
-            fail_count = 0
+                except planilha.AbaNaoEncontrada as e:
+                    self.stdout.write(self.style.ERROR(f"Não foi possível ler a aba '{aba}': {e}."))
 
-            for index, row in df_convencional.iterrows():
-                try:
-                    municipio_str = clean_value(row.get('Nome do Município'), str)
-                    comunidade_str = clean_value(row.get('Nome da Comunidade'), str)
-
-                    if not municipio_str or not comunidade_str:
-                        fail_count += 1
-                        continue
-
-                    lat = clean_value(row.get('Latitude'), float)
-                    lng = clean_value(row.get('Longitude'), float)
-
-                    if lat is None or lng is None:
-                        self.stdout.write(self.style.WARNING(f"[Convencional] Linha {index + 5}: Coordenadas ausentes para '{comunidade_str}'. Pulando."))
-                        fail_count += 1
-                        continue
-                    
-                    municipio_normalizado = municipio_str.upper().replace('Á', 'A').replace('Ã', 'A').replace('É', 'E').replace('Ô', 'O')
-                    calha_nome = calha_por_municipio.get(municipio_normalizado)
-                    calha_obj = calhas.get(calha_nome) if calha_nome else None
-                    
-                    Localidade.objects.create(
-                        fonte_dados=Localidade.FonteDados.CONVENCIONAL,
-                        ibge=clean_value(row.get('Código do Municipio (IBGE)'), str),
-                        uf=clean_value(row.get('UF'), str, default='AM'), # Explicitamente define 'AM' se o campo for vazio
-                        municipio=municipio_str,
-                        nome_comunidade=comunidade_str,
-                        tipo_comunidade=clean_value(row.get('Tipo de Comunidade'), str),
-                        latitude=lat,
-                        longitude=lng,
-                        domicilios=clean_value(row.get('Domicílios'), int),
-                        total_ligacoes=clean_value(row.get('Total de Ligações'), int),
-                        calha_rio=calha_obj,
-                    )
-                    success_count += 1
-                except IntegrityError:
-                    self.stdout.write(self.style.WARNING(f"[Convencional] Linha {index + 5}: Localidade '{comunidade_str}' em '{municipio_str}' já existe. Pulando."))
-                    fail_count += 1
-                except Exception as e:
-                    self.stdout.write(self.style.ERROR(f"[Convencional] Erro inesperado na linha {index + 5} ('{comunidade_str}'): {e}"))
-                    fail_count += 1
-            
-            self.stdout.write(self.style.SUCCESS(f"Aba 'Convencional': {success_count} importadas, {fail_count} puladas."))
-
-        except Exception as e:
-            self.stdout.write(self.style.ERROR(f"Não foi possível processar a aba 'Convencional': {e}"))
+        if caminho_rejeitados:
+            colunas = ['fonte_dados', 'linha', 'nome_comunidade', 'motivo']
+            pd.DataFrame(todos_rejeitados, columns=colunas).to_csv(caminho_rejeitados, index=False)
+            self.stdout.write(f'Linhas descartadas gravadas em {caminho_rejeitados}.')
 
         total_final = Localidade.objects.count()
-        self.stdout.write(self.style.SUCCESS(f'--- Processo de importação concluído! Total de {total_final} localidades no banco de dados. ---'))
\ No newline at end of file
+        self.stdout.write(self.style.SUCCESS(
+            f'--- Processo de importação concluído em {time.perf_counter() - inicio:.1f} s! '
+            f'Total de {total_final} localidades no banco de dados. ---'
+        ))
+
+    def carregar_limites(self, calhas):
+        # Com os polígonos das calhas, a calha vem da coordenada; o município
+        # só é usado para as localidades fora de todos os polígonos.
+        try:
+            limites = importacao.carregar_limites()
+        except limites_calhas.LimitesIndisponiveis as e:
+            raise CommandError(f'Não foi possível ler os limites das calhas: {e}.')
+        if limites is None:
+            self.stdout.write('Sem arquivo de limites das calhas; a calha será atribuída pelo município.')
+            return None
+        desconhecidas = sorted(set(limites.nomes) - set(calhas))
+        if desconhecidas:
+            self.stdout.write(self.style.WARNING(
+                f"Polígonos ignorados (calha inexistente): {', '.join(desconhecidas)}."
+            ))
+        self.stdout.write(f'Limites das calhas carregados: {len(limites.nomes)} polígonos.')
+        return limites
+
+    def importar_aba(self, arquivo, especificacao, calhas, limites, incremental, usar_cache, futuro):
+        aba = especificacao['aba']
+        sincronizacao = importacao.Sincronizacao(especificacao['fonte_dados']) if incremental else None
+        importadas = 0
+        todos_rejeitados = []
+        origem_calhas = Counter()
+        for validos, rejeitados in importacao.lotes_limpos(arquivo, especificacao, usar_cache=usar_cache, futuro=futuro):
+            validos['calha_rio_id'], resumo = importacao.atribuir_calhas(validos, calhas, limites)
+            origem_calhas.update(resumo)
+            if incremental:
+                sincronizacao.aplicar(validos)
+            else:
+                importadas += importacao.gravar(validos)
+
+            for rejeitado in rejeitados:
+                self.stdout.write(self.style.WARNING(
+                    f"[{aba}] Linha {rejeitado['linha']}: {rejeitado['motivo']} "
+                    f"('{rejeitado['nome_comunidade'] or ''}'). Pulando."
+                ))
+            todos_rejeitados += rejeitados
+
+        if incremental:
+            self.resumir_diferencas(aba, sincronizacao.finalizar(), len(todos_rejeitados))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Aba '{aba}': {importadas} importadas, {len(todos_rejeitados)} puladas."))
+        self.resumir_calhas(aba, origem_calhas, limites is not None)
+        return todos_rejeitados
+
+    def resumir_calhas(self, aba, origem, com_limites):
+        if com_limites:
+            self.stdout.write(
+                f"Aba '{aba}': calha pelos limites em {origem['limites']}, pelo município em {origem['municipio']}."
+            )
+        if origem['sem_calha']:
+            self.stdout.write(self.style.WARNING(f"Aba '{aba}': {origem['sem_calha']} localidades ficaram sem calha."))
+
+    def resumir_diferencas(self, aba, diferencas, puladas):
+        # Com --verbosity 2, lista cada localidade alterada (+ nova, ~ atualizada, - removida).
+        if self.verbosity >= 2:
+            for sinal, grupo in (('+', 'inseridas'), ('~', 'atualizadas'), ('-', 'removidas')):
+                for nome, municipio in diferencas[grupo]:
+                    self.stdout.write(f'[{aba}] {sinal} {nome} ({municipio})')
+        self.stdout.write(self.style.SUCCESS(
+            f"Aba '{aba}': {len(diferencas['inseridas'])} inseridas, {len(diferencas['atualizadas'])} atualizadas, "
+            f"{len(diferencas['removidas'])} removidas, {diferencas['inalteradas']} inalteradas, {puladas} puladas."
+        ))
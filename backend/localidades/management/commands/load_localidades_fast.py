@@ -0,0 +1,57 @@
+# backend/localidades/management/commands/load_localidades_fast.py
+
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+
+from localidades import fixture, resumo
+from localidades.models import Localidade
+from localidades.versao import adiar_incremento, incrementar_versao
+
+
+class Command(BaseCommand):
+    help = (
+        'Carrega uma fixture de localidades em JSON lines (.jsonl) com INSERTs em lote (executemany), '
+        'numa única transação. Equivale ao loaddata para essa fixture, sem salvar objeto por objeto.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('caminho', help='Fixture .jsonl (por exemplo, gerada com carregar_localidades --formato jsonl).')
+        parser.add_argument('--lote', type=int, default=10_000, help='Localidades lidas e inseridas por vez.')
+        parser.add_argument(
+            '--substituir',
+            action='store_true',
+            help='Apaga todas as localidades antes de carregar (senão, como no loaddata, a mesma pk sobrescreve).',
+        )
+
+    def handle(self, *args, **options):
+        caminho = options['caminho']
+        if not os.path.exists(caminho):
+            raise CommandError(f'Arquivo não encontrado: {caminho}')
+        if options['lote'] < 1:
+            raise CommandError('--lote precisa ser maior que zero.')
+
+        inicio = time.perf_counter()
+        try:
+            # Tudo ou nada, como no loaddata; o INSERT direto não envia
+            # post_save, então a versão dos dados é incrementada uma vez no fim.
+            with adiar_incremento(), transaction.atomic():
+                if options['substituir']:
+                    Localidade.objects.all().delete()
+                total = fixture.carregar(caminho, options['lote'])
+                if total:
+                    # Como no loaddata, uma pk existente é sobrescrita sem
+                    # que se saiba o grupo antigo: o resumo é refeito inteiro.
+                    resumo.marcar_tudo()
+                    incrementar_versao()
+        except fixture.FixtureInvalida as e:
+            raise CommandError(f'Fixture inválida: {e}.')
+        except IntegrityError as e:
+            raise CommandError(f'Não foi possível carregar a fixture: {e}.')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{total} localidades carregadas de {caminho} em {time.perf_counter() - inicio:.1f} s.'
+        ))
+
@@ -0,0 +1,16 @@
+# backend/localidades/management/commands/loaddata.py
+
+from django.core.management.commands import loaddata
+
+from localidades.versao import adiar_incremento
+
+
+class Command(loaddata.Command):
+    """
+    Versão do `loaddata` do Django que agrupa todas as gravações do fixture
+    em um único incremento da versão dos dados.
+    """
+
+    def handle(self, *fixture_labels, **options):
+        with adiar_incremento():
+            return super().handle(*fixture_labels, **options)
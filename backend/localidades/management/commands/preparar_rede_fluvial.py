@@ -0,0 +1,56 @@
+# backend/localidades/management/commands/preparar_rede_fluvial.py
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from localidades import rede_fluvial
+from localidades.arquivos import hash_arquivo
+from localidades.models import Localidade
+from localidades.versao import versao_atual
+
+
+class Command(BaseCommand):
+    help = (
+        'Lê a rede de rios (GeoJSON/shapefile), encaixa cada localidade no nó mais próximo, '
+        'contrai o grafo e pré-calcula as distâncias por calha para o roteamento fluvial.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--arquivo', default=None, help='Arquivo da rede (padrão: LOCALIDADES_REDE_FLUVIAL_ARQUIVO).')
+
+    def handle(self, *args, **options):
+        caminho_rede = options['arquivo'] or settings.LOCALIDADES_REDE_FLUVIAL_ARQUIVO
+        try:
+            assinatura = hash_arquivo(caminho_rede)
+        except FileNotFoundError:
+            raise CommandError(f'Arquivo da rede fluvial não encontrado: {caminho_rede}')
+
+        inicio = time.monotonic()
+        localidades = list(Localidade.objects.order_by('id').values_list('id', 'latitude', 'longitude', 'calha_rio_id'))
+        self.stdout.write(f'Preparando a rede fluvial de {caminho_rede} para {len(localidades)} localidades...')
+        try:
+            arrays, resumo = rede_fluvial.preparar(
+                caminho_rede,
+                localidades,
+                casas_decimais=settings.LOCALIDADES_REDE_FLUVIAL_CASAS_DECIMAIS,
+                max_encaixe_km=settings.LOCALIDADES_REDE_FLUVIAL_MAX_ENCAIXE_KM,
+                meta={'arquivo': str(caminho_rede), 'sha256': assinatura, 'versao_dados': versao_atual()},
+            )
+        except rede_fluvial.RedeFluvialIndisponivel as erro:
+            raise CommandError(str(erro))
+        rede_fluvial.salvar(settings.LOCALIDADES_REDE_FLUVIAL_PREPARADA, arrays)
+
+        self.stdout.write(
+            f"Grafo: {resumo['nos']} nós e {resumo['arestas']} arestas, contraído para "
+            f"{resumo['nos_contraidos']} nós e {resumo['arestas_contraidas']} arestas."
+        )
+        self.stdout.write(
+            f"Localidades encaixadas: {resumo['localidades_encaixadas']} "
+            f"({resumo['localidades_fora_da_rede']} a mais de {settings.LOCALIDADES_REDE_FLUVIAL_MAX_ENCAIXE_KM} km da rede). "
+            f"Distâncias pré-calculadas para {resumo['calhas']} calhas."
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Rede salva em {settings.LOCALIDADES_REDE_FLUVIAL_PREPARADA} ({time.monotonic() - inicio:.1f}s).'
+        ))
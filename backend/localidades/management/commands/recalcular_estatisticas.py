@@ -0,0 +1,17 @@
+# backend/localidades/management/commands/recalcular_estatisticas.py
+
+from django.core.management.base import BaseCommand
+
+from localidades import resumo
+from localidades.models import ResumoLocalidades
+
+
+class Command(BaseCommand):
+    help = (
+        'Refaz a tabela de resumo usada por /api/estatisticas/ a partir das localidades. '
+        'Normalmente não é preciso: importações e alterações já a mantêm atualizada.'
+    )
+
+    def handle(self, *args, **options):
+        resumo.recalcular()
+        self.stdout.write(self.style.SUCCESS(f'{ResumoLocalidades.objects.count()} grupos recalculados.'))
@@ -2,6 +2,7 @@
 
 from django.core.management.base import BaseCommand
 from localidades.models import CalhaRio
+from localidades.versao import adiar_incremento
 from django.db import transaction
 
 class Command(BaseCommand):
@@ -21,6 +22,7 @@ class Command(BaseCommand):
     ]
 
     @transaction.atomic # Garante que a operação seja "tudo ou nada"
+    @adiar_incremento() # Um único incremento na versão dos dados
     def handle(self, *args, **options):
         self.stdout.write(self.style.WARNING('--- Iniciando a padronização das Calhas de Rios ---'))
 
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 08:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('localidades', '0002_versaodados'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='localidade',
+            name='hash_conteudo',
+            field=models.CharField(blank=True, default='', editable=False, max_length=32, verbose_name='Hash do Conteúdo'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.4 on 2026-10-18 08:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def preencher_resumo(apps, schema_editor):
+    # Totais iniciais a partir das localidades já gravadas; depois disso a
+    # tabela é mantida por localidades.resumo.
+    Localidade = apps.get_model('localidades', 'Localidade')
+    ResumoLocalidades = apps.get_model('localidades', 'ResumoLocalidades')
+    colunas = ('calha_rio_id', 'municipio', 'fonte_dados', 'tipo_comunidade')
+    totais = (
+        Localidade.objects.order_by().values(*colunas)
+        .annotate(quantidade=models.Count('id'), soma_domicilios=models.Sum('domicilios'), soma_ligacoes=models.Sum('total_ligacoes'))
+    )
+    ResumoLocalidades.objects.bulk_create([
+        ResumoLocalidades(
+            **{coluna: linha[coluna] for coluna in colunas},
+            quantidade=linha['quantidade'],
+            domicilios=linha['soma_domicilios'] or 0,
+            total_ligacoes=linha['soma_ligacoes'] or 0,
+        )
+        for linha in totais
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('localidades', '0003_localidade_hash_conteudo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumoLocalidades',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('municipio', models.CharField(max_length=100, verbose_name='Município')),
+                ('fonte_dados', models.CharField(choices=[('3ª Tranche', 'Tranche'), ('Convencional', 'Convencional')], max_length=20, verbose_name='Fonte dos Dados')),
+                ('tipo_comunidade', models.CharField(blank=True, max_length=100, null=True, verbose_name='Tipo de Comunidade')),
+                ('quantidade', models.PositiveIntegerField(default=0, verbose_name='Localidades')),
+                ('domicilios', models.BigIntegerField(default=0, verbose_name='Domicílios/UCs')),
+                ('total_ligacoes', models.BigIntegerField(default=0, verbose_name='Total de Ligações')),
+                ('calha_rio', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='localidades.calhario', verbose_name='Calha de Rio')),
+            ],
+            options={
+                'verbose_name': 'Resumo de Localidades',
+                'verbose_name_plural': 'Resumos de Localidades',
+            },
+        ),
+        migrations.RunPython(preencher_resumo, migrations.RunPython.noop),
+    ]
@@ -77,6 +77,10 @@ class Localidade(models.Model):
         choices=FonteDados.choices
     )
 
+    # Hash dos campos importados da planilha. A importação incremental
+    # compara com o hash da linha nova para saber se a localidade mudou.
+    hash_conteudo = models.CharField("Hash do Conteúdo", max_length=32, blank=True, default='', editable=False)
+
     def __str__(self):
         """Representação em texto do objeto, útil no admin do Django."""
         return f"{self.nome_comunidade} ({self.municipio}) - {self.fonte_dados}"
@@ -85,4 +89,59 @@ class Localidade(models.Model):
         verbose_name = "Localidade"
         verbose_name_plural = "Localidades"
         # Garante que não teremos localidades duplicadas da mesma fonte.
-        unique_together = ('nome_comunidade', 'municipio', 'fonte_dados')
\ No newline at end of file
+        unique_together = ('nome_comunidade', 'municipio', 'fonte_dados')
+
+# Modelo de controle com uma única linha que guarda a versão atual dos dados.
+# Toda alteração em Localidade/CalhaRio incrementa o contador, o que permite
+# que os caches em memória saibam quando precisam ser reconstruídos.
+class VersaoDados(models.Model):
+    """Contador monotônico da versão do conjunto de localidades."""
+
+    # Número da versão, incrementado a cada alteração nos dados.
+    versao = models.PositiveBigIntegerField("Versão", default=0)
+
+    # Identificador aleatório gerado junto com a linha. Se o banco for recriado
+    # o contador volta a zero, mas a época muda, evitando colisões de versão.
+    epoca = models.CharField("Época", max_length=16)
+
+    atualizado_em = models.DateTimeField("Atualizado em", auto_now=True)
+
+    def __str__(self):
+        return f"{self.epoca}-{self.versao}"
+
+    class Meta:
+        verbose_name = "Versão dos Dados"
+        verbose_name_plural = "Versões dos Dados"
+
+
+# Tabela de resumo (materializada) com os totais por combinação de calha,
+# município, fonte e tipo de comunidade. É mantida pelo módulo `resumo`:
+# os sinais e os comandos de importação recalculam só os grupos afetados, e
+# /api/estatisticas/ agrega estas poucas centenas de linhas em vez de
+# varrer as localidades.
+class ResumoLocalidades(models.Model):
+    """Totais das localidades de um grupo (calha, município, fonte, tipo)."""
+
+    calha_rio = models.ForeignKey(
+        CalhaRio,
+        verbose_name="Calha de Rio",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='+',
+    )
+    municipio = models.CharField("Município", max_length=100)
+    fonte_dados = models.CharField("Fonte dos Dados", max_length=20, choices=Localidade.FonteDados.choices)
+    tipo_comunidade = models.CharField("Tipo de Comunidade", max_length=100, null=True, blank=True)
+
+    # Número de localidades do grupo e somas (nulos contam como zero).
+    quantidade = models.PositiveIntegerField("Localidades", default=0)
+    domicilios = models.BigIntegerField("Domicílios/UCs", default=0)
+    total_ligacoes = models.BigIntegerField("Total de Ligações", default=0)
+
+    def __str__(self):
+        return f"{self.municipio} / {self.fonte_dados} / {self.tipo_comunidade or '-'}: {self.quantidade}"
+
+    class Meta:
+        verbose_name = "Resumo de Localidades"
+        verbose_name_plural = "Resumos de Localidades"
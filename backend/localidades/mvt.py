@@ -0,0 +1,126 @@
+# backend/localidades/mvt.py
+#
+# Codificador mínimo de Mapbox Vector Tiles (especificação 2.1) para camadas
+# de pontos. Evita uma dependência externa: o formato é um protobuf simples
+# e só precisamos escrever geometrias do tipo POINT.
+
+import math
+import struct
+
+EXTENT = 4096
+
+_VARINT = 0
+_FIXED64 = 1
+_LENGTH = 2
+
+
+def _varint(valor):
+    saida = bytearray()
+    while True:
+        byte = valor & 0x7F
+        valor >>= 7
+        if valor:
+            saida.append(byte | 0x80)
+        else:
+            saida.append(byte)
+            return bytes(saida)
+
+
+def _chave(campo, tipo):
+    return _varint((campo << 3) | tipo)
+
+
+def _campo_varint(campo, valor):
+    return _chave(campo, _VARINT) + _varint(valor)
+
+
+def _campo_bytes(campo, valor):
+    return _chave(campo, _LENGTH) + _varint(len(valor)) + valor
+
+
+def _zigzag(valor):
+    return (valor << 1) ^ (valor >> 63)
+
+
+def _packed(campo, valores):
+    return _campo_bytes(campo, b''.join(_varint(v) for v in valores))
+
+
+def _valor(valor):
+    """Codifica uma mensagem `Value` do MVT."""
+    if isinstance(valor, bool):
+        return _campo_varint(7, int(valor))
+    if isinstance(valor, int):
+        return _campo_varint(6, _zigzag(valor))  # sint_value
+    if isinstance(valor, float):
+        return _chave(3, _FIXED64) + struct.pack('<d', valor)  # double_value
+    return _campo_bytes(1, str(valor).encode('utf-8'))  # string_value
+
+
+def limites_tile(z, x, y):
+    """Retorna (oeste, sul, leste, norte) em graus do tile z/x/y."""
+    n = 2 ** z
+
+    def lat(linha):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * linha / n))))
+
+    return x / n * 360.0 - 180.0, lat(y + 1), (x + 1) / n * 360.0 - 180.0, lat(y)
+
+
+def posicao_no_tile(z, x, y, latitude, longitude):
+    """Converte lat/lon para coordenadas inteiras dentro do tile (0..EXTENT)."""
+    n = 2 ** z
+    lat = math.radians(max(min(latitude, 85.05112878), -85.05112878))
+    mx = (longitude + 180.0) / 360.0 * n
+    my = (1.0 - math.log(math.tan(lat) + 1.0 / math.cos(lat)) / math.pi) / 2.0 * n
+    return int(round((mx - x) * EXTENT)), int(round((my - y) * EXTENT))
+
+
+def codificar_tile(nome_camada, pontos):
+    """
+    Gera os bytes de um tile com uma camada de pontos.
+
+    `pontos` é uma sequência de tuplas (id, px, py, propriedades), onde px/py
+    já estão nas coordenadas do tile e `propriedades` é um dicionário. Valores
+    nulos são omitidos, como manda a especificação.
+    """
+    chaves, indice_chaves = [], {}
+    valores, indice_valores = [], {}
+    features = []
+
+    for id_, px, py, propriedades in pontos:
+        tags = []
+        for chave, valor in propriedades.items():
+            if valor is None:
+                continue
+            if chave not in indice_chaves:
+                indice_chaves[chave] = len(chaves)
+                chaves.append(chave)
+            # O tipo entra na chave para que 1 e 1.0 não se confundam.
+            chave_valor = (type(valor), valor)
+            if chave_valor not in indice_valores:
+                indice_valores[chave_valor] = len(valores)
+                valores.append(valor)
+            tags += [indice_chaves[chave], indice_valores[chave_valor]]
+
+        # MoveTo(1) seguido do deslocamento em zigzag a partir de (0, 0).
+        geometria = [(1 & 0x7) | (1 << 3), _zigzag(px), _zigzag(py)]
+        features.append(
+            _campo_varint(1, id_)
+            + _packed(2, tags)
+            + _campo_varint(3, 1)  # GeomType.POINT
+            + _packed(4, geometria)
+        )
+
+    if not features:
+        return b''
+
+    camada = (
+        _campo_varint(15, 2)
+        + _campo_bytes(1, nome_camada.encode('utf-8'))
+        + b''.join(_campo_bytes(2, f) for f in features)
+        + b''.join(_campo_bytes(3, c.encode('utf-8')) for c in chaves)
+        + b''.join(_campo_bytes(4, _valor(v)) for v in valores)
+        + _campo_varint(5, EXTENT)
+    )
+    return _campo_bytes(3, camada)
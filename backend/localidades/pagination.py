@@ -0,0 +1,24 @@
+# backend/localidades/pagination.py
+
+from rest_framework.pagination import CursorPagination
+
+
+class LocalidadeCursorPagination(CursorPagination):
+    """
+    Paginação por cursor (keyset) ordenada por `id`.
+
+    Cada página é buscada com `WHERE id > <último id>`, então o custo é
+    proporcional ao tamanho da página em qualquer profundidade, ao contrário
+    de LIMIT/OFFSET. A paginação só é ativada quando o cliente envia `limit`
+    ou `cursor`; sem eles a lista completa continua sendo retornada.
+    """
+    ordering = 'id'
+    page_size = 1000
+    page_size_query_param = 'limit'
+    max_page_size = 5000
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if (self.cursor_query_param not in request.query_params
+                and self.page_size_query_param not in request.query_params):
+            return None
+        return super().paginate_queryset(queryset, request, view)
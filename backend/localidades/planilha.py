@@ -0,0 +1,109 @@
+# backend/localidades/planilha.py
+#
+# Leitura das planilhas em modo streaming. O openpyxl em modo read_only lê
+# o XML de cada aba linha a linha, sem montar a planilha inteira na memória
+# (como faz o pd.read_excel). As linhas saem em lotes de DataFrames com as
+# colunas do modelo, prontos para a limpeza de `importacao.limpar`, então a
+# memória usada depende do tamanho do lote e não do tamanho do arquivo.
+
+from contextlib import contextmanager
+
+import openpyxl
+import pandas as pd
+
+from .arquivos import hash_arquivo
+
+
+class AbaNaoEncontrada(Exception):
+    pass
+
+
+class Planilha:
+    """
+    Arquivo de planilha aberto sob demanda: a pasta de trabalho só é
+    carregada (uma vez) quando alguma aba precisa ser lida de fato, o que
+    permite pular o .xlsx inteiro quando todas as abas vêm do cache.
+    """
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._pasta = None
+        self._hash = None
+
+    @property
+    def hash(self):
+        """sha256 do conteúdo do arquivo."""
+        if self._hash is None:
+            self._hash = hash_arquivo(self.caminho)
+        return self._hash
+
+    @property
+    def pasta(self):
+        # Somente leitura e com os valores calculados das fórmulas.
+        if self._pasta is None:
+            self._pasta = openpyxl.load_workbook(self.caminho, read_only=True, data_only=True)
+        return self._pasta
+
+    def fechar(self):
+        if self._pasta is not None:
+            self._pasta.close()
+            self._pasta = None
+
+
+@contextmanager
+def abrir(caminho):
+    planilha = Planilha(caminho)
+    try:
+        yield planilha
+    finally:
+        planilha.fechar()
+
+
+def _posicoes(colunas, cabecalho):
+    """Posição de cada campo na linha: direto quando a coluna é um número,
+    pelo nome (primeira ocorrência no cabeçalho) quando é texto."""
+    nomes = {}
+    for posicao, nome in enumerate(cabecalho or ()):
+        nomes.setdefault(str(nome).strip() if nome is not None else None, posicao)
+    return {campo: coluna if isinstance(coluna, int) else nomes.get(coluna) for campo, coluna in colunas.items()}
+
+
+def ler_lotes(planilha, especificacao, tamanho_lote):
+    """
+    Gera DataFrames de até `tamanho_lote` linhas (todas, se None) da aba
+    descrita por `especificacao` (veja `importacao.ABAS`), com as colunas do
+    modelo, `fonte_dados` e `linha` (número da linha na planilha). Colunas
+    que não existirem na aba ficam vazias.
+    """
+    if especificacao['aba'] not in planilha.pasta.sheetnames:
+        raise AbaNaoEncontrada(f"aba '{especificacao['aba']}' não encontrada")
+    aba = planilha.pasta[especificacao['aba']]
+    # O tamanho gravado no arquivo nem sempre está certo; sem ele o openpyxl
+    # lê até a última linha de verdade.
+    aba.reset_dimensions()
+    primeira_linha = especificacao['primeira_linha']
+    cabecalho = None
+    if especificacao['cabecalho'] is not None:
+        cabecalho = next(aba.iter_rows(
+            min_row=especificacao['cabecalho'], max_row=especificacao['cabecalho'], values_only=True
+        ), ())
+    posicoes = _posicoes(especificacao['colunas'], cabecalho)
+    campos = list(posicoes)
+
+    def montar(valores, inicio):
+        df = pd.DataFrame.from_records(valores, columns=campos)
+        df['fonte_dados'] = especificacao['fonte_dados']
+        df['linha'] = range(inicio, inicio + len(df))
+        return df
+
+    lote, inicio = [], primeira_linha
+    for numero, linha in enumerate(aba.iter_rows(min_row=primeira_linha, values_only=True), start=primeira_linha):
+        lote.append(tuple(
+            linha[posicao] if posicao is not None and posicao < len(linha) else None
+            for posicao in posicoes.values()
+        ))
+        if tamanho_lote and len(lote) == tamanho_lote:
+            yield montar(lote, inicio)
+            lote, inicio = [], numero + 1
+    if lote:
+        yield montar(lote, inicio)
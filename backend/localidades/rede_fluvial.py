@@ -0,0 +1,427 @@
+# backend/localidades/rede_fluvial.py
+#
+# Roteamento pela rede de rios. A rede vem de um arquivo local (GeoJSON com
+# LineString/MultiLineString ou, com o pacote opcional `pyshp`, shapefile) e
+# é preparada uma vez pelo comando `preparar_rede_fluvial`:
+#
+#   1. os vértices das linhas viram nós (coordenadas arredondadas, para que
+#      rios que se encontram no mesmo ponto compartilhem o nó) e cada par de
+#      vértices consecutivos vira uma aresta com o comprimento em km;
+#   2. cada localidade é encaixada no nó mais próximo (KD-tree); as
+#      coordenadas usadas no encaixe ficam guardadas, e uma localidade que
+#      mudou de lugar depois da preparação é encaixada de novo na consulta;
+#   3. os trechos sem bifurcação (nós de grau 2 sem localidade) são
+#      contraídos em uma única aresta, que guarda a geometria original. O
+#      grafo que sobra é muito menor e é nele que rodam Dijkstra/A*;
+#   4. para cada calha, as distâncias entre todos os pares de nós das suas
+#      localidades são pré-calculadas.
+#
+# O resultado fica em um arquivo .npz, carregado sob demanda pelos processos
+# do servidor e recarregado quando o arquivo muda.
+
+import heapq
+import json
+import os
+import threading
+
+import numpy as np
+
+from .geo import haversine_km
+from .kdtree import ArvoreKD
+
+try:
+    import shapefile
+except ImportError:  # pyshp é opcional; sem ele só GeoJSON é aceito.
+    shapefile = None
+
+
+class RedeFluvialIndisponivel(Exception):
+    """A rede fluvial não foi configurada ou ainda não foi preparada."""
+
+
+# --- Leitura do arquivo da rede ---
+
+def _linhas_geojson(geometria):
+    tipo = geometria.get('type') if geometria else None
+    if tipo == 'LineString':
+        yield geometria['coordinates']
+    elif tipo == 'MultiLineString':
+        yield from geometria['coordinates']
+    elif tipo == 'GeometryCollection':
+        for parte in geometria['geometries']:
+            yield from _linhas_geojson(parte)
+
+
+def ler_linhas(caminho):
+    """
+    Lê as linhas da rede. Retorna uma lista de arrays (k, 2) com
+    [latitude, longitude] de cada vértice.
+    """
+    caminho = str(caminho)
+    if caminho.lower().endswith('.shp'):
+        if shapefile is None:
+            raise RedeFluvialIndisponivel(
+                'Leitura de shapefile requer o pacote "pyshp". Instale-o ou converta a rede para GeoJSON.'
+            )
+        brutas = []
+        with shapefile.Reader(caminho) as leitor:
+            for forma in leitor.iterShapes():
+                limites = list(forma.parts) + [len(forma.points)]
+                brutas += [forma.points[inicio:fim] for inicio, fim in zip(limites, limites[1:])]
+    else:
+        with open(caminho, encoding='utf-8') as arquivo:
+            dados = json.load(arquivo)
+        if dados.get('type') == 'FeatureCollection':
+            geometrias = [feature.get('geometry') for feature in dados['features']]
+        elif dados.get('type') == 'Feature':
+            geometrias = [dados.get('geometry')]
+        else:
+            geometrias = [dados]
+        brutas = [linha for geometria in geometrias for linha in _linhas_geojson(geometria)]
+
+    # GeoJSON e shapefile usam (longitude, latitude).
+    return [np.asarray(linha, dtype=np.float64)[:, 1::-1] for linha in brutas if len(linha) >= 2]
+
+
+# --- Construção do grafo ---
+
+def construir_grafo(linhas, casas_decimais):
+    """
+    Une os vértices de todas as linhas em nós e cria as arestas entre
+    vértices consecutivos. Retorna (latitudes, longitudes, origem, destino,
+    peso_km), com uma única aresta (a mais curta) por par de nós.
+    """
+    if not linhas:
+        vazio = np.empty(0, dtype=np.int64)
+        return np.empty(0), np.empty(0), vazio, vazio, np.empty(0)
+    vertices = np.concatenate(linhas)
+    chaves = np.round(vertices, casas_decimais)
+    chaves, inverso = np.unique(chaves, axis=0, return_inverse=True)
+    inverso = inverso.reshape(-1)
+
+    # Vértices consecutivos da mesma linha (não atravessa a fronteira entre linhas).
+    fim_de_linha = np.cumsum([len(linha) for linha in linhas]) - 1
+    consecutivos = np.ones(len(vertices) - 1, dtype=bool)
+    consecutivos[fim_de_linha[:-1]] = False
+    a = np.flatnonzero(consecutivos)
+    origem, destino = inverso[a], inverso[a + 1]
+    peso = haversine_km(vertices[a, 0], vertices[a, 1], vertices[a + 1, 0], vertices[a + 1, 1])
+
+    validas = origem != destino
+    origem, destino, peso = origem[validas], destino[validas], peso[validas]
+    menor, maior = np.minimum(origem, destino), np.maximum(origem, destino)
+    ordem = np.lexsort((peso, maior, menor))
+    menor, maior, peso = menor[ordem], maior[ordem], peso[ordem]
+    primeira = np.ones(len(menor), dtype=bool)
+    primeira[1:] = (menor[1:] != menor[:-1]) | (maior[1:] != maior[:-1])
+    return chaves[:, 0], chaves[:, 1], menor[primeira], maior[primeira], peso[primeira]
+
+
+def contrair(quantidade_nos, origem, destino, peso, manter):
+    """
+    Contrai os caminhos formados por nós de grau 2 que não estão em `manter`.
+
+    Retorna (nos_mantidos, arestas_u, arestas_v, pesos, offsets, intermediarios),
+    com as arestas em índices do grafo contraído e, para cada uma, os nós
+    originais percorridos de u até v (sem as pontas) em
+    intermediarios[offsets[i]:offsets[i + 1]].
+    """
+    adjacencia = [[] for _ in range(quantidade_nos)]
+    for u, v, w in zip(origem.tolist(), destino.tolist(), peso.tolist()):
+        adjacencia[u].append((v, w))
+        adjacencia[v].append((u, w))
+    grau = np.bincount(np.concatenate((origem, destino)), minlength=quantidade_nos)
+    manter = np.asarray(manter, dtype=bool) | (grau != 2)
+
+    arestas = {}
+    percorridos = np.zeros(quantidade_nos, dtype=bool)
+
+    def caminhar(inicio):
+        for vizinho, w in adjacencia[inicio]:
+            anterior, atual, total, caminho = inicio, vizinho, w, []
+            while not manter[atual]:
+                percorridos[atual] = True
+                caminho.append(atual)
+                # Nó de grau 2: segue pelo vizinho que não é o anterior.
+                (a, wa), (b, wb) = adjacencia[atual]
+                anterior, atual, total = (atual, b, total + wb) if a == anterior else (atual, a, total + wa)
+            chave = (min(inicio, atual), max(inicio, atual))
+            if chave[0] == chave[1]:
+                continue
+            if inicio > atual:
+                caminho.reverse()
+            if chave not in arestas or total < arestas[chave][0]:
+                arestas[chave] = (total, caminho)
+
+    for no in np.flatnonzero(manter).tolist():
+        caminhar(no)
+    # Ciclos isolados só de nós de grau 2: mantém um nó de cada um.
+    for no in np.flatnonzero(~manter & ~percorridos).tolist():
+        if not percorridos[no]:
+            manter[no] = True
+            caminhar(no)
+
+    nos_mantidos = np.flatnonzero(manter)
+    indice = np.full(quantidade_nos, -1, dtype=np.int64)
+    indice[nos_mantidos] = np.arange(len(nos_mantidos))
+    chaves = sorted(arestas)
+    caminhos = [arestas[chave][1] for chave in chaves]
+    offsets = np.zeros(len(chaves) + 1, dtype=np.int64)
+    np.cumsum([len(caminho) for caminho in caminhos], out=offsets[1:])
+    return (
+        nos_mantidos,
+        indice[[u for u, _ in chaves]] if chaves else np.empty(0, dtype=np.int64),
+        indice[[v for _, v in chaves]] if chaves else np.empty(0, dtype=np.int64),
+        np.array([arestas[chave][0] for chave in chaves], dtype=np.float64),
+        offsets,
+        np.array([no for caminho in caminhos for no in caminho], dtype=np.int64),
+    )
+
+
+# --- Consultas ---
+
+class RedeFluvial:
+    """Grafo contraído da rede fluvial com as localidades encaixadas."""
+
+    def __init__(self, dados):
+        self.meta = json.loads(str(dados['meta']))
+        self.latitudes = dados['nos_lat']
+        self.longitudes = dados['nos_lon']
+        self.nos = dados['contraido_nos']
+        self.arestas_u = dados['arestas_u']
+        self.arestas_v = dados['arestas_v']
+        self.pesos = dados['arestas_peso']
+        self.offsets = dados['geometria_offsets']
+        self.intermediarios = dados['geometria_nos']
+        self.encaixe = {
+            int(id_localidade): (int(no), float(distancia), float(latitude), float(longitude))
+            for id_localidade, no, distancia, latitude, longitude in zip(
+                dados['localidades_ids'], dados['localidades_no'], dados['localidades_encaixe_km'],
+                dados['localidades_lat'], dados['localidades_lon'],
+            )
+        }
+        self.calhas = {}
+        for chave in list(dados.keys()):
+            if chave.startswith('calha_') and chave.endswith('_nos'):
+                id_calha = int(chave[len('calha_'):-len('_nos')])
+                nos = dados[chave]
+                self.calhas[id_calha] = ({int(no): i for i, no in enumerate(nos)}, dados[f'calha_{id_calha}_dist'])
+
+        self.adjacencia = [[] for _ in range(len(self.nos))]
+        for aresta, (u, v, w) in enumerate(zip(self.arestas_u.tolist(), self.arestas_v.tolist(), self.pesos.tolist())):
+            self.adjacencia[u].append((v, w, aresta))
+            self.adjacencia[v].append((u, w, aresta))
+        self.latitudes_nos = self.latitudes[self.nos]
+        self.longitudes_nos = self.longitudes[self.nos]
+        self._arvore = None
+        self._trava = threading.Lock()
+
+    def coordenadas(self, no):
+        return float(self.latitudes_nos[no]), float(self.longitudes_nos[no])
+
+    def encaixar(self, id_localidade, latitude, longitude, max_km):
+        """
+        Nó da rede (índice contraído) e distância de encaixe da localidade.
+        Localidades criadas ou movidas depois da preparação são encaixadas na
+        hora, no nó mantido mais próximo. Retorna None se a rede estiver
+        longe demais.
+        """
+        encaixe = self.encaixe.get(id_localidade)
+        if encaixe is not None and encaixe[2:] == (latitude, longitude):
+            no, distancia = encaixe[:2]
+        else:
+            with self._trava:
+                if self._arvore is None:
+                    self._arvore = ArvoreKD(np.arange(len(self.nos)), self.latitudes_nos, self.longitudes_nos)
+            nos, distancias = self._arvore.vizinhos(latitude, longitude, 1)
+            if not len(nos):
+                return None
+            no, distancia = int(nos[0]), float(distancias[0])
+        if no < 0 or distancia > max_km:
+            return None
+        return no, distancia
+
+    def distancia_pre_calculada(self, id_calha, origem, destino):
+        if id_calha not in self.calhas:
+            return None
+        posicoes, matriz = self.calhas[id_calha]
+        if origem in posicoes and destino in posicoes:
+            return float(matriz[posicoes[origem], posicoes[destino]])
+        return None
+
+    def dijkstra(self, origem, destinos):
+        """Distâncias de `origem` até cada nó de `destinos` (inf se inalcançável)."""
+        faltando = set(destinos)
+        distancias = {origem: 0.0}
+        fila = [(0.0, origem)]
+        resolvidos = {}
+        while fila and faltando:
+            distancia, no = heapq.heappop(fila)
+            if no in resolvidos:
+                continue
+            resolvidos[no] = distancia
+            faltando.discard(no)
+            for vizinho, w, _ in self.adjacencia[no]:
+                nova = distancia + w
+                if nova < distancias.get(vizinho, float('inf')):
+                    distancias[vizinho] = nova
+                    heapq.heappush(fila, (nova, vizinho))
+        return [resolvidos.get(no, float('inf')) for no in destinos]
+
+    def a_estrela(self, origem, destino):
+        """
+        Menor caminho de `origem` a `destino` com A* (heurística: distância em
+        linha reta, que nunca supera a distância pelo rio). Retorna
+        (distancia_km, lista de (aresta, sentido_direto)) ou None.
+        """
+        lat_destino, lon_destino = self.coordenadas(destino)
+        h = haversine_km(self.latitudes_nos, self.longitudes_nos, lat_destino, lon_destino).tolist()
+
+        distancias = {origem: 0.0}
+        chegada = {}
+        fila = [(h[origem], 0.0, origem)]
+        fechados = set()
+        while fila:
+            _, distancia, no = heapq.heappop(fila)
+            if no == destino:
+                caminho = []
+                while no != origem:
+                    anterior, aresta = chegada[no]
+                    caminho.append((aresta, int(self.arestas_u[aresta]) == anterior))
+                    no = anterior
+                return distancia, caminho[::-1]
+            if no in fechados:
+                continue
+            fechados.add(no)
+            for vizinho, w, aresta in self.adjacencia[no]:
+                nova = distancia + w
+                if nova < distancias.get(vizinho, float('inf')):
+                    distancias[vizinho] = nova
+                    chegada[vizinho] = (no, aresta)
+                    heapq.heappush(fila, (nova + h[vizinho], nova, vizinho))
+        return None
+
+    def geometria(self, origem, caminho):
+        """Lista de [latitude, longitude] ao longo do caminho retornado por `a_estrela`."""
+        pontos = [list(self.coordenadas(origem))]
+        for aresta, direto in caminho:
+            intermediarios = self.intermediarios[self.offsets[aresta]:self.offsets[aresta + 1]]
+            if not direto:
+                intermediarios = intermediarios[::-1]
+            fim = self.arestas_v[aresta] if direto else self.arestas_u[aresta]
+            pontos += [[float(self.latitudes[no]), float(self.longitudes[no])] for no in intermediarios]
+            pontos.append(list(self.coordenadas(int(fim))))
+        return pontos
+
+
+# --- Preparação e carga do arquivo pré-processado ---
+
+def preparar(caminho_rede, localidades, casas_decimais, max_encaixe_km, meta=None):
+    """
+    Monta todos os arrays do arquivo pré-processado. `localidades` é uma
+    sequência de tuplas (id, latitude, longitude, calha_id). Retorna
+    (arrays, resumo).
+    """
+    linhas = ler_linhas(caminho_rede)
+    latitudes, longitudes, origem, destino, peso = construir_grafo(linhas, casas_decimais)
+    if not len(latitudes):
+        raise RedeFluvialIndisponivel(f'Nenhuma linha encontrada em {caminho_rede}.')
+
+    ids = np.array([linha[0] for linha in localidades], dtype=np.int64)
+    lat_loc = np.array([linha[1] for linha in localidades], dtype=np.float64)
+    lon_loc = np.array([linha[2] for linha in localidades], dtype=np.float64)
+    calhas = [linha[3] for linha in localidades]
+
+    # Encaixe de cada localidade no nó mais próximo.
+    arvore = ArvoreKD(np.arange(len(latitudes)), latitudes, longitudes)
+    nos_originais = np.full(len(ids), -1, dtype=np.int64)
+    encaixe_km = np.full(len(ids), np.inf)
+    for i, (lat, lon) in enumerate(zip(lat_loc.tolist(), lon_loc.tolist())):
+        nos, distancias = arvore.vizinhos(lat, lon, 1)
+        if len(nos) and distancias[0] <= max_encaixe_km:
+            nos_originais[i], encaixe_km[i] = nos[0], distancias[0]
+
+    manter = np.zeros(len(latitudes), dtype=bool)
+    manter[nos_originais[nos_originais >= 0]] = True
+    nos, arestas_u, arestas_v, pesos, offsets, intermediarios = contrair(len(latitudes), origem, destino, peso, manter)
+    indice = np.full(len(latitudes), -1, dtype=np.int64)
+    indice[nos] = np.arange(len(nos))
+    nos_localidades = np.where(nos_originais >= 0, indice[np.maximum(nos_originais, 0)], -1)
+
+    arrays = {
+        'meta': np.array(json.dumps({
+            **(meta or {}),
+            'casas_decimais': casas_decimais,
+            'max_encaixe_km': max_encaixe_km,
+        })),
+        'nos_lat': latitudes,
+        'nos_lon': longitudes,
+        'contraido_nos': nos,
+        'arestas_u': arestas_u,
+        'arestas_v': arestas_v,
+        'arestas_peso': pesos,
+        'geometria_offsets': offsets,
+        'geometria_nos': intermediarios,
+        'localidades_ids': ids,
+        'localidades_no': nos_localidades,
+        'localidades_encaixe_km': encaixe_km,
+        'localidades_lat': lat_loc,
+        'localidades_lon': lon_loc,
+    }
+
+    # Distâncias entre todos os pares de nós de cada calha.
+    rede = RedeFluvial(arrays)
+    por_calha = {}
+    for no, calha in zip(nos_localidades.tolist(), calhas):
+        if no >= 0 and calha is not None:
+            por_calha.setdefault(calha, set()).add(no)
+    for calha, conjunto in por_calha.items():
+        nos_calha = np.array(sorted(conjunto), dtype=np.int64)
+        matriz = np.array([rede.dijkstra(no, nos_calha.tolist()) for no in nos_calha.tolist()], dtype=np.float32)
+        arrays[f'calha_{calha}_nos'] = nos_calha
+        arrays[f'calha_{calha}_dist'] = matriz
+
+    resumo = {
+        'nos': len(latitudes),
+        'arestas': len(origem),
+        'nos_contraidos': len(nos),
+        'arestas_contraidas': len(pesos),
+        'localidades_encaixadas': int((nos_localidades >= 0).sum()),
+        'localidades_fora_da_rede': int((nos_localidades < 0).sum()),
+        'calhas': len(por_calha),
+    }
+    return arrays, resumo
+
+
+def salvar(caminho, arrays):
+    """Grava o arquivo pré-processado de forma atômica."""
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    temporario = f'{caminho}.{os.getpid()}.tmp.npz'
+    np.savez(temporario, **arrays)
+    os.replace(temporario, caminho)
+
+
+_carregada = {'carimbo': None, 'rede': None}
+_trava_carga = threading.Lock()
+
+
+def obter_rede(caminho):
+    """Rede pré-processada, recarregada quando o arquivo em disco muda."""
+    try:
+        estado = os.stat(caminho)
+    except FileNotFoundError:
+        raise RedeFluvialIndisponivel(
+            'A rede fluvial ainda não foi preparada. Rode "python manage.py preparar_rede_fluvial".'
+        ) from None
+    carimbo = (str(caminho), estado.st_mtime_ns, estado.st_size)
+    with _trava_carga:
+        if _carregada['carimbo'] != carimbo:
+            with np.load(caminho, allow_pickle=False) as dados:
+                if 'localidades_lat' not in dados:
+                    raise RedeFluvialIndisponivel(
+                        'A rede fluvial foi preparada por uma versão anterior. '
+                        'Rode "python manage.py preparar_rede_fluvial" de novo.'
+                    )
+                _carregada['rede'] = RedeFluvial(dados)
+            _carregada['carimbo'] = carimbo
+        return _carregada['rede']
@@ -0,0 +1,38 @@
+# backend/localidades/renderers.py
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+
+class MVTRenderer(BaseRenderer):
+    """
+    Renderer para tiles vetoriais. Os bytes já chegam prontos da view; ele
+    existe para que clientes que pedem `application/vnd.mapbox-vector-tile`
+    não recebam 406 na negociação de conteúdo.
+    """
+    media_type = 'application/vnd.mapbox-vector-tile'
+    format = 'pbf'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, bytes):
+            return data
+        return b''
+
+
+class ColunarRenderer(BaseRenderer):
+    """
+    Formato binário colunar da lista de localidades (ver `colunar.py`).
+    Pode ser pedido com `Accept: application/vnd.geolocalizacao.colunar`
+    ou `?format=colunar`. A view entrega os bytes já codificados.
+    """
+    media_type = 'application/vnd.geolocalizacao.colunar'
+    format = 'colunar'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, bytes):
+            return data
+        # Respostas de erro (dicionários) seguem em JSON dentro do corpo binário.
+        return JSONRenderer().render(data)
@@ -0,0 +1,166 @@
+# backend/localidades/replica.py
+#
+# Réplica de leitura opcional (LOCALIDADES_REPLICA_MEMORIA): uma cópia do
+# banco num SQLite em memória compartilhado entre as threads do processo.
+# As leituras dos modelos de localidades vão para ela; escritas e a tabela
+# de versão continuam no banco principal.
+#
+# A cópia é feita com a API de backup do SQLite, numa thread separada, na
+# primeira requisição e sempre que a versão dos dados muda (inclusive por
+# uma importação rodando em outro processo). Enquanto a réplica não está na
+# versão atual, as leituras voltam para o banco principal: nenhuma resposta
+# sai de dados desatualizados, e nenhuma requisição espera a cópia.
+
+import logging
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.dispatch import receiver
+
+from .models import VersaoDados
+from .versao import versao_alterada, versao_atual
+
+logger = logging.getLogger(__name__)
+
+ALIAS = 'replica'
+# Tentativas de cópia enquanto leituras ainda em andamento travam a réplica.
+TENTATIVAS = 50
+
+_lock = threading.Lock()
+# Conexão que mantém o banco em memória vivo (ele some quando a última fecha).
+_guardia = None
+# Versão dos dados copiada para a réplica; None = indisponível.
+_versao = None
+_atualizando = False
+# Muda a cada invalidação. Uma cópia só é publicada se nenhuma invalidação
+# aconteceu desde que ela começou: uma escrita deste processo ainda não
+# confirmada não aparece na cópia, mesmo que a versão lida bata.
+_geracao = 0
+
+
+def habilitada():
+    return ALIAS in settings.DATABASES
+
+
+def disponivel():
+    return _versao is not None
+
+
+def _ler_versao(conexao):
+    linha = conexao.execute(f'SELECT epoca, versao FROM {VersaoDados._meta.db_table} WHERE id = 1').fetchone()
+    return f'{linha[0]}-{linha[1]}' if linha else None
+
+
+def atualizar():
+    """
+    Copia o banco principal para a réplica e a marca com a versão copiada.
+    Se a versão mudou durante a cópia, copia de novo; se a réplica foi
+    invalidada durante a cópia, ela não é publicada.
+    """
+    global _guardia, _versao, _atualizando
+    # Novas leituras vão para o banco principal enquanto a cópia é feita.
+    with _lock:
+        _versao = None
+        geracao = _geracao
+    try:
+        # uri=True, como nas conexões do Django (NAME pode ser "file:...").
+        origem = sqlite3.connect(settings.DATABASES[DEFAULT_DB_ALIAS]['NAME'], uri=True)
+        try:
+            if _guardia is None:
+                _guardia = sqlite3.connect(settings.DATABASES[ALIAS]['NAME'], uri=True, check_same_thread=False)
+            while True:
+                _copiar(origem)
+                copiada = _ler_versao(_guardia)
+                if copiada == _ler_versao(origem):
+                    break
+        finally:
+            origem.close()
+        with _lock:
+            if _geracao == geracao:
+                _versao = copiada
+    except sqlite3.Error:
+        logger.exception('Não foi possível atualizar a réplica em memória.')
+    finally:
+        with _lock:
+            _atualizando = False
+
+
+def _copiar(origem):
+    # Com o cache compartilhado, uma leitura ainda em andamento na réplica
+    # faz o backup falhar na hora ("table is locked") em vez de esperar.
+    for tentativa in range(TENTATIVAS):
+        try:
+            origem.backup(_guardia)
+            return
+        except sqlite3.OperationalError as erro:
+            if 'locked' not in str(erro) or tentativa == TENTATIVAS - 1:
+                raise
+            time.sleep(0.01)
+
+
+@receiver(request_started)
+def verificar(**kwargs):
+    """No início de cada requisição: se a versão dos dados mudou, agenda a cópia."""
+    global _versao, _atualizando, _geracao
+    if not habilitada():
+        return
+    versao = versao_atual()
+    if versao == _versao:
+        return
+    with _lock:
+        if _versao == versao:
+            return
+        # Sem versão publicada, uma cópia em andamento confere a versão no fim.
+        if _versao is not None:
+            _versao = None
+            _geracao += 1
+        if _atualizando:
+            return
+        _atualizando = True
+    threading.Thread(target=atualizar, name='replica-localidades', daemon=True).start()
+
+
+@receiver(versao_alterada)
+def invalidar(sender=None, **kwargs):
+    # Alteração feita neste processo: as próximas leituras já vão para o
+    # principal, e uma cópia em andamento não é publicada.
+    global _versao, _geracao
+    with _lock:
+        _versao = None
+        _geracao += 1
+
+
+class RoteadorReplica:
+    """
+    Leituras dos modelos de `localidades` na réplica, quando ela está na
+    versão atual e não há uma transação aberta no banco principal (quem está
+    escrevendo precisa ler o que acabou de gravar).
+    """
+
+    def db_for_read(self, model, **hints):
+        if (
+            model._meta.app_label == 'localidades'
+            and model is not VersaoDados
+            and disponivel()
+            and not connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        # Sem isto, um objeto lido da réplica seria salvo nela.
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if {obj1._state.db, obj2._state.db} <= {DEFAULT_DB_ALIAS, ALIAS}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == ALIAS:
+            return False
+        return None
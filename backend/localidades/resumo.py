@@ -0,0 +1,146 @@
+# backend/localidades/resumo.py
+#
+# Manutenção da tabela ResumoLocalidades (totais por calha, município,
+# fonte e tipo de comunidade) e as consultas de /api/estatisticas/.
+#
+# Quem altera localidades marca os grupos afetados (`marcar`) ou a tabela
+# inteira (`marcar_tudo`, usado pelas gravações em lote, que não enviam
+# sinais). Os grupos marcados são recalculados quando a versão dos dados é
+# incrementada: na hora, para um save() isolado, ou uma vez só no fim de um
+# bloco `adiar_incremento()`, como nas importações.
+
+import threading
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.dispatch import receiver
+
+from .models import Localidade, ResumoLocalidades
+from .versao import versao_alterada
+
+# Campos que definem um grupo, na ordem das tuplas de `grupo_de`.
+DIMENSOES = ('calha_rio', 'municipio', 'fonte_dados', 'tipo_comunidade')
+_COLUNAS = ('calha_rio_id', 'municipio', 'fonte_dados', 'tipo_comunidade')
+
+# Acima disto, recalcular a tabela inteira sai mais barato que filtrar grupo a grupo.
+MAX_GRUPOS_PARCIAL = 200
+
+_TUDO = object()
+_pendentes = threading.local()
+
+
+def grupo_de(localidade):
+    """Tupla (calha_rio_id, municipio, fonte_dados, tipo_comunidade) de uma localidade."""
+    return tuple(getattr(localidade, coluna) for coluna in _COLUNAS)
+
+
+def grupo_gravado(pk):
+    """Grupo da localidade como está no banco (None se ela não existe)."""
+    return Localidade.objects.filter(pk=pk).values_list(*_COLUNAS).first()
+
+
+def marcar(grupos):
+    """Marca grupos para serem recalculados no próximo incremento de versão."""
+    atuais = getattr(_pendentes, 'grupos', None)
+    if atuais is _TUDO:
+        return
+    atuais = set() if atuais is None else atuais
+    atuais.update(grupos)
+    _pendentes.grupos = _TUDO if len(atuais) > MAX_GRUPOS_PARCIAL else atuais
+
+
+def marcar_tudo():
+    _pendentes.grupos = _TUDO
+
+
+@receiver(versao_alterada)
+def aplicar_pendentes(sender=None, **kwargs):
+    grupos = getattr(_pendentes, 'grupos', None)
+    _pendentes.grupos = None
+    if grupos is _TUDO:
+        recalcular()
+    elif grupos:
+        recalcular(grupos)
+
+
+def _filtro(grupos):
+    condicao = Q()
+    for grupo in grupos:
+        condicao |= Q(**{
+            f'{coluna}__isnull' if valor is None else coluna: True if valor is None else valor
+            for coluna, valor in zip(_COLUNAS, grupo)
+        })
+    return condicao
+
+
+def recalcular(grupos=None):
+    """
+    Refaz as linhas de resumo dos `grupos` (todos, se None) a partir das
+    localidades, numa transação. Grupos que ficaram vazios somem.
+    """
+    localidades = Localidade.objects.all()
+    resumos = ResumoLocalidades.objects.all()
+    if grupos is not None:
+        filtro = _filtro(grupos)
+        localidades, resumos = localidades.filter(filtro), resumos.filter(filtro)
+    totais = (
+        localidades.order_by().values(*_COLUNAS)
+        .annotate(
+            quantidade=Count('id'),
+            soma_domicilios=Coalesce(Sum('domicilios'), Value(0)),
+            soma_ligacoes=Coalesce(Sum('total_ligacoes'), Value(0)),
+        )
+    )
+    with transaction.atomic():
+        resumos.delete()
+        ResumoLocalidades.objects.bulk_create([
+            ResumoLocalidades(
+                **{coluna: linha[coluna] for coluna in _COLUNAS},
+                quantidade=linha['quantidade'],
+                domicilios=linha['soma_domicilios'],
+                total_ligacoes=linha['soma_ligacoes'],
+            )
+            for linha in totais
+        ])
+
+
+def estatisticas(agrupar_por, fonte_dados=None, calha_rio=None):
+    """
+    Totais (quantidade, domicilios, total_ligacoes) agrupados pelos campos
+    de `agrupar_por` (subconjunto de DIMENSOES; vazio = total geral), a
+    partir da tabela de resumo. A calha sai com id e nome.
+    """
+    resumos = ResumoLocalidades.objects.all()
+    if fonte_dados:
+        resumos = resumos.filter(fonte_dados__iexact=fonte_dados)
+    if calha_rio is not None:
+        resumos = resumos.filter(calha_rio_id=calha_rio)
+    colunas = []
+    for campo in agrupar_por:
+        colunas += ['calha_rio_id', 'calha_rio__nome'] if campo == 'calha_rio' else [campo]
+    linhas = (
+        resumos.values(*colunas)
+        .annotate(
+            localidades=Coalesce(Sum('quantidade'), Value(0)),
+            soma_domicilios=Coalesce(Sum('domicilios'), Value(0)),
+            soma_ligacoes=Coalesce(Sum('total_ligacoes'), Value(0)),
+        )
+        .order_by(*colunas)
+    )
+    if not colunas:
+        linhas = [resumos.aggregate(
+            localidades=Coalesce(Sum('quantidade'), Value(0)),
+            soma_domicilios=Coalesce(Sum('domicilios'), Value(0)),
+            soma_ligacoes=Coalesce(Sum('total_ligacoes'), Value(0)),
+        )]
+    renomear = {'calha_rio_id': 'calha_rio', 'calha_rio__nome': 'calha_rio_nome'}
+    return [
+        {
+            **{renomear.get(coluna, coluna): linha[coluna] for coluna in colunas},
+            'quantidade': linha['localidades'],
+            'domicilios': linha['soma_domicilios'],
+            'total_ligacoes': linha['soma_ligacoes'],
+        }
+        for linha in linhas
+    ]
@@ -0,0 +1,221 @@
+# backend/localidades/rotas.py
+#
+# Planejamento de visitas a várias localidades (problema do caixeiro
+# viajante) com heurísticas: construção pelo vizinho mais próximo seguida de
+# melhorias 2-opt e Or-opt até acabar o tempo disponível. Cada passo das
+# melhorias é vetorizado com NumPy sobre a matriz de distâncias, e só os nós
+# próximos de alguma mudança recente voltam a ser examinados ("don't look
+# bits"), o que faz as rodadas depois da primeira custarem pouco.
+
+import time
+
+import numpy as np
+
+from .geo import haversine_km
+from .kdtree import corda_para_km, para_vetores
+
+EPSILON = 1e-6
+
+# Quantos vizinhos mais próximos de cada nó o Or-opt considera como destino.
+VIZINHOS_CANDIDATOS = 12
+
+
+def matriz_com_inicio(inicio, latitudes, longitudes, max_celulas, retornar):
+    """
+    Matriz de distâncias (km, float32) com o ponto de partida no índice 0.
+
+    As distâncias de grande círculo saem do produto escalar entre vetores
+    unitários (uma multiplicação de matrizes), bem mais barato que a fórmula
+    de haversine célula a célula. Para rotas sem retorno é acrescentado um nó
+    fictício no fim, com distância zero para todos. Ele fica sempre na última
+    posição da rota, então o ciclo ... -> última parada -> fictício -> início
+    custa o mesmo que o caminho aberto.
+    """
+    vetores = para_vetores(np.concatenate(([inicio[0]], latitudes)), np.concatenate(([inicio[1]], longitudes)))
+    reais = len(vetores)
+    n = reais + (0 if retornar else 1)
+    matriz = np.zeros((n, n), dtype=np.float32)
+    linhas_por_bloco = max(1, max_celulas // reais)
+    for inicio_bloco in range(0, reais, linhas_por_bloco):
+        fim = min(inicio_bloco + linhas_por_bloco, reais)
+        produto = vetores[inicio_bloco:fim] @ vetores.T
+        corda = np.sqrt(np.clip(2 - 2 * produto, 0, 4))
+        matriz[inicio_bloco:fim, :reais] = corda_para_km(corda)
+    np.fill_diagonal(matriz, 0)
+    return matriz
+
+
+def vizinho_mais_proximo(matriz, retornar):
+    """Rota inicial: a partir do nó 0, sempre para o nó não visitado mais próximo."""
+    n = len(matriz)
+    # O nó fictício (rota aberta) não participa da construção; vai para o fim.
+    reais = n if retornar else n - 1
+    visitado = np.zeros(reais, dtype=bool)
+    rota = np.empty(n, dtype=np.int64)
+    atual = 0
+    for posicao in range(reais):
+        rota[posicao] = atual
+        visitado[atual] = True
+        if posicao == reais - 1:
+            break
+        distancias = np.where(visitado, np.inf, matriz[atual, :reais])
+        atual = int(np.argmin(distancias))
+    if not retornar:
+        rota[-1] = n - 1
+    return rota
+
+
+def listas_de_vizinhos(matriz, quantidade=VIZINHOS_CANDIDATOS, linhas_por_bloco=256):
+    """Para cada nó, os `quantidade` nós mais próximos (candidatos do Or-opt)."""
+    n = len(matriz)
+    quantidade = min(quantidade, n - 1)
+    vizinhos = np.empty((n, max(quantidade, 0)), dtype=np.int64)
+    if quantidade <= 0:
+        return vizinhos
+    for inicio in range(0, n, linhas_por_bloco):
+        bloco = matriz[inicio:inicio + linhas_por_bloco].copy()
+        bloco[np.arange(len(bloco)), np.arange(inicio, inicio + len(bloco))] = np.inf
+        vizinhos[inicio:inicio + len(bloco)] = np.argpartition(bloco, quantidade - 1, axis=1)[:, :quantidade]
+    return vizinhos
+
+
+def _arestas(matriz, rota):
+    proximos = np.roll(rota, -1)
+    return proximos, matriz[rota, proximos]
+
+
+def passo_2opt(matriz, rota, ativos, tocados, prazo, retornar):
+    """
+    Uma passada de 2-opt. Para cada aresta (a, b) com uma ponta ativa, testa
+    de uma vez a troca com todas as outras arestas (c, d) e aplica a melhor,
+    invertendo o trecho entre elas. O nó 0 e, em rotas abertas, o nó
+    fictício final nunca se movem. Retorna o número de melhorias aplicadas.
+    """
+    n = len(rota)
+    # Em rotas abertas a aresta fictício -> início (a última) não pode ser trocada.
+    total_arestas = n if retornar else n - 1
+    indices = np.arange(n)
+    proximos, arestas = _arestas(matriz, rota)
+    melhorias = 0
+    for i in range(total_arestas):
+        a, b = rota[i], proximos[i]
+        if not (ativos[a] or ativos[b]):
+            continue
+        if time.monotonic() > prazo:
+            break
+        ganho = matriz[a, rota] + matriz[b, proximos] - arestas[i] - arestas
+        # Arestas vizinhas (ou a própria) não formam uma troca válida.
+        proibidas = (np.abs(indices - i) <= 1) | (indices >= total_arestas)
+        if retornar:
+            proibidas |= np.abs(indices - i) == n - 1
+        ganho[proibidas] = np.inf
+        j = int(np.argmin(ganho))
+        if ganho[j] < -EPSILON:
+            c, d = rota[j], proximos[j]
+            inicio, fim = min(i, j) + 1, max(i, j)
+            rota[inicio:fim + 1] = rota[inicio:fim + 1][::-1].copy()
+            tocados[[a, b, c, d]] = True
+            proximos, arestas = _arestas(matriz, rota)
+            melhorias += 1
+    return melhorias
+
+
+def passo_oropt(matriz, rota, vizinhos, ativos, tocados, prazo, retornar, tamanhos=(1, 2, 3)):
+    """
+    Uma passada de Or-opt: move trechos de 1 a 3 nós (com algum nó ativo)
+    para junto de um dos vizinhos mais próximos das suas pontas, antes ou
+    depois dele, inclusive invertidos. O nó 0 e o nó fictício final nunca
+    saem do lugar. Retorna o número de melhorias.
+    """
+    n = len(rota)
+    limite = n if retornar else n - 1
+    posicao = np.empty(n, dtype=np.int64)
+    posicao[rota] = np.arange(n)
+    melhorias = 0
+    for tamanho in tamanhos:
+        i = 1
+        while i + tamanho <= limite:
+            if not ativos[rota[i:i + tamanho]].any():
+                i += 1
+                continue
+            if time.monotonic() > prazo:
+                return melhorias
+            trecho = rota[i:i + tamanho].copy()
+            anterior, proximo = rota[i - 1], rota[(i + tamanho) % n]
+            primeiro, ultimo = trecho[0], trecho[-1]
+            economia = matriz[anterior, primeiro] + matriz[ultimo, proximo] - matriz[anterior, proximo]
+
+            # Arestas candidatas (rota[k], rota[k + 1]): as que chegam ou saem
+            # de um vizinho próximo de uma das pontas do trecho. Arestas que
+            # tocam o próprio trecho não contam; em rotas abertas nada pode
+            # entrar entre o nó fictício e o início.
+            candidatos = posicao[np.concatenate((vizinhos[primeiro], vizinhos[ultimo]))]
+            k = np.concatenate((candidatos, candidatos - 1)) % n
+            validos = (k < i - 1) | (k >= i + tamanho)
+            if not retornar:
+                validos &= k != n - 1
+            k = k[validos]
+            if not len(k):
+                i += 1
+                continue
+            u, v = rota[k], rota[(k + 1) % n]
+            aresta = matriz[u, v]
+            custo_direto = matriz[u, primeiro] + matriz[ultimo, v] - aresta
+            custo_invertido = matriz[u, ultimo] + matriz[primeiro, v] - aresta
+            custo = np.minimum(custo_direto, custo_invertido)
+            melhor = int(np.argmin(custo))
+            if custo[melhor] < economia - EPSILON:
+                if custo_invertido[melhor] < custo_direto[melhor]:
+                    trecho = trecho[::-1]
+                destino = int(k[melhor])
+                if destino < i:
+                    partes = (rota[:destino + 1], trecho, rota[destino + 1:i], rota[i + tamanho:])
+                else:
+                    partes = (rota[:i], rota[i + tamanho:destino + 1], trecho, rota[destino + 1:])
+                rota[:] = np.concatenate(partes)
+                posicao[rota] = np.arange(n)
+                tocados[[anterior, proximo, u[melhor], v[melhor]]] = True
+                tocados[trecho] = True
+                melhorias += 1
+            else:
+                i += 1
+    return melhorias
+
+
+def planejar_visita(inicio, latitudes, longitudes, retornar=False, tempo_limite=0.8, max_celulas=2_000_000):
+    """
+    Ordem de visita para as localidades a partir do ponto `inicio` (lat, lon).
+
+    Retorna (ordem, distancias_trechos, estatisticas), onde `ordem` indexa
+    as listas de entrada e `distancias_trechos[i]` é a distância (km) do
+    trecho que chega à i-ésima parada. Com `retornar`, a volta ao ponto de
+    partida entra nas estatísticas (`distancia_retorno_km`).
+    """
+    prazo = time.monotonic() + tempo_limite
+    estatisticas = {'distancia_inicial_km': 0.0, 'melhorias_2opt': 0, 'melhorias_oropt': 0, 'rodadas': 0}
+    if len(latitudes) == 0:
+        return [], [], estatisticas
+
+    matriz = matriz_com_inicio(inicio, latitudes, longitudes, max_celulas, retornar)
+    rota = vizinho_mais_proximo(matriz, retornar)
+    estatisticas['distancia_inicial_km'] = round(float(matriz[rota, np.roll(rota, -1)].sum(dtype=np.float64)), 2)
+    vizinhos = listas_de_vizinhos(matriz)
+
+    ativos = np.ones(len(rota), dtype=bool)
+    while ativos.any() and time.monotonic() < prazo:
+        tocados = np.zeros(len(rota), dtype=bool)
+        estatisticas['melhorias_2opt'] += passo_2opt(matriz, rota, ativos, tocados, prazo, retornar)
+        estatisticas['melhorias_oropt'] += passo_oropt(matriz, rota, vizinhos, ativos, tocados, prazo, retornar)
+        estatisticas['rodadas'] += 1
+        ativos = tocados
+
+    if not retornar:
+        rota = rota[:-1]
+    ordem = rota[1:] - 1
+    # Os trechos da resposta usam a mesma fórmula de haversine do frontend.
+    latitudes = np.concatenate(([inicio[0]], latitudes))
+    longitudes = np.concatenate(([inicio[1]], longitudes))
+    trechos = haversine_km(latitudes[rota[:-1]], longitudes[rota[:-1]], latitudes[rota[1:]], longitudes[rota[1:]])
+    if retornar:
+        estatisticas['distancia_retorno_km'] = float(haversine_km(latitudes[rota[-1]], longitudes[rota[-1]], inicio[0], inicio[1]))
+    return ordem.tolist(), trechos.tolist(), estatisticas
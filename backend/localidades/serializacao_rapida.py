@@ -0,0 +1,62 @@
+# backend/localidades/serializacao_rapida.py
+#
+# Caminho rápido de leitura para listas grandes de localidades. Em vez de
+# instanciar um modelo por linha e passar pelos campos do DRF, lemos tuplas
+# com `values_list()` (com o nome da calha já unido por JOIN) e montamos os
+# dicionários direto, na mesma ordem de `LocalidadeSerializer.Meta.fields`.
+# A saída JSON é byte a byte igual à do JSONRenderer do DRF.
+
+import json
+
+try:
+    import orjson
+except ImportError:  # orjson é opcional; sem ele usamos o json da biblioteca padrão.
+    orjson = None
+
+from .serializers import LocalidadeSerializer
+
+# Campos de saída, na mesma ordem do serializer.
+CAMPOS = tuple(LocalidadeSerializer.Meta.fields)
+
+# Colunas lidas do banco: `calha_rio` vira o nome da calha (o que o
+# StringRelatedField produziria via CalhaRio.__str__).
+COLUNAS = tuple('calha_rio__nome' if campo == 'calha_rio' else campo for campo in CAMPOS)
+
+_POS_LAT = CAMPOS.index('latitude')
+_POS_LON = CAMPOS.index('longitude')
+
+
+def linhas(queryset):
+    """Retorna um queryset de tuplas com as colunas da lista rápida."""
+    return queryset.values_list(*COLUNAS)
+
+
+def para_dicionarios(tuplas):
+    return [dict(zip(CAMPOS, tupla)) for tupla in tuplas]
+
+
+def reordenar_valores(valores):
+    """Converte dicionários de `queryset.values(*COLUNAS)` para o formato de saída."""
+    return [{campo: valor[coluna] for campo, coluna in zip(CAMPOS, COLUNAS)} for valor in valores]
+
+
+def _float_compativel(valor):
+    # O orjson escreve floats muito pequenos/grandes sem notação científica
+    # (0.00001 em vez de 1e-05), diferente do repr() usado pelo json.
+    return valor is None or valor == 0 or 1e-4 <= abs(valor) < 1e16
+
+
+def renderizar(tuplas):
+    """Renderiza uma lista de tuplas como o array JSON que o DRF produziria."""
+    dados = para_dicionarios(tuplas)
+    if orjson is not None and all(
+        _float_compativel(t[_POS_LAT]) and _float_compativel(t[_POS_LON]) for t in tuplas
+    ):
+        conteudo = orjson.dumps(dados)
+    else:
+        conteudo = json.dumps(dados, ensure_ascii=False, allow_nan=False, separators=(',', ':')).encode('utf-8')
+    # O JSONRenderer do DRF escapa estes dois separadores para manter o JSON
+    # válido também como JavaScript.
+    if b'\xe2\x80\xa8' in conteudo or b'\xe2\x80\xa9' in conteudo:
+        conteudo = conteudo.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+    return conteudo
@@ -39,4 +39,44 @@ class LocalidadeSerializer(serializers.ModelSerializer):
             'longitude',
             'calha_rio',
             'fonte_dados',
-        ]
\ No newline at end of file
+        ]
+
+class SelecaoLocalidadesSerializer(serializers.Serializer):
+    """
+    Seleciona um conjunto de localidades por lista de ids ou pelos mesmos
+    filtros da listagem (`fonte_dados` e/ou `calha_rio`).
+    """
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+    fonte_dados = serializers.CharField(required=False)
+    calha_rio = serializers.IntegerField(required=False)
+
+    def validate(self, attrs):
+        if not attrs:
+            raise serializers.ValidationError('Informe "ids" ou pelo menos um filtro ("fonte_dados", "calha_rio").')
+        return attrs
+
+
+class MatrizDistanciaSerializer(serializers.Serializer):
+    """Parâmetros do endpoint de matriz de distâncias."""
+    origens = SelecaoLocalidadesSerializer()
+    destinos = SelecaoLocalidadesSerializer()
+    # Velocidade média (km/h) usada na estimativa de tempo, como no frontend.
+    velocidade = serializers.FloatField(default=60, min_value=0.1)
+    # Se informado, retorna apenas os k destinos mais próximos de cada origem.
+    top_k = serializers.IntegerField(required=False, min_value=1, max_value=1000)
+
+
+class PontoSerializer(serializers.Serializer):
+    latitude = serializers.FloatField(min_value=-90, max_value=90)
+    longitude = serializers.FloatField(min_value=-180, max_value=180)
+
+
+class RotaVisitaSerializer(serializers.Serializer):
+    """Parâmetros do planejador de visitas (/api/rotas/tour/)."""
+    localidades = SelecaoLocalidadesSerializer()
+    inicio = PontoSerializer()
+    velocidade = serializers.FloatField(default=60, min_value=0.1)
+    # Se verdadeiro, a rota termina de volta no ponto de partida.
+    retornar = serializers.BooleanField(default=False)
+    # Tempo máximo (s) gasto nas melhorias 2-opt/Or-opt.
+    tempo_limite = serializers.FloatField(required=False, min_value=0, max_value=10)
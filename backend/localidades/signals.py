@@ -0,0 +1,49 @@
+# backend/localidades/signals.py
+
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import resumo
+from .models import CalhaRio, Localidade
+from .versao import incrementar_versao
+
+
+@receiver(pre_save, sender=Localidade)
+def guardar_grupo_anterior(sender, instance, raw=False, update_fields=None, **kwargs):
+    # Se o save() tirar a localidade do grupo antigo (outro município,
+    # calha...), o resumo dos dois grupos precisa ser refeito. O loaddata
+    # (raw) grava muitas linhas seguidas: aí o resumo é refeito inteiro no
+    # fim, em vez de uma consulta por linha.
+    if raw:
+        resumo.marcar_tudo()
+        return
+    if instance.pk is not None:
+        instance._grupo_resumo_anterior = resumo.grupo_gravado(instance.pk)
+    # O hash descreve a linha como a importação a gravou. Depois de uma
+    # edição (admin, shell) ele é apagado, para que a próxima importação
+    # incremental compare a linha de novo e não a dê como inalterada.
+    instance.hash_conteudo = ''
+    if update_fields is not None and 'hash_conteudo' not in update_fields and instance.pk is not None:
+        Localidade.objects.filter(pk=instance.pk).update(hash_conteudo='')
+
+
+# Qualquer alteração em localidades ou calhas (admin, shell, comandos)
+# gera uma nova versão dos dados, invalidando os caches derivados. Os
+# grupos do resumo são marcados antes do incremento, que é quando eles são
+# recalculados.
+@receiver(post_save, sender=Localidade)
+@receiver(post_delete, sender=Localidade)
+def localidade_alterada(sender, instance, **kwargs):
+    anterior = getattr(instance, '_grupo_resumo_anterior', None)
+    resumo.marcar({resumo.grupo_de(instance)} | ({anterior} if anterior else set()))
+    incrementar_versao()
+
+
+@receiver(post_save, sender=CalhaRio)
+@receiver(post_delete, sender=CalhaRio)
+def dados_alterados(sender, signal, **kwargs):
+    # Apagar uma calha deixa as localidades dela sem calha (SET_NULL, sem
+    # sinais por localidade): o resumo é refeito inteiro.
+    if signal is post_delete:
+        resumo.marcar_tudo()
+    incrementar_versao()
@@ -0,0 +1,28 @@
+# backend/localidades/streaming.py
+
+from itertools import islice
+
+from . import serializacao_rapida
+
+
+def gerar_array_json(queryset, chunk_size):
+    """
+    Gera um array JSON em pedaços, lendo o queryset com `iterator()`.
+
+    Cada lote de `chunk_size` linhas passa pelo caminho rápido de
+    serialização, então o resultado concatenado é idêntico ao da resposta
+    normal, mas só um lote fica em memória por vez.
+    """
+    tuplas = serializacao_rapida.linhas(queryset).iterator(chunk_size=chunk_size)
+    yield b'['
+    primeiro = True
+    while True:
+        lote = list(islice(tuplas, chunk_size))
+        if not lote:
+            break
+        # Remove os colchetes do array parcial para emendar os lotes.
+        if not primeiro:
+            yield b','
+        yield serializacao_rapida.renderizar(lote)[1:-1]
+        primeiro = False
+    yield b']'
@@ -0,0 +1,31 @@
+# backend/localidades/tests/base.py
+#
+# Fábricas e classe base compartilhadas pelos testes do app.
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from localidades.models import CalhaRio, Localidade
+
+
+def criar_localidade(**campos):
+    """Cria uma localidade com valores padrão para os campos não informados."""
+    padrao = {
+        'nome_comunidade': 'COMUNIDADE', 'municipio': 'MANAUS', 'uf': 'AM', 'ibge': '1302603',
+        'tipo_comunidade': 'Ribeirinhos', 'domicilios': 10, 'total_ligacoes': 10,
+        'latitude': -3.1, 'longitude': -60.0, 'fonte_dados': Localidade.FonteDados.CONVENCIONAL,
+    }
+    return Localidade.objects.create(**{**padrao, **campos})
+
+
+def criar_calha(nome):
+    return CalhaRio.objects.create(nome=nome)
+
+
+class ApiTestCase(TestCase):
+    """TestCase com um usuário autenticado no cliente (a API exige login)."""
+
+    def setUp(self):
+        super().setUp()
+        self.usuario = User.objects.create_user('teste', password='senha-de-teste')
+        self.client.force_login(self.usuario)
@@ -0,0 +1,127 @@
+# backend/localidades/tests/test_autocomplete.py
+
+from django.test import SimpleTestCase, override_settings
+
+from localidades.autocomplete import IndiceAutocomplete
+from localidades.models import Localidade
+
+from .base import ApiTestCase, criar_calha, criar_localidade
+
+URL = '/api/localidades/autocomplete/'
+
+
+class IndiceAutocompleteTests(SimpleTestCase):
+    def setUp(self):
+        self.indice = IndiceAutocomplete([
+            (1, 'SÃO GABRIEL', 'TEFÉ', 5),
+            (2, 'Vila São Gabriel', 'Manaus', 50),
+            (3, 'Sao Gabriel do Papuri', 'BARCELOS', 20),
+            (4, 'LAGO DO GABRIEL', 'São Gabriel da Cachoeira', None),
+            (5, 'BOA VISTA', 'SÃO GABRIEL DA CACHOEIRA', 80),
+            (6, 'NOVA ESPERANÇA', 'São Gabriel da Cachoeira', 10),
+        ])
+
+    def test_ordem_nome_palavra_municipio_e_domicilios(self):
+        # Prefixo do nome (3 antes de 1, por domicílios), depois prefixo de
+        # uma palavra do nome (2), depois o município (5, 6 e 4, sem domicílios).
+        self.assertEqual(self.indice.buscar('sao gab', 10), [3, 1, 2, 5, 6, 4])
+        # "gabriel": 4 casa por uma palavra do nome, com menos domicílios que 2,
+        # e também pelo município; aparece uma vez só.
+        self.assertEqual(self.indice.buscar('gabriel', 10), [2, 3, 1, 4, 5, 6])
+
+    def test_sem_acentos_e_caixa(self):
+        for texto in ('SÃO GABRIEL', 'são gabriel', 'Sao Gabriel', '  sao   gabriel '):
+            with self.subTest(texto=texto):
+                self.assertEqual(self.indice.buscar(texto, 10)[:3], [3, 1, 2])
+        self.assertEqual(self.indice.buscar('esperanca', 10), [6])
+        self.assertEqual(self.indice.buscar('tefe', 10), [1])
+
+    def test_prefixo_e_nao_substring(self):
+        self.assertEqual(self.indice.buscar('abriel', 10), [])
+        self.assertEqual(self.indice.buscar('papuri', 10), [3])
+        self.assertEqual(self.indice.buscar('cachoeira', 10), [5, 6, 4])
+
+    def test_limite(self):
+        self.assertEqual(self.indice.buscar('sao gab', 2), [3, 1])
+        self.assertEqual(self.indice.buscar('sao gab', 4), [3, 1, 2, 5])
+        self.assertEqual(self.indice.buscar('sao gab', 0), [])
+        self.assertEqual(self.indice.buscar('', 10), [])
+        self.assertEqual(self.indice.buscar(' ', 10), [])
+
+    def test_consultas_curtas_memorizadas(self):
+        self.assertEqual(self.indice.buscar('s', 3), [3, 1, 2])
+        self.assertEqual(self.indice._memo, {('s', 3): [3, 1, 2]})
+        self.assertEqual(self.indice.buscar('S', 3), [3, 1, 2])
+        self.indice.buscar('sao', 3)
+        self.assertEqual(list(self.indice._memo), [('s', 3)])
+
+    def test_vazio(self):
+        self.assertEqual(IndiceAutocomplete([]).buscar('sao', 10), [])
+
+
+@override_settings(LOCALIDADES_AUTOCOMPLETE_MAX_LIMITE=50)
+class AutocompleteViewTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.calha = criar_calha('Calha do Alto Rio Negro')
+        self.grande = criar_localidade(nome_comunidade='SÃO JOÃO', municipio='TEFÉ', domicilios=90)
+        self.pequena = criar_localidade(
+            nome_comunidade='São João do Içá', municipio='Tefé', domicilios=3, calha_rio=self.calha,
+            fonte_dados=Localidade.FonteDados.TRANCHE,
+        )
+        self.palavra = criar_localidade(nome_comunidade='VILA SÃO JOÃO', municipio='COARI', domicilios=500)
+        self.municipio = criar_localidade(nome_comunidade='BOA VISTA', municipio='SÃO JOÃO DO ARAGUAIA', domicilios=None)
+
+    def buscar(self, q, **params):
+        resposta = self.client.get(URL, {'q': q, **params})
+        self.assertEqual(resposta.status_code, 200)
+        return [item['id'] for item in resposta.json()]
+
+    def test_prefixo_sem_acentos_no_nome_e_no_municipio(self):
+        esperado = [self.grande.id, self.pequena.id, self.palavra.id, self.municipio.id]
+        self.assertEqual(self.buscar('sao joao'), esperado)
+        self.assertEqual(self.buscar('SÃO JOÃO'), esperado)
+        self.assertEqual(self.buscar('tefe'), [self.grande.id, self.pequena.id])
+        self.assertEqual(self.buscar('araguaia'), [self.municipio.id])
+        self.assertEqual(self.buscar('ica'), [self.pequena.id])
+        # Prefixo, não substring.
+        self.assertEqual(self.buscar('oao'), [])
+
+    def test_resposta_no_formato_da_listagem(self):
+        resposta = self.client.get(URL, {'q': 'ica'})
+        (item,) = resposta.json()
+        self.assertEqual(item['nome_comunidade'], 'São João do Içá')
+        self.assertEqual(item['calha_rio'], 'Calha do Alto Rio Negro')
+        self.assertEqual(list(item), list(self.client.get('/api/localidades/').json()[0]))
+
+    def test_filtros(self):
+        self.assertEqual(self.buscar('sao joao', fonte_dados='3ª tranche'), [self.pequena.id])
+        self.assertEqual(self.buscar('sao joao', calha_rio=self.calha.id), [self.pequena.id])
+        self.assertEqual(
+            self.buscar('sao joao', fonte_dados='convencional'),
+            [self.grande.id, self.palavra.id, self.municipio.id],
+        )
+
+    def test_limit(self):
+        self.assertEqual(self.buscar('sao joao', limit=1), [self.grande.id])
+        self.assertEqual(self.buscar('sao joao', limit=50), self.buscar('sao joao'))
+        for limite in (0, 51, -1, 'x'):
+            with self.subTest(limit=limite):
+                self.assertEqual(self.client.get(URL, {'q': 'sao', 'limit': limite}).status_code, 400)
+
+    def test_q_vazio(self):
+        self.assertEqual(self.buscar(''), [])
+        self.assertEqual(self.buscar('   '), [])
+        self.assertEqual(self.client.get(URL).json(), [])
+
+    def test_reconstruido_depois_de_uma_alteracao(self):
+        self.assertEqual(self.buscar('boa vista'), [self.municipio.id])
+        self.municipio.nome_comunidade = 'NOVO AIRÃO'
+        self.municipio.save()
+        self.assertEqual(self.buscar('boa vista'), [])
+        self.assertEqual(self.buscar('novo airao'), [self.municipio.id])
+
+        nova = criar_localidade(nome_comunidade='SÃO JOÃO NOVA', domicilios=1000)
+        self.assertEqual(self.buscar('sao joao', limit=1), [nova.id])
+        self.grande.delete()
+        self.assertNotIn(self.grande.id, self.buscar('sao joao'))
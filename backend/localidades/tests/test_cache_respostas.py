@@ -0,0 +1,123 @@
+# backend/localidades/tests/test_cache_respostas.py
+
+import io
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import override_settings
+
+from localidades import cache_respostas
+
+from .base import ApiTestCase, criar_calha, criar_localidade
+from .test_importacao import gravar_planilha
+
+URL = '/api/localidades/'
+
+
+class CacheRespostasTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.calha = criar_calha('Calha do Purus')
+        self.localidade = criar_localidade(nome_comunidade='SÃO JOÃO', calha_rio=self.calha)
+        for i in range(5):
+            criar_localidade(nome_comunidade=f'COMUNIDADE {i}', latitude=-3 - i / 10)
+
+    def x_cache(self, params=None):
+        resposta = self.client.get(URL, params or {})
+        self.assertEqual(resposta.status_code, 200)
+        return resposta['X-Cache']
+
+    def contadores(self):
+        return self.client.get('/api/localidades/cache/').json()
+
+    def assertInvalidaComEscrita(self, escrever):
+        self.assertEqual(self.x_cache(), 'MISS')
+        self.assertEqual(self.x_cache(), 'HIT')
+        escrever()
+        self.assertEqual(self.x_cache(), 'MISS')
+        self.assertEqual(self.x_cache(), 'HIT')
+
+    def test_acerto_na_repeticao(self):
+        primeira = self.client.get(URL, {'fonte_dados': 'convencional'})
+        segunda = self.client.get(URL, {'fonte_dados': 'convencional'})
+        self.assertEqual((primeira['X-Cache'], segunda['X-Cache']), ('MISS', 'HIT'))
+        self.assertEqual(segunda.content, primeira.content)
+        self.assertEqual(segunda['Content-Type'], primeira['Content-Type'])
+
+    def test_save_de_localidade_invalida(self):
+        def escrever():
+            self.localidade.domicilios = 99
+            self.localidade.save()
+        self.assertInvalidaComEscrita(escrever)
+        self.assertIn('"domicilios":99', self.client.get(URL).content.decode())
+
+    def test_delete_de_calha_invalida(self):
+        self.assertInvalidaComEscrita(self.calha.delete)
+
+    def test_import_data_invalida(self):
+        with tempfile.TemporaryDirectory() as diretorio:
+            arquivo = os.path.join(diretorio, 'planilha.xlsx')
+            gravar_planilha(arquivo)
+            with override_settings(
+                LOCALIDADES_CALHAS_LIMITES_ARQUIVO=os.path.join(diretorio, 'sem_limites.geojson'),
+                LOCALIDADES_REDE_FLUVIAL_ARQUIVO=os.path.join(diretorio, 'sem_rede.geojson'),
+            ):
+                self.assertInvalidaComEscrita(lambda: call_command(
+                    'import_data', '--arquivo', arquivo, '--sem-cache', stdout=io.StringIO(),
+                ))
+
+    def test_chave_canonica(self):
+        self.assertEqual(self.x_cache({'fonte_dados': 'Convencional', 'calha_rio': self.calha.id}), 'MISS')
+        # Ordem dos parâmetros, caixa e espaços não importam.
+        self.assertEqual(self.x_cache({'calha_rio': self.calha.id, 'fonte_dados': ' CONVENCIONAL '}), 'HIT')
+        self.assertEqual(self.x_cache({'search': 'são   joão'}), 'MISS')
+        self.assertEqual(self.x_cache({'search': ' são joão '}), 'HIT')
+        self.assertEqual(self.x_cache({'in_bbox': '-61,-5,-59,-2'}), 'MISS')
+        self.assertEqual(self.x_cache({'in_bbox': '-61.0,-5.0,-59.0,-2.0'}), 'HIT')
+        # Filtros diferentes ou parâmetros desconhecidos nunca se misturam.
+        self.assertEqual(self.x_cache({'fonte_dados': '3ª Tranche'}), 'MISS')
+        self.assertEqual(self.x_cache({'search': 'são joão', 'outro': '1'}), 'MISS')
+
+    def test_contadores(self):
+        antes = self.contadores()
+        self.x_cache()
+        self.x_cache()
+        self.x_cache()
+        self.x_cache({'limit': 2})
+        depois = self.contadores()
+        self.assertEqual(depois['acertos'] - antes['acertos'], 2)
+        self.assertEqual(depois['falhas'] - antes['falhas'], 2)
+        self.assertEqual(depois['entradas'], 2)
+        self.assertGreater(depois['bytes'], 0)
+        self.assertEqual(depois['max_bytes'], settings.LOCALIDADES_CACHE_MAX_BYTES)
+        self.assertEqual(depois['max_entradas'], 128)
+        self.assertEqual(
+            depois['taxa_acerto'],
+            round(depois['acertos'] / (depois['acertos'] + depois['falhas']), 4),
+        )
+
+    def test_orcamento_em_bytes_descarta_as_menos_usadas(self):
+        for i in range(10):
+            criar_localidade(nome_comunidade=f'OUTRA {i}')
+        tamanhos = [len(self.client.get(URL, {'limit': limite}).content) for limite in (1, 2, 3)]
+        # Começa com o cache vazio; as medições acima ficaram guardadas.
+        cache_respostas.invalidar(sender=None)
+        with override_settings(LOCALIDADES_CACHE_MAX_BYTES=tamanhos[0] + tamanhos[2]):
+            self.assertEqual(self.x_cache({'limit': 1}), 'MISS')
+            self.assertEqual(self.x_cache({'limit': 2}), 'MISS')
+            self.assertEqual(self.x_cache({'limit': 1}), 'HIT')
+            # Não cabe junto com as outras: sai a menos usada (limit=2).
+            self.assertEqual(self.x_cache({'limit': 3}), 'MISS')
+            self.assertEqual(self.contadores()['bytes'], tamanhos[0] + tamanhos[2])
+            self.assertEqual(self.x_cache({'limit': 3}), 'HIT')
+            self.assertEqual(self.x_cache({'limit': 1}), 'HIT')
+            self.assertEqual(self.x_cache({'limit': 2}), 'MISS')
+
+            # Uma resposta maior que o orçamento inteiro não é guardada e não
+            # descarta as outras.
+            self.assertGreater(len(self.client.get(URL, {'format': 'json'}).content), tamanhos[0] + tamanhos[2])
+            self.assertEqual(self.x_cache(), 'MISS')
+            self.assertEqual(self.x_cache(), 'MISS')
+            self.assertEqual(self.x_cache({'limit': 2}), 'HIT')
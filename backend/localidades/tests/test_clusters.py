@@ -0,0 +1,41 @@
+# backend/localidades/tests/test_clusters.py
+
+from django.test import override_settings
+
+from localidades.serializers import LocalidadeSerializer
+
+from .base import ApiTestCase, criar_localidade
+
+
+@override_settings(LOCALIDADES_CLUSTER_ZOOM_PONTOS=13)
+class ClustersTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.perto = criar_localidade(nome_comunidade='PERTO A', latitude=-3.10, longitude=-60.00)
+        criar_localidade(nome_comunidade='PERTO B', latitude=-3.1001, longitude=-60.0001)
+        criar_localidade(nome_comunidade='LONGE', latitude=-7.0, longitude=-70.0)
+
+    def test_zoom_baixo_agrega_as_localidades(self):
+        resposta = self.client.get('/api/localidades/clusters/', {'z': 5})
+        self.assertEqual(resposta.status_code, 200)
+        self.assertTrue(resposta.json()['agrupado'])
+        clusters = resposta.json()['clusters']
+        self.assertEqual(sorted(c['quantidade'] for c in clusters), [1, 2])
+        self.assertEqual(sum(c['domicilios'] for c in clusters), 30)
+
+    def test_zoom_de_pontos_exige_bbox(self):
+        resposta = self.client.get('/api/localidades/clusters/', {'z': 14})
+        self.assertEqual(resposta.status_code, 400)
+
+    def test_zoom_de_pontos_devolve_so_o_bbox(self):
+        resposta = self.client.get('/api/localidades/clusters/', {'z': 14, 'in_bbox': '-60.5,-3.5,-59.5,-2.5'})
+        self.assertEqual(resposta.status_code, 200)
+        dados = resposta.json()
+        self.assertFalse(dados['agrupado'])
+        self.assertEqual(sorted(l['nome_comunidade'] for l in dados['localidades']), ['PERTO A', 'PERTO B'])
+        self.assertIn(self.perto.id, [l['id'] for l in dados['localidades']])
+        self.assertEqual(list(dados['localidades'][0]), list(LocalidadeSerializer.Meta.fields))
+
+    def test_zoom_invalido(self):
+        self.assertEqual(self.client.get('/api/localidades/clusters/', {'z': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/localidades/clusters/', {'z': -1}).status_code, 400)
@@ -0,0 +1,86 @@
+# backend/localidades/tests/test_colunar.py
+
+import json
+import struct
+
+import numpy as np
+
+from localidades import colunar
+from localidades.serializacao_rapida import CAMPOS
+
+from .base import ApiTestCase, criar_calha, criar_localidade
+
+
+def decodificar(conteudo):
+    """Decodificador de referência do formato (o mesmo trabalho feito pelo frontend)."""
+    assert conteudo[:4] == colunar.ASSINATURA
+    (tamanho,) = struct.unpack('<I', conteudo[4:8])
+    cabecalho = json.loads(conteudo[8:8 + tamanho])
+    inicio = 8 + tamanho
+    assert inicio % colunar.ALINHAMENTO == 0
+    linhas, colunas = cabecalho['linhas'], {}
+    for coluna in cabecalho['colunas']:
+        dados = conteudo[inicio + coluna['offset']:inicio + coluna['offset'] + coluna['bytes']]
+        if coluna['tipo'] == 'dicionario':
+            indices = np.frombuffer(dados, dtype='<' + np.dtype(coluna['indices']).str[1:])
+            valores = [coluna['valores'][i] for i in indices]
+        elif coluna['tipo'] == 'texto':
+            offsets = np.frombuffer(dados[:4 * (linhas + 1)], dtype='<i4')
+            texto = dados[4 * (linhas + 1):]
+            valores = [texto[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(linhas)]
+        else:
+            array = np.frombuffer(dados, dtype='<' + np.dtype(coluna['tipo']).str[1:])
+            nulo = coluna.get('nulo')
+            valores = [None if nulo is not None and v == nulo else v.item() for v in array]
+        colunas[coluna['nome']] = valores
+    return cabecalho, [dict(zip(colunas, linha)) for linha in zip(*colunas.values())]
+
+
+class ColunarTests(ApiTestCase):
+    def tuplas(self):
+        return [
+            (1, '1302603', 'AM', 'MANAUS', 'SÃO JOÃO', 'Ribeirinhos', 12, None, -3.5, -60.25, 'Calha A', 'Convencional'),
+            (2, None, 'AM', 'MANAUS', '', None, None, 7, -4.0, -61.0, None, '3ª Tranche'),
+            (3, '1302603', 'AM', 'COARI', 'ALDEIA', 'Ribeirinhos', 0, 0, -4.125, -63.5, 'Calha A', 'Convencional'),
+        ]
+
+    def test_ida_e_volta(self):
+        tuplas = self.tuplas()
+        cabecalho, linhas = decodificar(colunar.codificar(tuplas, {'next': None}))
+        self.assertEqual(cabecalho['linhas'], 3)
+        self.assertIn('next', cabecalho)
+        for tupla, linha in zip(tuplas, linhas):
+            esperado = dict(zip(CAMPOS, tupla))
+            # Texto livre nulo vira string vazia; as coordenadas vão em float32.
+            esperado['nome_comunidade'] = esperado['nome_comunidade'] or ''
+            for campo in ('latitude', 'longitude'):
+                self.assertAlmostEqual(linha.pop(campo), esperado.pop(campo), places=4)
+            self.assertEqual(linha, esperado)
+
+    def test_inteiros_nulos_e_dicionarios(self):
+        conteudo = colunar.codificar(self.tuplas())
+        cabecalho, linhas = decodificar(conteudo)
+        colunas = {coluna['nome']: coluna for coluna in cabecalho['colunas']}
+        self.assertEqual(colunas['domicilios']['nulo'], colunar.NULO_INTEIRO)
+        self.assertEqual([l['domicilios'] for l in linhas], [12, None, 0])
+        self.assertEqual(colunas['municipio']['tipo'], 'dicionario')
+        self.assertEqual(colunas['municipio']['valores'], ['MANAUS', 'COARI'])
+        self.assertEqual(colunas['calha_rio']['valores'], ['Calha A', None])
+
+    def test_lista_vazia(self):
+        cabecalho, linhas = decodificar(colunar.codificar([]))
+        self.assertEqual((cabecalho['linhas'], linhas), (0, []))
+
+    def test_endpoint_igual_ao_json(self):
+        calha = criar_calha('Calha do Purus')
+        criar_localidade(nome_comunidade='A', calha_rio=calha, domicilios=None)
+        criar_localidade(nome_comunidade='B', tipo_comunidade=None)
+        json_ = self.client.get('/api/localidades/').json()
+        resposta = self.client.get('/api/localidades/', {'format': 'colunar'})
+        self.assertEqual(resposta['Content-Type'], 'application/vnd.geolocalizacao.colunar')
+        _, linhas = decodificar(resposta.content)
+        self.assertEqual(len(linhas), 2)
+        for esperado, linha in zip(json_, linhas):
+            for campo in ('latitude', 'longitude'):
+                self.assertAlmostEqual(linha.pop(campo), esperado.pop(campo), places=4)
+            self.assertEqual(linha, esperado)
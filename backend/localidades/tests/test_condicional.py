@@ -0,0 +1,94 @@
+# backend/localidades/tests/test_condicional.py
+
+import json
+import os
+import tempfile
+
+import pandas as pd
+from django.core.management import call_command
+
+from localidades import importacao
+from localidades.models import Localidade
+from localidades.versao import versao_atual
+
+from .base import ApiTestCase, criar_calha, criar_localidade
+
+
+class GetCondicionalTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.calha = criar_calha('Calha do Purus')
+        self.localidade = criar_localidade(calha_rio=self.calha)
+        self.urls = [
+            '/api/localidades/',
+            f'/api/localidades/{self.localidade.id}/',
+            '/api/calhas/',
+            f'/api/calhas/{self.calha.id}/',
+        ]
+
+    def etags(self, urls):
+        return [self.client.get(url)['ETag'] for url in urls]
+
+    def test_etag_atual_responde_304(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                resposta = self.client.get(url)
+                self.assertEqual(resposta.status_code, 200)
+                self.assertEqual(resposta['Cache-Control'], 'private, no-cache')
+                revalidada = self.client.get(url, HTTP_IF_NONE_MATCH=resposta['ETag'])
+                self.assertEqual(revalidada.status_code, 304)
+                self.assertEqual(revalidada.content, b'')
+
+    def test_etag_depende_dos_parametros(self):
+        sem_filtro = self.client.get('/api/localidades/')['ETag']
+        com_filtro = self.client.get('/api/localidades/', {'fonte_dados': 'convencional'})['ETag']
+        self.assertNotEqual(sem_filtro, com_filtro)
+        resposta = self.client.get('/api/localidades/', {'fonte_dados': '3ª Tranche'}, HTTP_IF_NONE_MATCH=sem_filtro)
+        self.assertEqual(resposta.status_code, 200)
+
+    def assertEscritaMudaEtags(self, escrever, urls=None):
+        urls = urls or self.urls
+        antes = self.etags(urls)
+        escrever()
+        depois = self.etags(urls)
+        for url, anterior, atual in zip(urls, antes, depois):
+            self.assertNotEqual(anterior, atual, url)
+        self.assertEqual(self.client.get(self.urls[0], HTTP_IF_NONE_MATCH=antes[0]).status_code, 200)
+
+    def test_save_muda_etag(self):
+        def escrever():
+            self.localidade.domicilios = 99
+            self.localidade.save()
+        self.assertEscritaMudaEtags(escrever)
+
+    def test_importacao_muda_etag(self):
+        df = pd.DataFrame([{
+            'ibge': '1300102', 'uf': 'AM', 'municipio': 'ANORI', 'nome_comunidade': 'NOVA', 'tipo_comunidade': None,
+            'domicilios': 5, 'total_ligacoes': 5, 'latitude': -3.7, 'longitude': -61.6,
+            'fonte_dados': Localidade.FonteDados.TRANCHE,
+        }])
+        self.assertEscritaMudaEtags(lambda: importacao.gravar(df))
+
+    def test_seed_calhas_muda_etag(self):
+        # O seed apaga as calhas existentes, então o detalhe da calha some.
+        with open(os.devnull, 'w') as saida:
+            self.assertEscritaMudaEtags(lambda: call_command('seed_calhas', stdout=saida), self.urls[:3])
+        self.assertEqual(self.client.get(self.urls[3]).status_code, 404)
+
+    def test_loaddata_muda_etag_com_um_unico_incremento(self):
+        registros = [
+            {'model': 'localidades.localidade', 'pk': 1000 + i, 'fields': {
+                'nome_comunidade': f'FIXTURE {i}', 'municipio': 'COARI', 'uf': 'AM', 'latitude': -4.0, 'longitude': -63.0,
+                'fonte_dados': Localidade.FonteDados.CONVENCIONAL, 'calha_rio': self.calha.id,
+            }}
+            for i in range(5)
+        ]
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as arquivo:
+            json.dump(registros, arquivo)
+        self.addCleanup(os.unlink, arquivo.name)
+
+        epoca, numero = versao_atual().rsplit('-', 1)
+        self.assertEscritaMudaEtags(lambda: call_command('loaddata', arquivo.name, verbosity=0))
+        # O loaddata do app junta as gravações do fixture num único incremento.
+        self.assertEqual(versao_atual(), f'{epoca}-{int(numero) + 1}')
+        self.assertEqual(Localidade.objects.filter(municipio='COARI').count(), 5)
@@ -0,0 +1,163 @@
+# backend/localidades/tests/test_distancias.py
+
+import math
+import random
+
+import numpy as np
+from django.test import SimpleTestCase, override_settings
+
+from localidades.geo import blocos_matriz, formatar_tempo, mais_proximos, matriz_distancias
+from localidades.models import Localidade
+
+from .base import ApiTestCase, criar_localidade
+
+URL = '/api/localidades/distance-matrix/'
+
+
+def haversine_escalar(lat1, lon1, lat2, lon2):
+    """Haversine ponto a ponto, com math, para comparar com a versão vetorizada."""
+    fi1, fi2 = math.radians(lat1), math.radians(lat2)
+    a = math.sin((fi2 - fi1) / 2) ** 2 + math.cos(fi1) * math.cos(fi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2
+    return 6371.0 * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def pontos(gerador, quantidade):
+    return [gerador.uniform(-8, 0) for _ in range(quantidade)], [gerador.uniform(-70, -58) for _ in range(quantidade)]
+
+
+class GeoTests(SimpleTestCase):
+    def setUp(self):
+        gerador = random.Random(5)
+        self.origens = pontos(gerador, 23)
+        self.destinos = pontos(gerador, 17)
+        self.escalar = [
+            [haversine_escalar(lat_o, lon_o, lat_d, lon_d) for lat_d, lon_d in zip(*self.destinos)]
+            for lat_o, lon_o in zip(*self.origens)
+        ]
+
+    def test_matriz_em_blocos(self):
+        for max_celulas in (1, 17, 40, 100, 10_000):
+            with self.subTest(max_celulas=max_celulas):
+                blocos = list(blocos_matriz(self.origens, self.destinos, max_celulas))
+                # Cada bloco respeita o limite (no mínimo uma linha) e os blocos cobrem todas as origens.
+                self.assertEqual(blocos[0][0], 0)
+                self.assertEqual(blocos[-1][1], 23)
+                for (_, fim, _), (inicio, _, _) in zip(blocos, blocos[1:]):
+                    self.assertEqual(fim, inicio)
+                for _, _, bloco in blocos:
+                    self.assertLessEqual(bloco.size, max(max_celulas, 17))
+                np.testing.assert_allclose(
+                    matriz_distancias(self.origens, self.destinos, max_celulas), self.escalar, rtol=1e-12,
+                )
+        self.assertEqual(len(list(blocos_matriz(self.origens, self.destinos, 40))), 12)
+
+    def test_mais_proximos(self):
+        for k, max_celulas in ((1, 10_000), (5, 40), (17, 17), (50, 1)):
+            with self.subTest(k=k, max_celulas=max_celulas):
+                indices, distancias = mais_proximos(self.origens, self.destinos, k, max_celulas)
+                self.assertEqual(indices.shape, (23, min(k, 17)))
+                for linha, (linha_indices, linha_distancias) in enumerate(zip(indices, distancias)):
+                    esperado = sorted(range(17), key=lambda j: self.escalar[linha][j])[:k]
+                    self.assertEqual(linha_indices.tolist(), esperado)
+                    np.testing.assert_allclose(linha_distancias, [self.escalar[linha][j] for j in esperado], rtol=1e-12)
+
+    def test_mais_proximos_ignora_a_propria_origem(self):
+        ids = list(range(100, 117))
+        indices, distancias = mais_proximos(self.destinos, self.destinos, 3, 20, ids, ids)
+        for linha, linha_indices in enumerate(indices.tolist()):
+            self.assertNotIn(linha, linha_indices)
+            self.assertTrue(np.all(np.isfinite(distancias[linha])))
+
+    def test_formatar_tempo(self):
+        self.assertEqual(formatar_tempo(0), '0h 0min')
+        self.assertEqual(formatar_tempo(1.5), '1h 30min')
+        self.assertEqual(formatar_tempo(26 / 60), '0h 26min')
+
+
+class DistanceMatrixTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        gerador = random.Random(9)
+        latitudes, longitudes = pontos(gerador, 9)
+        self.localidades = [
+            criar_localidade(
+                nome_comunidade=f'COMUNIDADE {i}', latitude=latitude, longitude=longitude,
+                fonte_dados=Localidade.FonteDados.CONVENCIONAL if i < 5 else Localidade.FonteDados.TRANCHE,
+            )
+            for i, (latitude, longitude) in enumerate(zip(latitudes, longitudes))
+        ]
+        self.origens = self.localidades[:5]
+        self.destinos = self.localidades[5:]
+
+    def pedir(self, **dados):
+        dados = {
+            'origens': {'ids': [localidade.id for localidade in self.origens]},
+            'destinos': {'fonte_dados': Localidade.FonteDados.TRANCHE},
+            **dados,
+        }
+        return self.client.post(URL, dados, content_type='application/json')
+
+    def distancia(self, origem, destino):
+        return haversine_escalar(origem.latitude, origem.longitude, destino.latitude, destino.longitude)
+
+    def assertMatrizDensa(self, resposta, velocidade=60):
+        self.assertEqual(resposta.status_code, 200)
+        dados = resposta.json()
+        self.assertEqual(dados['origens'], [localidade.id for localidade in self.origens])
+        self.assertEqual(dados['destinos'], [localidade.id for localidade in self.destinos])
+        esperado = [[self.distancia(o, d) for d in self.destinos] for o in self.origens]
+        np.testing.assert_allclose(dados['distancias_km'], esperado, atol=0.005)
+        np.testing.assert_allclose(dados['tempos_horas'], np.array(esperado) / velocidade, atol=0.0005)
+
+    def test_matriz_densa(self):
+        self.assertMatrizDensa(self.pedir())
+        self.assertMatrizDensa(self.pedir(velocidade=25), velocidade=25)
+
+    @override_settings(LOCALIDADES_DISTANCIA_CELULAS_POR_BLOCO=3)
+    def test_matriz_densa_em_blocos(self):
+        # 3 células por bloco com 4 destinos: uma origem por bloco.
+        self.assertMatrizDensa(self.pedir())
+
+    @override_settings(LOCALIDADES_DISTANCIA_CELULAS_POR_BLOCO=8)
+    def test_top_k_em_blocos(self):
+        resposta = self.pedir(top_k=2, velocidade=30)
+        self.assertEqual(resposta.status_code, 200)
+        resultados = resposta.json()['resultados']
+        self.assertEqual([r['origem'] for r in resultados], [localidade.id for localidade in self.origens])
+        for origem, resultado in zip(self.origens, resultados):
+            esperado = sorted(self.destinos, key=lambda destino: self.distancia(origem, destino))[:2]
+            self.assertEqual([d['id'] for d in resultado['destinos']], [destino.id for destino in esperado])
+            for destino, item in zip(esperado, resultado['destinos']):
+                self.assertAlmostEqual(item['distancia_km'], self.distancia(origem, destino), delta=0.005)
+                self.assertEqual(item['tempo'], formatar_tempo(self.distancia(origem, destino) / 30))
+
+    def test_top_k_nao_repete_a_origem(self):
+        resposta = self.pedir(top_k=20, destinos={'ids': [localidade.id for localidade in self.localidades]})
+        for origem, resultado in zip(self.origens, resposta.json()['resultados']):
+            ids = [d['id'] for d in resultado['destinos']]
+            self.assertNotIn(origem.id, ids)
+            self.assertEqual(len(ids), len(self.localidades) - 1)
+
+    @override_settings(LOCALIDADES_DISTANCIA_MAX_DENSA=19)
+    def test_matriz_densa_grande_demais(self):
+        # 5 x 4 = 20 células.
+        resposta = self.pedir()
+        self.assertEqual(resposta.status_code, 400)
+        self.assertIn('top_k', resposta.json()['detail'])
+        self.assertEqual(self.pedir(top_k=1).status_code, 200)
+
+    def test_ids_desconhecidos(self):
+        desconhecido = max(localidade.id for localidade in self.localidades) + 1
+        resposta = self.pedir(origens={'ids': [self.origens[0].id, desconhecido]})
+        self.assertEqual(resposta.status_code, 400)
+        self.assertIn(str(desconhecido), str(resposta.json()['origens']['ids']))
+        resposta = self.pedir(destinos={'ids': [desconhecido]}, top_k=1)
+        self.assertEqual(resposta.status_code, 400)
+        self.assertIn('destinos', resposta.json())
+        # Ids repetidos não são desconhecidos: a matriz tem cada um uma vez.
+        self.origens = self.origens[:1]
+        self.assertMatrizDensa(self.pedir(origens={'ids': [self.origens[0].id] * 2}))
+
+    def test_selecao_invalida(self):
+        self.assertEqual(self.pedir(origens={}).status_code, 400)
+        self.assertEqual(self.pedir(top_k=0).status_code, 400)
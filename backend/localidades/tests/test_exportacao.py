@@ -0,0 +1,143 @@
+# backend/localidades/tests/test_exportacao.py
+
+import csv
+import gzip
+import io
+import json
+import xml.etree.ElementTree as ET
+
+from django.test import override_settings
+
+from localidades.exportacao import CAMPOS
+from localidades.models import Localidade
+
+from .base import ApiTestCase, criar_calha, criar_localidade
+
+KML = '{http://www.opengis.net/kml/2.2}'
+
+
+# Lotes pequenos: a saída é emendada a partir de vários lotes.
+@override_settings(LOCALIDADES_STREAM_CHUNK=2)
+class ExportacaoTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        calha = criar_calha('Calha do Purus')
+        criar_localidade(nome_comunidade='LAGO "GRANDE", SUL', calha_rio=calha, latitude=-7.25, longitude=-64.8)
+        criar_localidade(nome_comunidade='SÃO JOÃO <&>', total_ligacoes=None, tipo_comunidade=None)
+        criar_localidade(
+            nome_comunidade='VILA NOVA', municipio='TEFÉ', latitude=-3.35, longitude=-64.71,
+            fonte_dados=Localidade.FonteDados.TRANCHE,
+        )
+        for i in range(3):
+            criar_localidade(nome_comunidade=f'COMUNIDADE {i}', latitude=-4 - i / 10)
+
+    def exportar(self, formato, **params):
+        resposta = self.client.get(f'/api/localidades/export.{formato}', params)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertTrue(resposta.streaming)
+        return resposta, b''.join(resposta.streaming_content)
+
+    def esperado(self, **params):
+        """O que a listagem devolve com os mesmos filtros, em ordem de id."""
+        resposta = self.client.get('/api/localidades/', params)
+        self.assertEqual(resposta.status_code, 200)
+        return sorted(resposta.json(), key=lambda item: item['id'])
+
+    def ler_geojson(self, conteudo):
+        dados = json.loads(conteudo)
+        self.assertEqual(dados['type'], 'FeatureCollection')
+        return [
+            {
+                **feature['properties'],
+                'longitude': feature['geometry']['coordinates'][0],
+                'latitude': feature['geometry']['coordinates'][1],
+            }
+            for feature in dados['features']
+        ]
+
+    def ler_csv(self, conteudo):
+        linhas = list(csv.reader(io.StringIO(conteudo.decode('utf-8'))))
+        self.assertEqual(linhas[0], list(CAMPOS))
+        return linhas[1:]
+
+    def ler_kml(self, conteudo):
+        documento = ET.fromstring(conteudo).find(f'{KML}Document')
+        return documento.findall(f'{KML}Placemark')
+
+    def test_geojson(self):
+        resposta, conteudo = self.exportar('geojson')
+        self.assertEqual(resposta['Content-Type'], 'application/geo+json')
+        self.assertEqual(resposta['Content-Disposition'], 'attachment; filename="localidades.geojson"')
+        features = json.loads(conteudo)['features']
+        self.assertEqual([feature['id'] for feature in features], [item['id'] for item in self.esperado()])
+        self.assertEqual({feature['geometry']['type'] for feature in features}, {'Point'})
+        self.assertEqual(
+            [{campo: item[campo] for campo in CAMPOS} for item in self.ler_geojson(conteudo)],
+            self.esperado(),
+        )
+
+    def test_csv(self):
+        resposta, conteudo = self.exportar('csv')
+        self.assertEqual(resposta['Content-Type'], 'text/csv; charset=utf-8')
+        esperado = [['' if item[campo] is None else str(item[campo]) for campo in CAMPOS] for item in self.esperado()]
+        self.assertEqual(self.ler_csv(conteudo), esperado)
+
+    def test_kml(self):
+        resposta, conteudo = self.exportar('kml')
+        self.assertEqual(resposta['Content-Type'], 'application/vnd.google-earth.kml+xml')
+        placemarks = self.ler_kml(conteudo)
+        esperado = self.esperado()
+        self.assertEqual(len(placemarks), len(esperado))
+        for placemark, item in zip(placemarks, esperado):
+            self.assertEqual(placemark.get('id'), f'localidade-{item["id"]}')
+            self.assertEqual(placemark.findtext(f'{KML}name'), item['nome_comunidade'])
+            longitude, latitude = placemark.findtext(f'{KML}Point/{KML}coordinates').split(',')
+            self.assertEqual((float(latitude), float(longitude)), (item['latitude'], item['longitude']))
+            dados = {
+                dado.get('name'): dado.findtext(f'{KML}value')
+                for dado in placemark.iter(f'{KML}Data')
+            }
+            # Nulos ficam de fora do ExtendedData.
+            self.assertEqual(dados, {
+                campo: str(item[campo]) for campo in CAMPOS
+                if campo not in ('latitude', 'longitude') and item[campo] is not None
+            })
+
+    def test_gzip(self):
+        for formato in ('geojson', 'csv', 'kml'):
+            with self.subTest(formato=formato):
+                _, normal = self.exportar(formato)
+                resposta, comprimido = self.exportar(formato, gzip='true')
+                self.assertEqual(resposta['Content-Type'], 'application/gzip')
+                self.assertEqual(resposta['Content-Disposition'], f'attachment; filename="localidades.{formato}.gz"')
+                self.assertEqual(gzip.decompress(comprimido), normal)
+
+    def test_filtros(self):
+        casos = [
+            {'fonte_dados': 'convencional'},
+            {'in_bbox': '-65,-8,-64,-3'},
+            {'search': 'sao joao'},
+            {'fonte_dados': '3ª tranche', 'in_bbox': '-65,-8,-64,-3'},
+        ]
+        for params in casos:
+            with self.subTest(params=params):
+                esperado = self.esperado(**params)
+                self.assertTrue(esperado)
+                _, conteudo = self.exportar('geojson', **params)
+                self.assertEqual([item['id'] for item in self.ler_geojson(conteudo)], [item['id'] for item in esperado])
+                _, conteudo = self.exportar('csv', **params)
+                self.assertEqual([int(linha[0]) for linha in self.ler_csv(conteudo)], [item['id'] for item in esperado])
+                _, conteudo = self.exportar('kml', **params)
+                self.assertEqual(len(self.ler_kml(conteudo)), len(esperado))
+
+    def test_sem_resultados(self):
+        params = {'in_bbox': '0,0,1,1'}
+        _, conteudo = self.exportar('csv', **params)
+        # Só o cabeçalho, uma única vez.
+        self.assertEqual(conteudo.decode('utf-8'), ','.join(CAMPOS) + '\r\n')
+        _, conteudo = self.exportar('geojson', **params)
+        self.assertEqual(json.loads(conteudo), {'type': 'FeatureCollection', 'features': []})
+        _, conteudo = self.exportar('kml', **params)
+        self.assertEqual(self.ler_kml(conteudo), [])
+        _, conteudo = self.exportar('csv', gzip='true', **params)
+        self.assertEqual(gzip.decompress(conteudo).decode('utf-8'), ','.join(CAMPOS) + '\r\n')
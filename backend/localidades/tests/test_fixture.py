@@ -0,0 +1,137 @@
+# backend/localidades/tests/test_fixture.py
+
+import io
+import json
+import os
+import tempfile
+
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase
+
+from localidades import fixture
+from localidades.models import Localidade
+from localidades.versao import versao_atual
+
+from .base import criar_calha, criar_localidade
+
+
+def registro(nome, **campos):
+    return {
+        'nome_comunidade': nome, 'municipio': 'SÃO GABRIEL DA CACHOEIRA', 'uf': 'AM', 'ibge': '1303809',
+        'tipo_comunidade': 'Indígena', 'domicilios': 12, 'total_ligacoes': None,
+        'latitude': -0.1303, 'longitude': -67.0892, 'fonte_dados': Localidade.FonteDados.TRANCHE, **campos,
+    }
+
+
+class TemporarioMixin:
+    def setUp(self):
+        super().setUp()
+        diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(diretorio.cleanup)
+        self.diretorio = diretorio.name
+
+    def caminho(self, nome):
+        return os.path.join(self.diretorio, nome)
+
+
+class EscritorJsonTests(TemporarioMixin, SimpleTestCase):
+    def escrever(self, lotes, **opcoes):
+        caminho = self.caminho('fixture.json')
+        with fixture.EscritorFixture(caminho, 'json', **opcoes) as escritor:
+            for lote in lotes:
+                escritor.escrever(lote)
+        with open(caminho, 'rb') as arquivo:
+            return arquivo.read()
+
+    def esperado(self, objetos):
+        buffer = io.StringIO()
+        json.dump(objetos, buffer, indent=4, ensure_ascii=False)
+        return buffer.getvalue().encode('utf-8')
+
+    def test_igual_ao_json_dump_da_lista_inteira(self):
+        lotes = [
+            [registro('AÇAÍ "grande"'), registro('LINHA\nQUEBRADA', latitude=1e-05)],
+            [],
+            [registro('ÚLTIMA', domicilios=0, fonte_dados='Convencional')],
+        ]
+        objetos = [
+            {'model': fixture.MODELO, 'pk': pk, 'fields': campos}
+            for pk, campos in enumerate((campos for lote in lotes for campos in lote), start=7)
+        ]
+        self.assertEqual(self.escrever(lotes, primeira_pk=7), self.esperado(objetos))
+
+    def test_vazio(self):
+        self.assertEqual(self.escrever([]), self.esperado([]))
+
+    def test_formato_desconhecido(self):
+        with self.assertRaises(ValueError):
+            fixture.EscritorFixture(self.caminho('x'), 'xml')
+
+
+class CarregarTests(TemporarioMixin, TestCase):
+    def campos(self, localidade):
+        return {campo: getattr(localidade, campo) for campo in registro('').keys()}
+
+    def test_ida_e_volta(self):
+        calha = criar_calha('Calha do Alto Rio Negro')
+        registros = [
+            registro('AÇAÍ', calha_rio=calha.id),
+            registro('BOA VISTA', total_ligacoes=5, latitude=1e-05),
+            registro('CARURU', tipo_comunidade=None),
+        ]
+        caminho = self.caminho('fixture.jsonl')
+        with fixture.EscritorFixture(caminho, 'jsonl', primeira_pk=100) as escritor:
+            escritor.escrever(registros[:2])
+            escritor.escrever(registros[2:])
+        self.assertEqual(escritor.total, 3)
+
+        self.assertEqual(fixture.carregar(caminho, tamanho_lote=2), 3)
+        localidades = Localidade.objects.order_by('id')
+        self.assertEqual([localidade.id for localidade in localidades], [100, 101, 102])
+        for localidade, esperado in zip(localidades, registros):
+            self.assertEqual(self.campos(localidade), {campo: esperado[campo] for campo in registro('')})
+        self.assertEqual([localidade.calha_rio_id for localidade in localidades], [calha.id, None, None])
+        # Campos ausentes da fixture ficam com o padrão do modelo.
+        self.assertEqual(localidades[0].hash_conteudo, '')
+
+    def test_pk_existente_e_sobrescrita(self):
+        existente = criar_localidade(nome_comunidade='ANTIGA')
+        caminho = self.caminho('fixture.jsonl')
+        with fixture.EscritorFixture(caminho, 'jsonl', primeira_pk=existente.id) as escritor:
+            escritor.escrever([registro('NOVA', domicilios=3)])
+        fixture.carregar(caminho, tamanho_lote=10)
+        self.assertEqual(Localidade.objects.count(), 1)
+        localidade = Localidade.objects.get(pk=existente.id)
+        self.assertEqual((localidade.nome_comunidade, localidade.domicilios), ('NOVA', 3))
+
+    def test_fixture_invalida(self):
+        casos = {
+            'linha inválida': '{"model": "localidades.localidade", "pk": 1,\n',
+            'sem fields': '{"model": "localidades.localidade", "pk": 1}\n',
+            'outro modelo': '{"model": "localidades.calhario", "pk": 1, "fields": {"nome": "X"}}\n',
+            'sem pk': '{"model": "localidades.localidade", "fields": {"nome_comunidade": "X"}}\n',
+            'campo desconhecido': '{"model": "localidades.localidade", "pk": 1, "fields": {"cor": "azul"}}\n',
+        }
+        for caso, conteudo in casos.items():
+            with self.subTest(caso):
+                caminho = self.caminho('invalida.jsonl')
+                with open(caminho, 'w', encoding='utf-8') as arquivo:
+                    arquivo.write(conteudo)
+                with self.assertRaises(fixture.FixtureInvalida):
+                    fixture.carregar(caminho, tamanho_lote=10)
+        self.assertFalse(Localidade.objects.exists())
+
+    def test_comando_carrega_tudo_ou_nada_com_um_incremento(self):
+        caminho = self.caminho('fixture.jsonl')
+        with fixture.EscritorFixture(caminho, 'jsonl') as escritor:
+            escritor.escrever([registro(f'COMUNIDADE {i}') for i in range(5)])
+        epoca, numero = versao_atual().split('-')
+        call_command('load_localidades_fast', caminho, '--lote', '2', stdout=io.StringIO())
+        self.assertEqual(Localidade.objects.count(), 5)
+        self.assertEqual(versao_atual(), f'{epoca}-{int(numero) + 1}')
+
+        with open(caminho, 'a', encoding='utf-8') as arquivo:
+            arquivo.write('{"model": "localidades.localidade", "pk": 9, "fields": {"cor": "azul"}}\n')
+        with self.assertRaises(CommandError):
+            call_command('load_localidades_fast', caminho, '--substituir', stdout=io.StringIO())
+        self.assertEqual(Localidade.objects.count(), 5)
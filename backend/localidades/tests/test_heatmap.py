@@ -0,0 +1,132 @@
+# backend/localidades/tests/test_heatmap.py
+
+import math
+import random
+
+import numpy as np
+from django.test import override_settings
+
+from localidades import heatmap
+from localidades.models import Localidade
+
+from .base import ApiTestCase, criar_localidade
+
+URL = '/api/localidades/heatmap/'
+# Tile 21/32 do zoom 6: longitudes -61.875 a -56.25, latitudes 0 a -5.62.
+ZOOM, TX, TY = 6, 21, 32
+BBOX_DO_TILE = '-61.8,-5.5,-56.3,-0.1'
+
+
+def mercator(latitude, longitude):
+    """Web Mercator (0 a 1) pela fórmula com asinh, independente de clusters.py."""
+    x = (longitude + 180.0) / 360.0
+    y = (1.0 - math.asinh(math.tan(math.radians(latitude))) / math.pi) / 2.0
+    return x, y
+
+
+@override_settings(LOCALIDADES_HEATMAP_CELULA_PX=16, LOCALIDADES_HEATMAP_MAX_TILES=64)
+class HeatmapTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        gerador = random.Random(11)
+        self.localidades = [
+            criar_localidade(
+                nome_comunidade=f'COMUNIDADE {i}',
+                latitude=gerador.uniform(-5.3, -0.3), longitude=gerador.uniform(-61.5, -56.5),
+                domicilios=gerador.choice([0, 1, 5, 20, None]), total_ligacoes=gerador.choice([0, 3, None]),
+                fonte_dados=gerador.choice(list(Localidade.FonteDados)),
+            )
+            for i in range(300)
+        ]
+        # Vizinhas do mesmo ponto, para haver células com várias localidades.
+        for i in range(5):
+            criar_localidade(nome_comunidade=f'AGLOMERADO {i}', latitude=-3.0001 * (1 + i / 1e5), longitude=-60.0)
+        # Fora do tile.
+        criar_localidade(nome_comunidade='LONGE', latitude=-7.0, longitude=-70.0)
+
+    def pedir(self, **params):
+        return self.client.get(URL, {'z': ZOOM, **params})
+
+    def esperado(self, peso, queryset=None):
+        """Células do tile calculadas com numpy.histogram2d sobre as localidades."""
+        celulas = 256 // 16
+        por_eixo = 2 ** ZOOM * celulas
+        linhas = (queryset or Localidade.objects.all()).values_list('latitude', 'longitude', 'domicilios', 'total_ligacoes')
+        x, y, pesos = [], [], []
+        for latitude, longitude, domicilios, total_ligacoes in linhas:
+            px, py = mercator(latitude, longitude)
+            x.append(px * por_eixo)
+            y.append(py * por_eixo)
+            pesos.append({'quantidade': 1, 'domicilios': domicilios or 0, 'total_ligacoes': total_ligacoes or 0}[peso])
+        bordas_x = np.arange(TX * celulas, (TX + 1) * celulas + 1)
+        bordas_y = np.arange(TY * celulas, (TY + 1) * celulas + 1)
+        soma, _, _ = np.histogram2d(x, y, bins=[bordas_x, bordas_y], weights=pesos)
+        esperado = []
+        for coluna, linha in zip(*np.nonzero(soma)):
+            global_x, global_y = TX * celulas + coluna, TY * celulas + linha
+            longitude = (global_x + 0.5) / por_eixo * 360.0 - 180.0
+            latitude = math.degrees(math.atan(math.sinh(math.pi * (1.0 - 2.0 * (global_y + 0.5) / por_eixo))))
+            esperado.append([round(latitude, 5), round(longitude, 5), int(round(soma[coluna, linha]))])
+        return sorted(esperado)
+
+    def test_igual_ao_histogram2d_em_um_tile(self):
+        for peso in heatmap.PESOS:
+            with self.subTest(peso=peso):
+                resposta = self.pedir(weight=peso, in_bbox=BBOX_DO_TILE)
+                self.assertEqual(resposta.status_code, 200)
+                dados = resposta.json()
+                esperado = self.esperado(peso)
+                self.assertTrue(esperado)
+                self.assertEqual(sorted(dados['celulas']), esperado)
+                self.assertEqual(dados['maximo'], max(valor for _, _, valor in esperado))
+                self.assertEqual((dados['zoom'], dados['peso'], dados['celula_px']), (ZOOM, peso, 16))
+        # Sem weight, conta as localidades; a soma é o total dentro do tile.
+        dados = self.pedir(in_bbox=BBOX_DO_TILE).json()
+        self.assertEqual(dados['peso'], 'quantidade')
+        self.assertEqual(sum(valor for _, _, valor in dados['celulas']), len(self.localidades) + 5)
+        self.assertGreaterEqual(dados['maximo'], 5)
+
+    def test_filtro_fonte_dados(self):
+        dados = self.pedir(in_bbox=BBOX_DO_TILE, fonte_dados='convencional').json()
+        queryset = Localidade.objects.filter(fonte_dados=Localidade.FonteDados.CONVENCIONAL)
+        self.assertEqual(sorted(dados['celulas']), self.esperado('quantidade', queryset))
+
+    def test_save_atualiza_a_grade(self):
+        antes = self.pedir(in_bbox=BBOX_DO_TILE).json()
+        Localidade.objects.get(nome_comunidade='LONGE').delete()
+        localidade = self.localidades[0]
+        localidade.latitude, localidade.longitude = -3.0001, -60.0
+        localidade.save()
+        depois = self.pedir(in_bbox=BBOX_DO_TILE).json()
+        self.assertNotEqual(depois, antes)
+        self.assertEqual(sorted(depois['celulas']), self.esperado('quantidade'))
+        self.assertEqual(depois['maximo'], antes['maximo'] + 1)
+
+    def test_bbox_invertido_nao_tem_celulas(self):
+        # Oeste a leste do leste (ou sul ao norte do norte), com os dois
+        # cantos no mesmo tile: nenhuma célula.
+        for bbox in ('-56.3,-5.5,-61.8,-0.1', '-61.8,-0.1,-56.3,-5.5'):
+            with self.subTest(bbox=bbox):
+                resposta = self.pedir(in_bbox=bbox)
+                self.assertEqual(resposta.status_code, 200)
+                self.assertEqual((resposta.json()['celulas'], resposta.json()['maximo']), ([], 0))
+
+    def test_area_grande_demais(self):
+        resposta = self.pedir(z=10, in_bbox='-62,-6,-56,0')
+        self.assertEqual(resposta.status_code, 400)
+        self.assertIn('64 tiles', resposta.json()['detail'])
+        # Sem bbox, vale a extensão das localidades.
+        self.assertEqual(self.pedir(z=10).status_code, 400)
+        self.assertEqual(self.pedir(z=2).status_code, 200)
+
+    def test_bbox_malformado(self):
+        for bbox in ('abc', '-62,-6,-56', '-62,-6,-56,x'):
+            with self.subTest(bbox=bbox):
+                resposta = self.pedir(in_bbox=bbox)
+                self.assertEqual(resposta.status_code, 400)
+                self.assertIn('"in_bbox" inválido', resposta.json()['detail'])
+
+    def test_parametros_invalidos(self):
+        self.assertEqual(self.client.get(URL).status_code, 400)
+        self.assertEqual(self.pedir(z=23).status_code, 400)
+        self.assertEqual(self.pedir(weight='peso').status_code, 400)
@@ -0,0 +1,316 @@
+# backend/localidades/tests/test_importacao.py
+
+import io
+import os
+import tempfile
+
+import numpy as np
+import openpyxl
+import pandas as pd
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from localidades import importacao
+from localidades.models import CalhaRio, Localidade
+from localidades.versao import versao_atual
+
+CONVENCIONAL = Localidade.FonteDados.CONVENCIONAL
+
+
+def planilha(*linhas, fonte_dados=CONVENCIONAL, primeira_linha=5):
+    """DataFrame como os de `planilha.ler_lotes`, a partir de tuplas na ordem de `importacao.CAMPOS`."""
+    df = pd.DataFrame.from_records(linhas, columns=importacao.CAMPOS)
+    df['fonte_dados'] = fonte_dados
+    df['linha'] = range(primeira_linha, primeira_linha + len(df))
+    return df
+
+
+class LimparTests(SimpleTestCase):
+    def test_conversao_dos_campos(self):
+        validos, rejeitados = importacao.limpar(planilha(
+            (1302603.0, None, '  Manaus ', ' Lago Azul ', 'Ribeirinhos', '12,7', 30.0, '-3,10', ' -60.02 '),
+            (' 1304203 ', 'AM', 'Tefé', 'Boa Vista', '', 4, None, -3.35, -64.71),
+        ))
+        self.assertEqual(rejeitados, [])
+        # Código IBGE lido como float perde o ".0", mesmo numa coluna que
+        # mistura números e texto; o texto fica sem espaços nas pontas.
+        self.assertEqual(validos['ibge'].tolist(), ['1302603', '1304203'])
+        self.assertEqual(validos['municipio'].tolist(), ['Manaus', 'Tefé'])
+        self.assertEqual(validos['nome_comunidade'].tolist(), ['Lago Azul', 'Boa Vista'])
+        self.assertTrue(pd.isna(validos['tipo_comunidade'][1]))
+        # UF ausente vira AM.
+        self.assertEqual(validos['uf'].tolist(), ['AM', 'AM'])
+        self.assertEqual(validos['domicilios'].tolist(), [12, 4])
+        self.assertEqual(str(validos['total_ligacoes'].dtype), 'Int64')
+        self.assertTrue(pd.isna(validos['total_ligacoes'][1]))
+        np.testing.assert_allclose(validos['latitude'], [-3.10, -3.35])
+        np.testing.assert_allclose(validos['longitude'], [-60.02, -64.71])
+
+    def test_motivos_de_rejeicao(self):
+        validos, rejeitados = importacao.limpar(planilha(
+            ('1302603', 'AM', 'MANAUS', 'LAGO AZUL', None, 1, 1, -3.1, -60.0),
+            ('1302603', 'AM', None, 'SEM MUNICIPIO', None, 1, 1, -3.1, -60.0),
+            ('1302603', 'AM', 'MANAUS', None, None, 1, 1, -3.1, -60.0),
+            ('1302603', 'AM', 'MANAUS', 'SEM COORDENADA', None, 1, 1, 'n/d', -60.0),
+            ('1302603', 'AM', 'MANAUS', 'LAGO AZUL', None, 2, 2, -3.2, -60.1),
+            # Linha vazia do fim da aba (só código e UF): ignorada sem relatório.
+            ('1302603', 'AM', None, None, None, None, None, None, None),
+        ))
+        self.assertEqual(validos['linha'].tolist(), [5])
+        self.assertEqual(rejeitados, [
+            {'fonte_dados': CONVENCIONAL, 'linha': 6, 'nome_comunidade': 'SEM MUNICIPIO',
+             'motivo': 'município ou comunidade ausente'},
+            {'fonte_dados': CONVENCIONAL, 'linha': 7, 'nome_comunidade': None, 'motivo': 'município ou comunidade ausente'},
+            {'fonte_dados': CONVENCIONAL, 'linha': 8, 'nome_comunidade': 'SEM COORDENADA', 'motivo': 'coordenadas ausentes'},
+            {'fonte_dados': CONVENCIONAL, 'linha': 9, 'nome_comunidade': 'LAGO AZUL',
+             'motivo': 'repetida (mesma comunidade da linha 5)'},
+        ])
+
+    def test_repetidas_entre_lotes(self):
+        vistas = {}
+        primeiro = planilha(('1', 'AM', 'COARI', 'LAGO', None, 1, 1, -4.0, -63.1))
+        segundo = planilha(
+            ('1', 'AM', 'COARI', 'RIO', None, 1, 1, -4.1, -63.2),
+            ('1', 'AM', 'COARI', 'LAGO', None, 1, 1, -4.2, -63.3),
+            primeira_linha=6,
+        )
+        self.assertEqual(len(importacao.limpar(primeiro, vistas)[0]), 1)
+        validos, rejeitados = importacao.limpar(segundo, vistas)
+        self.assertEqual(validos['nome_comunidade'].tolist(), ['RIO'])
+        self.assertEqual([rejeitado['motivo'] for rejeitado in rejeitados], ['repetida (mesma comunidade da linha 5)'])
+
+    def test_mesmo_nome_em_outra_fonte_nao_e_repetido(self):
+        df = pd.concat([
+            planilha(('1', 'AM', 'COARI', 'LAGO', None, 1, 1, -4.0, -63.1)),
+            planilha(('1', 'AM', 'COARI', 'LAGO', None, 1, 1, -4.0, -63.1), fonte_dados=Localidade.FonteDados.TRANCHE),
+        ], ignore_index=True)
+        validos, rejeitados = importacao.limpar(df)
+        self.assertEqual(len(validos), 2)
+        self.assertEqual(rejeitados, [])
+
+
+class CalhasPorMunicipioTests(SimpleTestCase):
+    calhas = {'Calha do Triângulo': 1, 'Calha do Purus': 2}
+
+    def test_municipios_comparados_sem_acento_e_caixa(self):
+        municipios = pd.Series(['Tefé', ' TEFE ', 'lábrea', 'MANAUS', None], dtype='string', index=[10, 11, 12, 13, 14])
+        ids = importacao.mapear_calhas(municipios, self.calhas)
+        # Manaus é de uma calha que não está em `calhas`.
+        self.assertEqual(ids.index.tolist(), [10, 11, 12, 13, 14])
+        self.assertEqual(ids.tolist()[:3], [1, 1, 2])
+        self.assertTrue(ids[13:].isna().all())
+
+    def test_resumo_sem_limites(self):
+        df = pd.DataFrame({'municipio': ['TEFÉ', 'PAUINI', 'MANAUS'], 'latitude': [0.0] * 3, 'longitude': [0.0] * 3})
+        ids, resumo = importacao.atribuir_calhas(df, self.calhas)
+        self.assertEqual(ids.tolist()[:2], [1, 2])
+        self.assertEqual(resumo, {'limites': 0, 'municipio': 2, 'sem_calha': 1})
+
+    def test_mapeamento_informado(self):
+        df = pd.DataFrame({'municipio': ['Coari', 'Tefé'], 'latitude': [0.0] * 2, 'longitude': [0.0] * 2})
+        ids, resumo = importacao.atribuir_calhas(df, self.calhas, calha_por_municipio={'COARI': 'Calha do Purus'})
+        self.assertEqual(ids[0], 2)
+        self.assertTrue(pd.isna(ids[1]))
+        self.assertEqual(resumo, {'limites': 0, 'municipio': 1, 'sem_calha': 1})
+
+
+class GravarTests(TestCase):
+    def test_grava_em_lotes_com_calha_e_hash(self):
+        calha = CalhaRio.objects.create(nome='Calha do Triângulo')
+        validos, _ = importacao.limpar(planilha(*[
+            ('1304203', 'AM', 'TEFÉ', f'COMUNIDADE {i}', 'Ribeirinhos', i, None, -3.3, -64.7) for i in range(7)
+        ]))
+        validos['calha_rio_id'], _ = importacao.atribuir_calhas(validos, {calha.nome: calha.id})
+        self.assertEqual(importacao.gravar(validos, tamanho_lote=3), 7)
+
+        localidades = Localidade.objects.order_by('domicilios')
+        self.assertEqual(localidades.count(), 7)
+        self.assertEqual({localidade.calha_rio_id for localidade in localidades}, {calha.id})
+        primeira = localidades[0]
+        self.assertEqual(
+            (primeira.ibge, primeira.nome_comunidade, primeira.domicilios, primeira.total_ligacoes),
+            ('1304203', 'COMUNIDADE 0', 0, None),
+        )
+        hashes = importacao.calcular_hashes(validos)
+        self.assertEqual(sorted(localidades.values_list('hash_conteudo', flat=True)), sorted(hashes))
+
+
+def gravar_planilha(caminho):
+    pasta = openpyxl.Workbook()
+    tranche = pasta.active
+    tranche.title = '3ª Tranche'
+    # Sem cabeçalho: colunas pela posição, dados a partir da linha 8.
+    for numero, (ibge, municipio, nome, latitude) in enumerate([
+        (1304203, 'Tefé', 'LAGO DO TRIÂNGULO', -3.3),
+        (1302603, 'Manaus', 'COMUNIDADE DO NEGRO', -3.1),
+        (1302603, 'Manaus', 'COMUNIDADE DO NEGRO', -3.2),
+    ], start=8):
+        tranche.cell(numero, 1, ibge)
+        tranche.cell(numero, 2, 'AM')
+        tranche.cell(numero, 3, municipio)
+        tranche.cell(numero, 4, nome)
+        tranche.cell(numero, 5, 'Ribeirinhos')
+        tranche.cell(numero, 6, 10)
+        tranche.cell(numero, 23, 12)
+        tranche.cell(numero, 27, latitude)
+        tranche.cell(numero, 28, -60.0)
+
+    convencional = pasta.create_sheet('Convencional')
+    colunas = importacao.ABA_CONVENCIONAL['colunas']
+    # Colunas fora da ordem do modelo: são localizadas pelo nome no cabeçalho.
+    cabecalho = list(reversed(colunas.values()))
+    for posicao, nome in enumerate(cabecalho, start=1):
+        convencional.cell(4, posicao, nome)
+    for numero, valores in enumerate([
+        {'municipio': 'Lábrea', 'nome_comunidade': 'SÃO JOSÉ', 'latitude': '-7,25', 'longitude': '-64,8'},
+        {'municipio': 'Lábrea', 'nome_comunidade': 'SEM LUGAR'},
+        {'municipio': 'Nenhures', 'nome_comunidade': 'PERDIDA', 'latitude': -5.0, 'longitude': -62.0},
+    ], start=5):
+        for campo, valor in valores.items():
+            convencional.cell(numero, cabecalho.index(colunas[campo]) + 1, valor)
+    pasta.save(caminho)
+
+
+class ImportDataTests(TestCase):
+    def setUp(self):
+        diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(diretorio.cleanup)
+        self.diretorio = diretorio.name
+        self.arquivo = os.path.join(self.diretorio, 'planilha.xlsx')
+        gravar_planilha(self.arquivo)
+        configuracao = override_settings(
+            LOCALIDADES_CALHAS_LIMITES_ARQUIVO=os.path.join(self.diretorio, 'sem_limites.geojson'),
+            LOCALIDADES_REDE_FLUVIAL_ARQUIVO=os.path.join(self.diretorio, 'sem_rede.geojson'),
+        )
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+
+    def importar(self, *args):
+        saida = io.StringIO()
+        call_command('import_data', '--arquivo', self.arquivo, '--sem-cache', *args, stdout=saida)
+        return saida.getvalue()
+
+    def test_importa_as_duas_abas(self):
+        rejeitados = os.path.join(self.diretorio, 'rejeitados.csv')
+        saida = self.importar('--rejeitados', rejeitados)
+
+        self.assertEqual(CalhaRio.objects.count(), len(importacao.CALHAS))
+        localidades = {
+            (localidade.fonte_dados, localidade.nome_comunidade): localidade
+            for localidade in Localidade.objects.select_related('calha_rio')
+        }
+        self.assertEqual(set(localidades), {
+            (Localidade.FonteDados.CONVENCIONAL, 'PERDIDA'),
+            (Localidade.FonteDados.CONVENCIONAL, 'SÃO JOSÉ'),
+            (Localidade.FonteDados.TRANCHE, 'COMUNIDADE DO NEGRO'),
+            (Localidade.FonteDados.TRANCHE, 'LAGO DO TRIÂNGULO'),
+        })
+        tefe = localidades[(Localidade.FonteDados.TRANCHE, 'LAGO DO TRIÂNGULO')]
+        self.assertEqual((tefe.ibge, tefe.total_ligacoes, tefe.calha_rio.nome), ('1304203', 12, 'Calha do Triângulo'))
+        sao_jose = localidades[(Localidade.FonteDados.CONVENCIONAL, 'SÃO JOSÉ')]
+        self.assertEqual((sao_jose.latitude, sao_jose.longitude), (-7.25, -64.8))
+        self.assertEqual(sao_jose.calha_rio.nome, 'Calha do Purus')
+        self.assertIsNone(localidades[(Localidade.FonteDados.CONVENCIONAL, 'PERDIDA')].calha_rio)
+
+        self.assertIn("Aba '3ª Tranche': 2 importadas, 1 puladas.", saida)
+        self.assertIn("Aba 'Convencional': 1 localidades ficaram sem calha.", saida)
+        self.assertEqual(pd.read_csv(rejeitados).to_dict('records'), [
+            {'fonte_dados': Localidade.FonteDados.TRANCHE, 'linha': 10, 'nome_comunidade': 'COMUNIDADE DO NEGRO',
+             'motivo': 'repetida (mesma comunidade da linha 9)'},
+            {'fonte_dados': Localidade.FonteDados.CONVENCIONAL, 'linha': 6, 'nome_comunidade': 'SEM LUGAR',
+             'motivo': 'coordenadas ausentes'},
+        ])
+
+    def test_reimportar_substitui_tudo(self):
+        self.importar()
+        CalhaRio.objects.create(nome='Calha Extra')
+        self.importar()
+        self.assertEqual(Localidade.objects.count(), 4)
+        self.assertFalse(CalhaRio.objects.filter(nome='Calha Extra').exists())
+
+
+class SincronizarTests(TestCase):
+    def setUp(self):
+        self.calha = CalhaRio.objects.create(nome='Calha do Triângulo')
+
+    def validos(self, *linhas):
+        """Linhas (nome, domicílios) já limpas de Tefé, com a calha atribuída."""
+        validos, _ = importacao.limpar(planilha(*[
+            ('1304203', 'AM', 'TEFÉ', nome, 'Ribeirinhos', domicilios, None, -3.3, -64.7) for nome, domicilios in linhas
+        ]))
+        validos['calha_rio_id'], _ = importacao.atribuir_calhas(validos, {self.calha.nome: self.calha.id})
+        return validos
+
+    def ids(self):
+        return dict(Localidade.objects.filter(fonte_dados=CONVENCIONAL).values_list('nome_comunidade', 'id'))
+
+    def test_insere_atualiza_remove_e_mantem_ids(self):
+        primeira = importacao.sincronizar(self.validos(('A', 1), ('B', 2), ('C', 3)), CONVENCIONAL, tamanho_lote=2)
+        self.assertEqual(primeira, {
+            'inseridas': [('A', 'TEFÉ'), ('B', 'TEFÉ'), ('C', 'TEFÉ')], 'atualizadas': [], 'removidas': [], 'inalteradas': 0,
+        })
+        ids = self.ids()
+        outra_fonte = Localidade.objects.create(
+            nome_comunidade='C', municipio='TEFÉ', fonte_dados=Localidade.FonteDados.TRANCHE, latitude=-3.3, longitude=-64.7,
+        )
+
+        segunda = importacao.sincronizar(self.validos(('A', 1), ('B', 20), ('D', 4)), CONVENCIONAL, tamanho_lote=2)
+        self.assertEqual(segunda, {
+            'inseridas': [('D', 'TEFÉ')], 'atualizadas': [('B', 'TEFÉ')], 'removidas': [('C', 'TEFÉ')], 'inalteradas': 1,
+        })
+        depois = self.ids()
+        self.assertEqual(set(depois), {'A', 'B', 'D'})
+        self.assertEqual((depois['A'], depois['B']), (ids['A'], ids['B']))
+        self.assertEqual(Localidade.objects.get(pk=ids['B']).domicilios, 20)
+        # Só a fonte sincronizada é afetada.
+        self.assertTrue(Localidade.objects.filter(pk=outra_fonte.pk).exists())
+
+    def test_em_varios_lotes_so_remove_o_que_nao_apareceu_em_nenhum(self):
+        importacao.sincronizar(self.validos(('A', 1), ('B', 2), ('C', 3)), CONVENCIONAL)
+        sincronizacao = importacao.Sincronizacao(CONVENCIONAL)
+        sincronizacao.aplicar(self.validos(('A', 1)))
+        sincronizacao.aplicar(self.validos(('C', 30)))
+        diferencas = sincronizacao.finalizar()
+        self.assertEqual(diferencas['removidas'], [('B', 'TEFÉ')])
+        self.assertEqual(diferencas['atualizadas'], [('C', 'TEFÉ')])
+        self.assertEqual(diferencas['inalteradas'], 1)
+
+    def test_sem_diferencas_nao_grava_nem_muda_a_versao(self):
+        validos = self.validos(('A', 1), ('B', 2))
+        importacao.sincronizar(validos, CONVENCIONAL)
+        versao = versao_atual()
+        with CaptureQueriesContext(connection) as consultas:
+            diferencas = importacao.sincronizar(validos, CONVENCIONAL)
+        self.assertFalse([
+            consulta['sql'] for consulta in consultas if consulta['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))
+        ])
+        self.assertEqual(diferencas, {'inseridas': [], 'atualizadas': [], 'removidas': [], 'inalteradas': 2})
+        self.assertEqual(versao_atual(), versao)
+
+    def test_mudanca_de_calha_e_atualizacao(self):
+        importacao.sincronizar(self.validos(('A', 1)), CONVENCIONAL)
+        validos = self.validos(('A', 1))
+        outra = CalhaRio.objects.create(nome='Calha do Purus')
+        validos['calha_rio_id'] = pd.array([outra.id], dtype='Int64')
+        self.assertEqual(importacao.sincronizar(validos, CONVENCIONAL)['atualizadas'], [('A', 'TEFÉ')])
+        self.assertEqual(Localidade.objects.get(nome_comunidade='A').calha_rio_id, outra.id)
+
+    def test_edicao_manual_e_desfeita_pela_proxima_sincronizacao(self):
+        validos = self.validos(('A', 1), ('B', 2))
+        importacao.sincronizar(validos, CONVENCIONAL)
+        a = Localidade.objects.get(nome_comunidade='A')
+        a.domicilios = 99
+        a.save()
+        b = Localidade.objects.get(nome_comunidade='B')
+        b.domicilios = 99
+        b.save(update_fields=['domicilios'])
+        self.assertEqual(set(Localidade.objects.values_list('hash_conteudo', flat=True)), {''})
+
+        diferencas = importacao.sincronizar(validos, CONVENCIONAL)
+        self.assertEqual(diferencas['atualizadas'], [('A', 'TEFÉ'), ('B', 'TEFÉ')])
+        self.assertEqual(list(Localidade.objects.order_by('nome_comunidade').values_list('domicilios', flat=True)), [1, 2])
+        self.assertEqual(
+            sorted(Localidade.objects.values_list('hash_conteudo', flat=True)), sorted(importacao.calcular_hashes(validos)),
+        )
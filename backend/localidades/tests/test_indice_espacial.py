@@ -0,0 +1,109 @@
+# backend/localidades/tests/test_indice_espacial.py
+
+import random
+
+from django.core.management.sql import emit_post_migrate_signal
+from django.db import connection
+
+from localidades import cache_respostas
+from localidades.indice_espacial import GATILHOS, TABELA_RTREE
+from localidades.models import Localidade
+
+from .base import ApiTestCase, criar_localidade
+
+BBOXES = [
+    (-70.0, -10.0, -50.0, 0.0),
+    (-65.0, -6.0, -60.0, -2.0),
+    (-60.0, -3.1, -60.0, -3.1),  # degenerado, exatamente sobre um ponto
+    (-63.37, -4.21, -61.05, -2.93),
+    (-40.0, 10.0, -30.0, 20.0),  # vazio
+]
+
+
+def nova(i, gerador):
+    return Localidade(
+        nome_comunidade=f'EM LOTE {i}', municipio='COARI', uf='AM', fonte_dados=Localidade.FonteDados.CONVENCIONAL,
+        latitude=round(gerador.uniform(-8, -1), 4), longitude=round(gerador.uniform(-68, -56), 4),
+    )
+
+
+class IndiceEspacialTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.gerador = random.Random(3)
+        self.localidades = [criar_localidade(nome_comunidade='MANAUS', latitude=-3.1, longitude=-60.0)]
+        self.localidades += [
+            criar_localidade(
+                nome_comunidade=f'COMUNIDADE {i}',
+                latitude=round(self.gerador.uniform(-8, -1), 4), longitude=round(self.gerador.uniform(-68, -56), 4),
+            )
+            for i in range(40)
+        ]
+        self.assertIndiceSincronizado()
+
+    def por_intervalo(self, oeste, sul, leste, norte):
+        return sorted(Localidade.objects.filter(
+            longitude__gte=oeste, longitude__lte=leste, latitude__gte=sul, latitude__lte=norte,
+        ).values_list('id', flat=True))
+
+    def pela_api(self, bbox):
+        # .update() não gera versão nova; o cache de respostas não deve
+        # esconder o que o índice devolve.
+        cache_respostas.cache().clear()
+        resposta = self.client.get('/api/localidades/', {'in_bbox': ','.join(map(str, bbox))})
+        self.assertEqual(resposta.status_code, 200)
+        return sorted(item['id'] for item in resposta.json())
+
+    def assertIndiceSincronizado(self):
+        for bbox in BBOXES:
+            with self.subTest(bbox=bbox):
+                self.assertEqual(self.pela_api(bbox), self.por_intervalo(*bbox))
+        # O R*Tree tem exatamente uma entrada por localidade.
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT id FROM {TABELA_RTREE} ORDER BY id')
+            no_indice = [linha[0] for linha in cursor.fetchall()]
+        self.assertEqual(no_indice, sorted(Localidade.objects.values_list('id', flat=True)))
+
+    def test_bbox_degenerado_encontra_o_ponto(self):
+        self.assertEqual(self.pela_api((-60.0, -3.1, -60.0, -3.1)), [self.localidades[0].id])
+
+    def test_save(self):
+        movida = self.localidades[0]
+        movida.latitude, movida.longitude = 15.0, -35.0
+        movida.save()
+        criar_localidade(nome_comunidade='NOVA', latitude=-4.0, longitude=-62.0)
+        self.assertIndiceSincronizado()
+        self.assertEqual(self.pela_api(BBOXES[4]), [movida.id])
+
+    def test_update_do_queryset(self):
+        ids = [localidade.id for localidade in self.localidades[:10]]
+        Localidade.objects.filter(id__in=ids).update(latitude=15.5, longitude=-35.5)
+        self.assertIndiceSincronizado()
+        self.assertEqual(self.pela_api(BBOXES[4]), sorted(ids))
+
+    def test_bulk_create(self):
+        Localidade.objects.bulk_create([nova(i, self.gerador) for i in range(30)])
+        self.assertIndiceSincronizado()
+
+    def test_delete(self):
+        self.localidades[0].delete()
+        Localidade.objects.filter(id__in=[localidade.id for localidade in self.localidades[5:20]]).delete()
+        self.assertIndiceSincronizado()
+        Localidade.objects.all().delete()
+        self.assertIndiceSincronizado()
+
+    def test_post_migrate_reconstroi_o_indice(self):
+        # Simula uma migração que recriou a tabela: os gatilhos se perdem e
+        # as gravações seguintes não chegam ao R*Tree.
+        with connection.cursor() as cursor:
+            for nome in GATILHOS:
+                cursor.execute(f'DROP TRIGGER {nome}')
+        Localidade.objects.bulk_create([nova(i, self.gerador) for i in range(10)])
+        Localidade.objects.filter(id=self.localidades[1].id).update(latitude=15.0, longitude=-35.0)
+        self.assertNotEqual(self.pela_api(BBOXES[0]), self.por_intervalo(*BBOXES[0]))
+
+        emit_post_migrate_signal(verbosity=0, interactive=False, db=connection.alias)
+        self.assertIndiceSincronizado()
+        # Os gatilhos voltaram.
+        criar_localidade(nome_comunidade='DEPOIS', latitude=-5.0, longitude=-61.0)
+        self.assertIndiceSincronizado()
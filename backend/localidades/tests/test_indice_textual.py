@@ -0,0 +1,116 @@
+# backend/localidades/tests/test_indice_textual.py
+
+import json
+import os
+import tempfile
+
+from django.db import connection
+
+from localidades import fixture
+from localidades.indice_textual import TABELA_FTS, buscar, consulta_fts
+from localidades.models import Localidade
+
+from .base import ApiTestCase, criar_localidade
+
+
+def ids(queryset):
+    return [localidade.id for localidade in queryset]
+
+
+class IndiceTextualTests(ApiTestCase):
+    def assertIndiceIntegro(self):
+        # Com conteúdo externo, o integrity-check compara o índice com a
+        # tabela de localidades e falha se algum gatilho deixou de rodar.
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {TABELA_FTS} ({TABELA_FTS}, rank) VALUES ('integrity-check', 1)")
+
+    def busca(self, texto):
+        return ids(buscar(Localidade.objects.all(), texto))
+
+    def test_save_e_delete(self):
+        localidade = criar_localidade(nome_comunidade='SÃO GABRIEL')
+        self.assertEqual(self.busca('gabriel'), [localidade.id])
+
+        localidade.nome_comunidade = 'BOA VISTA'
+        localidade.save()
+        self.assertEqual(self.busca('gabriel'), [])
+        self.assertEqual(self.busca('vista'), [localidade.id])
+
+        localidade.delete()
+        self.assertEqual(self.busca('vista'), [])
+        self.assertIndiceIntegro()
+
+    def test_bulk_create(self):
+        criadas = Localidade.objects.bulk_create([
+            Localidade(
+                nome_comunidade=f'LAGO {i}', municipio='TEFÉ', uf='AM', latitude=-3.3, longitude=-64.7,
+                fonte_dados=Localidade.FonteDados.CONVENCIONAL,
+            )
+            for i in range(5)
+        ])
+        self.assertEqual(sorted(self.busca('tefe lago')), sorted(localidade.id for localidade in criadas))
+        self.assertIndiceIntegro()
+
+    def test_fixture_carregar_insere_e_sobrescreve(self):
+        existente = criar_localidade(nome_comunidade='ANTIGA')
+        with tempfile.TemporaryDirectory() as diretorio:
+            caminho = os.path.join(diretorio, 'fixture.jsonl')
+            with open(caminho, 'w', encoding='utf-8') as arquivo:
+                for pk, nome in ((existente.id, 'RENOMEADA'), (existente.id + 1, 'NOVA')):
+                    campos = {
+                        'nome_comunidade': nome, 'municipio': 'COARI', 'uf': 'AM',
+                        'latitude': -4.0, 'longitude': -63.1, 'fonte_dados': Localidade.FonteDados.CONVENCIONAL,
+                    }
+                    arquivo.write(json.dumps({'model': fixture.MODELO, 'pk': pk, 'fields': campos}) + '\n')
+            fixture.carregar(caminho, tamanho_lote=1)
+
+        self.assertEqual(self.busca('antiga'), [])
+        self.assertEqual(self.busca('renomeada'), [existente.id])
+        self.assertEqual(self.busca('nova'), [existente.id + 1])
+        self.assertIndiceIntegro()
+
+    def test_sem_acentos_nos_dois_sentidos(self):
+        com_acento = criar_localidade(nome_comunidade='SÃO JOÃO', municipio='TEFÉ')
+        sem_acento = criar_localidade(nome_comunidade='SAO JOAO DO ARAÇÁ', municipio='TEFE')
+        self.assertEqual(sorted(self.busca('sao joao')), sorted([com_acento.id, sem_acento.id]))
+        self.assertEqual(sorted(self.busca('São João')), sorted([com_acento.id, sem_acento.id]))
+        self.assertEqual(self.busca('araca'), [sem_acento.id])
+        self.assertEqual(sorted(self.busca('tefé')), sorted([com_acento.id, sem_acento.id]))
+
+    def test_prefixo_de_palavra_e_nao_substring(self):
+        # Diferente do icontains do SearchFilter: cada termo casa com o começo
+        # de uma palavra de qualquer campo, e todos os termos precisam casar.
+        localidade = criar_localidade(nome_comunidade='SANTA TEREZINHA', municipio='MANACAPURU')
+        self.assertEqual(self.busca('ter'), [localidade.id])
+        self.assertEqual(self.busca('santa manac'), [localidade.id])
+        self.assertEqual(self.busca('ezinha'), [])
+        self.assertEqual(self.busca('capuru'), [])
+        self.assertEqual(self.busca('santa coari'), [])
+        # Pontuação é separador, não operador do FTS5.
+        self.assertEqual(self.busca('"santa" - (ter*'), [localidade.id])
+
+    def test_consulta_fts(self):
+        self.assertIsNone(consulta_fts('  -- '))
+        self.assertIsNone(consulta_fts(None))
+        self.assertEqual(consulta_fts('São  gab'), '"São"* "gab"*')
+
+    def test_ordenacao_bm25(self):
+        no_municipio = criar_localidade(nome_comunidade='LAGO AZUL', municipio='BARCELOS')
+        no_nome = criar_localidade(nome_comunidade='BARCELOS', municipio='NOVO AIRÃO')
+        no_nome_longo = criar_localidade(
+            nome_comunidade='COMUNIDADE RIBEIRINHA DO BAIXO RIO NEGRO BARCELOS', municipio='NOVO AIRÃO',
+        )
+        # Nome da comunidade pesa mais que o município; nome curto, mais que o longo.
+        self.assertEqual(self.busca('barcelos'), [no_nome.id, no_nome_longo.id, no_municipio.id])
+        relevancias = [localidade.relevancia_busca for localidade in buscar(Localidade.objects.all(), 'barcelos')]
+        self.assertEqual(relevancias, sorted(relevancias))
+
+    def test_search_na_api(self):
+        criar_localidade(nome_comunidade='LAGO AZUL', municipio='BARCELOS')
+        no_nome = criar_localidade(nome_comunidade='BARCELOS', municipio='NOVO AIRÃO')
+        criar_localidade(nome_comunidade='OUTRA', municipio='COARI')
+        resposta = self.client.get('/api/localidades/', {'search': 'barcelos'})
+        self.assertEqual(resposta.status_code, 200)
+        resultado = resposta.json()
+        self.assertEqual(len(resultado), 2)
+        self.assertEqual(resultado[0]['id'], no_nome.id)
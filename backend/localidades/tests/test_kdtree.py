@@ -0,0 +1,86 @@
+# backend/localidades/tests/test_kdtree.py
+
+import numpy as np
+from django.test import SimpleTestCase, override_settings
+
+from localidades.geo import haversine_km
+from localidades.kdtree import ArvoreKD
+
+from .base import ApiTestCase, criar_localidade
+
+
+class ArvoreKDTests(SimpleTestCase):
+    def setUp(self):
+        gerador = np.random.default_rng(42)
+        self.quantidade = 3000
+        self.ids = np.arange(1, self.quantidade + 1) * 10
+        self.latitudes = gerador.uniform(-9.5, 2.5, self.quantidade)
+        self.longitudes = gerador.uniform(-73.5, -56.0, self.quantidade)
+        self.arvore = ArvoreKD(self.ids, self.latitudes, self.longitudes)
+        self.consultas = list(zip(gerador.uniform(-10, 3, 25), gerador.uniform(-75, -55, 25)))
+
+    def forca_bruta(self, latitude, longitude):
+        distancias = haversine_km(latitude, longitude, self.latitudes, self.longitudes)
+        ordem = np.argsort(distancias, kind='stable')
+        return self.ids[ordem], distancias[ordem]
+
+    def test_vizinhos_igual_a_forca_bruta(self):
+        for latitude, longitude in self.consultas:
+            for k in (1, 7, 100):
+                ids, distancias = self.arvore.vizinhos(latitude, longitude, k)
+                esperados, esperadas = self.forca_bruta(latitude, longitude)
+                np.testing.assert_allclose(distancias, esperadas[:k], rtol=1e-9, atol=1e-6)
+                self.assertEqual(set(ids.tolist()), set(esperados[:k].tolist()))
+
+    def test_vizinhos_limitados_ao_raio(self):
+        for latitude, longitude in self.consultas:
+            ids, distancias = self.arvore.vizinhos(latitude, longitude, 50, raio_km=80)
+            esperados, esperadas = self.forca_bruta(latitude, longitude)
+            dentro = esperadas <= 80
+            self.assertEqual(len(ids), min(50, int(dentro.sum())))
+            np.testing.assert_allclose(distancias, esperadas[dentro][:50], rtol=1e-9, atol=1e-6)
+
+    def test_no_raio_igual_a_forca_bruta(self):
+        for latitude, longitude in self.consultas:
+            ids, distancias = self.arvore.no_raio(latitude, longitude, 120)
+            esperados, esperadas = self.forca_bruta(latitude, longitude)
+            dentro = esperadas <= 120
+            self.assertEqual(set(ids.tolist()), set(esperados[dentro].tolist()))
+            np.testing.assert_allclose(distancias, esperadas[dentro], rtol=1e-9, atol=1e-6)
+            self.assertTrue(np.all(np.diff(distancias) >= 0))
+
+    def test_arvore_vazia(self):
+        arvore = ArvoreKD([], [], [])
+        self.assertEqual(len(arvore.vizinhos(-3, -60, 5)[0]), 0)
+        self.assertEqual(len(arvore.no_raio(-3, -60, 100)[0]), 0)
+
+
+class NearestEndpointTests(ApiTestCase):
+    def test_vizinhos_em_ordem_de_distancia(self):
+        perto = criar_localidade(nome_comunidade='PERTO', latitude=-3.11, longitude=-60.01)
+        medio = criar_localidade(nome_comunidade='MEDIO', latitude=-3.5, longitude=-60.5)
+        criar_localidade(nome_comunidade='LONGE', latitude=-7.0, longitude=-70.0)
+        resposta = self.client.get('/api/localidades/nearest/', {'lat': -3.1, 'lon': -60.0, 'k': 2})
+        self.assertEqual(resposta.status_code, 200)
+        dados = resposta.json()
+        self.assertEqual([item['id'] for item in dados], [perto.id, medio.id])
+        self.assertAlmostEqual(dados[0]['distancia_km'], float(haversine_km(-3.1, -60.0, -3.11, -60.01)), places=2)
+
+        resposta = self.client.get('/api/localidades/nearest/', {'lat': -3.1, 'lon': -60.0, 'radius_km': 10})
+        self.assertEqual([item['id'] for item in resposta.json()], [perto.id])
+        self.assertEqual(self.client.get('/api/localidades/nearest/', {'lat': 'x', 'lon': 1}).status_code, 400)
+
+    @override_settings(LOCALIDADES_VIZINHOS_MAX_K=3)
+    def test_raio_sem_k_limitado(self):
+        localidades = [
+            criar_localidade(nome_comunidade=f'COMUNIDADE {i}', latitude=-3.1 - i / 10, longitude=-60.0)
+            for i in range(6)
+        ]
+        params = {'lat': -3.1, 'lon': -60.0, 'radius_km': 5000}
+        resposta = self.client.get('/api/localidades/nearest/', params)
+        self.assertEqual(resposta.status_code, 200)
+        # As mais próximas primeiro, até LOCALIDADES_VIZINHOS_MAX_K.
+        self.assertEqual([item['id'] for item in resposta.json()], [localidade.id for localidade in localidades[:3]])
+        resposta = self.client.get('/api/localidades/nearest/', {**params, 'k': 2})
+        self.assertEqual(len(resposta.json()), 2)
+        self.assertEqual(self.client.get('/api/localidades/nearest/', {**params, 'k': 4}).status_code, 400)
@@ -0,0 +1,191 @@
+# backend/localidades/tests/test_limites_calhas.py
+
+import io
+import json
+import os
+import tempfile
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from localidades import importacao, limites_calhas
+from localidades.limites_calhas import LimitesCalhas, LimitesIndisponiveis
+from localidades.models import Localidade
+
+from .test_importacao import gravar_planilha
+
+
+def retangulo(oeste, sul, leste, norte):
+    return np.array([[oeste, sul], [leste, sul], [leste, norte], [oeste, norte], [oeste, sul]], dtype=np.float64)
+
+
+def estrela(x, y, raio, pontas, vertices, gerador):
+    """Polígono sinuoso (raio variando com o ângulo), fechado."""
+    angulos = np.linspace(0, 2 * np.pi, vertices, endpoint=False)
+    raios = raio * (1 + 0.3 * np.sin(pontas * angulos) + 0.05 * gerador.standard_normal(vertices))
+    anel = np.column_stack([x + raios * np.cos(angulos), y + raios * np.sin(angulos)])
+    return np.vstack([anel, anel[:1]])
+
+
+def par_impar(limites, latitudes, longitudes):
+    """Referência: raio para leste contra todas as arestas de cada região; vale a primeira região."""
+    resultado = np.full(len(latitudes), -1, dtype=np.int64)
+    for i, (y, x) in enumerate(zip(latitudes, longitudes)):
+        for indice, (_, aneis) in enumerate(limites):
+            dentro = False
+            for anel in aneis:
+                x1, y1 = anel[:, 0], anel[:, 1]
+                x2, y2 = np.roll(x1, -1), np.roll(y1, -1)
+                cruza = (y1 > y) != (y2 > y)
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    corte = x1 + (y - y1) * (x2 - x1) / (y2 - y1)
+                dentro ^= bool(np.count_nonzero(cruza & (corte > x)) & 1)
+            if dentro:
+                resultado[i] = indice
+                break
+    return resultado
+
+
+class LimitesCalhasTests(SimpleTestCase):
+    def setUp(self):
+        gerador = np.random.default_rng(7)
+        self.limites = [
+            # Retângulo com um buraco (lago) no meio.
+            ('Com buraco', [retangulo(-70, -8, -60, -2), retangulo(-67, -6, -63, -4)]),
+            # MultiPolygon: uma ilha dentro do buraco e uma parte separada, sinuosa.
+            ('Multi', [retangulo(-66, -5.5, -64, -4.5), estrela(-55, -5, 2.5, 7, 400, gerador)]),
+            # Sobrepõe a borda leste do primeiro: lá vale o primeiro.
+            ('Sobreposto', [estrela(-60, -3, 1.5, 5, 300, gerador)]),
+        ]
+        self.calhas = LimitesCalhas(self.limites)
+        quantidade = 5000
+        self.latitudes = gerador.uniform(-10, 0, quantidade)
+        self.longitudes = gerador.uniform(-72, -50, quantidade)
+
+    def test_igual_ao_teste_par_impar(self):
+        esperado = par_impar(self.limites, self.latitudes, self.longitudes)
+        # Os pontos caem em todas as situações: fora, em cada região, no buraco e na ilha.
+        self.assertEqual(set(esperado.tolist()), {-1, 0, 1, 2})
+        np.testing.assert_array_equal(self.calhas.localizar(self.latitudes, self.longitudes), esperado)
+
+    def test_pontos_conhecidos(self):
+        pontos = {
+            (-3.0, -68.0): 0,   # no retângulo
+            (-5.0, -63.5): -1,  # no buraco
+            (-5.0, -65.0): 1,   # na ilha dentro do buraco
+            (-5.0, -55.0): 1,   # na outra parte do MultiPolygon
+            (-3.0, -60.5): 0,   # na sobreposição: vale o primeiro do arquivo
+            (-3.0, -59.5): 2,
+            (-20.0, -40.0): -1,  # fora da caixa dos limites
+            (float('nan'), -65.0): -1,
+        }
+        latitudes, longitudes = zip(*pontos)
+        self.assertEqual(self.calhas.localizar(latitudes, longitudes).tolist(), list(pontos.values()))
+
+    def test_em_blocos_pequenos(self):
+        esperado = self.calhas.localizar(self.latitudes, self.longitudes)
+        with mock.patch.object(limites_calhas, 'MAX_PARES', 50):
+            np.testing.assert_array_equal(self.calhas.localizar(self.latitudes, self.longitudes), esperado)
+
+    def test_sem_limites(self):
+        self.assertEqual(LimitesCalhas([]).localizar([-3.0], [-60.0]).tolist(), [-1])
+        self.assertEqual(len(self.calhas.localizar([], [])), 0)
+
+
+def gravar_geojson(caminho, features):
+    with open(caminho, 'w', encoding='utf-8') as arquivo:
+        json.dump({'type': 'FeatureCollection', 'features': features}, arquivo)
+
+
+def feature(nome, geometria):
+    return {'type': 'Feature', 'properties': {'nome': nome} if nome else {}, 'geometry': geometria}
+
+
+def poligono(*aneis):
+    return {'type': 'Polygon', 'coordinates': [anel.tolist() for anel in aneis]}
+
+
+class LerLimitesTests(SimpleTestCase):
+    def setUp(self):
+        diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(diretorio.cleanup)
+        self.caminho = os.path.join(diretorio.name, 'calhas.geojson')
+
+    def test_le_poligonos_e_multipoligonos(self):
+        gravar_geojson(self.caminho, [
+            feature(' Calha A ', poligono(retangulo(0, 0, 4, 4), retangulo(1, 1, 2, 2))),
+            feature('Calha B', {'type': 'MultiPolygon', 'coordinates': [
+                [retangulo(5, 0, 6, 1).tolist()], [retangulo(7, 0, 8, 1).tolist()],
+            ]}),
+            feature(None, poligono(retangulo(9, 9, 10, 10))),
+            feature('Sem geometria', None),
+        ])
+        limites = limites_calhas.ler_limites(self.caminho, 'nome')
+        self.assertEqual([(nome, len(aneis)) for nome, aneis in limites], [('Calha A', 2), ('Calha B', 2)])
+        np.testing.assert_array_equal(limites[0][1][0], retangulo(0, 0, 4, 4))
+
+    def test_arquivo_invalido(self):
+        with self.assertRaises(LimitesIndisponiveis):
+            limites_calhas.ler_limites(self.caminho, 'nome')
+        with open(self.caminho, 'w') as arquivo:
+            arquivo.write('{')
+        with self.assertRaises(LimitesIndisponiveis):
+            limites_calhas.ler_limites(self.caminho, 'nome')
+        gravar_geojson(self.caminho, [])
+        self.assertEqual(limites_calhas.ler_limites(self.caminho, 'nome'), [])
+        # Geometria solta, sem feature com o nome da calha.
+        with open(self.caminho, 'w') as arquivo:
+            json.dump(poligono(retangulo(0, 0, 1, 1)), arquivo)
+        with self.assertRaises(LimitesIndisponiveis):
+            limites_calhas.ler_limites(self.caminho, 'nome')
+
+
+class AtribuirCalhasComLimitesTests(SimpleTestCase):
+    def test_municipio_so_para_quem_fica_fora_dos_poligonos(self):
+        limites = LimitesCalhas([
+            ('Calha do Purus', [retangulo(-66, -9, -63, -6)]),
+            ('Calha Inexistente', [retangulo(-61, -4, -59, -2)]),
+        ])
+        calhas = {'Calha do Purus': 1, 'Calha do Triângulo': 2}
+        df = pd.DataFrame({
+            'municipio': ['TEFÉ', 'TEFÉ', 'TEFÉ', 'NENHURES', 'NENHURES'],
+            'latitude': [-7.0, -3.0, -20.0, -3.0, -7.5],
+            'longitude': [-64.0, -60.0, -64.0, -60.0, -65.0],
+        }, index=[3, 5, 8, 13, 21])
+        ids, resumo = importacao.atribuir_calhas(df, calhas, limites)
+        # O polígono tem prioridade sobre o município; o de uma calha que não
+        # existe no banco é ignorado e a linha cai no município.
+        self.assertEqual(ids.index.tolist(), [3, 5, 8, 13, 21])
+        self.assertEqual(ids.tolist()[:3], [1, 2, 2])
+        self.assertTrue(pd.isna(ids[13]))
+        self.assertEqual(ids[21], 1)
+        self.assertEqual(resumo, {'limites': 2, 'municipio': 2, 'sem_calha': 1})
+
+
+class ImportDataComLimitesTests(TestCase):
+    def test_resumo_por_origem_da_calha(self):
+        with tempfile.TemporaryDirectory() as diretorio:
+            arquivo = os.path.join(diretorio, 'planilha.xlsx')
+            gravar_planilha(arquivo)
+            limites = os.path.join(diretorio, 'calhas.geojson')
+            gravar_geojson(limites, [
+                feature('Calha do Purus', poligono(retangulo(-63, -6, -61, -4))),
+                feature('Calha Inexistente', poligono(retangulo(-61, -4, -59, -2))),
+            ])
+            saida = io.StringIO()
+            with override_settings(
+                LOCALIDADES_CALHAS_LIMITES_ARQUIVO=limites,
+                LOCALIDADES_REDE_FLUVIAL_ARQUIVO=os.path.join(diretorio, 'sem_rede.geojson'),
+            ):
+                call_command('import_data', '--arquivo', arquivo, '--sem-cache', stdout=saida)
+
+        saida = saida.getvalue()
+        self.assertIn('Polígonos ignorados (calha inexistente): Calha Inexistente.', saida)
+        self.assertIn('Limites das calhas carregados: 2 polígonos.', saida)
+        self.assertIn("Aba '3ª Tranche': calha pelos limites em 0, pelo município em 2.", saida)
+        self.assertIn("Aba 'Convencional': calha pelos limites em 1, pelo município em 1.", saida)
+        perdida = Localidade.objects.get(nome_comunidade='PERDIDA')
+        self.assertEqual(perdida.calha_rio.nome, 'Calha do Purus')
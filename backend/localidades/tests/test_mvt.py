@@ -0,0 +1,247 @@
+# backend/localidades/tests/test_mvt.py
+
+import math
+import struct
+import tempfile
+from pathlib import Path
+
+from django.test import SimpleTestCase, override_settings
+
+from localidades import mvt
+from localidades.models import Localidade
+
+from .base import ApiTestCase, criar_calha, criar_localidade
+
+
+def ler_varint(dados, posicao):
+    valor = deslocamento = 0
+    while True:
+        byte = dados[posicao]
+        posicao += 1
+        valor |= (byte & 0x7F) << deslocamento
+        deslocamento += 7
+        if not byte & 0x80:
+            return valor, posicao
+
+
+def ler_mensagem(dados):
+    """Lista de (campo, valor) de uma mensagem protobuf: int para varint, bytes para o resto."""
+    campos, posicao = [], 0
+    while posicao < len(dados):
+        chave, posicao = ler_varint(dados, posicao)
+        campo, tipo = chave >> 3, chave & 0x7
+        if tipo == 0:
+            valor, posicao = ler_varint(dados, posicao)
+        elif tipo == 1:
+            valor, posicao = dados[posicao:posicao + 8], posicao + 8
+        elif tipo == 2:
+            tamanho, posicao = ler_varint(dados, posicao)
+            valor, posicao = dados[posicao:posicao + tamanho], posicao + tamanho
+        else:
+            raise AssertionError(f'Tipo de campo inesperado: {tipo}')
+        campos.append((campo, valor))
+    return campos
+
+
+def ler_packed(dados):
+    valores, posicao = [], 0
+    while posicao < len(dados):
+        valor, posicao = ler_varint(dados, posicao)
+        valores.append(valor)
+    return valores
+
+
+def desfazer_zigzag(valor):
+    return (valor >> 1) ^ -(valor & 1)
+
+
+def ler_valor(dados):
+    ((campo, valor),) = ler_mensagem(dados)
+    if campo == 1:
+        return valor.decode('utf-8')
+    if campo == 3:
+        return struct.unpack('<d', valor)[0]
+    if campo == 6:
+        return desfazer_zigzag(valor)
+    if campo == 7:
+        return bool(valor)
+    raise AssertionError(f'Campo de valor inesperado: {campo}')
+
+
+def decodificar_tile(dados):
+    """Decodifica um tile de pontos em {camada: {'extent', 'versao', 'features'}}."""
+    camadas = {}
+    for campo, bytes_camada in ler_mensagem(dados):
+        assert campo == 3, campo
+        camada = {'features': [], 'chaves': [], 'valores': []}
+        for campo_camada, valor in ler_mensagem(bytes_camada):
+            if campo_camada == 1:
+                camada['nome'] = valor.decode('utf-8')
+            elif campo_camada == 2:
+                camada['features'].append(dict(ler_mensagem(valor)))
+            elif campo_camada == 3:
+                camada['chaves'].append(valor.decode('utf-8'))
+            elif campo_camada == 4:
+                camada['valores'].append(ler_valor(valor))
+            elif campo_camada == 5:
+                camada['extent'] = valor
+            elif campo_camada == 15:
+                camada['versao'] = valor
+
+        features = []
+        for feature in camada['features']:
+            comando, dx, dy = ler_packed(feature[4])
+            # MoveTo com um único ponto, deslocado a partir de (0, 0).
+            assert (comando & 0x7, comando >> 3) == (1, 1), comando
+            tags = ler_packed(feature.get(2, b''))
+            features.append({
+                'id': feature[1],
+                'tipo': feature[3],
+                'posicao': (desfazer_zigzag(dx), desfazer_zigzag(dy)),
+                'propriedades': {
+                    camada['chaves'][chave]: camada['valores'][valor] for chave, valor in zip(tags[::2], tags[1::2])
+                },
+                'tags': tags,
+            })
+        camadas[camada['nome']] = {
+            'extent': camada['extent'], 'versao': camada['versao'], 'features': features,
+            'chaves': camada['chaves'], 'valores': camada['valores'],
+        }
+    return camadas
+
+
+def posicao_esperada(z, x, y, latitude, longitude):
+    """Web Mercator pela fórmula com asinh, independente da usada em mvt.py."""
+    n = 2 ** z
+    mx = (longitude + 180.0) / 360.0 * n
+    my = (1.0 - math.asinh(math.tan(math.radians(latitude))) / math.pi) / 2.0 * n
+    return round((mx - x) * mvt.EXTENT), round((my - y) * mvt.EXTENT)
+
+
+class CodificadorTests(SimpleTestCase):
+    def test_ida_e_volta(self):
+        pontos = [
+            (7, 2048, 2048, {'nome': 'CENTRO', 'domicilios': 12, 'fator': 1.5, 'ativa': True, 'vazia': None}),
+            (300, 0, 4095, {'nome': 'AÇAÍ', 'domicilios': -3, 'fator': 1}),
+            (2 ** 40, -64, 4160, {'nome': 'CENTRO', 'ativa': False}),
+        ]
+        camada = decodificar_tile(mvt.codificar_tile('pontos', pontos))['pontos']
+        self.assertEqual((camada['versao'], camada['extent']), (2, mvt.EXTENT))
+        self.assertEqual(len(camada['features']), 3)
+        self.assertEqual([f['id'] for f in camada['features']], [7, 300, 2 ** 40])
+        self.assertEqual({f['tipo'] for f in camada['features']}, {1})
+        # Coordenadas na margem (fora de 0..EXTENT) também são codificadas.
+        self.assertEqual([f['posicao'] for f in camada['features']], [(2048, 2048), (0, 4095), (-64, 4160)])
+        self.assertEqual(
+            [f['propriedades'] for f in camada['features']],
+            [
+                {'nome': 'CENTRO', 'domicilios': 12, 'fator': 1.5, 'ativa': True},
+                {'nome': 'AÇAÍ', 'domicilios': -3, 'fator': 1},
+                {'nome': 'CENTRO', 'ativa': False},
+            ],
+        )
+        # Chaves e valores repetidos entram uma vez só nas tabelas; 1 (int)
+        # e True (bool) não se confundem.
+        self.assertEqual(camada['chaves'], ['nome', 'domicilios', 'fator', 'ativa'])
+        self.assertEqual(camada['valores'], ['CENTRO', 12, 1.5, True, 'AÇAÍ', -3, 1, False])
+        self.assertIs(type(camada['valores'][6]), int)
+        self.assertEqual(camada['features'][2]['tags'], [0, 0, 3, 7])
+
+    def test_sem_pontos(self):
+        self.assertEqual(mvt.codificar_tile('pontos', []), b'')
+
+    def test_posicao_no_tile(self):
+        casos = [(0, 0, 0, 0.0, 0.0), (0, 0, 0, 0.0, 90.0), (2, 1, 2, -3.1, -60.0), (12, 1365, 2083, -3.1, -60.0)]
+        for caso in casos:
+            with self.subTest(caso=caso):
+                self.assertEqual(mvt.posicao_no_tile(*caso), posicao_esperada(*caso))
+        self.assertEqual(mvt.posicao_no_tile(0, 0, 0, 0.0, 0.0), (2048, 2048))
+
+    def test_limites_tile(self):
+        self.assertEqual(mvt.limites_tile(1, 0, 0)[0::2], (-180.0, 0.0))
+        oeste, sul, leste, norte = mvt.limites_tile(0, 0, 0)
+        self.assertAlmostEqual(norte, 85.05112878, places=6)
+        self.assertAlmostEqual(sul, -85.05112878, places=6)
+
+
+class TileViewTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(diretorio.cleanup)
+        self.diretorio = Path(diretorio.name)
+        configuracao = override_settings(LOCALIDADES_TILES_DIR=self.diretorio)
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+
+        self.calha = criar_calha('Calha do Purus')
+        self.manaus = criar_localidade(nome_comunidade='MANAUS', latitude=-3.1, longitude=-60.0, calha_rio=self.calha)
+        criar_localidade(
+            nome_comunidade='TRANCHE', latitude=-3.2, longitude=-60.1, fonte_dados=Localidade.FonteDados.TRANCHE,
+            total_ligacoes=None,
+        )
+        # Em outro tile no zoom 2.
+        criar_localidade(nome_comunidade='BELÉM', latitude=-1.4, longitude=-48.5)
+
+    def tile(self, z=2, x=1, y=2, **params):
+        resposta = self.client.get(f'/api/localidades/tiles/{z}/{x}/{y}.pbf', params)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta['Content-Type'], 'application/vnd.mapbox-vector-tile')
+        if not resposta.content:
+            return []
+        return decodificar_tile(resposta.content)['localidades']['features']
+
+    def nomes(self, features):
+        return sorted(feature['propriedades']['nome_comunidade'] for feature in features)
+
+    def test_features_e_propriedades(self):
+        features = {feature['id']: feature for feature in self.tile()}
+        self.assertEqual(len(features), 3)
+        manaus = features[self.manaus.id]
+        self.assertEqual(manaus['posicao'], posicao_esperada(2, 1, 2, -3.1, -60.0))
+        self.assertEqual(manaus['propriedades'], {
+            'id': self.manaus.id, 'nome_comunidade': 'MANAUS', 'municipio': 'MANAUS', 'uf': 'AM',
+            'tipo_comunidade': 'Ribeirinhos', 'domicilios': 10, 'total_ligacoes': 10,
+            'fonte_dados': 'Convencional', 'calha_rio': 'Calha do Purus',
+        })
+        # Nulos (total_ligacoes, calha) ficam de fora.
+        tranche = next(f for f in features.values() if f['propriedades']['nome_comunidade'] == 'TRANCHE')
+        self.assertNotIn('total_ligacoes', tranche['propriedades'])
+        self.assertNotIn('calha_rio', tranche['propriedades'])
+
+    def test_so_as_localidades_do_tile(self):
+        self.assertEqual(self.nomes(self.tile(z=6, x=21, y=32)), ['MANAUS', 'TRANCHE'])
+        self.assertEqual(self.nomes(self.tile(z=6, x=23, y=32)), ['BELÉM'])
+        self.assertEqual(self.tile(z=6, x=0, y=0), [])
+
+    def test_filtros(self):
+        self.assertEqual(self.nomes(self.tile(fonte_dados='convencional')), ['BELÉM', 'MANAUS'])
+        self.assertEqual(self.nomes(self.tile(fonte_dados='3ª Tranche')), ['TRANCHE'])
+        self.assertEqual(self.nomes(self.tile(calha_rio=self.calha.id)), ['MANAUS'])
+        resposta = self.client.get('/api/localidades/tiles/2/1/2.pbf', {'calha_rio': 'x'})
+        self.assertEqual(resposta.status_code, 400)
+
+    def test_fora_dos_limites(self):
+        for z, x, y in ((23, 0, 0), (1, 2, 0), (1, 0, 2), (2, 4, 1), (0, 1, 0)):
+            with self.subTest(z=z, x=x, y=y):
+                resposta = self.client.get(f'/api/localidades/tiles/{z}/{x}/{y}.pbf')
+                self.assertEqual(resposta.status_code, 404)
+
+    def test_cache_em_disco_por_versao(self):
+        self.tile()
+        (arquivo,) = self.diretorio.rglob('*.pbf')
+        # O tile em disco é servido enquanto a versão não muda.
+        arquivo.write_bytes(mvt.codificar_tile('localidades', [(1, 0, 0, {'nome_comunidade': 'DO DISCO'})]))
+        self.assertEqual(self.nomes(self.tile()), ['DO DISCO'])
+
+        self.manaus.nome_comunidade = 'MANAUS RENOMEADA'
+        self.manaus.save()
+        self.assertEqual(self.nomes(self.tile()), ['BELÉM', 'MANAUS RENOMEADA', 'TRANCHE'])
+        # A pasta da versão anterior foi apagada.
+        self.assertFalse(arquivo.exists())
+        self.assertEqual(len(list(self.diretorio.iterdir())), 1)
+
+    def test_cache_separado_por_filtro(self):
+        self.assertEqual(len(self.tile()), 3)
+        self.assertEqual(len(self.tile(fonte_dados='convencional')), 2)
+        self.assertEqual(len(list(self.diretorio.rglob('*.pbf'))), 2)
@@ -0,0 +1,44 @@
+# backend/localidades/tests/test_paginacao.py
+
+import json
+
+from django.test import override_settings
+
+from .base import ApiTestCase, criar_localidade
+
+
+class PaginacaoCursorTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.ids = [
+            criar_localidade(nome_comunidade=f'COMUNIDADE {i}', latitude=-3 - i / 100).id
+            for i in range(23)
+        ]
+
+    def test_paginas_cobrem_tudo_sem_repetir(self):
+        vistos, url, parametros = [], '/api/localidades/', {'limit': 5}
+        while url:
+            resposta = self.client.get(url, parametros)
+            self.assertEqual(resposta.status_code, 200)
+            pagina = resposta.json()
+            self.assertLessEqual(len(pagina['results']), 5)
+            vistos += [item['id'] for item in pagina['results']]
+            url, parametros = pagina['next'], None
+        self.assertEqual(vistos, sorted(self.ids))
+
+    def test_sem_limit_nem_cursor_devolve_a_lista_completa(self):
+        resposta = self.client.get('/api/localidades/')
+        self.assertEqual([item['id'] for item in resposta.json()], sorted(self.ids))
+
+    @override_settings(LOCALIDADES_STREAM_CHUNK=4)
+    def test_streaming_igual_a_lista_normal(self):
+        normal = self.client.get('/api/localidades/', {'fonte_dados': 'convencional'})
+        streaming = self.client.get('/api/localidades/', {'fonte_dados': 'convencional', 'stream': 'true'})
+        self.assertTrue(streaming.streaming)
+        corpo = b''.join(streaming.streaming_content)
+        self.assertEqual(json.loads(corpo), json.loads(normal.content))
+        self.assertEqual(corpo, normal.content)
+
+    def test_streaming_vazio(self):
+        resposta = self.client.get('/api/localidades/', {'fonte_dados': '3ª Tranche', 'stream': '1'})
+        self.assertEqual(b''.join(resposta.streaming_content), b'[]')
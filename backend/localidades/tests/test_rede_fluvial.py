@@ -0,0 +1,224 @@
+# backend/localidades/tests/test_rede_fluvial.py
+
+import io
+import json
+import os
+import tempfile
+
+import numpy as np
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+
+from localidades import rede_fluvial
+from localidades.geo import haversine_km
+
+from .base import ApiTestCase, criar_calha, criar_localidade
+
+
+def _trecho(inicio, fim, passos):
+    """Linha reta de `inicio` a `fim` (lon, lat) com `passos` segmentos."""
+    return [
+        [round(inicio[0] + (fim[0] - inicio[0]) * i / passos, 5), round(inicio[1] + (fim[1] - inicio[1]) * i / passos, 5)]
+        for i in range(passos + 1)
+    ]
+
+
+# Rio principal de oeste a leste, um afluente ao norte e um desvio ao sul,
+# mais longo, entre -59.8 e -59.2: três pontas e três junções.
+LINHAS = [
+    _trecho((-60.0, -3.0), (-59.0, -3.0), 10),
+    _trecho((-59.5, -3.0), (-59.5, -2.5), 5),
+    _trecho((-59.8, -3.0), (-59.8, -3.3), 3) + _trecho((-59.8, -3.3), (-59.2, -3.3), 6)[1:]
+    + _trecho((-59.2, -3.3), (-59.2, -3.0), 3)[1:],
+]
+
+# (id, latitude, longitude, calha): perto de vértices da rede.
+LOCALIDADES = [
+    (1, -3.001, -59.9, 10),
+    (2, -3.0, -59.3, 10),
+    (3, -2.6, -59.501, 10),
+    (4, -3.3, -59.5, 20),
+    (5, -3.0, -59.0, 20),
+    (6, -8.0, -50.0, 10),  # Longe demais da rede.
+]
+
+
+def gravar_rede(diretorio):
+    caminho = os.path.join(diretorio, 'rede.geojson')
+    with open(caminho, 'w', encoding='utf-8') as arquivo:
+        json.dump({'type': 'FeatureCollection', 'features': [
+            {'type': 'Feature', 'properties': {}, 'geometry': {'type': 'MultiLineString', 'coordinates': LINHAS[:2]}},
+            {'type': 'Feature', 'properties': {}, 'geometry': {'type': 'LineString', 'coordinates': LINHAS[2]}},
+        ]}, arquivo)
+    return caminho
+
+
+def comprimento(linha):
+    lon, lat = np.array(linha).T
+    return float(haversine_km(lat[:-1], lon[:-1], lat[1:], lon[1:]).sum())
+
+
+def floyd_warshall(quantidade, origem, destino, peso):
+    distancias = np.full((quantidade, quantidade), np.inf)
+    np.fill_diagonal(distancias, 0)
+    distancias[origem, destino] = np.minimum(distancias[origem, destino], peso)
+    distancias[destino, origem] = distancias[origem, destino]
+    for k in range(quantidade):
+        distancias = np.minimum(distancias, distancias[:, k:k + 1] + distancias[k:k + 1, :])
+    return distancias
+
+
+class RedeFluvialTests(SimpleTestCase):
+    def setUp(self):
+        diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(diretorio.cleanup)
+        self.caminho = gravar_rede(diretorio.name)
+        self.linhas = rede_fluvial.ler_linhas(self.caminho)
+        self.grafo = rede_fluvial.construir_grafo(self.linhas, 5)
+        self.arrays, self.resumo = rede_fluvial.preparar(self.caminho, LOCALIDADES, 5, 30)
+        self.rede = rede_fluvial.RedeFluvial(self.arrays)
+
+        # Distâncias de referência no grafo completo, sem contração.
+        latitudes, longitudes, origem, destino, peso = self.grafo
+        self.completo = floyd_warshall(len(latitudes), origem, destino, peso)
+        self.no_original = {
+            (round(float(lat), 5), round(float(lon), 5)): no
+            for no, (lat, lon) in enumerate(zip(latitudes, longitudes))
+        }
+
+    def original(self, no_contraido):
+        return self.no_original[tuple(round(c, 5) for c in self.rede.coordenadas(no_contraido))]
+
+    def test_grafo_une_vertices_compartilhados(self):
+        latitudes, _, origem, _, _ = self.grafo
+        # 11 + 6 + 13 vértices, com 3 compartilhados entre as linhas.
+        self.assertEqual(len(latitudes), 11 + 6 + 13 - 3)
+        self.assertEqual(len(origem), 10 + 5 + 12)
+
+    def test_contracao_mantem_juncoes_localidades_e_comprimento(self):
+        _, _, origem, destino, peso = self.grafo
+        # Pontas (3), junções (3) e os nós das localidades 1 a 4 (a 5 fica numa ponta).
+        self.assertEqual(self.resumo['localidades_encaixadas'], 5)
+        self.assertEqual(self.resumo['localidades_fora_da_rede'], 1)
+        self.assertEqual(self.resumo['nos_contraidos'], 3 + 3 + 4)
+        self.assertLess(self.resumo['arestas_contraidas'], len(origem))
+        self.assertAlmostEqual(float(self.rede.pesos.sum()), float(peso.sum()), places=9)
+        # Cada aresta contraída guarda os nós originais do trecho que substitui.
+        for aresta in range(len(self.rede.pesos)):
+            u = int(self.rede.nos[self.rede.arestas_u[aresta]])
+            v = int(self.rede.nos[self.rede.arestas_v[aresta]])
+            caminho = [u, *self.rede.intermediarios[self.rede.offsets[aresta]:self.rede.offsets[aresta + 1]].tolist(), v]
+            comprimento = sum(self.completo[a, b] for a, b in zip(caminho, caminho[1:]))
+            self.assertAlmostEqual(comprimento, float(self.rede.pesos[aresta]), places=9)
+
+    def test_contracao_de_ciclo_isolado(self):
+        # Quadrado só com nós de grau 2: sobra um nó e uma aresta para ele mesmo não é criada.
+        origem, destino = np.array([0, 1, 2, 3]), np.array([1, 2, 3, 0])
+        nos, arestas_u, _, pesos, _, _ = rede_fluvial.contrair(4, origem, destino, np.ones(4), np.zeros(4, dtype=bool))
+        self.assertEqual(len(nos), 1)
+        self.assertEqual(len(pesos), 0)
+
+    def test_dijkstra_e_a_estrela_iguais_ao_grafo_completo(self):
+        nos = [self.rede.encaixar(i, lat, lon, 30)[0] for i, lat, lon, _ in LOCALIDADES[:5]]
+        for origem in nos:
+            distancias = self.rede.dijkstra(origem, nos)
+            for destino, distancia in zip(nos, distancias):
+                esperada = self.completo[self.original(origem), self.original(destino)]
+                self.assertAlmostEqual(distancia, esperada, places=9)
+                resultado = self.rede.a_estrela(origem, destino)
+                self.assertAlmostEqual(resultado[0], esperada, places=9)
+                # A geometria sai da origem, chega ao destino e tem o comprimento da rota.
+                pontos = np.array(self.rede.geometria(origem, resultado[1]))
+                self.assertEqual(tuple(pontos[0]), self.rede.coordenadas(origem))
+                self.assertEqual(tuple(pontos[-1]), self.rede.coordenadas(destino))
+                comprimento = haversine_km(pontos[:-1, 0], pontos[:-1, 1], pontos[1:, 0], pontos[1:, 1]).sum()
+                self.assertAlmostEqual(float(comprimento), esperada, places=6)
+
+    def test_distancias_pre_calculadas_por_calha(self):
+        self.assertEqual(self.resumo['calhas'], 2)
+        for calha in (10, 20):
+            nos = [self.rede.encaixar(i, lat, lon, 30)[0] for i, lat, lon, c in LOCALIDADES[:5] if c == calha]
+            for origem in nos:
+                for destino in nos:
+                    esperada = self.completo[self.original(origem), self.original(destino)]
+                    self.assertAlmostEqual(self.rede.distancia_pre_calculada(calha, origem, destino), esperada, places=3)
+        # Localidades de calhas diferentes não têm distância pré-calculada.
+        no_1 = self.rede.encaixar(1, -3.001, -59.9, 30)[0]
+        no_5 = self.rede.encaixar(5, -3.0, -59.0, 30)[0]
+        self.assertIsNone(self.rede.distancia_pre_calculada(10, no_1, no_5))
+
+    def test_encaixe(self):
+        no, distancia = self.rede.encaixar(1, -3.001, -59.9, 30)
+        self.assertEqual(self.rede.coordenadas(no), (-3.0, -59.9))
+        self.assertAlmostEqual(distancia, float(haversine_km(-3.001, -59.9, -3.0, -59.9)), places=9)
+        self.assertIsNone(self.rede.encaixar(6, -8.0, -50.0, 30))
+
+    def test_localidade_movida_depois_da_preparacao_e_encaixada_de_novo(self):
+        no, distancia = self.rede.encaixar(1, -2.5, -59.5, 30)
+        self.assertEqual(self.rede.coordenadas(no), (-2.5, -59.5))
+        self.assertEqual(distancia, 0)
+        # Localidade criada depois da preparação: só os nós mantidos na contração servem.
+        no, _ = self.rede.encaixar(99, -3.29, -59.5, 30)
+        self.assertEqual(self.rede.coordenadas(no), (-3.3, -59.5))
+        self.assertIsNone(self.rede.encaixar(99, -3.3, -59.8, 30))
+
+
+class RotaFluvialEndpointTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(diretorio.cleanup)
+        self.caminho = gravar_rede(diretorio.name)
+        self.preparada = os.path.join(diretorio.name, 'rede.npz')
+        configuracao = override_settings(
+            LOCALIDADES_REDE_FLUVIAL_ARQUIVO=self.caminho,
+            LOCALIDADES_REDE_FLUVIAL_PREPARADA=self.preparada,
+            LOCALIDADES_REDE_FLUVIAL_CASAS_DECIMAIS=5,
+            LOCALIDADES_REDE_FLUVIAL_MAX_ENCAIXE_KM=30,
+        )
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+
+    def rota(self, origem, destino, **params):
+        return self.client.get('/api/rotas/fluvial/', {'origem': origem.pk, 'destino': destino.pk, **params})
+
+    def test_sem_rede_preparada_responde_503(self):
+        a, b = criar_localidade(nome_comunidade='A'), criar_localidade(nome_comunidade='B')
+        resposta = self.rota(a, b)
+        self.assertEqual(resposta.status_code, 503)
+        self.assertIn('preparar_rede_fluvial', resposta.json()['detail'])
+
+    def test_rota_pela_rede(self):
+        calha = criar_calha('CALHA')
+        a = criar_localidade(nome_comunidade='A', latitude=-3.0, longitude=-60.0, calha_rio=calha)
+        b = criar_localidade(nome_comunidade='B', latitude=-3.0, longitude=-59.0, calha_rio=calha)
+        call_command('preparar_rede_fluvial', stdout=io.StringIO())
+
+        # Mesma calha: distância pré-calculada, sem geometria.
+        resposta = self.rota(a, b, geometria='false').json()
+        esperada = comprimento(LINHAS[0])
+        self.assertAlmostEqual(resposta['distancia_rio_km'], esperada, places=2)
+        self.assertNotIn('geometria', resposta)
+
+        resposta = self.rota(a, b).json()
+        self.assertAlmostEqual(resposta['distancia_rio_km'], esperada, places=2)
+        self.assertEqual(resposta['geometria'][0], [-3.0, -60.0])
+        self.assertEqual(resposta['geometria'][-1], [-3.0, -59.0])
+
+    def test_localidade_movida_depois_da_preparacao(self):
+        a = criar_localidade(nome_comunidade='A', latitude=-3.0, longitude=-60.0)
+        b = criar_localidade(nome_comunidade='B', latitude=-3.0, longitude=-59.0)
+        call_command('preparar_rede_fluvial', stdout=io.StringIO())
+
+        b.latitude, b.longitude = -2.5, -59.5
+        b.save()
+        resposta = self.rota(a, b, geometria='false').json()
+        esperada = comprimento(LINHAS[0][:6]) + comprimento(LINHAS[1])
+        self.assertAlmostEqual(resposta['distancia_rio_km'], esperada, places=2)
+        self.assertEqual(resposta['encaixe_km'], [0, 0])
+
+    def test_localidade_longe_da_rede(self):
+        a = criar_localidade(nome_comunidade='A', latitude=-3.0, longitude=-60.0)
+        b = criar_localidade(nome_comunidade='B', latitude=-8.0, longitude=-50.0)
+        call_command('preparar_rede_fluvial', stdout=io.StringIO())
+        self.assertEqual(self.rota(a, b).status_code, 404)
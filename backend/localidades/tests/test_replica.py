@@ -0,0 +1,103 @@
+# backend/localidades/tests/test_replica.py
+
+import threading
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import DEFAULT_DB_ALIAS, connections, router, transaction
+from django.test import TransactionTestCase, override_settings
+
+from localidades import replica
+from localidades.models import Localidade
+from localidades.versao import versao_alterada
+
+from .base import criar_localidade
+
+CONFIGURACAO = {
+    'ENGINE': 'django.db.backends.sqlite3',
+    'NAME': 'file:localidades_replica_teste?mode=memory&cache=shared',
+}
+
+
+def aguardar_copia():
+    for thread in threading.enumerate():
+        if thread.name == 'replica-localidades':
+            thread.join(10)
+
+
+# TransactionTestCase: a cópia é feita por outra conexão, que só enxerga o
+# que já foi confirmado no banco principal.
+@override_settings(DATABASE_ROUTERS=['localidades.replica.RoteadorReplica'])
+class ReplicaTests(TransactionTestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Liga a réplica como o settings faz com LOCALIDADES_REPLICA_MEMORIA.
+        # Só aqui: o runner não cria banco de teste para ela.
+        cls.enterClassContext(mock.patch.dict(settings.DATABASES, {replica.ALIAS: CONFIGURACAO}))
+        connections.settings[replica.ALIAS] = connections.configure_settings(settings.DATABASES)[replica.ALIAS]
+        cls.addClassCleanup(cls.remover_replica)
+        cls.databases = {DEFAULT_DB_ALIAS, replica.ALIAS}
+        super().setUpClass()
+
+    @classmethod
+    def remover_replica(cls):
+        connections[replica.ALIAS].close()
+        del connections[replica.ALIAS]
+        del connections.settings[replica.ALIAS]
+        del cls.databases
+
+    def setUp(self):
+        self.addCleanup(self.desligar)
+        self.localidade = criar_localidade(nome_comunidade='ORIGINAL')
+        self.usuario = User.objects.create_user('teste', password='senha-de-teste')
+        self.client.force_login(self.usuario)
+
+    def desligar(self):
+        aguardar_copia()
+        if replica._guardia is not None:
+            replica._guardia.close()
+        replica._guardia, replica._versao, replica._atualizando = None, None, False
+
+    def lido(self):
+        return Localidade.objects.get(pk=self.localidade.pk).nome_comunidade
+
+    def test_leituras_vao_para_a_replica_atualizada(self):
+        self.assertEqual(router.db_for_read(Localidade), DEFAULT_DB_ALIAS)
+        replica.atualizar()
+        self.assertTrue(replica.disponivel())
+        self.assertEqual(router.db_for_read(Localidade), replica.ALIAS)
+        self.assertEqual(Localidade.objects.get(pk=self.localidade.pk)._state.db, replica.ALIAS)
+        # Dentro de uma transação, quem escreve lê do banco principal.
+        with transaction.atomic():
+            self.assertEqual(router.db_for_read(Localidade), DEFAULT_DB_ALIAS)
+
+    def test_escrita_seguida_de_leitura_nunca_le_dado_velho(self):
+        for i in range(10):
+            self.client.get('/api/calhas/')
+            aguardar_copia()
+            self.assertTrue(replica.disponivel())
+            self.localidade.nome_comunidade = f'NOVA {i}'
+            self.localidade.save()
+            self.assertEqual(self.lido(), f'NOVA {i}')
+            resposta = self.client.get(f'/api/localidades/{self.localidade.pk}/')
+            self.assertEqual(resposta.json()['nome_comunidade'], f'NOVA {i}')
+
+    def test_copia_invalidada_durante_a_copia_nao_e_publicada(self):
+        # Uma escrita deste processo durante a cópia, ainda não confirmada:
+        # a versão no banco não mudou, mas a cópia não tem a alteração.
+        copiar = replica._copiar
+
+        def copiar_e_invalidar(origem):
+            copiar(origem)
+            versao_alterada.send(sender=None)
+
+        with mock.patch.object(replica, '_copiar', copiar_e_invalidar):
+            replica.atualizar()
+        self.assertFalse(replica.disponivel())
+        self.assertEqual(router.db_for_read(Localidade), DEFAULT_DB_ALIAS)
+
+        # A próxima requisição agenda uma cópia nova, que é publicada.
+        self.client.get('/api/calhas/')
+        aguardar_copia()
+        self.assertTrue(replica.disponivel())
@@ -0,0 +1,143 @@
+# backend/localidades/tests/test_resumo.py
+
+import io
+import json
+import os
+import tempfile
+
+import pandas as pd
+from django.core.management import call_command
+from django.db.models import Count, Sum, Value
+from django.db.models.functions import Coalesce
+
+from localidades import fixture, importacao, resumo
+from localidades.models import CalhaRio, Localidade
+
+from .base import ApiTestCase, criar_calha, criar_localidade
+
+CONVENCIONAL = Localidade.FonteDados.CONVENCIONAL
+TRANCHE = Localidade.FonteDados.TRANCHE
+
+
+def agregado_direto(agrupar_por):
+    """O que `resumo.estatisticas` deveria devolver, calculado direto sobre as localidades."""
+    colunas = []
+    for campo in agrupar_por:
+        colunas += ['calha_rio_id', 'calha_rio__nome'] if campo == 'calha_rio' else [campo]
+    totais = dict(
+        quantidade=Count('id'),
+        domicilios=Coalesce(Sum('domicilios'), Value(0)),
+        total_ligacoes=Coalesce(Sum('total_ligacoes'), Value(0)),
+    )
+    if not colunas:
+        return [Localidade.objects.aggregate(**totais)]
+    renomear = {'calha_rio_id': 'calha_rio', 'calha_rio__nome': 'calha_rio_nome'}
+    return [
+        {renomear.get(chave, chave): valor for chave, valor in linha.items()}
+        for linha in Localidade.objects.values(*colunas).annotate(**totais).order_by(*colunas)
+    ]
+
+
+class ResumoConsistenteTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.purus = criar_calha('Calha do Purus')
+        self.jurua = criar_calha('Calha do Juruá')
+        for i in range(6):
+            criar_localidade(
+                nome_comunidade=f'COMUNIDADE {i}', municipio=('LÁBREA', 'CARAUARI')[i % 2],
+                calha_rio=(self.purus, self.jurua, None)[i % 3], tipo_comunidade=('Ribeirinhos', None)[i % 2],
+                domicilios=i * 10, total_ligacoes=None if i == 4 else i,
+            )
+        self.assertResumoConsistente()
+
+    def assertResumoConsistente(self):
+        for agrupar_por in ([], ['calha_rio'], ['municipio', 'fonte_dados'], list(resumo.DIMENSOES)):
+            with self.subTest(agrupar_por=agrupar_por):
+                self.assertEqual(resumo.estatisticas(agrupar_por), agregado_direto(agrupar_por))
+        # Nenhum grupo vazio sobra na tabela.
+        self.assertFalse(resumo.ResumoLocalidades.objects.filter(quantidade=0).exists())
+
+    def test_save_que_muda_de_grupo(self):
+        localidade = Localidade.objects.get(nome_comunidade='COMUNIDADE 0')
+        localidade.municipio = 'PAUINI'
+        localidade.calha_rio = self.jurua
+        localidade.domicilios = 7
+        localidade.save()
+        self.assertResumoConsistente()
+        # O grupo antigo (Lábrea, Purus) perdeu a localidade.
+        self.assertFalse(resumo.ResumoLocalidades.objects.filter(municipio='PAUINI', calha_rio=self.purus).exists())
+
+    def test_delete(self):
+        Localidade.objects.get(nome_comunidade='COMUNIDADE 3').delete()
+        self.assertResumoConsistente()
+        Localidade.objects.all().delete()
+        self.assertResumoConsistente()
+        self.assertFalse(resumo.ResumoLocalidades.objects.exists())
+
+    def test_gravar(self):
+        validos, _ = importacao.limpar(pd.DataFrame({
+            'ibge': ['1302405'] * 3, 'uf': ['AM'] * 3, 'municipio': ['LÁBREA', 'LÁBREA', 'TAPAUÁ'],
+            'nome_comunidade': ['NOVA 1', 'NOVA 2', 'NOVA 3'], 'tipo_comunidade': ['Ribeirinhos', 'Indígenas', None],
+            'domicilios': [1, 2, None], 'total_ligacoes': [3, None, 5],
+            'latitude': [-7.2] * 3, 'longitude': [-64.8] * 3, 'fonte_dados': [TRANCHE] * 3, 'linha': [8, 9, 10],
+        }))
+        validos['calha_rio_id'], _ = importacao.atribuir_calhas(validos, {self.purus.nome: self.purus.id})
+        importacao.gravar(validos)
+        self.assertResumoConsistente()
+
+    def test_sincronizacao(self):
+        existentes = pd.DataFrame(Localidade.objects.values(*importacao.CAMPOS, 'fonte_dados', 'calha_rio_id'))
+        # Uma linha muda de calha e de tipo, uma some e uma é nova.
+        existentes.loc[0, ['calha_rio_id', 'tipo_comunidade']] = [self.jurua.id, 'Indígenas']
+        existentes = existentes.drop(index=1)
+        nova = existentes.iloc[[0]].assign(nome_comunidade='NOVA', domicilios=5)
+        df = pd.concat([existentes, nova], ignore_index=True)
+        df['calha_rio_id'] = df['calha_rio_id'].astype('Int64')
+        diferencas = importacao.sincronizar(df, CONVENCIONAL, tamanho_lote=2)
+        self.assertEqual((len(diferencas['inseridas']), len(diferencas['removidas'])), (1, 1))
+        self.assertTrue(diferencas['atualizadas'])
+        self.assertResumoConsistente()
+
+    def test_load_localidades_fast(self):
+        movida = Localidade.objects.get(nome_comunidade='COMUNIDADE 1')
+        with tempfile.TemporaryDirectory() as diretorio:
+            caminho = os.path.join(diretorio, 'fixture.jsonl')
+            with fixture.EscritorFixture(caminho, 'jsonl') as escritor:
+                campos = {
+                    'nome_comunidade': 'MOVIDA', 'municipio': 'TAPAUÁ', 'uf': 'AM', 'latitude': -5.6, 'longitude': -63.2,
+                    'fonte_dados': TRANCHE, 'calha_rio': self.purus.id, 'domicilios': 4,
+                }
+                # Sobrescreve uma localidade existente (outro grupo) e acrescenta outra.
+                escritor.escrever([campos, {**campos, 'nome_comunidade': 'NOVA'}], pks=[movida.id, movida.id + 100])
+            call_command('load_localidades_fast', caminho, stdout=io.StringIO())
+        self.assertResumoConsistente()
+
+    def test_loaddata(self):
+        movida = Localidade.objects.get(nome_comunidade='COMUNIDADE 2')
+        objetos = [
+            {'model': fixture.MODELO, 'pk': pk, 'fields': {
+                'nome_comunidade': nome, 'municipio': 'BERURI', 'uf': 'AM', 'latitude': -3.9, 'longitude': -61.4,
+                'fonte_dados': TRANCHE, 'calha_rio': self.jurua.id, 'domicilios': 9, 'total_ligacoes': 2,
+            }}
+            for pk, nome in ((movida.id, 'MOVIDA'), (movida.id + 100, 'NOVA'))
+        ]
+        with tempfile.TemporaryDirectory() as diretorio:
+            caminho = os.path.join(diretorio, 'resumo_fixture.json')
+            with open(caminho, 'w', encoding='utf-8') as arquivo:
+                json.dump(objetos, arquivo)
+            call_command('loaddata', caminho, verbosity=0)
+        self.assertResumoConsistente()
+
+    def test_apagar_calha(self):
+        self.purus.delete()
+        self.assertResumoConsistente()
+        self.assertTrue(Localidade.objects.filter(calha_rio__isnull=True).exists())
+        CalhaRio.objects.all().delete()
+        self.assertResumoConsistente()
+
+    def test_endpoint_usa_a_tabela_de_resumo(self):
+        Localidade.objects.filter(nome_comunidade='COMUNIDADE 5').delete()
+        resposta = self.client.get('/api/estatisticas/', {'group_by': 'calha_rio'})
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.json(), agregado_direto(['calha_rio']))
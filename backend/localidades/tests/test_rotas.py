@@ -0,0 +1,70 @@
+# backend/localidades/tests/test_rotas.py
+
+import time
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from localidades.geo import haversine_km
+from localidades.rotas import planejar_visita
+
+
+class PlanejarVisitaTests(SimpleTestCase):
+    def setUp(self):
+        gerador = np.random.default_rng(7)
+        self.inicio = (-3.1, -60.0)
+        self.latitudes = gerador.uniform(-8, 0, 400)
+        self.longitudes = gerador.uniform(-70, -58, 400)
+
+    def assertRotaValida(self, ordem, trechos):
+        self.assertEqual(sorted(ordem), list(range(len(self.latitudes))))
+        self.assertEqual(len(trechos), len(ordem))
+        # O primeiro trecho sai do ponto de partida.
+        primeiro = ordem[0]
+        self.assertAlmostEqual(
+            trechos[0], float(haversine_km(*self.inicio, self.latitudes[primeiro], self.longitudes[primeiro])), places=6,
+        )
+        for anterior, atual, trecho in zip(ordem, ordem[1:], trechos[1:]):
+            esperado = haversine_km(self.latitudes[anterior], self.longitudes[anterior], self.latitudes[atual], self.longitudes[atual])
+            self.assertAlmostEqual(trecho, float(esperado), places=6)
+
+    def test_rota_aberta_valida_e_nao_piora(self):
+        ordem, trechos, estatisticas = planejar_visita(self.inicio, self.latitudes, self.longitudes, tempo_limite=0.5)
+        self.assertRotaValida(ordem, trechos)
+        # A matriz interna é float32: tolerância de 0,01%.
+        self.assertLessEqual(sum(trechos), estatisticas['distancia_inicial_km'] * 1.0001)
+        self.assertGreater(estatisticas['melhorias_2opt'] + estatisticas['melhorias_oropt'], 0)
+
+    def test_rota_com_retorno_valida_e_nao_piora(self):
+        ordem, trechos, estatisticas = planejar_visita(
+            self.inicio, self.latitudes, self.longitudes, retornar=True, tempo_limite=0.5,
+        )
+        self.assertRotaValida(ordem, trechos)
+        ultimo = ordem[-1]
+        retorno = float(haversine_km(self.latitudes[ultimo], self.longitudes[ultimo], *self.inicio))
+        self.assertAlmostEqual(estatisticas['distancia_retorno_km'], retorno, places=6)
+        self.assertLessEqual(sum(trechos) + retorno, estatisticas['distancia_inicial_km'] * 1.0001)
+
+    def test_sem_tempo_fica_a_rota_do_vizinho_mais_proximo(self):
+        ordem, trechos, estatisticas = planejar_visita(self.inicio, self.latitudes, self.longitudes, tempo_limite=0)
+        self.assertRotaValida(ordem, trechos)
+        self.assertEqual(estatisticas['rodadas'], 0)
+        self.assertAlmostEqual(sum(trechos), estatisticas['distancia_inicial_km'], delta=0.05)
+
+    def test_respeita_o_tempo_limite(self):
+        latitudes = np.random.default_rng(1).uniform(-8, 0, 2500)
+        longitudes = np.random.default_rng(2).uniform(-70, -58, 2500)
+        # Montar a matriz e a rota inicial fica fora do limite; mede-se à parte.
+        comeco = time.monotonic()
+        planejar_visita(self.inicio, latitudes, longitudes, tempo_limite=0)
+        construcao = time.monotonic() - comeco
+
+        comeco = time.monotonic()
+        planejar_visita(self.inicio, latitudes, longitudes, tempo_limite=0.2)
+        self.assertLess(time.monotonic() - comeco, construcao + 0.2 + 0.3)
+
+    def test_casos_pequenos(self):
+        self.assertEqual(planejar_visita(self.inicio, np.array([]), np.array([]))[:2], ([], []))
+        ordem, trechos, _ = planejar_visita(self.inicio, np.array([-3.0]), np.array([-60.1]))
+        self.assertEqual(ordem, [0])
+        self.assertEqual(len(trechos), 1)
@@ -0,0 +1,43 @@
+# backend/localidades/tests/test_serializacao.py
+
+from rest_framework.renderers import JSONRenderer
+
+from localidades import serializacao_rapida
+from localidades.models import Localidade
+from localidades.serializers import LocalidadeSerializer
+
+from .base import ApiTestCase, criar_calha, criar_localidade
+
+
+class SerializacaoRapidaTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        calha = criar_calha('Calha do Médio Solimões')
+        criar_localidade(nome_comunidade='SÃO JOSÉ', calha_rio=calha, latitude=-3.123456789, longitude=-60.5)
+        criar_localidade(nome_comunidade='SEM DADOS', ibge=None, tipo_comunidade=None, domicilios=None, total_ligacoes=None)
+        # Floats que o repr() escreve em notação científica e separadores de linha Unicode.
+        criar_localidade(nome_comunidade='LINHA\u2028NOVA\u2029', latitude=0.00001, longitude=-1e-05)
+        criar_localidade(nome_comunidade='ASPAS "E" \\ BARRA', latitude=0.0, longitude=-73.0,
+                         fonte_dados=Localidade.FonteDados.TRANCHE)
+
+    def drf(self, queryset):
+        return JSONRenderer().render(LocalidadeSerializer(queryset, many=True).data)
+
+    def test_bytes_iguais_ao_serializer_do_drf(self):
+        queryset = Localidade.objects.select_related('calha_rio').order_by('id')
+        rapido = serializacao_rapida.renderizar(list(serializacao_rapida.linhas(queryset)))
+        self.assertEqual(rapido, self.drf(queryset))
+
+    def test_dicionarios_iguais_ao_serializer(self):
+        queryset = Localidade.objects.order_by('id')
+        dicionarios = serializacao_rapida.para_dicionarios(serializacao_rapida.linhas(queryset))
+        self.assertEqual(dicionarios, [dict(item) for item in LocalidadeSerializer(queryset, many=True).data])
+
+    def test_lista_da_api_igual_ao_serializer(self):
+        resposta = self.client.get('/api/localidades/')
+        self.assertEqual(resposta.content, self.drf(Localidade.objects.order_by('id')))
+
+    def test_detalhe(self):
+        localidade = Localidade.objects.order_by('id').first()
+        resposta = self.client.get(f'/api/localidades/{localidade.id}/')
+        self.assertEqual(resposta.json(), LocalidadeSerializer(localidade).data)
@@ -0,0 +1,35 @@
+# backend/localidades/texto.py
+
+import re
+import unicodedata
+
+_SEPARADORES = re.compile(r'[\W_]+')
+
+
+def _sem_acentos_lento(texto):
+    decomposto = unicodedata.normalize('NFKD', texto)
+    return ''.join(caractere for caractere in decomposto if not unicodedata.combining(caractere))
+
+
+# Tabela para str.translate com as letras latinas acentuadas mais comuns já
+# sem acento; cobre quase todos os nomes sem passar pelo NFKD caractere a
+# caractere, que é bem mais lento em importações grandes.
+_TABELA_LATINA = {
+    codigo: _sem_acentos_lento(chr(codigo))
+    for codigo in range(0xA0, 0x250)
+    if _sem_acentos_lento(chr(codigo)) != chr(codigo)
+}
+
+
+def normalizar_texto(texto):
+    """
+    Forma canônica para comparar nomes digitados com os da base: sem
+    acentos, em minúsculas e com qualquer pontuação reduzida a um espaço
+    ("São Gabriel-da Cachoeira" -> "sao gabriel da cachoeira").
+    """
+    if not texto:
+        return ''
+    texto = str(texto).translate(_TABELA_LATINA)
+    if not texto.isascii():
+        texto = _sem_acentos_lento(texto)
+    return _SEPARADORES.sub(' ', texto.casefold()).strip()
@@ -0,0 +1,88 @@
+# backend/localidades/tiles.py
+
+import hashlib
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+
+from .indice_espacial import filtrar_bbox
+from .mvt import EXTENT, codificar_tile, limites_tile, posicao_no_tile
+from .versao import versao_atual
+
+NOME_CAMADA = 'localidades'
+
+# Margem (em unidades do tile) incluída ao redor de cada tile para que os
+# marcadores próximos à borda não sejam cortados.
+MARGEM = 64
+
+CAMPOS = (
+    'id', 'latitude', 'longitude', 'nome_comunidade', 'municipio', 'uf',
+    'tipo_comunidade', 'domicilios', 'total_ligacoes', 'fonte_dados', 'calha_rio__nome',
+)
+
+
+def _caminho_cache(versao, chave_filtros, z, x, y):
+    filtros = hashlib.sha1(repr(chave_filtros).encode('utf-8')).hexdigest()[:16]
+    return Path(settings.LOCALIDADES_TILES_DIR) / versao / filtros / str(z) / str(x) / f'{y}.pbf'
+
+
+def _remover_versoes_antigas(versao):
+    """Apaga do disco os tiles gerados para versões anteriores dos dados."""
+    raiz = Path(settings.LOCALIDADES_TILES_DIR)
+    if not raiz.is_dir():
+        return
+    for pasta in raiz.iterdir():
+        if pasta.is_dir() and pasta.name != versao:
+            shutil.rmtree(pasta, ignore_errors=True)
+
+
+def gerar_tile(queryset, z, x, y):
+    """Codifica as localidades do queryset que caem no tile z/x/y."""
+    oeste, sul, leste, norte = limites_tile(z, x, y)
+    margem_lon = (leste - oeste) * MARGEM / EXTENT
+    margem_lat = (norte - sul) * MARGEM / EXTENT
+    linhas = filtrar_bbox(
+        queryset, oeste - margem_lon, sul - margem_lat, leste + margem_lon, norte + margem_lat
+    ).values_list(*CAMPOS)
+
+    pontos = []
+    for linha in linhas:
+        px, py = posicao_no_tile(z, x, y, linha[1], linha[2])
+        propriedades = dict(zip(
+            ('id', 'nome_comunidade', 'municipio', 'uf', 'tipo_comunidade',
+             'domicilios', 'total_ligacoes', 'fonte_dados', 'calha_rio'),
+            (linha[0],) + linha[3:],
+        ))
+        pontos.append((linha[0], px, py, propriedades))
+    return codificar_tile(NOME_CAMADA, pontos)
+
+
+def obter_tile(chave_filtros, queryset, z, x, y):
+    """
+    Retorna os bytes do tile, lendo do cache em disco quando possível.
+
+    O cache é organizado por versão dos dados, então uma importação nova
+    simplesmente passa a usar outra pasta; as pastas antigas são removidas
+    na primeira geração da versão nova.
+    """
+    versao = versao_atual()
+    caminho = _caminho_cache(versao, chave_filtros, z, x, y)
+    try:
+        return caminho.read_bytes()
+    except FileNotFoundError:
+        pass
+
+    if not (Path(settings.LOCALIDADES_TILES_DIR) / versao).exists():
+        _remover_versoes_antigas(versao)
+
+    conteudo = gerar_tile(queryset, z, x, y)
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    # Escrita atômica: outro processo nunca lê um tile pela metade.
+    descritor, temporario = tempfile.mkstemp(dir=caminho.parent, suffix='.tmp')
+    with os.fdopen(descritor, 'wb') as arquivo:
+        arquivo.write(conteudo)
+    os.replace(temporario, caminho)
+    return conteudo
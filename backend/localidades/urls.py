@@ -1,6 +1,6 @@
 # backend/localidades/urls.py
 
-from django.urls import path, include
+from django.urls import path, re_path, include
 from rest_framework.routers import DefaultRouter
 from . import views
 
@@ -9,7 +9,13 @@ router.register(r'localidades', views.LocalidadeViewSet, basename='localidade')
 router.register(r'calhas', views.CalhaRioViewSet, basename='calha')
 
 urlpatterns = [
+    # Registradas antes do router para não serem capturadas como detalhe de localidade.
+    path('localidades/tiles/<int:z>/<int:x>/<int:y>.pbf', views.LocalidadeTileView.as_view(), name='localidade-tile'),
+    re_path(r'^localidades/export\.(?P<formato>geojson|csv|kml)$', views.LocalidadeExportView.as_view(), name='localidade-export'),
     path('', include(router.urls)),
+    path('estatisticas/', views.EstatisticasView.as_view(), name='estatisticas'),
+    path('rotas/tour/', views.RotaVisitaView.as_view(), name='rota-tour'),
+    path('rotas/fluvial/', views.RotaFluvialView.as_view(), name='rota-fluvial'),
     # ADICIONE A NOVA ROTA CSRF
     path('csrf/', views.CSRFTokenView.as_view(), name='csrf'),
     path('login/', views.LoginView.as_view(), name='login'),
@@ -0,0 +1,97 @@
+# backend/localidades/versao.py
+
+import secrets
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from django.db import connection
+from django.db.models import F
+from django.dispatch import Signal
+
+from .models import VersaoDados
+
+# Controle de "adiamento": durante importações em lote não faz sentido
+# incrementar a versão a cada linha salva. O contador de profundidade é por
+# thread para que um comando não interfira em requisições concorrentes.
+_estado = threading.local()
+
+# Enviado depois de cada incremento de versão, para que caches possam ser liberados.
+versao_alterada = Signal()
+
+
+def versao_atual():
+    """
+    Retorna a versão atual dos dados no formato "<epoca>-<numero>".
+
+    A leitura usa SQL direto na tabela de controle (uma única linha) para ser
+    barata o suficiente para rodar em toda requisição.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT epoca, versao FROM {VersaoDados._meta.db_table} WHERE id = 1')
+        linha = cursor.fetchone()
+    if linha is None:
+        VersaoDados.objects.get_or_create(pk=1, defaults={'epoca': secrets.token_hex(8)})
+        return versao_atual()
+    return f'{linha[0]}-{linha[1]}'
+
+
+def incrementar_versao():
+    """Incrementa a versão dos dados, a menos que esteja dentro de `adiar_incremento()`."""
+    if getattr(_estado, 'profundidade', 0) > 0:
+        _estado.pendente = True
+        return
+    atualizadas = VersaoDados.objects.filter(pk=1).update(versao=F('versao') + 1)
+    if not atualizadas:
+        VersaoDados.objects.get_or_create(pk=1, defaults={'epoca': secrets.token_hex(8), 'versao': 1})
+    versao_alterada.send(sender=VersaoDados)
+
+
+@contextmanager
+def adiar_incremento():
+    """
+    Agrupa todas as alterações do bloco em um único incremento de versão,
+    aplicado na saída. Usado pelos comandos de importação.
+    """
+    _estado.profundidade = getattr(_estado, 'profundidade', 0) + 1
+    try:
+        yield
+    finally:
+        _estado.profundidade -= 1
+        if _estado.profundidade == 0 and getattr(_estado, 'pendente', False):
+            _estado.pendente = False
+            incrementar_versao()
+
+
+class CachePorVersao:
+    """
+    Cache em memória (por processo) de estruturas derivadas dos dados, como a
+    pirâmide de clusters. Cada entrada guarda a versão com que foi construída
+    e é reconstruída automaticamente quando a versão dos dados muda.
+    """
+
+    def __init__(self, max_itens=32):
+        self.max_itens = max_itens
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, chave, construir):
+        versao = versao_atual()
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is not None and item[0] == versao:
+                self._itens.move_to_end(chave)
+                return item[1]
+
+        # A construção acontece fora do lock para não bloquear outras chaves.
+        valor = construir()
+        with self._lock:
+            self._itens[chave] = (versao, valor)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+        return valor
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
@@ -1,25 +1,513 @@
 # backend/localidades/views.py (VERSÃO FINAL E CORRIGIDA)
 
+import time
+
+import numpy as np
+from django.conf import settings
 from django.contrib.auth import authenticate, login, logout
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.decorators import method_decorator
 from django.middleware.csrf import get_token
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, permissions
-from rest_framework import viewsets, filters
+from rest_framework import generics, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from django_filters.rest_framework import DjangoFilterBackend
-from .filters import LocalidadeFilter, BoundingBoxFilter
+from rest_framework.renderers import JSONRenderer
+from .clusters import obter_piramide
+from .heatmap import PESOS as PESOS_HEATMAP, heatmap as calcular_heatmap
+from .filters import LocalidadeFilter, BoundingBoxFilter, BuscaTextualFilter, filtrar_fonte_e_calha, filtrar_selecao, ler_bbox
 from .models import Localidade, CalhaRio
-from .serializers import LocalidadeSerializer, CalhaRioSerializer
+from .pagination import LocalidadeCursorPagination
+from .renderers import ColunarRenderer, MVTRenderer
+from .tiles import obter_tile
+from . import colunar, exportacao, resumo, serializacao_rapida
+from .cache_respostas import cache_de_resposta, estatisticas as estatisticas_cache
+from .condicional import condicional_por_versao
+from .kdtree import obter_arvore
+from .autocomplete import obter_indice as obter_indice_autocomplete
+from .geo import formatar_tempo, haversine_km, matriz_distancias, mais_proximos
+from .rotas import planejar_visita
+from .rede_fluvial import RedeFluvialIndisponivel, obter_rede
+from .serializers import LocalidadeSerializer, CalhaRioSerializer, MatrizDistanciaSerializer, RotaVisitaSerializer
+from .streaming import gerar_array_json
 
 # --- Views de API para os Dados ---
+# As leituras respondem com ETag derivado da versão dos dados; um
+# If-None-Match com o ETag atual recebe 304 sem consultar as localidades.
+@method_decorator(condicional_por_versao, name='retrieve')
 class LocalidadeViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Localidade.objects.select_related('calha_rio').all()
     serializer_class = LocalidadeSerializer
-    filter_backends = [DjangoFilterBackend, BoundingBoxFilter, filters.SearchFilter]
+    filter_backends = [DjangoFilterBackend, BoundingBoxFilter, BuscaTextualFilter]
+    filterset_class = LocalidadeFilter
+    search_fields = ['nome_comunidade', 'municipio', 'uf']
+    pagination_class = LocalidadeCursorPagination
+
+    def get_renderers(self):
+        renderers = super().get_renderers()
+        # O formato colunar só existe para a listagem.
+        if self.action == 'list':
+            renderers.append(ColunarRenderer())
+        return renderers
+
+    @method_decorator(condicional_por_versao)
+    @method_decorator(cache_de_resposta)
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+
+        # Modo streaming (opcional): as linhas são escritas à medida que são lidas
+        # do banco, mantendo a memória constante independente do tamanho do resultado.
+        if request.query_params.get('stream', '').lower() in ('1', 'true'):
+            conteudo = gerar_array_json(queryset.order_by('id'), settings.LOCALIDADES_STREAM_CHUNK)
+            return StreamingHttpResponse(conteudo, content_type='application/json')
+
+        if request.accepted_renderer.format == ColunarRenderer.format:
+            return self.list_colunar(queryset)
+
+        # A API navegável continua usando o serializer completo.
+        if request.accepted_renderer.format != 'json':
+            return super().list(request, *args, **kwargs)
+
+        # Caminho rápido: tuplas/dicionários vindos do banco, sem instanciar modelos.
+        # A paginação por cursor aceita dicionários, desde que contenham o `id`.
+        page = self.paginate_queryset(queryset.values(*serializacao_rapida.COLUNAS))
+        if page is not None:
+            return self.get_paginated_response(serializacao_rapida.reordenar_valores(page))
+        conteudo = serializacao_rapida.renderizar(list(serializacao_rapida.linhas(queryset)))
+        return HttpResponse(conteudo, content_type='application/json')
+
+    def list_colunar(self, queryset):
+        """Lista no formato binário colunar; os links de paginação vão no cabeçalho."""
+        page = self.paginate_queryset(queryset.values(*serializacao_rapida.COLUNAS))
+        if page is not None:
+            tuplas = [tuple(valor[coluna] for coluna in serializacao_rapida.COLUNAS) for valor in page]
+            extras = {'next': self.paginator.get_next_link(), 'previous': self.paginator.get_previous_link()}
+        else:
+            tuplas = list(serializacao_rapida.linhas(queryset))
+            extras = None
+        return Response(colunar.codificar(tuplas, extras))
+
+    @action(detail=False, methods=['get'])
+    @method_decorator(condicional_por_versao)
+    def clusters(self, request):
+        """
+        Clusters pré-agregados para o mapa no zoom `z`. A partir do zoom
+        `LOCALIDADES_CLUSTER_ZOOM_PONTOS` os pontos individuais do `in_bbox`
+        (obrigatório nesses zooms) são retornados.
+        """
+        try:
+            zoom = int(request.query_params.get('z', ''))
+        except ValueError:
+            return Response({'detail': 'Parâmetro "z" (zoom) é obrigatório e deve ser inteiro.'}, status=status.HTTP_400_BAD_REQUEST)
+        if zoom < 0:
+            return Response({'detail': 'O zoom não pode ser negativo.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        bbox = ler_bbox(request.query_params.get('in_bbox'))
+        if zoom >= settings.LOCALIDADES_CLUSTER_ZOOM_PONTOS:
+            # Sem o recorte, os pontos individuais seriam a tabela inteira.
+            if bbox is None:
+                return Response(
+                    {'detail': f'A partir do zoom {settings.LOCALIDADES_CLUSTER_ZOOM_PONTOS} o parâmetro "in_bbox" (oeste,sul,leste,norte) é obrigatório.'},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            queryset = self.filter_queryset(self.get_queryset())
+            localidades = serializacao_rapida.para_dicionarios(serializacao_rapida.linhas(queryset))
+            return Response({'zoom': zoom, 'agrupado': False, 'localidades': localidades})
+
+        chave, queryset = filtrar_fonte_e_calha(request, self.get_queryset())
+        piramide = obter_piramide(chave, queryset)
+        return Response({'zoom': zoom, 'agrupado': True, 'clusters': piramide.clusters(zoom, bbox)})
+
+    @action(detail=False, methods=['get'])
+    @method_decorator(condicional_por_versao)
+    def heatmap(self, request):
+        """
+        Mapa de calor no zoom `z`: soma do peso (`weight`: quantidade,
+        domicilios ou total_ligacoes) em células de tamanho fixo na tela,
+        nos tiles inteiros que cobrem o `in_bbox` (cada tile fica em cache
+        por versão dos dados). Aceita os filtros `fonte_dados` e `calha_rio`.
+        """
+        params = request.query_params
+        try:
+            zoom = int(params.get('z', ''))
+        except ValueError:
+            return Response({'detail': 'Parâmetro "z" (zoom) é obrigatório e deve ser inteiro.'}, status=status.HTTP_400_BAD_REQUEST)
+        if not 0 <= zoom <= 22:
+            return Response({'detail': 'O zoom deve estar entre 0 e 22.'}, status=status.HTTP_400_BAD_REQUEST)
+        peso = params.get('weight', 'quantidade')
+        if peso not in PESOS_HEATMAP:
+            return Response(
+                {'detail': f'"weight" deve ser um de: {", ".join(PESOS_HEATMAP)}.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        bbox = ler_bbox(params.get('in_bbox'))
+        if params.get('in_bbox') and bbox is None:
+            return Response(
+                {'detail': '"in_bbox" inválido: informe oeste,sul,leste,norte como números separados por vírgula.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        chave, queryset = filtrar_fonte_e_calha(request, self.get_queryset())
+        resultado = calcular_heatmap(chave, queryset, zoom, peso, bbox)
+        if resultado is None:
+            return Response(
+                {'detail': f'A área pedida cobre mais de {settings.LOCALIDADES_HEATMAP_MAX_TILES} tiles neste zoom; informe um "in_bbox" menor.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response(resultado)
+
+    @action(detail=False, methods=['get'])
+    @method_decorator(condicional_por_versao)
+    def nearest(self, request):
+        """
+        Localidades mais próximas de um ponto (`lat`, `lon`): as `k` mais
+        próximas ou, com `radius_km`, as mais próximas dentro do raio
+        (até `k`, ou até `LOCALIDADES_VIZINHOS_MAX_K` sem `k`). Aceita os
+        filtros `fonte_dados` e `calha_rio`.
+        """
+        params = request.query_params
+        try:
+            latitude = float(params['lat'])
+            longitude = float(params['lon'])
+            k = int(params['k']) if 'k' in params else None
+            raio_km = float(params['radius_km']) if 'radius_km' in params else None
+        except (KeyError, ValueError):
+            return Response(
+                {'detail': 'Informe "lat" e "lon" numéricos; "k" deve ser inteiro e "radius_km" numérico.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if (k is not None and not 1 <= k <= settings.LOCALIDADES_VIZINHOS_MAX_K) or (raio_km is not None and raio_km <= 0):
+            return Response(
+                {'detail': f'"k" deve estar entre 1 e {settings.LOCALIDADES_VIZINHOS_MAX_K} e "radius_km" deve ser positivo.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        chave, queryset = filtrar_fonte_e_calha(request, self.get_queryset())
+        arvore = obter_arvore(chave, queryset)
+        if k is None:
+            # Um raio grande pode cobrir a base inteira: o limite vale também aí.
+            k = settings.LOCALIDADES_VIZINHOS_MAX_K if raio_km is not None else 20
+        ids, distancias = arvore.vizinhos(latitude, longitude, k, raio_km)
+
+        linhas = {
+            tupla[0]: tupla
+            for tupla in serializacao_rapida.linhas(Localidade.objects.filter(id__in=ids.tolist()))
+        }
+        resultados = []
+        for id_, distancia in zip(ids.tolist(), distancias.tolist()):
+            if id_ in linhas:
+                item = serializacao_rapida.para_dicionarios([linhas[id_]])[0]
+                item['distancia_km'] = round(distancia, 3)
+                resultados.append(item)
+        return Response(resultados)
+
+    @action(detail=False, methods=['get'])
+    @method_decorator(condicional_por_versao)
+    def autocomplete(self, request):
+        """
+        Localidades cujo nome (ou município) começa com `q`, ignorando
+        acentos, para os seletores de ponto A/B. Aceita `limit` e os filtros
+        `fonte_dados` e `calha_rio`.
+        """
+        try:
+            limite = int(request.query_params.get('limit', 10))
+        except ValueError:
+            limite = 0
+        if not 1 <= limite <= settings.LOCALIDADES_AUTOCOMPLETE_MAX_LIMITE:
+            return Response(
+                {'detail': f'"limit" deve estar entre 1 e {settings.LOCALIDADES_AUTOCOMPLETE_MAX_LIMITE}.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        chave, queryset = filtrar_fonte_e_calha(request, Localidade.objects.all())
+        ids = obter_indice_autocomplete(chave, queryset).buscar(request.query_params.get('q', ''), limite)
+
+        linhas = {tupla[0]: tupla for tupla in serializacao_rapida.linhas(Localidade.objects.filter(id__in=ids))}
+        return Response(serializacao_rapida.para_dicionarios([linhas[id_] for id_ in ids if id_ in linhas]))
+
+    def selecionar(self, campo, selecao):
+        """
+        Resolve uma seleção (ids ou filtros) em arrays de ids, latitudes e
+        longitudes. Ids que não existem são rejeitados com 400.
+        """
+        queryset = filtrar_selecao(self.request, selecao)
+        linhas = list(queryset.order_by('id').values_list('id', 'latitude', 'longitude'))
+        ids, latitudes, longitudes = (list(coluna) for coluna in zip(*linhas)) if linhas else ([], [], [])
+        desconhecidos = sorted(set(selecao.get('ids', ())) - set(ids))
+        if desconhecidos:
+            raise ValidationError({campo: {'ids': [f'Localidades não encontradas: {", ".join(map(str, desconhecidos))}.']}})
+        return ids, (latitudes, longitudes)
+
+    @action(detail=False, methods=['post'], url_path='distance-matrix')
+    def distance_matrix(self, request):
+        """
+        Matriz de distâncias (haversine, km) entre dois conjuntos de localidades,
+        com a mesma estimativa de tempo por velocidade média do frontend.
+        Com `top_k`, retorna só os destinos mais próximos de cada origem.
+        Origens e destinos saem ordenados por id, sem repetições.
+        """
+        parametros = MatrizDistanciaSerializer(data=request.data)
+        parametros.is_valid(raise_exception=True)
+        dados = parametros.validated_data
+        velocidade = dados['velocidade']
+
+        ids_origens, origens = self.selecionar('origens', dados['origens'])
+        ids_destinos, destinos = self.selecionar('destinos', dados['destinos'])
+        max_celulas = settings.LOCALIDADES_DISTANCIA_CELULAS_POR_BLOCO
+
+        if 'top_k' in dados:
+            indices, distancias = mais_proximos(origens, destinos, dados['top_k'], max_celulas, ids_origens, ids_destinos)
+            resultados = []
+            for id_origem, linha_indices, linha_distancias in zip(ids_origens, indices.tolist(), distancias.tolist()):
+                resultados.append({
+                    'origem': id_origem,
+                    'destinos': [
+                        {
+                            'id': ids_destinos[indice],
+                            'distancia_km': round(distancia, 2),
+                            'tempo_horas': round(distancia / velocidade, 3),
+                            'tempo': formatar_tempo(distancia / velocidade),
+                        }
+                        for indice, distancia in zip(linha_indices, linha_distancias)
+                        if distancia != float('inf')
+                    ],
+                })
+            return Response({'velocidade': velocidade, 'resultados': resultados})
+
+        if len(ids_origens) * len(ids_destinos) > settings.LOCALIDADES_DISTANCIA_MAX_DENSA:
+            return Response(
+                {'detail': 'Matriz grande demais para a resposta densa. Use "top_k" ou reduza a seleção.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        matriz = matriz_distancias(origens, destinos, max_celulas)
+        return Response({
+            'origens': ids_origens,
+            'destinos': ids_destinos,
+            'velocidade': velocidade,
+            'distancias_km': np.round(matriz, 2).tolist(),
+            'tempos_horas': np.round(matriz / velocidade, 3).tolist(),
+        })
+
+    @action(detail=False, methods=['get'], url_path='cache')
+    def cache(self, request):
+        """Contadores de acerto/falha do cache de respostas da listagem (por processo)."""
+        return Response(estatisticas_cache())
+
+class LocalidadeTileView(APIView):
+    """
+    Tiles vetoriais (Mapbox Vector Tile) com as localidades, filtrados por
+    `fonte_dados` e `calha_rio`. Os tiles gerados ficam em cache no disco.
+    """
+    renderer_classes = [JSONRenderer, MVTRenderer]
+
+    @method_decorator(condicional_por_versao)
+    def get(self, request, z, x, y, format=None):
+        if z > 22 or x >= 2 ** z or y >= 2 ** z:
+            return Response({'detail': 'Tile fora dos limites.'}, status=status.HTTP_404_NOT_FOUND)
+        queryset = Localidade.objects.all()
+        chave, queryset = filtrar_fonte_e_calha(request, queryset)
+        conteudo = obter_tile(chave, queryset, z, x, y)
+        resposta = HttpResponse(conteudo, content_type=MVTRenderer.media_type)
+        resposta['Cache-Control'] = f'private, max-age={settings.LOCALIDADES_TILES_MAX_AGE}'
+        return resposta
+
+class LocalidadeExportView(generics.GenericAPIView):
+    """
+    Extração completa das localidades em GeoJSON, CSV ou KML
+    (/api/localidades/export.<formato>), com os mesmos filtros da listagem.
+    O arquivo é escrito em streaming; com `gzip=true` sai comprimido (.gz).
+    """
+    queryset = Localidade.objects.all()
+    filter_backends = [DjangoFilterBackend, BoundingBoxFilter, BuscaTextualFilter]
     filterset_class = LocalidadeFilter
     search_fields = ['nome_comunidade', 'municipio', 'uf']
-    pagination_class = None
 
+    @method_decorator(condicional_por_versao)
+    def get(self, request, formato, format=None):
+        queryset = self.filter_queryset(self.get_queryset()).order_by('id')
+        conteudo = exportacao.GERADORES[formato](queryset, settings.LOCALIDADES_STREAM_CHUNK)
+        nome, tipo = f'localidades.{formato}', exportacao.TIPOS_CONTEUDO[formato]
+        if request.query_params.get('gzip', '').lower() in ('1', 'true'):
+            conteudo, nome, tipo = exportacao.comprimir(conteudo), f'{nome}.gz', 'application/gzip'
+        resposta = StreamingHttpResponse(conteudo, content_type=tipo)
+        resposta['Content-Disposition'] = f'attachment; filename="{nome}"'
+        return resposta
+
+class EstatisticasView(APIView):
+    """
+    Totais de localidades, domicílios e ligações agrupados por `group_by`
+    (lista separada por vírgulas de calha_rio, municipio, fonte_dados e
+    tipo_comunidade; vazio = total geral), com filtros opcionais
+    `fonte_dados` e `calha_rio`. Lê a tabela de resumo, não as localidades.
+    """
+
+    @method_decorator(condicional_por_versao)
+    def get(self, request, format=None):
+        params = request.query_params
+        agrupar_por = [campo.strip() for campo in params.get('group_by', '').split(',') if campo.strip()]
+        invalidos = [campo for campo in agrupar_por if campo not in resumo.DIMENSOES]
+        if invalidos:
+            return Response(
+                {'detail': f'"group_by" aceita apenas {", ".join(resumo.DIMENSOES)} (recebido: {", ".join(invalidos)}).'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            calha_rio = int(params['calha_rio']) if params.get('calha_rio') else None
+        except ValueError:
+            return Response({'detail': '"calha_rio" deve ser o id de uma calha.'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(resumo.estatisticas(
+            list(dict.fromkeys(agrupar_por)), fonte_dados=params.get('fonte_dados'), calha_rio=calha_rio,
+        ))
+
+class RotaVisitaView(APIView):
+    """
+    Planeja a ordem de visita a várias localidades (por ids ou filtros) a
+    partir de um ponto de partida: construção pelo vizinho mais próximo e
+    melhorias 2-opt/Or-opt dentro de um limite de tempo.
+    """
+
+    def post(self, request, format=None):
+        parametros = RotaVisitaSerializer(data=request.data)
+        parametros.is_valid(raise_exception=True)
+        dados = parametros.validated_data
+        velocidade = dados['velocidade']
+
+        queryset = filtrar_selecao(request, dados['localidades'])
+        linhas = list(queryset.order_by('id').values_list('id', 'nome_comunidade', 'municipio', 'latitude', 'longitude'))
+        if len(linhas) > settings.LOCALIDADES_ROTA_MAX_PARADAS:
+            return Response(
+                {'detail': f'Seleção com {len(linhas)} localidades; o máximo é {settings.LOCALIDADES_ROTA_MAX_PARADAS}.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        inicio = (dados['inicio']['latitude'], dados['inicio']['longitude'])
+        latitudes = [linha[3] for linha in linhas]
+        longitudes = [linha[4] for linha in linhas]
+        comeco = time.monotonic()
+        ordem, trechos, estatisticas = planejar_visita(
+            inicio, latitudes, longitudes,
+            retornar=dados['retornar'],
+            tempo_limite=dados.get('tempo_limite', settings.LOCALIDADES_ROTA_TEMPO_LIMITE),
+            max_celulas=settings.LOCALIDADES_DISTANCIA_CELULAS_POR_BLOCO,
+        )
+
+        paradas, acumulada = [], 0.0
+        for indice, trecho in zip(ordem, trechos):
+            id_localidade, nome, municipio, latitude, longitude = linhas[indice]
+            acumulada += trecho
+            paradas.append({
+                'id': id_localidade,
+                'nome_comunidade': nome,
+                'municipio': municipio,
+                'latitude': latitude,
+                'longitude': longitude,
+                'distancia_trecho_km': round(trecho, 2),
+                'distancia_acumulada_km': round(acumulada, 2),
+            })
+        total = acumulada + estatisticas.pop('distancia_retorno_km', 0.0)
+
+        return Response({
+            'inicio': dados['inicio'],
+            'retornar': dados['retornar'],
+            'ordem': [parada['id'] for parada in paradas],
+            'paradas': paradas,
+            'distancia_total_km': round(total, 2),
+            'velocidade': velocidade,
+            'tempo_horas': round(total / velocidade, 3),
+            'tempo': formatar_tempo(total / velocidade),
+            'melhorias': estatisticas,
+            'tempo_calculo_ms': round((time.monotonic() - comeco) * 1000, 1),
+        })
+
+class RotaFluvialView(APIView):
+    """
+    Rota pela rede de rios entre duas localidades (`origem` e `destino`,
+    ids), com distância, tempo estimado (`velocidade`, km/h) e a geometria
+    do caminho como lista de [latitude, longitude] para o mapa.
+    """
+
+    def get(self, request, format=None):
+        params = request.query_params
+        try:
+            ids = int(params['origem']), int(params['destino'])
+            velocidade = float(params.get('velocidade', settings.LOCALIDADES_REDE_FLUVIAL_VELOCIDADE))
+        except (KeyError, ValueError):
+            return Response(
+                {'detail': 'Informe os ids "origem" e "destino"; "velocidade" deve ser numérica.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if velocidade <= 0:
+            return Response({'detail': '"velocidade" deve ser positiva.'}, status=status.HTTP_400_BAD_REQUEST)
+        com_geometria = params.get('geometria', 'true').lower() not in ('false', '0')
+
+        try:
+            rede = obter_rede(settings.LOCALIDADES_REDE_FLUVIAL_PREPARADA)
+        except RedeFluvialIndisponivel as erro:
+            return Response({'detail': str(erro)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+        localidades = {
+            linha[0]: linha
+            for linha in Localidade.objects.filter(id__in=ids).values_list('id', 'latitude', 'longitude', 'calha_rio_id')
+        }
+        if any(id_localidade not in localidades for id_localidade in ids):
+            return Response({'detail': 'Localidade não encontrada.'}, status=status.HTTP_404_NOT_FOUND)
+        encaixes = []
+        for id_localidade in ids:
+            _, latitude, longitude, _ = localidades[id_localidade]
+            encaixe = rede.encaixar(id_localidade, latitude, longitude, settings.LOCALIDADES_REDE_FLUVIAL_MAX_ENCAIXE_KM)
+            if encaixe is None:
+                return Response(
+                    {'detail': f'A localidade {id_localidade} fica longe demais da rede fluvial.'},
+                    status=status.HTTP_404_NOT_FOUND,
+                )
+            encaixes.append(encaixe)
+        (no_origem, encaixe_origem), (no_destino, encaixe_destino) = encaixes
+
+        # Com as duas localidades na mesma calha, a distância já está
+        # pré-calculada; o A* só roda quando a geometria é pedida.
+        calha_origem, calha_destino = localidades[ids[0]][3], localidades[ids[1]][3]
+        distancia_rio = None
+        if calha_origem == calha_destino:
+            distancia_rio = rede.distancia_pre_calculada(calha_origem, no_origem, no_destino)
+        geometria = None
+        if com_geometria or distancia_rio is None:
+            caminho = rede.a_estrela(no_origem, no_destino)
+            if caminho is None:
+                return Response(
+                    {'detail': 'Não há caminho pela rede fluvial entre as localidades.'},
+                    status=status.HTTP_404_NOT_FOUND,
+                )
+            distancia_rio, arestas = caminho
+            if com_geometria:
+                geometria = [list(localidades[ids[0]][1:3])] + rede.geometria(no_origem, arestas) + [list(localidades[ids[1]][1:3])]
+        if distancia_rio == float('inf'):
+            return Response(
+                {'detail': 'Não há caminho pela rede fluvial entre as localidades.'},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        total = encaixe_origem + distancia_rio + encaixe_destino
+        origem, destino = localidades[ids[0]], localidades[ids[1]]
+        resposta = {
+            'origem': ids[0],
+            'destino': ids[1],
+            'distancia_km': round(total, 2),
+            'distancia_rio_km': round(distancia_rio, 2),
+            'encaixe_km': [round(encaixe_origem, 3), round(encaixe_destino, 3)],
+            'distancia_linha_reta_km': round(float(haversine_km(origem[1], origem[2], destino[1], destino[2])), 2),
+            'velocidade': velocidade,
+            'tempo_horas': round(total / velocidade, 3),
+            'tempo': formatar_tempo(total / velocidade),
+        }
+        if com_geometria:
+            resposta['geometria'] = geometria
+        return Response(resposta)
+
+@method_decorator(condicional_por_versao, name='list')
+@method_decorator(condicional_por_versao, name='retrieve')
 class CalhaRioViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = CalhaRio.objects.all().order_by('nome')
     serializer_class = CalhaRioSerializer
@@ -4,40 +4,43 @@ import sys
 import django
 import json
 
+import pandas as pd
+
 # Configurar o Django
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 django.setup()
 
+from django.db import transaction
+from localidades import importacao
 from localidades.models import Localidade, CalhaRio
 
+# Chaves do localidades.json -> campos do modelo.
+COLUNAS_JSON = {
+    'IBGE': 'ibge', 'UF': 'uf', 'Municipio': 'municipio', 'nome_comunidade': 'nome_comunidade',
+    'tipo_comunidade': 'tipo_comunidade', 'Domicilios': 'domicilios', 'Total_Ligacoes': 'total_ligacoes',
+    'Latitude': 'latitude', 'Longitude': 'longitude', 'fonte_dados': 'fonte_dados',
+}
+
 def load_localidades():
     # Carregar o arquivo JSON
     with open('localidades.json', 'r', encoding='utf-8') as f:
         data = json.load(f)
-    
-    # Limpar dados existentes
-    Localidade.objects.all().delete()
-    
-    # Criar localidades
-    localidades_criadas = 0
-    for item in data:
-        try:
-            localidade = Localidade.objects.create(
-                ibge=item.get('IBGE', ''),
-                uf=item.get('UF', 'AM'),
-                municipio=item.get('Municipio', ''),
-                nome_comunidade=item.get('nome_comunidade', ''),
-                tipo_comunidade=item.get('tipo_comunidade', ''),
-                domicilios=item.get('Domicilios', 0) or 0,
-                total_ligacoes=item.get('Total_Ligacoes', 0) or 0,
-                latitude=float(item.get('Latitude', 0)) if item.get('Latitude') else 0,
-                longitude=float(item.get('Longitude', 0)) if item.get('Longitude') else 0,
-                fonte_dados=item.get('fonte_dados', '')
-            )
-            localidades_criadas += 1
-        except Exception as e:
-            print(f'Erro ao criar localidade {item.get("nome_comunidade", "N/A")}: {e}')
-    
+
+    # Mesma limpeza vetorizada do comando import_data; os campos ausentes
+    # mantêm os valores padrão usados até aqui (0 para números e coordenadas).
+    df = pd.DataFrame(data, columns=list(COLUNAS_JSON)).rename(columns=COLUNAS_JSON)
+    numericos = ['domicilios', 'total_ligacoes', 'latitude', 'longitude']
+    df[numericos] = df[numericos].where(df[numericos] != '').fillna(0)
+    df['linha'] = df.index + 1
+    validos, rejeitados = importacao.limpar(df)
+    for rejeitado in rejeitados:
+        print(f'Item {rejeitado["linha"]} ({rejeitado["nome_comunidade"] or "N/A"}) ignorado: {rejeitado["motivo"]}')
+
+    # Limpar dados existentes e criar as localidades numa única transação
+    with transaction.atomic():
+        Localidade.objects.all().delete()
+        localidades_criadas = importacao.gravar(validos)
+
     print(f'Total de localidades criadas: {localidades_criadas}')
 
 def create_calhas():
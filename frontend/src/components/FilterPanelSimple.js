@@ -1,10 +1,11 @@
 import React, { useState } from 'react';
-import { Button, Box, Typography, Divider, TextField, Autocomplete } from '@mui/material';
+import { Button, Box, Typography, Divider, TextField } from '@mui/material';
+import api from '../services/api';
+import LocalidadeAutocomplete from './LocalidadeAutocomplete';
 
 // --- RECEBENDO AS NOVAS PROPS: pontoA, setPontoA, pontoB, setPontoB ---
 const FilterPanelSimple = ({
   calhas,
-  localidades,
   onFilterChange,
   onCalculateRoute,
   onClearFilters,
@@ -30,12 +31,7 @@ const FilterPanelSimple = ({
     }
   };
 
-  const handleCalculateClick = () => {
-    if (!pontoA || !pontoB) {
-      alert("Por favor, selecione as localidades de Ponto A e Ponto B.");
-      return;
-    }
-
+  const calcularLinhaReta = () => {
     const R = 6371; // Raio da Terra em km
     const dLat = (pontoB.latitude - pontoA.latitude) * Math.PI / 180;
     const dLon = (pontoB.longitude - pontoA.longitude) * Math.PI / 180;
@@ -49,11 +45,35 @@ const FilterPanelSimple = ({
     const horas = Math.floor(tempoHoras);
     const minutos = Math.round((tempoHoras - horas) * 60);
 
-    const result = {
+    return {
       distancia: distancia.toFixed(2),
       velocidade: velocidade,
       tempo: `${horas}h ${minutos}min`
     };
+  };
+
+  const handleCalculateClick = async () => {
+    if (!pontoA || !pontoB) {
+      alert("Por favor, selecione as localidades de Ponto A e Ponto B.");
+      return;
+    }
+
+    // Tenta a rota pelos rios; se a rede fluvial não estiver disponível
+    // (ou não houver caminho), usa a distância em linha reta.
+    let result;
+    try {
+      const response = await api.get('/rotas/fluvial/', {
+        params: { origem: pontoA.id, destino: pontoB.id, velocidade: velocidade }
+      });
+      result = {
+        distancia: response.data.distancia_km.toFixed(2),
+        velocidade: velocidade,
+        tempo: response.data.tempo,
+        geometria: response.data.geometria
+      };
+    } catch (error) {
+      result = calcularLinhaReta();
+    }
     onCalculateRoute(pontoA, pontoB, result);
   };
 
@@ -86,34 +106,19 @@ const FilterPanelSimple = ({
 
       <Typography variant="h6" gutterBottom>Cálculo de Distância</Typography>
 
-      <Autocomplete
-        options={localidades}
-        getOptionLabel={(option) => `${option.nome_comunidade} (${option.municipio})`}
+      <LocalidadeAutocomplete
+        label="Ponto de Partida"
         // --- USANDO A PROP DO PAI ---
         value={pontoA}
-        onChange={(event, newValue) => {
-          setPontoA(newValue); // Atualiza o estado no componente pai
-        }}
-        disabled={localidades.length === 0}
-        renderInput={(params) => (
-          <TextField {...params} label="Ponto de Partida" margin="normal" />
-        )}
-        noOptionsText="Nenhuma localidade encontrada"
+        onChange={setPontoA} // Atualiza o estado no componente pai
+        filtros={currentFilters}
       />
 
-      <Autocomplete
-        options={localidades}
-        getOptionLabel={(option) => `${option.nome_comunidade} (${option.municipio})`}
-        // --- USANDO A PROP DO PAI ---
+      <LocalidadeAutocomplete
+        label="Ponto de Chegada"
         value={pontoB}
-        onChange={(event, newValue) => {
-          setPontoB(newValue); // Atualiza o estado no componente pai
-        }}
-        disabled={localidades.length === 0}
-        renderInput={(params) => (
-          <TextField {...params} label="Ponto de Chegada" margin="normal" />
-        )}
-        noOptionsText="Nenhuma localidade encontrada"
+        onChange={setPontoB}
+        filtros={currentFilters}
       />
 
       <TextField label="Velocidade Média (km/h)" type="number" value={velocidade} onChange={(e) => setVelocidade(e.target.value)} fullWidth margin="normal" />
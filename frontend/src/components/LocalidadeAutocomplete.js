@@ -0,0 +1,62 @@
+import React, { useEffect, useState } from 'react';
+import { Autocomplete, TextField } from '@mui/material';
+import api from '../services/api';
+
+// Seletor de localidade com sugestões vindas do servidor
+// (/api/localidades/autocomplete/), sem precisar da lista completa no cliente.
+const LocalidadeAutocomplete = ({ label, value, onChange, filtros = {}, limite = 20 }) => {
+  const [texto, setTexto] = useState('');
+  const [opcoes, setOpcoes] = useState([]);
+  const [carregando, setCarregando] = useState(false);
+
+  useEffect(() => {
+    if (!texto.trim()) {
+      setOpcoes(value ? [value] : []);
+      return undefined;
+    }
+    let cancelado = false;
+    // Espera o usuário parar de digitar antes de consultar.
+    const temporizador = setTimeout(async () => {
+      setCarregando(true);
+      try {
+        const params = { q: texto, limit: limite };
+        if (filtros.fonte_dados) params.fonte_dados = filtros.fonte_dados;
+        if (filtros.calha_rio) params.calha_rio = filtros.calha_rio;
+        const response = await api.get('/localidades/autocomplete/', { params });
+        if (!cancelado) setOpcoes(response.data);
+      } catch (error) {
+        if (!cancelado) setOpcoes([]);
+      } finally {
+        if (!cancelado) setCarregando(false);
+      }
+    }, 150);
+    return () => {
+      cancelado = true;
+      clearTimeout(temporizador);
+    };
+  }, [texto, value, filtros.fonte_dados, filtros.calha_rio, limite]);
+
+  return (
+    <Autocomplete
+      options={opcoes}
+      loading={carregando}
+      // A filtragem e a ordenação já vêm prontas do servidor.
+      filterOptions={(x) => x}
+      getOptionLabel={(option) => `${option.nome_comunidade} (${option.municipio})`}
+      isOptionEqualToValue={(option, selecionado) => option.id === selecionado.id}
+      value={value}
+      onChange={(event, newValue) => onChange(newValue)}
+      onInputChange={(event, newInputValue, reason) => {
+        // Ao escolher uma opção o campo mostra o rótulo dela; não é uma nova busca.
+        if (reason !== 'reset') setTexto(newInputValue);
+      }}
+      renderInput={(params) => (
+        <TextField {...params} label={label} margin="normal" />
+      )}
+      loadingText="Buscando..."
+      noOptionsText={texto.trim() ? 'Nenhuma localidade encontrada' : 'Digite o nome da comunidade ou do município'}
+    />
+  );
+};
+
+export default LocalidadeAutocomplete;
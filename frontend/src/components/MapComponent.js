@@ -102,7 +102,7 @@ const MapComponent = ({ localidades = [], routePoints = {}, routeResult = null }
             </Popup>
           </Marker>
           
-          <Polyline positions={[[routePoints.pontoA.latitude, routePoints.pontoA.longitude], [routePoints.pontoB.latitude, routePoints.pontoB.longitude]]} color="red">
+          <Polyline positions={routeResult?.geometria || [[routePoints.pontoA.latitude, routePoints.pontoA.longitude], [routePoints.pontoB.latitude, routePoints.pontoB.longitude]]} color="red">
             {routeResult && 
               <Popup>
                 <b>Distância:</b> {routeResult.distancia} km<br/>
@@ -3,6 +3,7 @@ import { Box, Paper } from '@mui/material';
 import MapComponent from '../components/MapComponent';
 import FilterPanelSimple from '../components/FilterPanelSimple';
 import api from '../services/api';
+import { decodificarColunar } from '../services/colunar';
 
 function DashboardPage() {
   const [calhas, setCalhas] = useState([]);
@@ -45,8 +46,18 @@ function DashboardPage() {
       if (filters.calha_rio) {
         params.append('calha_rio', filters.calha_rio);
       }
-      const response = await api.get(`/localidades/?limit=2000&${params.toString()}`);
-      setLocalidades(response.data.results || response.data || []);
+      // A API pagina por cursor: seguimos os links "next" até a última página.
+      // O formato colunar binário é bem menor e mais rápido de decodificar que o JSON.
+      params.append('format', 'colunar');
+      let todas = [];
+      let url = `/localidades/?limit=2000&${params.toString()}`;
+      while (url) {
+        const response = await api.get(url, { responseType: 'arraybuffer' });
+        const { cabecalho, linhas } = decodificarColunar(response.data);
+        todas = todas.concat(linhas);
+        url = cabecalho.next || null;
+      }
+      setLocalidades(todas);
     } catch (error) {
       console.error("Erro ao buscar localidades:", error);
       setLocalidades([]);
@@ -90,7 +101,6 @@ function DashboardPage() {
         <h2>Filtros e Análise</h2>
         <FilterPanelSimple
           calhas={calhas}
-          localidades={localidades}
           onFilterChange={handleFilterChange}
           onCalculateRoute={handleCalculateRoute}
           onClearFilters={handleClearFilters}
@@ -0,0 +1,52 @@
+// frontend/src/services/colunar.js
+//
+// Decodifica o formato binário colunar da API de localidades (?format=colunar).
+// Layout: "GLC1" + tamanho do cabeçalho (uint32 LE) + cabeçalho JSON + buffers
+// alinhados em 8 bytes. Veja backend/localidades/colunar.py.
+
+const TIPOS = {
+  int32: Int32Array,
+  int64: BigInt64Array,
+  float32: Float32Array,
+  uint8: Uint8Array,
+  uint16: Uint16Array,
+  uint32: Uint32Array,
+};
+
+const lerColuna = (buffer, base, coluna, linhas) => {
+  const inicio = base + coluna.offset;
+
+  if (coluna.tipo === 'dicionario') {
+    const indices = new TIPOS[coluna.indices](buffer, inicio, linhas);
+    return Array.from(indices, (i) => coluna.valores[i]);
+  }
+
+  if (coluna.tipo === 'texto') {
+    const offsets = new Int32Array(buffer, inicio, linhas + 1);
+    const texto = new Uint8Array(buffer, inicio + 4 * (linhas + 1), coluna.bytes - 4 * (linhas + 1));
+    const decoder = new TextDecoder('utf-8');
+    return Array.from({ length: linhas }, (_, i) => decoder.decode(texto.subarray(offsets[i], offsets[i + 1])));
+  }
+
+  const valores = Array.from(new TIPOS[coluna.tipo](buffer, inicio, linhas), Number);
+  if (coluna.nulo !== undefined) {
+    return valores.map((v) => (v === coluna.nulo ? null : v));
+  }
+  return valores;
+};
+
+// Retorna { cabecalho, linhas }, onde `linhas` tem o mesmo formato da resposta JSON.
+export const decodificarColunar = (buffer) => {
+  const visao = new DataView(buffer);
+  const tamanhoCabecalho = visao.getUint32(4, true);
+  const cabecalho = JSON.parse(new TextDecoder('utf-8').decode(new Uint8Array(buffer, 8, tamanhoCabecalho)));
+  const base = 8 + tamanhoCabecalho;
+
+  const colunas = cabecalho.colunas.map((coluna) => [coluna.nome, lerColuna(buffer, base, coluna, cabecalho.linhas)]);
+  const linhas = Array.from({ length: cabecalho.linhas }, (_, i) => {
+    const linha = {};
+    colunas.forEach(([nome, valores]) => { linha[nome] = valores[i]; });
+    return linha;
+  });
+  return { cabecalho, linhas };
+};